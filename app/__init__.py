@@ -1,11 +1,12 @@
 import os
 from flask import Flask, request
-from sqlalchemy import inspect as sa_inspect
 from flask_sqlalchemy import SQLAlchemy
 from config import config
+from app.database import RoutingSession
 
 # Initialize extensions
-db = SQLAlchemy()
+# 読み取りと書き込みで接続先を切り替えるセッションを使う（app/database.py）
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 def create_app(config_name=None):
     """Application factory pattern"""
@@ -25,9 +26,19 @@ def create_app(config_name=None):
     os.makedirs(app.config['DATABASE_PATH'].parent, exist_ok=True)
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
+    # 読み取り専用エンジンを binds に追加してから初期化する
+    from app.database import READ_BIND_KEY, configure_read_engine, configure_sqlite, read_pragmas
+    configure_read_engine(app)
+    
     # Initialize extensions with app
     db.init_app(app)
     
+    # SQLiteの接続ごとの設定（WAL・キャッシュ・busy_timeout など）を登録
+    with app.app_context():
+        configure_sqlite(db.engine, app.config.get('SQLITE_PRAGMAS'))
+        if READ_BIND_KEY in db.engines:
+            configure_sqlite(db.engines[READ_BIND_KEY], read_pragmas(app.config.get('SQLITE_PRAGMAS')))
+    
     # Register blueprints (centralized)
     from app.controllers.blueprints import register_blueprints
     register_blueprints(app)
@@ -36,6 +47,10 @@ def create_app(config_name=None):
     from app.controllers.error_handlers import register_error_handlers
     register_error_handlers(app)
     
+    # Register CLI commands
+    from app.cli import register_commands
+    register_commands(app)
+    
     # 静的ファイル配信の改善
     @app.after_request
     def after_request(response):
@@ -47,29 +62,20 @@ def create_app(config_name=None):
                 response.mimetype = 'application/javascript'
         return response
     
-    # リクエスト毎に最低限のDB初期化を保証（初回起動時の500回避）
-    @app.before_request
-    def ensure_db_initialized():
-        try:
-            inspector = sa_inspect(db.engine)
-            tables = set(inspector.get_table_names())
-            required = {"projects", "branches", "fiscal_years"}
-            if not required.issubset(tables):
-                # モデル読み込み後に作成
-                from app import models  # noqa: F401
-                db.create_all()
-        except Exception:
-            # 初期化段階の例外は握りつぶしてハンドラ（OperationalError フォールバック）に委ねる
-            pass
-
-    # Create database tables
+    # マイグレーションの適用とテーブル・インデックスの作成は起動時に1回だけ行い、
+    # できなかった場合は起動しない（リクエストごとに再試行しない）
+    from app.database import ensure_database_ready
+    ensure_database_ready(app)
+    
+    # 停止したワーカープロセスが実行していたエクスポートジョブは、起動時に失敗扱いにする
+    from app.services.export_job_service import ExportJobService
     with app.app_context():
-        # Ensure models are imported so SQLAlchemy is aware of all tables
         try:
-            from app import models  # noqa: F401
-        except Exception:
-            # 遅延インポート失敗時でもアプリの起動は継続する
-            pass
-        db.create_all()
+            ExportJobService.recover_orphaned_jobs(at_startup=True)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'Failed to recover orphaned export jobs: {e}')
+        finally:
+            db.session.remove()
     
-    return app
\ No newline at end of file
+    return app
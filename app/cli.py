@@ -0,0 +1,111 @@
+"""
+管理用CLIコマンド
+
+    flask --app app snapshot create [--compress]
+    flask --app app snapshot list
+    flask --app app snapshot verify <name>
+    flask --app app snapshot restore <name> --yes
+    flask --app app backup create [--incremental [--since <変更番号>]] [--compress] -o <file>
+    flask --app app backup restore-chain <full> [<incremental> ...] --yes
+"""
+import click
+from flask import Flask
+from flask.cli import AppGroup
+
+from app.models import BackupHistory
+from app.services.backup_service import BackupService
+from app.services.snapshot_service import SnapshotService
+
+snapshot_cli = AppGroup('snapshot', help='SQLiteスナップショットの作成・検証・リストア')
+backup_cli = AppGroup('backup', help='JSONバックアップ（フル・差分）の作成とリストア')
+
+
+def _fail(result):
+    raise click.ClickException(result['error'])
+
+
+@snapshot_cli.command('create')
+@click.option('--compress', is_flag=True, help='gzip 圧縮する')
+@click.option('--pages', type=int, default=None, help='1ステップでコピーするページ数')
+def create_snapshot(compress, pages):
+    """スナップショットを作成"""
+    result = SnapshotService.create_snapshot(compress=compress, pages=pages)
+    if not result['success']:
+        _fail(result)
+    manifest = result['manifest']
+    click.echo(f"{manifest['name']}: {manifest['file']} ({manifest['size']} bytes, sha256 {manifest['sha256']})")
+
+
+@snapshot_cli.command('list')
+def list_snapshots():
+    """スナップショットの一覧を表示"""
+    for manifest in SnapshotService.list_snapshots():
+        tables = ', '.join(f'{table}={count}' for table, count in manifest['tables'].items())
+        click.echo(f"{manifest['name']}\t{manifest['created_at']}\t{manifest['size']} bytes\t{tables}")
+
+
+@snapshot_cli.command('verify')
+@click.argument('name')
+def verify_snapshot(name):
+    """スナップショットのチェックサムを検証"""
+    result = SnapshotService.verify_snapshot(name)
+    if not result['success']:
+        _fail(result)
+    click.echo(f'{name}: OK')
+
+
+@snapshot_cli.command('restore')
+@click.argument('name')
+@click.option('--yes', is_flag=True, help='確認せずに実行する')
+def restore_snapshot(name, yes):
+    """スナップショットからデータベースをリストア"""
+    if not yes:
+        click.confirm(f'現在のデータベースを {name} で置き換えます。続行しますか？', abort=True)
+    result = SnapshotService.restore_snapshot(name)
+    if not result['success']:
+        _fail(result)
+    click.echo(f"{name}: restored in {result['swap_ms']} ms (previous database: {result['pre_restore_file']})")
+
+
+@backup_cli.command('create')
+@click.option('--output', '-o', required=True, type=click.Path(dir_okay=False, writable=True), help='出力先ファイル')
+@click.option('--incremental', is_flag=True, help='直前のバックアップ以降の変更のみを出力する')
+@click.option('--since', default=None, type=click.IntRange(min=0),
+              help='差分の基準の変更番号（バックアップの watermark、省略時は直前のバックアップのウォーターマーク）')
+@click.option('--compress', is_flag=True, help='gzip 圧縮する')
+def create_backup(output, incremental, since, compress):
+    """バックアップファイルを作成"""
+    if since is not None and not incremental:
+        raise click.UsageError('--since は --incremental と一緒に指定してください')
+    if incremental and since is None:
+        since = BackupHistory.latest_watermark()
+        if since is None:
+            raise click.ClickException('差分の基準となるバックアップがありません。先にフルバックアップを作成してください。')
+    size = 0
+    with open(output, 'wb') as f:
+        for chunk in BackupService.iter_backup(compress=compress, since=since):
+            f.write(chunk)
+            size += len(chunk)
+    click.echo(f"{output}: {'incremental' if incremental else 'full'} backup ({size} bytes)")
+
+
+@backup_cli.command('restore-chain')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--yes', is_flag=True, help='確認せずに実行する')
+def restore_chain(paths, yes):
+    """フルバックアップに差分バックアップを順に適用してリストア"""
+    if not yes:
+        click.confirm(f'現在のデータを {paths[0]} と {len(paths) - 1} 件の差分で置き換えます。続行しますか？', abort=True)
+    result = BackupService.restore_chain(paths)
+    if not result['success']:
+        _fail(result)
+    statistics = result['statistics']
+    click.echo(f"base: {statistics['base']['total_created']} records")
+    for path, incremental in zip(paths[1:], statistics['incrementals']):
+        click.echo(f"{path}: {incremental['total_upserted']} upserted, {incremental['total_deleted']} deleted")
+
+
+def register_commands(app: Flask):
+    """CLIコマンドを登録"""
+    app.cli.add_command(snapshot_cli)
+    app.cli.add_command(backup_cli)
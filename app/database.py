@@ -0,0 +1,377 @@
+"""
+データベース接続の設定と初期化
+
+SQLiteの接続ごとの設定（PRAGMA）は接続を閉じると失われるため、
+SQLAlchemy の connect イベントで新しい接続が作られるたびに適用する。
+テーブル・インデックスの作成とマイグレーションの適用・確認はリクエストごと
+ではなく、プロセスの起動時に1回だけ行う。スキーマが古いままのデータベースでは
+起動しない（誤った単位の金額などを返さないため）。
+
+GETリクエストと read_only() の範囲内の読み取りは、読み取り専用の
+エンジン（mode=ro・query_only）に振り分ける。WAL では読み取りが
+書き込みをブロックしないため、長い集計やエクスポートがインポートと競合しない。
+"""
+import functools
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import sqlalchemy as sa
+from flask import Flask, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import SQLAlchemyError
+
+# 初期化の完了を記録する app.extensions のキー
+INITIALIZED_KEY = 'database_initialized'
+
+# マイグレーションを実行していないデータベースを、現在のモデルで作成されたものと判定する列
+# （projects の列名 -> 型。金額列の整数化・年度内期間の列・変更番号の列の追加が反映されていること）
+CURRENT_SCHEMA_COLUMNS = {'revenue': 'INTEGER', 'expenses': 'INTEGER', 'fiscal_month': 'INTEGER', 'change_seq': 'INTEGER'}
+
+# 金額を銭単位の整数に変換するマイグレーション（未適用のまま起動すると金額を100分の1で返す）
+MONEY_MIGRATION = '006_store_money_as_minor_units'
+
+# 読み取り専用エンジンの SQLALCHEMY_BINDS のキー
+READ_BIND_KEY = 'readonly'
+
+# 読み取り専用エンジンにも適用する PRAGMA（接続単位の性能設定のみ）
+READ_PRAGMA_NAMES = ('busy_timeout', 'cache_size', 'mmap_size', 'temp_store')
+
+# 読み取りを読み取り専用エンジンに振り分けるHTTPメソッド
+READ_ONLY_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+_initialize_lock = threading.Lock()
+_read_only = ContextVar('database_read_only', default=False)
+
+# 適用順（journal_mode の切り替えはロックを取るため、先に busy_timeout を設定する）
+SQLITE_PRAGMA_ORDER = (
+    'busy_timeout',
+    'journal_mode',
+    'synchronous',
+    'cache_size',
+    'mmap_size',
+    'temp_store',
+    'foreign_keys',
+    'query_only',
+)
+
+# 値として受け付けるキーワード（数値以外）
+SQLITE_PRAGMA_KEYWORDS = {
+    'journal_mode': ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'),
+    'synchronous': ('OFF', 'NORMAL', 'FULL', 'EXTRA'),
+    'temp_store': ('DEFAULT', 'FILE', 'MEMORY'),
+    'foreign_keys': ('ON', 'OFF'),
+    'query_only': ('ON', 'OFF'),
+}
+
+
+def build_pragma_statements(pragmas: Dict[str, Any]) -> List[str]:
+    """
+    設定値から PRAGMA 文を組み立てる（値が None の項目は SQLite の既定値のまま）
+
+    Args:
+        pragmas: PRAGMA 名 -> 値
+
+    Returns:
+        List: 適用順に並べた PRAGMA 文
+
+    Raises:
+        ValueError: 未対応の PRAGMA 名・値が指定された場合
+    """
+    unknown = set(pragmas) - set(SQLITE_PRAGMA_ORDER)
+    if unknown:
+        raise ValueError(f'未対応のSQLite PRAGMAです: {", ".join(sorted(unknown))}')
+    statements = []
+    for name in SQLITE_PRAGMA_ORDER:
+        value = pragmas.get(name)
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = 'ON' if value else 'OFF'
+        if isinstance(value, int):
+            statements.append(f'PRAGMA {name} = {value}')
+            continue
+        keyword = str(value).upper()
+        if keyword not in SQLITE_PRAGMA_KEYWORDS.get(name, ()):
+            raise ValueError(f'SQLite PRAGMA {name} の値が正しくありません: {value}')
+        statements.append(f'PRAGMA {name} = {keyword}')
+    return statements
+
+
+def configure_sqlite(engine: Engine, pragmas: Dict[str, Any]):
+    """
+    SQLiteのエンジンに接続ごとの PRAGMA を登録（SQLite以外のエンジンでは何もしない）
+
+    Args:
+        engine: SQLAlchemy のエンジン
+        pragmas: PRAGMA 名 -> 値（config の SQLITE_PRAGMAS）
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    statements = build_pragma_statements(pragmas or {})
+    if not statements:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+class DatabaseNotReadyError(RuntimeError):
+    """データベースを利用できる状態にできないため、アプリケーションを起動できない"""
+
+
+def _sqlite_database_path(engine: Engine) -> Optional[str]:
+    """SQLiteのファイルDBのパス（SQLite以外・メモリDBは None）"""
+    url = engine.url
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:' \
+            or url.database.startswith('file:'):
+        return None
+    return url.database
+
+
+def migrate_schema(app: Flask, engine: Engine):
+    """
+    未適用のマイグレーション（migrations/migrate.py）を適用する
+
+    マイグレーションの記録が無いデータベースは、projects テーブルが無ければ新規、
+    現在のモデルと同じ列の型であればモデルから作成されたものとして、マイグレーションを
+    実行せずに適用済みとして記録する。それ以外（金額が小数のままの旧スキーマなど）は
+    DATABASE_AUTO_MIGRATE が有効な場合に適用し、無効な場合や適用できなかった場合は
+    DatabaseNotReadyError を送出する。SQLite以外のデータベースでは何もしない。
+
+    確認から適用までをプロセス間のファイルロック（migration_lock）の中で行うため、
+    複数のワーカーが同時に起動しても適用するのは最初の1つで、他のワーカーは
+    適用の完了を待ってから適用済みであることを確認する。
+
+    Args:
+        app: Flask アプリケーション
+        engine: 書き込み用のエンジン
+
+    Raises:
+        DatabaseNotReadyError: 未適用のマイグレーションが残っている場合
+    """
+    path = _sqlite_database_path(engine)
+    if path is None:
+        return
+    from migrations.migrate import migration_lock
+
+    with migration_lock(path):
+        _migrate_schema_locked(app, path)
+
+
+def _migrate_schema_locked(app: Flask, path: str):
+    """migrate_schema の本体（migration_lock の中で呼ぶ）"""
+    from migrations.migrate import DatabaseMigrator, build_migrations, run_migrations
+
+    migrations = build_migrations()
+    migrator = DatabaseMigrator(path)
+    try:
+        pending = migrator.pending_versions(migrations)
+        if pending and len(pending) == len(migrations):
+            columns = {row[1]: row[2].upper() for row in migrator.connect().execute("PRAGMA table_info('projects')")}
+            if not columns or all(columns.get(name) == type_ for name, type_ in CURRENT_SCHEMA_COLUMNS.items()):
+                migrator.stamp(migrations)
+                return
+    finally:
+        migrator.close()
+    if not pending:
+        return
+
+    if app.config.get('DATABASE_AUTO_MIGRATE'):
+        app.logger.info(f'Applying database migrations: {", ".join(pending)}')
+        pending = run_migrations(path)
+        if not pending:
+            return
+    note = '（売上・経費が銭単位の整数に変換されていません）' if MONEY_MIGRATION in pending else ''
+    raise DatabaseNotReadyError(
+        f'データベース {path} に未適用のマイグレーションがあります: {", ".join(pending)}{note}。'
+        f'python migrations/migrate.py --db {path} を実行してから起動してください。'
+    )
+
+
+def initialize_database(app: Flask) -> bool:
+    """
+    マイグレーションを適用し、テーブルと既存テーブルに不足しているインデックスを作成
+
+    db.create_all() は既存のテーブルにインデックスを追加しないため、モデルに
+    定義されていて実際のデータベースに無いインデックスはここで作成する。
+    同じアプリに対しては成功するまで1回だけ実行する（複数スレッドから
+    同時に呼ばれても1回）。
+
+    Args:
+        app: Flask アプリケーション
+
+    Returns:
+        bool: 初期化済みかどうか（失敗した場合はログに記録して False）
+
+    Raises:
+        DatabaseNotReadyError: 未適用のマイグレーションが残っている場合（再試行しても解消しない）
+    """
+    if app.extensions.get(INITIALIZED_KEY):
+        return True
+    from app import db, models  # noqa: F401  モデルを読み込んでからテーブルを作成する
+
+    with _initialize_lock:
+        if app.extensions.get(INITIALIZED_KEY):
+            return True
+        try:
+            with app.app_context():
+                migrate_schema(app, db.engine)
+                # 読み取り専用エンジン（binds）にはテーブルを作成しない
+                db.create_all(bind_key=None)
+                with db.engine.begin() as connection:
+                    inspector = inspect(connection)
+                    for table in db.metadata.sorted_tables:
+                        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+                        for index in table.indexes:
+                            if index.name not in existing:
+                                index.create(connection)
+                                app.logger.info(f'Created missing index: {index.name}')
+        except (SQLAlchemyError, sqlite3.Error) as e:
+            app.logger.error(f'Database initialization error: {str(e)}')
+            return False
+        app.extensions[INITIALIZED_KEY] = True
+        return True
+
+
+def ensure_database_ready(app: Flask):
+    """
+    起動時にデータベースを初期化する（失敗した場合は待機して1回だけ再試行する）
+
+    起動直後のロック待ちなど一時的な失敗のみを再試行し、それでも初期化できない
+    場合は起動しない（リクエストごとに初期化を再試行しない）。
+
+    Args:
+        app: Flask アプリケーション
+
+    Raises:
+        DatabaseNotReadyError: 初期化できなかった場合・未適用のマイグレーションがある場合
+    """
+    if initialize_database(app):
+        return
+    time.sleep(app.config.get('DATABASE_INIT_RETRY_WAIT', 0))
+    if not initialize_database(app):
+        raise DatabaseNotReadyError('データベースを初期化できませんでした。接続先の設定とファイルの権限を確認してください。')
+
+
+def read_only_database_uri(uri: str, instance_path: Optional[str] = None) -> Optional[str]:
+    """
+    SQLiteのファイルDBの接続URIから、読み取り専用（mode=ro）の接続URIを作成
+
+    Args:
+        uri: SQLALCHEMY_DATABASE_URI
+        instance_path: 相対パスの基準（Flask-SQLAlchemy と同じく app.instance_path）
+
+    Returns:
+        Optional[str]: 読み取り専用の接続URI（SQLite以外・メモリDB・URI形式の場合は None）
+    """
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:' \
+            or url.database.startswith('file:'):
+        return None
+    path = Path(url.database)
+    if not path.is_absolute() and instance_path:
+        path = Path(instance_path) / path
+    return f'sqlite:///file:{path.resolve().as_posix()}?mode=ro&uri=true'
+
+
+def configure_read_engine(app: Flask):
+    """
+    読み取り専用エンジンを SQLALCHEMY_BINDS に追加（db.init_app より前に呼ぶ）
+
+    DATABASE_READ_ROUTING が無効な場合や、SQLite以外のデータベースでは追加しない。
+    """
+    if not app.config.get('DATABASE_READ_ROUTING'):
+        return
+    read_uri = read_only_database_uri(app.config['SQLALCHEMY_DATABASE_URI'], app.instance_path)
+    if read_uri is None:
+        return
+    # 設定クラスの辞書を書き換えないようにコピーする
+    app.config['SQLALCHEMY_BINDS'] = {**app.config.get('SQLALCHEMY_BINDS', {}), READ_BIND_KEY: read_uri}
+
+
+def read_pragmas(pragmas: Dict[str, Any]) -> Dict[str, Any]:
+    """読み取り専用エンジン用の PRAGMA（性能設定と query_only）"""
+    selected = {name: value for name, value in (pragmas or {}).items() if name in READ_PRAGMA_NAMES}
+    selected['query_only'] = 'ON'
+    return selected
+
+
+@contextmanager
+def read_only():
+    """範囲内の読み取りを読み取り専用エンジンに振り分ける（書き込みは通常のエンジン）"""
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def read_only_method(func):
+    """関数内の読み取りを読み取り専用エンジンに振り分けるデコレーター"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with read_only():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _routes_reads() -> bool:
+    """現在の処理で読み取りを読み取り専用エンジンに振り分けるか"""
+    if _read_only.get():
+        return True
+    return has_request_context() and request.method in READ_ONLY_METHODS
+
+
+class RoutingSession(Session):
+    """
+    読み取りと書き込みで接続先のエンジンを切り替えるセッション
+
+    振り分けが有効な間、SELECT は読み取り専用エンジンで実行する。
+    flush や INSERT/UPDATE/DELETE、テキストSQLは通常のエンジンで実行し、
+    以降はトランザクションが終わるまで読み取りも通常のエンジンで行う
+    （自分の書き込みが見えるようにするため）。
+    """
+
+    WROTE_KEY = 'routing_wrote'
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _routes_reads():
+            if not self._flushing and not self.info.get(self.WROTE_KEY) \
+                    and isinstance(clause, (sa.Select, sa.CompoundSelect)):
+                engine = self._db.engines.get(READ_BIND_KEY)
+                if engine is not None:
+                    return engine
+            else:
+                self.info[self.WROTE_KEY] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            self.info.pop(self.WROTE_KEY, None)
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self.info.pop(self.WROTE_KEY, None)
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.info.pop(self.WROTE_KEY, None)
@@ -1,5 +1,10 @@
 from datetime import datetime
-from sqlalchemy import CheckConstraint, Index
+from decimal import Decimal, ROUND_HALF_UP
+import json
+import operator
+import os
+from sqlalchemy import CheckConstraint, Index, Integer, event, insert, inspect, select, update
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.exc import IntegrityError
 from app import db
 from app.enums import OrderProbability
@@ -14,6 +19,110 @@ class ValidationError(Exception):
         super().__init__(self.message)
 
 
+class Money(TypeDecorator):
+    """
+    金額型（DBには銭単位の整数で保存し、Pythonでは円単位の float で扱う）
+
+    Numeric は SQLite で行ごとに Decimal へ変換するため、一覧やエクスポートの
+    読み込みが遅くなる。整数で保存することで、合計・並べ替えもSQL側で
+    整数のまま計算される。
+    """
+    impl = Integer
+    cache_ok = True
+
+    # 1円あたりの保存単位（銭）
+    SCALE = 100
+
+    class Comparator(TypeDecorator.Comparator):
+        """金額同士の加減算・数値との乗除算の結果も金額型として扱う"""
+
+        def _adapt_expression(self, op, other_comparator):
+            other_is_money = isinstance(other_comparator.type, Money)
+            if op in (operator.add, operator.sub) and other_is_money:
+                return op, self.type
+            if op in (operator.mul, operator.truediv) and not other_is_money:
+                return op, self.type
+            return super()._adapt_expression(op, other_comparator)
+
+    comparator_factory = Comparator
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, int):
+            return value * self.SCALE
+        return int((Decimal(str(value)) * self.SCALE).to_integral_value(ROUND_HALF_UP))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return value / self.SCALE
+
+    def result_processor(self, dialect, coltype):
+        # 行ごとの呼び出しを減らすため、process_result_value を経由しない変換関数を返す
+        scale = self.SCALE
+
+        def process(value):
+            return None if value is None else value / scale
+        return process
+
+
+class ChangeCounter(db.Model):
+    """
+    変更番号の採番（差分バックアップのウォーターマーク）
+
+    プロジェクト・支社・年度・トゥームストーンの行には、書き込んだトランザクションで
+    採番した変更番号（change_seq）を記録する。SQLiteでは書き込みトランザクションが
+    直列に実行され、採番はトランザクションの最初の書き込みで行うため、変更番号は
+    コミットの順に増える。バックアップは読み取りの前に現在の番号を読み、次の差分は
+    その番号より大きい行だけを出力すればよい（トランザクションの長さや時計に依存しない）。
+    """
+    __tablename__ = 'change_counter'
+
+    COUNTER_ID = 1
+
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def current(cls, session=None):
+        """コミット済みの最新の変更番号（まだ変更が無い場合は 0）"""
+        session = session or db.session
+        return session.execute(select(cls.value).where(cls.id == cls.COUNTER_ID)).scalar() or 0
+
+
+# connection.info に保存する（トランザクション, 変更番号）のキー
+CHANGE_SEQ_INFO_KEY = 'change_seq'
+
+
+def _next_change_seq(context):
+    """
+    変更番号の列の既定値（トランザクションごとに1回だけ採番し、同じトランザクションの行は同じ番号）
+
+    Core の一括INSERT・UPDATE でも適用される。UPSERT（ON CONFLICT DO UPDATE）の更新側には
+    onupdate が適用されないため、set_ に excluded.change_seq を含めること。
+    """
+    connection = context.connection
+    transaction = connection.get_transaction()
+    cached = connection.info.get(CHANGE_SEQ_INFO_KEY)
+    if cached and cached[0] is transaction:
+        return cached[1]
+    table = ChangeCounter.__table__
+    result = connection.execute(
+        update(table).where(table.c.id == ChangeCounter.COUNTER_ID).values(value=table.c.value + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(id=ChangeCounter.COUNTER_ID, value=1))
+    value = connection.execute(select(table.c.value).where(table.c.id == ChangeCounter.COUNTER_ID)).scalar_one()
+    connection.info[CHANGE_SEQ_INFO_KEY] = (transaction, value)
+    return value
+
+
+def change_seq_column(**kwargs):
+    """変更番号の列（挿入・更新のたびに採番した番号を記録する）"""
+    return db.Column(db.Integer, nullable=False, default=_next_change_seq, onupdate=_next_change_seq, **kwargs)
+
+
 class FiscalYear(db.Model):
     """年度マスターデータモデル"""
     __tablename__ = 'fiscal_years'
@@ -24,6 +133,7 @@ class FiscalYear(db.Model):
     is_active = db.Column(db.Boolean, nullable=False, default=True, index=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = change_seq_column()
     
     # リレーションシップ（プロジェクトとの関連付け）
     # 注意: fiscal_yearは外部キーではなく、年度の数値での関連付け
@@ -142,6 +252,7 @@ class Branch(db.Model):
     is_active = db.Column(db.Boolean, nullable=False, default=True, index=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = change_seq_column()
     
     # リレーションシップ（プロジェクトとの関連付け）
     projects = db.relationship('Project', backref='branch', lazy=True)
@@ -317,6 +428,47 @@ class Branch(db.Model):
         return f'<Branch {self.branch_code}: {self.branch_name}>'
 
 
+# 年度の開始月（4月）
+FISCAL_YEAR_START_MONTH = 4
+
+
+def fiscal_period(value):
+    """
+    日付から年度内の期間を求める
+
+    Args:
+        value: 日付・日時
+
+    Returns:
+        tuple: (年度内の月（4月=1〜3月=12）, 四半期（1〜4）, 半期（1〜2）)
+    """
+    month = (value.month - FISCAL_YEAR_START_MONTH) % 12 + 1
+    return month, (month - 1) // 3 + 1, (month - 1) // 6 + 1
+
+
+def fiscal_year_bounds(fiscal_year):
+    """
+    年度の期間（開始日時以上・終了日時未満）
+
+    Args:
+        fiscal_year: 年度
+
+    Returns:
+        tuple: (年度の開始日時, 翌年度の開始日時)
+    """
+    return datetime(fiscal_year, FISCAL_YEAR_START_MONTH, 1), datetime(fiscal_year + 1, FISCAL_YEAR_START_MONTH, 1)
+
+
+def _fiscal_period_default(index):
+    """売上計上日から年度内の期間を計算する列の既定値（Core の一括INSERTでも適用される）"""
+    def default(context):
+        recognized_at = context.get_current_parameters()[Project.REVENUE_DATE_COLUMN]
+        if isinstance(recognized_at, str):
+            recognized_at = datetime.fromisoformat(recognized_at)
+        return fiscal_period(recognized_at)[index]
+    return default
+
+
 class Project(db.Model):
     """プロジェクトデータモデル"""
     __tablename__ = 'projects'
@@ -327,13 +479,25 @@ class Project(db.Model):
     branch_id = db.Column(db.Integer, db.ForeignKey('branches.id'), nullable=False, index=True)
     fiscal_year = db.Column(db.Integer, nullable=False, index=True)
     order_probability = db.Column(db.Numeric(5, 2), nullable=False)
-    revenue = db.Column(db.Numeric(15, 2), nullable=False)
-    expenses = db.Column(db.Numeric(15, 2), nullable=False)
+    revenue = db.Column(Money, nullable=False)
+    expenses = db.Column(Money, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
-    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # 売上計上日（現状は作成日時）から計算した年度内の期間（月別・四半期・半期の集計用）
+    fiscal_month = db.Column(db.Integer, nullable=False, default=_fiscal_period_default(0))
+    fiscal_quarter = db.Column(db.Integer, nullable=False, default=_fiscal_period_default(1))
+    fiscal_half = db.Column(db.Integer, nullable=False, default=_fiscal_period_default(2))
+    # 差分バックアップ用の変更番号（ChangeCounter を参照）
+    change_seq = change_seq_column(index=True)
+    
+    # 売上計上日として扱う列
+    REVENUE_DATE_COLUMN = 'created_at'
     
     # Table constraints
     __table_args__ = (
+        Index('idx_projects_fiscal_year_month', 'fiscal_year', 'fiscal_month'),
+        Index('idx_projects_fiscal_year_quarter', 'fiscal_year', 'fiscal_quarter'),
+        Index('idx_projects_fiscal_year_half', 'fiscal_year', 'fiscal_half'),
         CheckConstraint('order_probability IN (0, 50, 100)', 
                        name='check_order_probability_values'),
         CheckConstraint('revenue >= 0', name='check_revenue_positive'),
@@ -557,4 +721,275 @@ class Project(db.Model):
         }
     
     def __repr__(self):
-        return f'<Project {self.project_code}: {self.project_name}>'
\ No newline at end of file
+        return f'<Project {self.project_code}: {self.project_name}>'
+
+class ImportCheckpoint(db.Model):
+    """インポートのチェックポイント（チャンク単位の進捗）"""
+    __tablename__ = 'import_checkpoints'
+    
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    job_key = db.Column(db.String(64), nullable=False, index=True)
+    file_hash = db.Column(db.String(64), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    file_type = db.Column(db.String(10), nullable=False)
+    sheet_name = db.Column(db.String(100))
+    column_mapping = db.Column(db.Text)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    last_chunk = db.Column(db.Integer, nullable=False, default=-1)
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+    processed_rows = db.Column(db.Integer, nullable=False, default=0)
+    success_count = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    skipped_count = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_RUNNING, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def is_completed(self):
+        """インポートが完了しているか"""
+        return self.status == self.STATUS_COMPLETED
+    
+    @classmethod
+    def find_running(cls, job_key):
+        """同じ条件で中断されているチェックポイントを取得"""
+        return cls.query.filter_by(job_key=job_key, status=cls.STATUS_RUNNING)\
+            .order_by(cls.id.desc()).first()
+    
+    @classmethod
+    def get_incomplete(cls):
+        """未完了のチェックポイント一覧を取得"""
+        return cls.query.filter_by(status=cls.STATUS_RUNNING).order_by(cls.updated_at.desc()).all()
+    
+    def record_chunk(self, chunk_index, processed_rows, success_count, error_count, skipped_count):
+        """
+        チャンクの反映結果を記録（コミットはチャンクのデータと同じトランザクションで行う）
+        
+        Args:
+            chunk_index: 反映したチャンク番号
+            processed_rows: チャンクで処理した行数
+            success_count: 成功件数
+            error_count: エラー件数
+            skipped_count: スキップ件数
+        """
+        self.last_chunk = chunk_index
+        self.processed_rows += processed_rows
+        self.success_count += success_count
+        self.error_count += error_count
+        self.skipped_count += skipped_count
+    
+    def to_dict(self):
+        """辞書形式でデータを返す"""
+        return {
+            'id': self.id,
+            'file_name': os.path.basename(self.file_path),
+            'file_type': self.file_type,
+            'sheet_name': self.sheet_name,
+            'chunk_size': self.chunk_size,
+            'last_chunk': self.last_chunk,
+            'total_rows': self.total_rows,
+            'processed_rows': self.processed_rows,
+            'success_count': self.success_count,
+            'error_count': self.error_count,
+            'skipped_count': self.skipped_count,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ImportCheckpoint {self.id}: chunk {self.last_chunk} ({self.status})>'
+
+
+class ExportJob(db.Model):
+    """バックグラウンドで実行するエクスポートジョブ"""
+    __tablename__ = 'export_jobs'
+    
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    export_format = db.Column(db.String(10), nullable=False)
+    filters = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_QUEUED, index=True)
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+    processed_rows = db.Column(db.Integer, nullable=False, default=0)
+    file_path = db.Column(db.String(500))
+    file_size = db.Column(db.Integer)
+    error_message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # ジョブを受け付けて実行するプロセス（「ホスト名:PID」。停止したプロセスのジョブの検出に使う）
+    worker_id = db.Column(db.String(100))
+    
+    @property
+    def is_completed(self):
+        """ファイルの生成が完了しているか"""
+        return self.status == self.STATUS_COMPLETED
+    
+    @property
+    def progress(self):
+        """進捗率（%）"""
+        if self.is_completed:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(int(self.processed_rows * 100 / self.total_rows), 99)
+    
+    @classmethod
+    def count_active(cls):
+        """待機中・実行中のジョブ数を取得"""
+        return cls.query.filter(cls.status.in_(cls.ACTIVE_STATUSES)).count()
+    
+    def to_dict(self):
+        """辞書形式でデータを返す"""
+        return {
+            'id': self.id,
+            'format': self.export_format,
+            'filters': json.loads(self.filters) if self.filters else {},
+            'status': self.status,
+            'total_rows': self.total_rows,
+            'processed_rows': self.processed_rows,
+            'progress': self.progress,
+            'file_size': self.file_size,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ExportJob {self.id}: {self.export_format} ({self.status})>'
+
+
+class DeletedRecord(db.Model):
+    """削除されたレコードの記録（差分バックアップで削除を伝えるトゥームストーン）"""
+    __tablename__ = 'deleted_records'
+    
+    # テーブル名 -> レコードを識別する自然キー（リストアでIDが振り直されるためIDは使わない）
+    RECORD_KEYS = {
+        'projects': 'project_code',
+        'branches': 'branch_code',
+        'fiscal_years': 'year',
+    }
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    record_key = db.Column(db.String(50), nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    change_seq = change_seq_column()
+    
+    __table_args__ = (
+        Index('idx_deleted_records_table_change_seq', 'table_name', 'change_seq'),
+    )
+    
+    def __repr__(self):
+        return f'<DeletedRecord {self.table_name}: {self.record_key}>'
+
+
+def _insert_tombstone(connection, table_name, record_key):
+    """トゥームストーンを記録（削除・キーの変更と同じトランザクション）"""
+    connection.execute(DeletedRecord.__table__.insert().values(
+        table_name=table_name,
+        record_key=str(record_key),
+        deleted_at=datetime.utcnow()
+    ))
+
+
+def _record_deletion(mapper, connection, target):
+    """ORM で削除されたレコードをトゥームストーンとして記録"""
+    table_name = target.__tablename__
+    _insert_tombstone(connection, table_name, getattr(target, DeletedRecord.RECORD_KEYS[table_name]))
+
+
+def _record_key_change(mapper, connection, target):
+    """
+    ORM で自然キー（プロジェクトコードなど）が変更されたレコードは、変更前のキーを
+    トゥームストーンとして記録（差分の適用先に変更前のキーの行が残らないように）
+    """
+    table_name = target.__tablename__
+    key = DeletedRecord.RECORD_KEYS[table_name]
+    history = inspect(target).attrs[key].history
+    if not history.has_changes():
+        return
+    if history.deleted:
+        previous = history.deleted[0]
+    else:
+        # 変更前の値を読み込まずに代入された場合は、更新前の行から取得する
+        table = mapper.local_table
+        previous = connection.execute(select(table.c[key]).where(table.c.id == target.id)).scalar()
+    if previous is not None and previous != getattr(target, key):
+        _insert_tombstone(connection, table_name, previous)
+
+
+for _model in (Project, Branch, FiscalYear):
+    event.listen(_model, 'after_delete', _record_deletion)
+    event.listen(_model, 'before_update', _record_key_change)
+
+
+@event.listens_for(Project, 'before_update')
+def _refresh_fiscal_period(mapper, connection, target):
+    """ORM で売上計上日が変更された場合に年度内の期間を再計算"""
+    if inspect(target).attrs[Project.REVENUE_DATE_COLUMN].history.has_changes():
+        target.fiscal_month, target.fiscal_quarter, target.fiscal_half = fiscal_period(
+            getattr(target, Project.REVENUE_DATE_COLUMN)
+        )
+
+
+class BackupHistory(db.Model):
+    """
+    作成したバックアップとリストアの記録（差分バックアップの基準となるウォーターマーク）
+
+    since・watermark は変更番号（ChangeCounter）。リストアはトゥームストーンを
+    残さずにデータを置き換えるため、区切り（TYPE_RESTORE）として記録し、
+    その後の差分バックアップには新しいフルバックアップを必要とする。
+    """
+    __tablename__ = 'backup_history'
+    
+    TYPE_FULL = 'full'
+    TYPE_INCREMENTAL = 'incremental'
+    TYPE_RESTORE = 'restore'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    backup_type = db.Column(db.String(20), nullable=False)
+    since = db.Column(db.Integer)
+    watermark = db.Column(db.Integer, nullable=False)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    deleted_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    @classmethod
+    def latest_watermark(cls):
+        """
+        直近のバックアップのウォーターマークを取得
+
+        バックアップが無い場合と、直近の記録がリストアの場合は None
+        （差分の基準にできないため、フルバックアップが必要）
+        """
+        latest = cls.query.order_by(cls.id.desc()).first()
+        if latest is None or latest.backup_type == cls.TYPE_RESTORE:
+            return None
+        return latest.watermark
+    
+    def to_dict(self):
+        """辞書形式でデータを返す"""
+        return {
+            'id': self.id,
+            'backup_type': self.backup_type,
+            'since': self.since,
+            'watermark': self.watermark,
+            'record_count': self.record_count,
+            'deleted_count': self.deleted_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<BackupHistory {self.id}: {self.backup_type} ({self.watermark})>'
@@ -1,8 +1,10 @@
-from flask import Blueprint, request, jsonify, send_file, render_template, redirect, url_for, flash, current_app
-from app.models import Project, Branch, FiscalYear, ValidationError
-from app import db
+from flask import Blueprint, Response, request, jsonify, send_file, render_template, current_app, stream_with_context
+from app.models import Project, Branch, FiscalYear, BackupHistory
+from app.services.backup_reader import BackupFormatError
+from app.services.backup_service import BackupService
+from app.services.snapshot_service import SnapshotService
+import gzip
 import json
-import io
 from datetime import datetime
 import os
 from werkzeug.utils import secure_filename
@@ -16,74 +18,80 @@ def index():
 @backup_bp.route('/create')
 def create_backup():
     try:
-        projects_data = []
-        branches_data = []
-        fiscal_years_data = []
+        compress = request.args.get('compress') == 'gzip'
+        since = None
+        if request.args.get('type') == 'incremental':
+            # 基準の指定が無い場合は直前のバックアップのウォーターマーク（変更番号）から差分を取る
+            if request.args.get('since'):
+                since = request.args.get('since', type=int)
+                if since is None or since < 0:
+                    return jsonify({'success': False, 'error': '基準の変更番号の形式が正しくありません。'}), 400
+            else:
+                since = BackupHistory.latest_watermark()
+                if since is None:
+                    return jsonify({'success': False, 'error': '差分の基準となるバックアップがありません。先にフルバックアップを作成してください。'}), 400
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        kind = 'incremental' if since is not None else 'backup'
+        filename = f'project_system_{kind}_{timestamp}.json' + ('.gz' if compress else '')
+        # テーブルごとにカーソルから逐次書き出す（全データをメモリに載せない）
+        chunks = BackupService.iter_backup(compress=compress, since=since)
+        response = Response(stream_with_context(chunks), mimetype='application/gzip' if compress else 'application/json')
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
+    except Exception as e:
+        current_app.logger.error(f'Backup creation error: {str(e)}')
+        return jsonify({'success': False, 'error': 'バックアップファイルの作成中にエラーが発生しました。'}), 500
 
-        projects = Project.query.all()
-        for project in projects:
-            projects_data.append({
-                'id': project.id,
-                'project_code': project.project_code,
-                'project_name': project.project_name,
-                'branch_id': project.branch_id,
-                'fiscal_year': project.fiscal_year,
-                'order_probability': float(project.order_probability),
-                'revenue': float(project.revenue),
-                'expenses': float(project.expenses),
-                'created_at': project.created_at.isoformat() if project.created_at else None,
-                'updated_at': project.updated_at.isoformat() if project.updated_at else None
-            })
+@backup_bp.route('/history')
+def backup_history():
+    try:
+        histories = BackupHistory.query.order_by(BackupHistory.id.desc()).limit(50).all()
+        return jsonify({'success': True, 'history': [history.to_dict() for history in histories]})
+    except Exception as e:
+        current_app.logger.error(f'Backup history error: {str(e)}')
+        return jsonify({'success': False, 'error': 'バックアップ履歴の取得中にエラーが発生しました。'}), 500
 
-        branches = Branch.query.all()
-        for branch in branches:
-            branches_data.append({
-                'id': branch.id,
-                'branch_code': branch.branch_code,
-                'branch_name': branch.branch_name,
-                'is_active': branch.is_active,
-                'created_at': branch.created_at.isoformat() if branch.created_at else None,
-                'updated_at': branch.updated_at.isoformat() if branch.updated_at else None
-            })
+@backup_bp.route('/snapshot', methods=['POST'])
+def create_snapshot():
+    try:
+        payload = request.get_json(silent=True) or {}
+        compress = bool(payload.get('compress', request.args.get('compress') == 'gzip'))
+        result = SnapshotService.create_snapshot(compress=compress)
+        if not result['success']:
+            return jsonify(result), 500
+        return jsonify({'success': True, 'snapshot': result['manifest'], 'message': 'スナップショットを作成しました。'})
+    except Exception as e:
+        current_app.logger.error(f'Snapshot creation error: {str(e)}')
+        return jsonify({'success': False, 'error': 'スナップショットの作成中にエラーが発生しました。'}), 500
 
-        fiscal_years = FiscalYear.query.all()
-        for fiscal_year in fiscal_years:
-            fiscal_years_data.append({
-                'id': fiscal_year.id,
-                'year': fiscal_year.year,
-                'year_name': fiscal_year.year_name,
-                'is_active': fiscal_year.is_active,
-                'created_at': fiscal_year.created_at.isoformat() if fiscal_year.created_at else None,
-                'updated_at': fiscal_year.updated_at.isoformat() if fiscal_year.updated_at else None
-            })
+@backup_bp.route('/snapshot', methods=['GET'])
+def list_snapshots():
+    try:
+        return jsonify({'success': True, 'snapshots': SnapshotService.list_snapshots()})
+    except Exception as e:
+        current_app.logger.error(f'Snapshot list error: {str(e)}')
+        return jsonify({'success': False, 'error': 'スナップショット一覧の取得中にエラーが発生しました。'}), 500
 
-        backup_data = {
-            'backup_info': {
-                'created_at': datetime.now().isoformat(),
-                'version': '1.0',
-                'description': 'プロジェクト収支システム バックアップデータ'
-            },
-            'data': {
-                'projects': projects_data,
-                'branches': branches_data,
-                'fiscal_years': fiscal_years_data
-            },
-            'statistics': {
-                'projects_count': len(projects_data),
-                'branches_count': len(branches_data),
-                'fiscal_years_count': len(fiscal_years_data)
-            }
-        }
+@backup_bp.route('/snapshot/<name>/download')
+def download_snapshot(name):
+    path = SnapshotService.snapshot_file_path(name)
+    if path is None or not os.path.exists(path):
+        return jsonify({'success': False, 'error': '指定されたスナップショットが見つかりません。'}), 404
+    return send_file(path, mimetype='application/gzip' if path.endswith('.gz') else 'application/vnd.sqlite3', as_attachment=True, download_name=os.path.basename(path), max_age=0)
 
-        json_str = json.dumps(backup_data, ensure_ascii=False, indent=2)
-        json_bytes = io.BytesIO(json_str.encode('utf-8'))
-        json_bytes.seek(0)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'project_system_backup_{timestamp}.json'
-        return send_file(json_bytes, mimetype='application/json', as_attachment=True, download_name=filename)
+@backup_bp.route('/snapshot/<name>/restore', methods=['POST'])
+def restore_snapshot(name):
+    try:
+        data = request.get_json(silent=True) or {}
+        if not data.get('confirm', False):
+            return jsonify({'success': False, 'error': 'リストア実行の確認が必要です。'}), 400
+        result = SnapshotService.restore_snapshot(name)
+        if not result['success']:
+            return jsonify(result), 400
+        return jsonify({'success': True, 'message': 'スナップショットからのリストアが完了しました。', 'swap_ms': result['swap_ms'], 'pre_restore_file': result['pre_restore_file']})
     except Exception as e:
-        current_app.logger.error(f'Backup creation error: {str(e)}')
-        return jsonify({'success': False, 'error': 'バックアップファイルの作成中にエラーが発生しました。'}), 500
+        current_app.logger.error(f'Snapshot restore error: {str(e)}')
+        return jsonify({'success': False, 'error': 'スナップショットのリストア中にエラーが発生しました。'}), 500
 
 @backup_bp.route('/info')
 def backup_info():
@@ -118,31 +126,42 @@ def upload_backup():
         file = request.files['backup_file']
         if file.filename == '':
             return jsonify({'success': False, 'error': 'ファイルが選択されていません。'}), 400
-        if not file.filename.lower().endswith('.json'):
+        filename = file.filename.lower()
+        if not filename.endswith(('.json', '.json.gz')):
             return jsonify({'success': False, 'error': 'JSONファイルを選択してください。'}), 400
-        try:
-            file_content = file.read().decode('utf-8')
-            backup_data = json.loads(file_content)
-        except json.JSONDecodeError:
-            return jsonify({'success': False, 'error': 'ファイル形式が正しくありません。有効なJSONファイルを選択してください。'}), 400
-        except UnicodeDecodeError:
-            return jsonify({'success': False, 'error': 'ファイルの文字エンコーディングが正しくありません。'}), 400
-        validation_result = validate_backup_file(backup_data)
-        if not validation_result['valid']:
-            return jsonify({'success': False, 'error': f"バックアップファイルの形式が正しくありません: {validation_result['error']}"}), 400
-        preview_info = generate_restore_preview(backup_data)
         session_key = f"backup_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         temp_dir = current_app.config.get('UPLOAD_FOLDER', 'uploads')
         os.makedirs(temp_dir, exist_ok=True)
-        temp_filename = secure_filename(f"{session_key}.json")
+        temp_filename = secure_filename(f"{session_key}.json" + ('.gz' if filename.endswith('.gz') else ''))
         temp_filepath = os.path.join(temp_dir, temp_filename)
-        with open(temp_filepath, 'w', encoding='utf-8') as f:
-            json.dump(backup_data, f, ensure_ascii=False, indent=2)
+        # アップロードされたバイト列をそのまま保存し、逐次読み込みで検証・件数集計する
+        file.save(temp_filepath)
+        try:
+            scanned = BackupService.scan_backup_file(temp_filepath)
+        except (json.JSONDecodeError, gzip.BadGzipFile, EOFError):
+            os.remove(temp_filepath)
+            return jsonify({'success': False, 'error': 'ファイル形式が正しくありません。有効なJSONファイルを選択してください。'}), 400
+        except UnicodeDecodeError:
+            os.remove(temp_filepath)
+            return jsonify({'success': False, 'error': 'ファイルの文字エンコーディングが正しくありません。'}), 400
+        except BackupFormatError as e:
+            os.remove(temp_filepath)
+            return jsonify({'success': False, 'error': f"バックアップファイルの形式が正しくありません: {str(e)}"}), 400
+        preview_info = generate_restore_preview(scanned['backup_info'], scanned['counts'])
         return jsonify({'success': True, 'session_key': session_key, 'preview': preview_info, 'message': 'バックアップファイルが正常にアップロードされました。'})
     except Exception as e:
         current_app.logger.error(f'Backup upload error: {str(e)}')
         return jsonify({'success': False, 'error': 'ファイルのアップロード中にエラーが発生しました。'}), 500
 
+def find_uploaded_backup(session_key):
+    """アップロード時に保存したバックアップファイルのパスを取得（見つからない場合は None）"""
+    temp_dir = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+    for suffix in ('.json', '.json.gz'):
+        temp_filepath = os.path.join(temp_dir, secure_filename(f"{session_key}{suffix}"))
+        if os.path.exists(temp_filepath):
+            return temp_filepath
+    return None
+
 @backup_bp.route('/restore', methods=['POST'])
 def restore_data():
     try:
@@ -153,14 +172,10 @@ def restore_data():
             return jsonify({'success': False, 'error': 'セッションキーが指定されていません。'}), 400
         if not confirm:
             return jsonify({'success': False, 'error': 'リストア実行の確認が必要です。'}), 400
-        temp_dir = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-        temp_filename = secure_filename(f"{session_key}.json")
-        temp_filepath = os.path.join(temp_dir, temp_filename)
-        if not os.path.exists(temp_filepath):
+        temp_filepath = find_uploaded_backup(session_key)
+        if temp_filepath is None:
             return jsonify({'success': False, 'error': 'バックアップデータが見つかりません。再度ファイルをアップロードしてください。'}), 400
-        with open(temp_filepath, 'r', encoding='utf-8') as f:
-            backup_data = json.load(f)
-        restore_result = execute_restore(backup_data)
+        restore_result = BackupService.restore_file(temp_filepath)
         try:
             os.remove(temp_filepath)
         except Exception:
@@ -173,50 +188,23 @@ def restore_data():
         current_app.logger.error(f'Restore execution error: {str(e)}')
         return jsonify({'success': False, 'error': 'リストア実行中にエラーが発生しました。'}), 500
 
-def validate_backup_file(backup_data):
-    try:
-        if 'backup_info' not in backup_data:
-            return {'valid': False, 'error': 'backup_info セクションが見つかりません'}
-        if 'data' not in backup_data:
-            return {'valid': False, 'error': 'data セクションが見つかりません'}
-        data_section = backup_data['data']
-        required_tables = ['projects', 'branches', 'fiscal_years']
-        for table in required_tables:
-            if table not in data_section:
-                return {'valid': False, 'error': f'{table} データが見つかりません'}
-            if not isinstance(data_section[table], list):
-                return {'valid': False, 'error': f'{table} データの形式が正しくありません'}
-        if data_section['projects']:
-            project_sample = data_section['projects'][0]
-            required_project_fields = ['project_code', 'project_name', 'branch_id', 'fiscal_year', 'order_probability', 'revenue', 'expenses']
-            for field in required_project_fields:
-                if field not in project_sample:
-                    return {'valid': False, 'error': f'プロジェクトデータに {field} フィールドが見つかりません'}
-        if data_section['branches']:
-            branch_sample = data_section['branches'][0]
-            required_branch_fields = ['branch_code', 'branch_name', 'is_active']
-            for field in required_branch_fields:
-                if field not in branch_sample:
-                    return {'valid': False, 'error': f'支社データに {field} フィールドが見つかりません'}
-        return {'valid': True, 'error': None}
-    except Exception as e:
-        return {'valid': False, 'error': f'ファイル検証中にエラーが発生しました: {str(e)}'}
-
-def generate_restore_preview(backup_data):
+def generate_restore_preview(backup_info, counts):
     try:
-        data_section = backup_data['data']
         current_projects = Project.query.count()
         current_branches = Branch.query.count()
         current_fiscal_years = FiscalYear.query.count()
-        backup_projects = len(data_section['projects'])
-        backup_branches = len(data_section['branches'])
-        backup_fiscal_years = len(data_section['fiscal_years'])
-        backup_info = backup_data.get('backup_info', {})
+        backup_projects = counts['projects']
+        backup_branches = counts['branches']
+        backup_fiscal_years = counts['fiscal_years']
+        incremental = BackupService.is_incremental(backup_info)
         return {
             'backup_info': {
                 'created_at': backup_info.get('created_at'),
                 'version': backup_info.get('version'),
-                'description': backup_info.get('description')
+                'description': backup_info.get('description'),
+                'backup_type': 'incremental' if incremental else 'full',
+                'since': backup_info.get('since'),
+                'watermark': backup_info.get('watermark')
             },
             'current_data': {
                 'projects': current_projects,
@@ -228,85 +216,16 @@ def generate_restore_preview(backup_data):
                 'projects': backup_projects,
                 'branches': backup_branches,
                 'fiscal_years': backup_fiscal_years,
-                'total': backup_projects + backup_branches + backup_fiscal_years
+                'total': backup_projects + backup_branches + backup_fiscal_years,
+                'deleted': counts.get('deleted', 0)
             },
             'warning': {
-                'data_will_be_replaced': True,
-                'current_data_will_be_lost': True
+                # 差分バックアップは現在のデータに上書き・削除を適用する
+                'data_will_be_replaced': not incremental,
+                'current_data_will_be_lost': not incremental
             }
         }
     except Exception as e:
         return {'error': f'プレビュー生成中にエラーが発生しました: {str(e)}'}
 
-def execute_restore(backup_data):
-    try:
-        data_section = backup_data['data']
-        try:
-            Project.query.delete()
-            Branch.query.delete()
-            FiscalYear.query.delete()
-            fiscal_years_created = 0
-            for fy_data in data_section['fiscal_years']:
-                fiscal_year = FiscalYear(
-                    year=fy_data['year'],
-                    year_name=fy_data['year_name'],
-                    is_active=fy_data['is_active'],
-                    created_at=datetime.fromisoformat(fy_data['created_at']) if fy_data.get('created_at') else datetime.now(),
-                    updated_at=datetime.fromisoformat(fy_data['updated_at']) if fy_data.get('updated_at') else datetime.now()
-                )
-                db.session.add(fiscal_year)
-                fiscal_years_created += 1
-            branches_created = 0
-            branch_id_mapping = {}
-            for branch_data in data_section['branches']:
-                branch = Branch(
-                    branch_code=branch_data['branch_code'],
-                    branch_name=branch_data['branch_name'],
-                    is_active=branch_data['is_active'],
-                    created_at=datetime.fromisoformat(branch_data['created_at']) if branch_data.get('created_at') else datetime.now(),
-                    updated_at=datetime.fromisoformat(branch_data['updated_at']) if branch_data.get('updated_at') else datetime.now()
-                )
-                db.session.add(branch)
-                db.session.flush()
-                old_id = branch_data.get('id')
-                if old_id:
-                    branch_id_mapping[old_id] = branch.id
-                branches_created += 1
-            projects_created = 0
-            for project_data in data_section['projects']:
-                old_branch_id = project_data['branch_id']
-                new_branch_id = branch_id_mapping.get(old_branch_id)
-                if not new_branch_id:
-                    first_branch = Branch.query.first()
-                    if first_branch:
-                        new_branch_id = first_branch.id
-                    else:
-                        raise Exception('リストア用の支社データが見つかりません')
-                project = Project(
-                    project_code=project_data['project_code'],
-                    project_name=project_data['project_name'],
-                    branch_id=new_branch_id,
-                    fiscal_year=project_data['fiscal_year'],
-                    order_probability=project_data['order_probability'],
-                    revenue=project_data['revenue'],
-                    expenses=project_data['expenses'],
-                    created_at=datetime.fromisoformat(project_data['created_at']) if project_data.get('created_at') else datetime.now(),
-                    updated_at=datetime.fromisoformat(project_data['updated_at']) if project_data.get('updated_at') else datetime.now()
-                )
-                db.session.add(project)
-                projects_created += 1
-            db.session.commit()
-            return {'success': True, 'statistics': {
-                'projects_created': projects_created,
-                'branches_created': branches_created,
-                'fiscal_years_created': fiscal_years_created,
-                'total_created': projects_created + branches_created + fiscal_years_created
-            }}
-        except Exception as e:
-            db.session.rollback()
-            raise e
-    except Exception as e:
-        current_app.logger.error(f'Restore execution error: {str(e)}')
-        return {'success': False, 'error': f'リストア実行中にエラーが発生しました: {str(e)}'}
-
 __all__ = ["backup_bp"]
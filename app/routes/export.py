@@ -1,60 +1,71 @@
-from flask import Blueprint, request, jsonify, send_file, current_app
-from app.models import Project, Branch
-import pandas as pd
-import io
+import os
+from flask import Blueprint, Response, request, jsonify, send_file, current_app, stream_with_context, url_for
+from app.services.export_cache import ExportCache
+from app.services.export_job_service import ExportJobService
+from app.services.export_service import ExportService
 from datetime import datetime
+from werkzeug.datastructures import MultiDict
 
 export_bp = Blueprint('export', __name__, url_prefix='/export')
 
+def _not_modified(cache_key):
+	"""クライアントが同じ内容を保持している場合の 304 レスポンス"""
+	response = Response(status=304)
+	response.set_etag(cache_key)
+	return response
+
+
+# ダウンロードリンクの種類: 形式 -> (エンドポイント, キャッシュの形式, 表示名)
+DOWNLOAD_LINKS = {
+	'csv': ('export.export_csv', 'csv', 'CSV'),
+	'excel': ('export.export_excel', 'xlsx', 'Excel'),
+}
+
+
+def _download_link(link_format, filters, count, data_version=None):
+	"""
+	ダウンロードURLと件数、キャッシュ済みかどうかを返す
+
+	Args:
+		link_format: DOWNLOAD_LINKS のキー
+		filters: 検索条件
+		count: 対象件数（プレビューで取得済みの件数。None の場合のみ件数を問い合わせる）
+		data_version: キャッシュキーに使うデータのバージョン（複数のリンクで使い回す場合に指定）
+	"""
+	endpoint, export_format, label = DOWNLOAD_LINKS[link_format]
+	if count is None:
+		count = ExportService.count(filters)
+	download_url = url_for(endpoint, **ExportService.filter_query_params(request.args))
+	cache = ExportCache.from_app()
+	cached = cache.exists(cache.key_for(export_format, ExportService.normalize_filters(filters), data_version), export_format)
+	return {'success': True, 'download_url': download_url, 'record_count': count, 'cached': cached, 'message': f'{count}件のプロジェクトデータを{label}形式でエクスポートします。'}
+
+
+def _download_link_response(link_format):
+	"""download-link のレスポンス（件数は常にサーバー側で集計する）"""
+	filters = ExportService.parse_filters(request.args)
+	return jsonify(_download_link(link_format, filters, None))
+
+
 @export_bp.route('/csv')
 def export_csv():
 	try:
-		project_code = request.args.get('project_code', '')
-		project_name = request.args.get('project_name', '')
-		branch_id = request.args.get('branch_id', type=int)
-		fiscal_year = request.args.get('fiscal_year', type=int)
-		order_probability_min = request.args.get('order_probability_min', type=float)
-		order_probability_max = request.args.get('order_probability_max', type=float)
-		query = Project.query.join(Branch)
-		if project_code:
-			query = query.filter(Project.project_code.contains(project_code))
-		if project_name:
-			query = query.filter(Project.project_name.contains(project_name))
-		if branch_id:
-			query = query.filter(Project.branch_id == branch_id)
-		if fiscal_year:
-			query = query.filter(Project.fiscal_year == fiscal_year)
-		if order_probability_min is not None:
-			query = query.filter(Project.order_probability >= order_probability_min)
-		if order_probability_max is not None:
-			query = query.filter(Project.order_probability <= order_probability_max)
-		projects = query.order_by(Project.created_at.desc()).all()
-		data = []
-		for project in projects:
-			data.append({
-				'プロジェクトコード': project.project_code,
-				'プロジェクト名': project.project_name,
-				'支社名': project.branch.branch_name if project.branch else '',
-				'支社コード': project.branch.branch_code if project.branch else '',
-				'売上の年度': project.fiscal_year,
-				'受注角度': f"{project.order_probability_symbol} {int(project.order_probability)}%",
-				'受注角度(数値)': int(project.order_probability),
-				'売上（契約金）': float(project.revenue),
-				'経費（トータル）': float(project.expenses),
-				'粗利': project.gross_profit,
-				'作成日': project.created_at.strftime('%Y-%m-%d %H:%M:%S') if project.created_at else '',
-				'更新日': project.updated_at.strftime('%Y-%m-%d %H:%M:%S') if project.updated_at else '',
-			})
-		df = pd.DataFrame(data)
-		output = io.StringIO()
-		df.to_csv(output, index=False, encoding='utf-8-sig')
-		output.seek(0)
+		filters = ExportService.parse_filters(request.args)
+		cache = ExportCache.from_app()
+		cache_key = cache.key_for('csv', ExportService.normalize_filters(filters))
 		timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
 		filename = f'projects_export_{timestamp}.csv'
-		csv_bytes = io.BytesIO()
-		csv_bytes.write(output.getvalue().encode('utf-8-sig'))
-		csv_bytes.seek(0)
-		return send_file(csv_bytes, mimetype='text/csv', as_attachment=True, download_name=filename)
+		if request.if_none_match.contains(cache_key):
+			return _not_modified(cache_key)
+		cached_path = cache.get(cache_key, 'csv')
+		if cached_path:
+			return send_file(cached_path, mimetype='text/csv', as_attachment=True, download_name=filename, conditional=True, etag=cache_key, max_age=0)
+		# クエリは送信開始前に実行し、行はカーソルからバッチ単位で書き出す（送信完了時にキャッシュへ登録）
+		chunks = cache.tee(ExportService.iter_csv(filters), cache_key, 'csv')
+		response = Response(stream_with_context(chunks), mimetype='text/csv')
+		response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+		response.set_etag(cache_key)
+		return response
 	except Exception as e:
 		current_app.logger.error(f'CSV export error: {str(e)}')
 		return jsonify({'success': False, 'error': 'CSVエクスポート中にエラーが発生しました。'}), 500
@@ -63,36 +74,7 @@ def export_csv():
 @export_bp.route('/csv/download-link')
 def csv_download_link():
 	try:
-		conditions = {}
-		if request.args.get('project_code'):
-			conditions['project_code'] = request.args.get('project_code')
-		if request.args.get('project_name'):
-			conditions['project_name'] = request.args.get('project_name')
-		if request.args.get('branch_id'):
-			conditions['branch_id'] = request.args.get('branch_id')
-		if request.args.get('fiscal_year'):
-			conditions['fiscal_year'] = request.args.get('fiscal_year')
-		if request.args.get('order_probability_min'):
-			conditions['order_probability_min'] = request.args.get('order_probability_min')
-		if request.args.get('order_probability_max'):
-			conditions['order_probability_max'] = request.args.get('order_probability_max')
-		query = Project.query.join(Branch)
-		if conditions.get('project_code'):
-			query = query.filter(Project.project_code.contains(conditions['project_code']))
-		if conditions.get('project_name'):
-			query = query.filter(Project.project_name.contains(conditions['project_name']))
-		if conditions.get('branch_id'):
-			query = query.filter(Project.branch_id == int(conditions['branch_id']))
-		if conditions.get('fiscal_year'):
-			query = query.filter(Project.fiscal_year == int(conditions['fiscal_year']))
-		if conditions.get('order_probability_min'):
-			query = query.filter(Project.order_probability >= float(conditions['order_probability_min']))
-		if conditions.get('order_probability_max'):
-			query = query.filter(Project.order_probability <= float(conditions['order_probability_max']))
-		count = query.count()
-		from urllib.parse import urlencode
-		download_url = f"/export/csv?{urlencode(conditions)}"
-		return jsonify({'success': True, 'download_url': download_url, 'record_count': count, 'message': f'{count}件のプロジェクトデータをCSV形式でエクスポートします。'})
+		return _download_link_response('csv')
 	except Exception as e:
 		current_app.logger.error(f'CSV download link generation error: {str(e)}')
 		return jsonify({'success': False, 'error': 'ダウンロードリンクの生成中にエラーが発生しました。'}), 500
@@ -101,77 +83,25 @@ def csv_download_link():
 @export_bp.route('/excel')
 def export_excel():
 	try:
-		project_code = request.args.get('project_code', '')
-		project_name = request.args.get('project_name', '')
-		branch_id = request.args.get('branch_id', type=int)
-		fiscal_year = request.args.get('fiscal_year', type=int)
-		order_probability_min = request.args.get('order_probability_min', type=float)
-		order_probability_max = request.args.get('order_probability_max', type=float)
-		query = Project.query.join(Branch)
-		if project_code:
-			query = query.filter(Project.project_code.contains(project_code))
-		if project_name:
-			query = query.filter(Project.project_name.contains(project_name))
-		if branch_id:
-			query = query.filter(Project.branch_id == branch_id)
-		if fiscal_year:
-			query = query.filter(Project.fiscal_year == fiscal_year)
-		if order_probability_min is not None:
-			query = query.filter(Project.order_probability >= order_probability_min)
-		if order_probability_max is not None:
-			query = query.filter(Project.order_probability <= order_probability_max)
-		projects = query.order_by(Project.created_at.desc()).all()
-		data = []
-		for project in projects:
-			data.append({
-				'プロジェクトコード': project.project_code,
-				'プロジェクト名': project.project_name,
-				'支社名': project.branch.branch_name if project.branch else '',
-				'支社コード': project.branch.branch_code if project.branch else '',
-				'売上の年度': project.fiscal_year,
-				'受注角度': f"{project.order_probability_symbol} {int(project.order_probability)}%",
-				'受注角度(数値)': int(project.order_probability),
-				'売上（契約金）': float(project.revenue),
-				'経費（トータル）': float(project.expenses),
-				'粗利': project.gross_profit,
-				'作成日': project.created_at.strftime('%Y-%m-%d %H:%M:%S') if project.created_at else '',
-				'更新日': project.updated_at.strftime('%Y-%m-%d %H:%M:%S') if project.updated_at else '',
-			})
-		df = pd.DataFrame(data)
-		output = io.BytesIO()
-		with pd.ExcelWriter(output, engine='openpyxl') as writer:
-			df.to_excel(writer, sheet_name='プロジェクト一覧', index=False)
-			worksheet = writer.sheets['プロジェクト一覧']
-			from openpyxl.styles import Font, PatternFill, Alignment
-			for column in worksheet.columns:
-				max_length = 0
-				column_letter = column[0].column_letter
-				for cell in column:
-					try:
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except Exception:
-						pass
-				adjusted_width = min(max_length + 2, 30)
-				worksheet.column_dimensions[column_letter].width = adjusted_width
-			header_font = Font(bold=True, color="FFFFFF")
-			header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-			header_alignment = Alignment(horizontal="center", vertical="center")
-			for cell in worksheet[1]:
-				cell.font = header_font
-				cell.fill = header_fill
-				cell.alignment = header_alignment
-			for row in worksheet.iter_rows(min_row=2):
-				if len(row) > 7:
-					row[7].number_format = '#,##0'
-				if len(row) > 8:
-					row[8].number_format = '#,##0'
-				if len(row) > 9:
-					row[9].number_format = '#,##0'
-		output.seek(0)
+		filters = ExportService.parse_filters(request.args)
+		cache = ExportCache.from_app()
+		cache_key = cache.key_for('xlsx', ExportService.normalize_filters(filters))
+		if request.if_none_match.contains(cache_key):
+			return _not_modified(cache_key)
+		cached_path = cache.get(cache_key, 'xlsx')
+		if not cached_path:
+			# write_only モードで一時ファイルに書き出し、完成後にキャッシュとして確定する
+			output, temp_path = cache.open_temp('xlsx')
+			try:
+				with output:
+					ExportService.write_excel(filters, output)
+			except Exception:
+				cache.discard(temp_path)
+				raise
+			cached_path = cache.commit(temp_path, cache_key, 'xlsx')
 		timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
 		filename = f'projects_export_{timestamp}.xlsx'
-		return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name=filename)
+		return send_file(cached_path, mimetype=ExportService.EXCEL_MIMETYPE, as_attachment=True, download_name=filename, conditional=True, etag=cache_key, max_age=0)
 	except Exception as e:
 		current_app.logger.error(f'Excel export error: {str(e)}')
 		return jsonify({'success': False, 'error': 'Excelエクスポート中にエラーが発生しました。'}), 500
@@ -180,87 +110,131 @@ def export_excel():
 @export_bp.route('/excel/download-link')
 def excel_download_link():
 	try:
-		conditions = {}
-		if request.args.get('project_code'):
-			conditions['project_code'] = request.args.get('project_code')
-		if request.args.get('project_name'):
-			conditions['project_name'] = request.args.get('project_name')
-		if request.args.get('branch_id'):
-			conditions['branch_id'] = request.args.get('branch_id')
-		if request.args.get('fiscal_year'):
-			conditions['fiscal_year'] = request.args.get('fiscal_year')
-		if request.args.get('order_probability_min'):
-			conditions['order_probability_min'] = request.args.get('order_probability_min')
-		if request.args.get('order_probability_max'):
-			conditions['order_probability_max'] = request.args.get('order_probability_max')
-		query = Project.query.join(Branch)
-		if conditions.get('project_code'):
-			query = query.filter(Project.project_code.contains(conditions['project_code']))
-		if conditions.get('project_name'):
-			query = query.filter(Project.project_name.contains(conditions['project_name']))
-		if conditions.get('branch_id'):
-			query = query.filter(Project.branch_id == int(conditions['branch_id']))
-		if conditions.get('fiscal_year'):
-			query = query.filter(Project.fiscal_year == int(conditions['fiscal_year']))
-		if conditions.get('order_probability_min'):
-			query = query.filter(Project.order_probability >= float(conditions['order_probability_min']))
-		if conditions.get('order_probability_max'):
-			query = query.filter(Project.order_probability <= float(conditions['order_probability_max']))
-		count = query.count()
-		from urllib.parse import urlencode
-		download_url = f"/export/excel?{urlencode(conditions)}"
-		return jsonify({'success': True, 'download_url': download_url, 'record_count': count, 'message': f'{count}件のプロジェクトデータをExcel形式でエクスポートします。'})
+		return _download_link_response('excel')
 	except Exception as e:
 		current_app.logger.error(f'Excel download link generation error: {str(e)}')
 		return jsonify({'success': False, 'error': 'ダウンロードリンクの生成中にエラーが発生しました。'}), 500
 
 
+@export_bp.route('/report.xlsx')
+def export_report():
+	try:
+		filters = ExportService.parse_filters(request.args)
+		cache = ExportCache.from_app()
+		cache_key = cache.key_for('report.xlsx', ExportService.normalize_filters(filters))
+		if request.if_none_match.contains(cache_key):
+			return _not_modified(cache_key)
+		cached_path = cache.get(cache_key, 'report.xlsx')
+		if not cached_path:
+			output, temp_path = cache.open_temp('report.xlsx')
+			try:
+				with output:
+					ExportService.write_report(filters, output)
+			except Exception:
+				cache.discard(temp_path)
+				raise
+			cached_path = cache.commit(temp_path, cache_key, 'report.xlsx')
+		timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+		filename = f'projects_report_{timestamp}.xlsx'
+		return send_file(cached_path, mimetype=ExportService.EXCEL_MIMETYPE, as_attachment=True, download_name=filename, conditional=True, etag=cache_key, max_age=0)
+	except Exception as e:
+		current_app.logger.error(f'Excel report export error: {str(e)}')
+		return jsonify({'success': False, 'error': 'レポートの出力中にエラーが発生しました。'}), 500
+
+
+@export_bp.route('/ndjson')
+def export_ndjson():
+	try:
+		filters = ExportService.parse_filters(request.args)
+		if request.args.get('updated_since') and filters['updated_since'] is None:
+			return jsonify({'success': False, 'error': 'updated_since はISO 8601形式の日時で指定してください。'}), 400
+		max_updated_at = ExportService.max_updated_at(filters)
+		compress = 'gzip' in request.accept_encodings
+		chunks = ExportService.iter_ndjson(filters, compress=compress)
+		response = Response(stream_with_context(chunks), mimetype='application/x-ndjson')
+		if compress:
+			response.headers['Content-Encoding'] = 'gzip'
+		response.headers['Vary'] = 'Accept-Encoding'
+		# 次回の updated_since に指定する値（該当データが無い場合は付与しない）
+		if max_updated_at:
+			response.headers['X-Max-Updated-At'] = ExportService.format_iso_datetime(max_updated_at)
+		return response
+	except Exception as e:
+		current_app.logger.error(f'NDJSON export error: {str(e)}')
+		return jsonify({'success': False, 'error': 'NDJSONエクスポート中にエラーが発生しました。'}), 500
+
+
+def _job_response(job):
+	"""ジョブの状態と参照先URLを返す"""
+	status = ExportJobService.job_status(job)
+	status['status_url'] = url_for('export.export_job_status', job_id=job.id)
+	status['download_url'] = url_for('export.export_job_download', job_id=job.id) if job.is_completed else None
+	return status
+
+
+@export_bp.route('/jobs', methods=['POST'])
+def create_export_job():
+	try:
+		payload = request.get_json(silent=True)
+		params = MultiDict(payload) if isinstance(payload, dict) else request.values
+		result = ExportJobService.submit(params.get('format', 'xlsx'), ExportService.parse_filters(params))
+		if not result['success']:
+			return jsonify(result), 503 if result.get('busy') else 400
+		job = ExportJobService.get_job(result['job']['id'])
+		return jsonify({'success': True, 'job': _job_response(job), 'message': 'エクスポートを受け付けました。完了後にダウンロードできます。'}), 202
+	except Exception as e:
+		current_app.logger.error(f'Export job submit error: {str(e)}')
+		return jsonify({'success': False, 'error': 'エクスポートの受付中にエラーが発生しました。'}), 500
+
+
+@export_bp.route('/jobs', methods=['GET'])
+def list_export_jobs():
+	try:
+		return jsonify({'success': True, 'jobs': [_job_response(job) for job in ExportJobService.recent_jobs()]})
+	except Exception as e:
+		current_app.logger.error(f'Export job list error: {str(e)}')
+		return jsonify({'success': False, 'error': 'エクスポートジョブの取得中にエラーが発生しました。'}), 500
+
+
+@export_bp.route('/jobs/<int:job_id>')
+def export_job_status(job_id):
+	job = ExportJobService.get_job(job_id)
+	if job is None:
+		return jsonify({'success': False, 'error': '指定されたエクスポートジョブが見つかりません。'}), 404
+	return jsonify({'success': True, 'job': _job_response(job)})
+
+
+@export_bp.route('/jobs/<int:job_id>/download')
+def export_job_download(job_id):
+	job = ExportJobService.get_job(job_id)
+	if job is None:
+		return jsonify({'success': False, 'error': '指定されたエクスポートジョブが見つかりません。'}), 404
+	if not job.is_completed:
+		return jsonify({'success': False, 'error': 'エクスポートはまだ完了していません。', 'job': _job_response(job)}), 409
+	if not job.file_path or not os.path.exists(job.file_path):
+		return jsonify({'success': False, 'error': 'エクスポートファイルの保存期間が過ぎています。再度実行してください。'}), 410
+	timestamp = job.finished_at.strftime('%Y%m%d_%H%M%S')
+	filename = f'projects_export_{timestamp}.{job.export_format}'
+	return send_file(job.file_path, mimetype=ExportJobService.MIMETYPES[job.export_format], as_attachment=True, download_name=filename, max_age=0)
+
+
 @export_bp.route('/preview')
 def export_preview():
 	try:
-		project_code = request.args.get('project_code', '')
-		project_name = request.args.get('project_name', '')
-		branch_id = request.args.get('branch_id', type=int)
-		fiscal_year = request.args.get('fiscal_year', type=int)
-		order_probability_min = request.args.get('order_probability_min', type=float)
-		order_probability_max = request.args.get('order_probability_max', type=float)
-		query = Project.query.join(Branch)
-		if project_code:
-			query = query.filter(Project.project_code.contains(project_code))
-		if project_name:
-			query = query.filter(Project.project_name.contains(project_name))
-		if branch_id:
-			query = query.filter(Project.branch_id == branch_id)
-		if fiscal_year:
-			query = query.filter(Project.fiscal_year == fiscal_year)
-		if order_probability_min is not None:
-			query = query.filter(Project.order_probability >= order_probability_min)
-		if order_probability_max is not None:
-			query = query.filter(Project.order_probability <= order_probability_max)
-		total_count = query.count()
-		projects = query.order_by(Project.created_at.desc()).limit(10).all()
-		preview_data = []
-		for project in projects:
-			preview_data.append({
-				'project_code': project.project_code,
-				'project_name': project.project_name,
-				'branch_name': project.branch.branch_name if project.branch else '',
-				'branch_code': project.branch.branch_code if project.branch else '',
-				'fiscal_year': project.fiscal_year,
-				'order_probability_symbol': project.order_probability_symbol,
-				'order_probability': int(project.order_probability),
-				'revenue': float(project.revenue),
-				'expenses': float(project.expenses),
-				'gross_profit': project.gross_profit,
-				'created_at': project.created_at.strftime('%Y-%m-%d %H:%M:%S') if project.created_at else '',
-				'updated_at': project.updated_at.strftime('%Y-%m-%d %H:%M:%S') if project.updated_at else '',
-			})
+		filters = ExportService.parse_filters(request.args)
+		preview = ExportService.preview(filters)
+		data_version = ExportCache.data_version()
 		return jsonify({
 			'success': True,
-			'total_count': total_count,
-			'preview_count': len(preview_data),
-			'preview_data': preview_data,
-			'columns': ['プロジェクトコード', 'プロジェクト名', '支社名', '支社コード', '売上の年度', '受注角度', '売上（契約金）', '経費（トータル）', '粗利', '作成日', '更新日'],
+			'total_count': preview['total_count'],
+			'preview_count': len(preview['rows']),
+			'preview_data': preview['rows'],
+			'columns': ExportService.PREVIEW_COLUMNS,
+			# プレビューで取得した件数を使い、ダウンロードリンクのための件数取得を省く
+			'download_links': {
+				link_format: _download_link(link_format, filters, preview['total_count'], data_version)
+				for link_format in DOWNLOAD_LINKS
+			},
 		})
 	except Exception as e:
 		current_app.logger.error(f'Export preview error: {str(e)}')
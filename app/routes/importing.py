@@ -1,8 +1,10 @@
 import os
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, jsonify
+from flask import Blueprint, Response, render_template, request, flash, redirect, url_for, current_app, jsonify, stream_with_context
 from werkzeug.utils import secure_filename
-from app.services.import_service import ImportService
+from app.services.import_service import ImportService, IMPORT_MODE_INSERT, IMPORT_MODE_UPSERT, IMPORT_MODES
 from app.forms import ImportForm
+from app.models import ImportCheckpoint
+from app import db
 
 import_bp = Blueprint('import', __name__, url_prefix='/import')
 
@@ -42,7 +44,15 @@ def suggest_mapping():
 @import_bp.route('/')
 def index():
 	form = ImportForm()
-	return render_template('import/index.html', form=form)
+	return render_template('import/index.html', form=form, pending_imports=_get_pending_imports())
+
+
+def _get_pending_imports():
+	"""再開可能な中断済みインポートを取得"""
+	try:
+		return [checkpoint.to_dict() for checkpoint in ImportCheckpoint.get_incomplete()]
+	except Exception:
+		return []
 
 
 @import_bp.route('/upload', methods=['POST'])
@@ -116,20 +126,37 @@ def set_sheet():
 		flash('Excelファイルが見つかりません', 'error')
 		return redirect(url_for('import.index'))
 	sheet_name = request.form.get('sheet_name')
-	if not sheet_name:
+	all_sheets = request.form.get('all_sheets') == '1'
+	if not sheet_name and not all_sheets:
 		flash('シートを選択してください', 'error')
 		return redirect(url_for('import.select_sheet'))
 	try:
 		import_service = ImportService()
+		data_sheets = []
+		if all_sheets:
+			excel_info = import_service.get_excel_sheets(session['import_file'])
+			if not excel_info['success']:
+				flash(f'Excelファイルの読み込みに失敗しました: {excel_info["error"]}', 'error')
+				return redirect(url_for('import.select_sheet'))
+			data_sheets = [sheet['name'] for sheet in excel_info['sheets'] if sheet['has_data']]
+			if not data_sheets:
+				flash('データが含まれているシートがありません', 'error')
+				return redirect(url_for('import.select_sheet'))
+			# 列マッピングは選択シート（未選択なら最初のシート）を基準にする
+			sheet_name = sheet_name or data_sheets[0]
 		sheet_result = import_service.validate_excel_sheet(session['import_file'], sheet_name)
 		if not sheet_result['success']:
 			flash(f'シートの検証に失敗しました: {sheet_result["error"]}', 'error')
 			return redirect(url_for('import.select_sheet'))
 		session['selected_sheet'] = sheet_name
+		session['import_all_sheets'] = all_sheets
 		session['import_columns'] = sheet_result['columns']
 		session['import_sample_data'] = sheet_result['sample_data']
 		session['import_row_count'] = sheet_result['row_count']
-		flash(f'シート「{sheet_name}」を選択しました。{sheet_result["row_count"]}行のデータが見つかりました。', 'success')
+		if all_sheets:
+			flash(f'全{len(data_sheets)}シートを一括インポートします。列マッピングはシート「{sheet_name}」を基準に設定してください。', 'success')
+		else:
+			flash(f'シート「{sheet_name}」を選択しました。{sheet_result["row_count"]}行のデータが見つかりました。', 'success')
 		return redirect(url_for('import.mapping'))
 	except Exception as e:
 		flash(f'シート設定中にエラーが発生しました: {str(e)}', 'error')
@@ -225,11 +252,17 @@ def preview():
 		return redirect(url_for('import.index'))
 	try:
 		import_service = ImportService()
+		import_mode = request.args.get('mode') or session.get('import_mode', IMPORT_MODE_INSERT)
+		if import_mode not in IMPORT_MODES:
+			import_mode = IMPORT_MODE_INSERT
+		session['import_mode'] = import_mode
 		preview_data = import_service.get_preview_data(
-			session['import_file'], session['import_type'], session['import_column_mapping'], sheet_name=session.get('selected_sheet')
+			session['import_file'], session['import_type'], session['import_column_mapping'], sheet_name=session.get('selected_sheet'), mode=import_mode
 		)
 		if preview_data['success']:
 			return render_template('import/preview.html',
+								   import_mode=import_mode,
+								   all_sheets=session.get('import_all_sheets', False),
 								   columns=session['import_columns'],
 								   sample_data=session['import_sample_data'],
 								   preview_data=preview_data['data'],
@@ -245,6 +278,27 @@ def preview():
 		return redirect(url_for('import.index'))
 
 
+@import_bp.route('/dry_run')
+def dry_run():
+	from flask import session
+	if 'import_file' not in session or 'import_column_mapping' not in session:
+		return jsonify({'success': False, 'error': 'インポートするファイルまたは列マッピング情報が見つかりません'}), 400
+	try:
+		import_service = ImportService()
+		result = import_service.get_dry_run_diff(
+			session['import_file'], session['import_type'], session['import_column_mapping'],
+			sheet_name=session.get('selected_sheet'),
+			page=request.args.get('page', 1, type=int),
+			per_page=request.args.get('per_page', 50, type=int),
+			status=request.args.get('status') or None
+		)
+		if not result['success']:
+			return jsonify(result), 400
+		return jsonify(result)
+	except Exception as e:
+		return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @import_bp.route('/execute', methods=['POST'])
 def execute_import():
 	from flask import session
@@ -253,17 +307,19 @@ def execute_import():
 		return redirect(url_for('import.index'))
 	try:
 		import_service = ImportService()
-		result = import_service.execute_import(
-			session['import_file'], session['import_type'], session['import_column_mapping'], sheet_name=session.get('selected_sheet')
-		)
-		if os.path.exists(session['import_file']):
+		import_mode = request.form.get('import_mode') or session.get('import_mode', IMPORT_MODE_INSERT)
+		if session.get('import_all_sheets'):
+			result = import_service.execute_multi_sheet_import(
+				session['import_file'], session['import_column_mapping'], max_workers=current_app.config.get('IMPORT_MAX_WORKERS'), mode=import_mode
+			)
+		else:
+			result = import_service.execute_import(
+				session['import_file'], session['import_type'], session['import_column_mapping'], sheet_name=session.get('selected_sheet'), mode=import_mode
+			)
+		# 中断した場合は再開できるようにファイルを残す
+		if os.path.exists(session['import_file']) and not result.get('resumable'):
 			os.remove(session['import_file'])
-		if result.get('errors'):
-			session['import_errors'] = result['errors']
-		if result.get('duplicates'):
-			session['import_duplicates'] = result['duplicates']
-		if result.get('successful_projects'):
-			session['import_successful_projects'] = result['successful_projects']
+		_store_report(session, result)
 		session.pop('import_file', None)
 		session.pop('import_type', None)
 		session.pop('import_columns', None)
@@ -272,9 +328,17 @@ def execute_import():
 		session.pop('import_column_mapping', None)
 		session.pop('excel_info', None)
 		session.pop('selected_sheet', None)
+		session.pop('import_mode', None)
+		session.pop('import_all_sheets', None)
+		if result['success'] and result.get('mode') == IMPORT_MODE_UPSERT:
+			flash(f'更新インポートが完了しました。新規: {result["inserted_count"]}件、更新: {result["updated_count"]}件、変更なし: {result["unchanged_count"]}件、エラー: {result["error_count"]}件', 'success')
+			return render_template('import/result.html', result=result, errors=result.get('errors', []))
 		if result['success']:
 			flash(f'インポートが完了しました。成功: {result["success_count"]}件、エラー: {result["error_count"]}件', 'success')
 			return render_template('import/result.html', result=result, errors=result.get('errors', []))
+		elif result.get('resumable'):
+			flash(f'インポートが中断されました: {result["error"]}（インポート画面から続きを再開できます）', 'error')
+			return redirect(url_for('import.index'))
 		else:
 			flash(f'インポートに失敗しました: {result["error"]}', 'error')
 			return redirect(url_for('import.index'))
@@ -290,10 +354,40 @@ def execute_import():
 		session.pop('import_column_mapping', None)
 		session.pop('excel_info', None)
 		session.pop('selected_sheet', None)
+		session.pop('import_mode', None)
+		session.pop('import_all_sheets', None)
 		flash(f'インポート処理中にエラーが発生しました: {str(e)}', 'error')
 		return redirect(url_for('import.index'))
 
 
+def _store_report(session, result):
+	"""レポートの参照先（スプールのID）だけをセッションに保存"""
+	session.pop('import_errors', None)
+	session.pop('import_duplicates', None)
+	session.pop('import_successful_projects', None)
+	if result.get('report_id'):
+		session['import_report_id'] = result['report_id']
+
+
+@import_bp.route('/resume/<int:checkpoint_id>', methods=['POST'])
+def resume_import(checkpoint_id):
+	import_service = ImportService()
+	result = import_service.resume_import(checkpoint_id)
+	if result['success'] and result.get('already_completed'):
+		flash(f'このインポートは既に完了しています。成功: {result["success_count"]}件、エラー: {result["error_count"]}件', 'info')
+		return redirect(url_for('import.index'))
+	if not result['success']:
+		flash(f'インポートの再開に失敗しました: {result["error"]}', 'error')
+		return redirect(url_for('import.index'))
+	from flask import session
+	_store_report(session, result)
+	checkpoint = db.session.get(ImportCheckpoint, checkpoint_id)
+	if checkpoint and os.path.exists(checkpoint.file_path):
+		os.remove(checkpoint.file_path)
+	flash(f'インポートを再開し完了しました。成功: {result["success_count"]}件、エラー: {result["error_count"]}件', 'success')
+	return render_template('import/result.html', result=result, errors=result.get('errors', []))
+
+
 @import_bp.route('/validate_mapping', methods=['POST'])
 def validate_mapping():
 	from flask import session
@@ -357,13 +451,16 @@ def get_saved_mappings():
 @import_bp.route('/download_error_report')
 def download_error_report():
 	from flask import session, make_response
+	import_service = ImportService()
+	report_id = session.get('import_report_id')
+	if report_id and import_service.has_spooled_report(report_id):
+		return _csv_stream_response(import_service.iter_spooled_error_report(report_id), 'import_errors.csv')
 	errors = session.get('import_errors', [])
 	duplicates = session.get('import_duplicates', [])
 	if not errors and not duplicates:
 		flash('ダウンロード可能なエラーレポートがありません', 'warning')
 		return redirect(url_for('import.index'))
 	try:
-		import_service = ImportService()
 		csv_content = import_service.generate_error_report(errors, duplicates)
 		response = make_response(csv_content)
 		response.headers['Content-Type'] = 'text/csv; charset=utf-8'
@@ -377,12 +474,15 @@ def download_error_report():
 @import_bp.route('/download_success_report')
 def download_success_report():
 	from flask import session, make_response
+	import_service = ImportService()
+	report_id = session.get('import_report_id')
+	if report_id and import_service.has_spooled_report(report_id):
+		return _csv_stream_response(import_service.iter_spooled_success_report(report_id), 'import_success.csv')
 	successful_projects = session.get('import_successful_projects', [])
 	if not successful_projects:
 		flash('ダウンロード可能な成功レポートがありません', 'warning')
 		return redirect(url_for('import.index'))
 	try:
-		import_service = ImportService()
 		csv_content = import_service.generate_success_report(successful_projects)
 		response = make_response(csv_content)
 		response.headers['Content-Type'] = 'text/csv; charset=utf-8'
@@ -393,6 +493,14 @@ def download_success_report():
 		return redirect(url_for('import.index'))
 
 
+def _csv_stream_response(lines, filename):
+	"""スプールから読み出したCSVをそのままストリーミングで返す"""
+	response = Response(stream_with_context(lines), mimetype='text/csv')
+	response.headers['Content-Type'] = 'text/csv; charset=utf-8'
+	response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+	return response
+
+
 @import_bp.route('/cancel')
 def cancel_import():
 	from flask import session
@@ -406,9 +514,12 @@ def cancel_import():
 	session.pop('import_column_mapping', None)
 	session.pop('excel_info', None)
 	session.pop('selected_sheet', None)
+	session.pop('import_mode', None)
+	session.pop('import_all_sheets', None)
 	session.pop('import_errors', None)
 	session.pop('import_duplicates', None)
 	session.pop('import_successful_projects', None)
+	session.pop('import_report_id', None)
 	flash('インポートをキャンセルしました', 'info')
 	return redirect(url_for('import.index'))
 
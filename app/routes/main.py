@@ -160,6 +160,27 @@ def monthly_revenue_trend():
     return jsonify(trend_data)
 
 
+@main_bp.route('/api/fiscal-period-summary')
+def fiscal_period_summary():
+    """四半期・半期（period=quarter|half|month）ごとの売上集計API"""
+    fiscal_year = request.args.get('year', type=int)
+    period = request.args.get('period', 'quarter')
+    branch_ids = request.args.getlist('branch_ids', type=int)
+    order_probabilities = request.args.getlist('order_probabilities', type=int)
+    if period not in DashboardService.FISCAL_PERIODS:
+        return jsonify({'error': f'集計期間の種類が正しくありません: {period}'}), 400
+    if not fiscal_year:
+        available_years = DashboardService.get_available_years()
+        fiscal_year = available_years[0] if available_years else 2024
+    summary = DashboardService.get_fiscal_period_summary(
+        fiscal_year=fiscal_year,
+        period=period,
+        branch_ids=branch_ids if branch_ids else None,
+        order_probabilities=order_probabilities if order_probabilities else None,
+    )
+    return jsonify(summary)
+
+
 @main_bp.route('/api/filter-options')
 def filter_options():
     return jsonify({
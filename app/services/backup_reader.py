@@ -0,0 +1,168 @@
+"""
+バックアップJSONの逐次読み込み
+
+ファイル全体を読み込まずに、backup_info などの小さなセクションと、
+data セクションの各テーブルのレコードを1件ずつ取り出す。保持する
+バッファは読み込み単位と1レコード分の大きさに収まる。
+"""
+import gzip
+import io
+import json
+import re
+from typing import Any, Iterator, Optional, Tuple
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class BackupFormatError(Exception):
+    """バックアップファイルの構造が正しくない"""
+
+
+def open_backup(path: str):
+    """
+    バックアップファイルをテキストとして開く（.gz は展開しながら読む）
+
+    Args:
+        path: ファイルパス
+
+    Returns:
+        TextIO: UTF-8 のテキストストリーム
+    """
+    raw = gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+    return io.TextIOWrapper(raw, encoding='utf-8')
+
+
+class BackupReader:
+    """
+    バックアップJSONのイベントを順に返すパーサー
+
+    iter_events() は次のイベントを返す。
+        ('section', キー, 値)      data 以外のトップレベルの項目
+        ('table', テーブル名, None)  data 内の配列の開始
+        ('record', テーブル名, 値)   配列の各要素
+        ('table_value', テーブル名, 値)  data 内の配列以外の値
+        ('data_value', None, 値)     オブジェクト以外の data セクション
+    """
+
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, stream, read_size: Optional[int] = None):
+        self._stream = stream
+        self._read_size = read_size or self.READ_SIZE
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """読み込み済みの部分を捨てて、続きをバッファに追加"""
+        if self._eof:
+            return False
+        chunk = self._stream.read(self._read_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _error(self, message: str):
+        return json.JSONDecodeError(message, self._buffer, self._pos)
+
+    def _peek(self) -> str:
+        """空白を読み飛ばして次の1文字を返す（終端の場合は空文字）"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or not self._fill():
+                return self._buffer[self._pos:self._pos + 1]
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise self._error(f'Expecting {char!r}')
+        self._pos += 1
+
+    def _value(self) -> Any:
+        """次のJSON値を1つ読み込む（バッファ末尾で切れている場合は続きを読む）"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # 数値などはバッファ末尾で途切れていても解析できてしまうため、続きを確認する
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _members(self) -> Iterator[str]:
+        """オブジェクトのキーを順に返す（値は呼び出し側で読み込む）"""
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            if self._peek() != '"':
+                raise self._error('Expecting property name enclosed in double quotes')
+            key = self._value()
+            self._expect(':')
+            yield key
+            separator = self._peek()
+            self._pos += 1
+            if separator == ',':
+                continue
+            if separator == '}':
+                return
+            raise self._error("Expecting ',' delimiter")
+
+    def _elements(self) -> Iterator[Any]:
+        """配列の要素を順に返す"""
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            separator = self._peek()
+            self._pos += 1
+            if separator == ',':
+                continue
+            if separator == ']':
+                return
+            raise self._error("Expecting ',' delimiter")
+
+    def iter_events(self) -> Iterator[Tuple[str, Optional[str], Any]]:
+        """
+        バックアップの内容をイベントとして順に返す
+
+        Raises:
+            json.JSONDecodeError: JSONとして正しくない場合
+            BackupFormatError: トップレベルがオブジェクトでない場合
+        """
+        if self._peek() != '{':
+            if self._peek() == '':
+                raise self._error('Expecting value')
+            raise BackupFormatError('ファイルの内容がJSONオブジェクトではありません')
+        for key in self._members():
+            if key != 'data':
+                yield 'section', key, self._value()
+            elif self._peek() != '{':
+                yield 'data_value', None, self._value()
+            else:
+                for table in self._members():
+                    if self._peek() == '[':
+                        yield 'table', table, None
+                        for record in self._elements():
+                            yield 'record', table, record
+                    else:
+                        yield 'table_value', table, self._value()
+        if self._peek() != '':
+            raise self._error('Extra data')
+
+    def iter_records(self, table: str) -> Iterator[Any]:
+        """指定したテーブルのレコードだけを順に返す"""
+        for event, name, value in self.iter_events():
+            if event == 'record' and name == table:
+                yield value
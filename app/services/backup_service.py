@@ -0,0 +1,717 @@
+"""
+バックアップ機能のサービスクラス
+
+テーブルごとにカーソルから行を取り出し、JSONを逐次書き出すことで、
+全データをメモリに載せずにバックアップを生成します。リストアは
+一括削除とチャンク単位の一括INSERTを1トランザクションで実行します。
+
+差分バックアップは、直前のバックアップのウォーターマーク（変更番号）より後に
+書き込まれた行と、削除されたレコードのトゥームストーンだけを出力します。リストアでは
+フルバックアップの後に差分バックアップを順に適用します。
+"""
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from flask import current_app
+from sqlalchemy import String, cast, delete, func, select
+
+from app import db
+from app.models import Project, Branch, FiscalYear, DeletedRecord, BackupHistory, ChangeCounter
+from app.services.backup_reader import BackupFormatError, BackupReader, open_backup
+
+
+class BackupService:
+    """バックアップの生成とリストアを担当するサービスクラス"""
+
+    BACKUP_VERSION = '1.0'
+    BACKUP_DESCRIPTION = 'プロジェクト収支システム バックアップデータ'
+
+    # DBカーソルから一度に取り出す行数
+    STREAM_BATCH_SIZE = 1000
+    # リストアで1回の executemany に渡す行数
+    RESTORE_CHUNK_SIZE = 5000
+
+    # バックアップに含めるテーブル（data セクションのキー、モデル、列）
+    TABLES = (
+        ('projects', Project, (
+            'id', 'project_code', 'project_name', 'branch_id', 'fiscal_year',
+            'order_probability', 'revenue', 'expenses', 'created_at', 'updated_at',
+        )),
+        ('branches', Branch, (
+            'id', 'branch_code', 'branch_name', 'is_active', 'created_at', 'updated_at',
+        )),
+        ('fiscal_years', FiscalYear, (
+            'id', 'year', 'year_name', 'is_active', 'created_at', 'updated_at',
+        )),
+    )
+
+    # リストアに必要なテーブルと、各レコードの必須項目
+    REQUIRED_TABLES = ('projects', 'branches', 'fiscal_years')
+    REQUIRED_FIELDS = {
+        'projects': (
+            'プロジェクトデータ',
+            ('project_code', 'project_name', 'branch_id', 'fiscal_year', 'order_probability', 'revenue', 'expenses'),
+        ),
+        'branches': ('支社データ', ('branch_code', 'branch_name', 'is_active')),
+        'deleted': ('削除データ', ('table', 'key')),
+    }
+
+    # 差分バックアップで追加する列（リストア先ではIDが異なるため支社は支社コードで対応付ける）
+    INCREMENTAL_EXTRA_COLUMNS = {'projects': ('branch_code',)}
+
+    # 数値（Decimal・円単位の金額）で読み込み、バックアップでは float で出力する列
+    FLOAT_COLUMNS = frozenset(('order_probability', 'revenue', 'expenses'))
+
+    @classmethod
+    def backup_info(cls, backup_type: str = BackupHistory.TYPE_FULL, since: Optional[int] = None,
+                    watermark: Optional[int] = None) -> Dict[str, Any]:
+        """
+        backup_info セクションを生成
+
+        Args:
+            backup_type: 'full' または 'incremental'
+            since: 差分バックアップの基準の変更番号
+            watermark: このバックアップに必ず含まれる変更の上限の変更番号。次の差分の基準になる
+        """
+        info = {
+            'created_at': datetime.now().isoformat(),
+            'version': cls.BACKUP_VERSION,
+            'description': cls.BACKUP_DESCRIPTION,
+            'backup_type': backup_type,
+            'watermark': watermark
+        }
+        if since is not None:
+            info['since'] = since
+        return info
+
+    @classmethod
+    def serialize_value(cls, column: str, value):
+        """列の値をJSONで表現できる値に変換"""
+        if value is None:
+            return None
+        if column in cls.FLOAT_COLUMNS:
+            return float(value)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    @classmethod
+    def iter_records(cls, model, columns, batch_size: Optional[int] = None,
+                     since: Optional[int] = None) -> Iterator[list]:
+        """
+        テーブルの行を列の射影でバッチ単位に取り出し、レコードの辞書に変換
+
+        Args:
+            model: モデルクラス
+            columns: 取り出す列名（プロジェクトの branch_code は支社から取得）
+            batch_size: 1バッチの行数
+            since: 指定した場合は、この変更番号より後に書き込まれた行のみ
+
+        Returns:
+            Iterator: レコードのリストを順に返すイテレータ
+        """
+        joins_branch = model is Project and 'branch_code' in columns
+        stmt = select(*(
+            Branch.branch_code if joins_branch and column == 'branch_code' else getattr(model, column)
+            for column in columns
+        )).select_from(model)
+        if joins_branch:
+            stmt = stmt.outerjoin(Branch, Project.branch_id == Branch.id)
+        if since is not None:
+            stmt = stmt.where(model.change_seq > since)
+        stmt = stmt.order_by(model.id)\
+            .execution_options(yield_per=batch_size or cls.STREAM_BATCH_SIZE, stream_results=True)
+        for partition in db.session.execute(stmt).partitions():
+            yield [
+                {column: cls.serialize_value(column, value) for column, value in zip(columns, row)}
+                for row in partition
+            ]
+
+    @classmethod
+    def iter_deleted(cls, since: int) -> Iterator[list]:
+        """
+        基準の変更番号より後に削除されたレコード（キーを変更したレコードの変更前のキーを含む）の
+        トゥームストーンを取り出す
+
+        同じキーで作り直されたレコードは更新として出力されるため除外し、
+        同じキーが複数回削除されている場合は最後の削除のみを返す。
+
+        Args:
+            since: 基準の変更番号
+
+        Returns:
+            Iterator: トゥームストーンのリストをテーブルごとに返すイテレータ
+        """
+        for key, model, _ in cls.TABLES:
+            key_column = getattr(model, DeletedRecord.RECORD_KEYS[key])
+            live = select(key_column).where(cast(key_column, String) == DeletedRecord.record_key).exists()
+            stmt = select(DeletedRecord.record_key, func.max(DeletedRecord.deleted_at))\
+                .where(DeletedRecord.table_name == key,
+                       DeletedRecord.change_seq > since,
+                       ~live)\
+                .group_by(DeletedRecord.record_key)\
+                .order_by(DeletedRecord.record_key)
+            yield [
+                {'table': key, 'key': record_key, 'deleted_at': cls.serialize_value('deleted_at', deleted_at)}
+                for record_key, deleted_at in db.session.execute(stmt)
+            ]
+
+    @classmethod
+    def iter_backup_json(cls, batch_size: Optional[int] = None,
+                         since: Optional[int] = None) -> Iterator[str]:
+        """
+        バックアップJSONをテーブルごとに逐次生成
+
+        従来と同じ backup_info / data / statistics の構成で、
+        data の各テーブルは1行1レコードで書き出す。statistics は
+        実際に書き出した件数から末尾に出力する。
+
+        since を指定した場合は差分バックアップとして、その変更番号より後に書き込まれた行と
+        data.deleted（削除されたレコードの自然キー）を出力する。出力を終えたら、
+        読み取りを始める前の変更番号をウォーターマークとしてバックアップ履歴に記録する。
+
+        Args:
+            batch_size: DBから一度に取り出す行数
+            since: 差分バックアップの基準の変更番号
+
+        Returns:
+            Iterator: JSON文字列の断片を順に返すジェネレータ
+        """
+        def dumps(value):
+            return json.dumps(value, ensure_ascii=False)
+
+        # 読み取りを始める前にコミット済みの変更番号をウォーターマークにする
+        # （以降にコミットされた変更はこれより大きい番号になり、次の差分に含まれる）
+        watermark = ChangeCounter.current()
+        backup_type = BackupHistory.TYPE_FULL if since is None else BackupHistory.TYPE_INCREMENTAL
+        sections = []
+        for key, model, columns in cls.TABLES:
+            if since is not None:
+                columns = columns + cls.INCREMENTAL_EXTRA_COLUMNS.get(key, ())
+            sections.append((key, lambda model=model, columns=columns: cls.iter_records(model, columns, batch_size, since)))
+        if since is not None:
+            sections.append(('deleted', lambda: cls.iter_deleted(since)))
+
+        yield '{"backup_info": ' + dumps(cls.backup_info(backup_type, since, watermark)) + ',\n"data": {'
+        statistics = {}
+        for index, (key, batches) in enumerate(sections):
+            yield (',\n' if index else '\n') + dumps(key) + ': ['
+            count = 0
+            for records in batches():
+                chunk = []
+                for record in records:
+                    chunk.append(('\n' if count == 0 else ',\n') + dumps(record))
+                    count += 1
+                yield ''.join(chunk)
+            yield '\n]' if count else ']'
+            statistics[f'{key}_count'] = count
+        yield '\n},\n"statistics": ' + dumps(statistics) + '}\n'
+        cls.record_history(backup_type, since, watermark, statistics)
+
+    @classmethod
+    def record_history(cls, backup_type: str, since: Optional[int], watermark: int,
+                       statistics: Dict[str, int]):
+        """
+        バックアップ履歴を記録（フルバックアップ時は保持期間を過ぎたトゥームストーンを削除）
+
+        Args:
+            backup_type: 'full' または 'incremental'
+            since: 差分バックアップの基準の変更番号
+            watermark: バックアップのウォーターマーク（変更番号）
+            statistics: テーブルごとの出力件数
+        """
+        deleted_count = statistics.get('deleted_count', 0)
+        db.session.add(BackupHistory(
+            backup_type=backup_type,
+            since=since,
+            watermark=watermark,
+            record_count=sum(statistics.values()) - deleted_count,
+            deleted_count=deleted_count
+        ))
+        if backup_type == BackupHistory.TYPE_FULL:
+            retention = timedelta(days=current_app.config['BACKUP_TOMBSTONE_RETENTION_DAYS'])
+            db.session.execute(delete(DeletedRecord).where(DeletedRecord.deleted_at < datetime.utcnow() - retention))
+        db.session.commit()
+
+    @classmethod
+    def iter_backup(cls, compress: bool = False, batch_size: Optional[int] = None,
+                    since: Optional[int] = None) -> Iterator[bytes]:
+        """
+        バックアップファイルの内容をバイト列として逐次生成
+
+        Args:
+            compress: gzip 圧縮して出力するか
+            batch_size: DBから一度に取り出す行数
+            since: 差分バックアップの基準の変更番号
+
+        Returns:
+            Iterator: バイト列を順に返すジェネレータ
+        """
+        compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+        for text in cls.iter_backup_json(batch_size, since):
+            data = text.encode('utf-8')
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+        if compressor:
+            yield compressor.flush()
+
+    @classmethod
+    def scan_backup_file(cls, path: str) -> Dict[str, Any]:
+        """
+        バックアップファイルを逐次読み込みながら検証し、テーブルごとの件数を数える
+
+        Args:
+            path: バックアップファイル（.json / .json.gz）
+
+        Returns:
+            Dict: backup_info と counts（テーブル名→件数）
+
+        Raises:
+            BackupFormatError: バックアップの構造が正しくない場合
+            json.JSONDecodeError: JSONとして正しくない場合
+            UnicodeDecodeError: UTF-8 でない場合
+        """
+        backup_info = None
+        has_data = False
+        counts = {}
+        with open_backup(path) as stream:
+            for event, table, value in BackupReader(stream).iter_events():
+                if event == 'record':
+                    counts[table] += 1
+                    label, fields = cls.REQUIRED_FIELDS.get(table, (None, ()))
+                    for field in fields:
+                        if not isinstance(value, dict) or field not in value:
+                            raise BackupFormatError(f'{label}に {field} フィールドが見つかりません')
+                elif event == 'table':
+                    counts[table] = 0
+                elif event == 'section':
+                    if table == 'backup_info':
+                        backup_info = value if isinstance(value, dict) else {}
+                elif event == 'table_value':
+                    if table in cls.REQUIRED_TABLES:
+                        raise BackupFormatError(f'{table} データの形式が正しくありません')
+                elif event == 'data_value':
+                    raise BackupFormatError('data セクションの形式が正しくありません')
+                if event in ('table', 'table_value', 'data_value'):
+                    has_data = True
+        if backup_info is None:
+            raise BackupFormatError('backup_info セクションが見つかりません')
+        if not has_data:
+            raise BackupFormatError('data セクションが見つかりません')
+        for table in cls.REQUIRED_TABLES:
+            if table not in counts:
+                raise BackupFormatError(f'{table} データが見つかりません')
+        return {'backup_info': backup_info, 'counts': counts}
+
+    @classmethod
+    def load_backup_file(cls, path: str) -> Dict[str, Any]:
+        """
+        リストア用にバックアップファイルを読み込む
+
+        バックアップではプロジェクトが支社より先に出力されているため、件数の少ない
+        年度・支社・削除データをここで集め、プロジェクトはリストア時にファイルを
+        もう一度読み込んで1件ずつ取り出す。プロジェクトのレコードはメモリに溜めない。
+
+        Args:
+            path: バックアップファイル（.json / .json.gz）
+
+        Returns:
+            Dict: backup_info と data（リストアに渡す data セクション）
+
+        Raises:
+            BackupFormatError, ValueError: ファイルを読み込めない場合
+        """
+        backup_info = {}
+        masters = {'fiscal_years': [], 'branches': [], 'deleted': []}
+        with open_backup(path) as stream:
+            for event, table, value in BackupReader(stream).iter_events():
+                if event == 'record' and table in masters:
+                    masters[table].append(value)
+                elif event == 'section' and table == 'backup_info' and isinstance(value, dict):
+                    backup_info = value
+
+        def projects():
+            with open_backup(path) as stream:
+                yield from BackupReader(stream).iter_records('projects')
+
+        masters['projects'] = projects()
+        return {'backup_info': backup_info, 'data': masters}
+
+    @staticmethod
+    def is_incremental(backup_info: Dict[str, Any]) -> bool:
+        """差分バックアップかどうか（backup_type の無い旧形式はフルバックアップ）"""
+        return backup_info.get('backup_type') == BackupHistory.TYPE_INCREMENTAL
+
+    @classmethod
+    def restore_file(cls, path: str, chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        バックアップファイルを逐次読み込んでリストア
+
+        フルバックアップは全データを置き換え、差分バックアップは現在のデータに適用する。
+
+        Args:
+            path: アップロードされたバックアップファイル
+            chunk_size: 1回の executemany に渡す行数
+
+        Returns:
+            Dict: リストア結果
+        """
+        try:
+            backup = cls.load_backup_file(path)
+        except (BackupFormatError, ValueError) as e:
+            current_app.logger.error(f'Restore file read error: {str(e)}')
+            return {'success': False, 'error': 'バックアップファイルを読み込めませんでした。再度アップロードしてください。'}
+        if cls.is_incremental(backup['backup_info']):
+            return cls.apply_incremental(backup['data'], chunk_size)
+        return cls.restore(backup['data'], chunk_size)
+
+    @classmethod
+    def validate_chain(cls, backup_infos: Sequence[Dict[str, Any]]) -> Optional[str]:
+        """
+        フルバックアップと差分バックアップの並びが連続しているか検証
+
+        2つ目以降は差分バックアップで、基準（since）が直前のバックアップの
+        ウォーターマーク以前である（間の変更が欠落していない）必要がある。
+        ウォーターマークが変更番号（整数）でない旧形式のファイルは差分の基準にできない。
+
+        Returns:
+            Optional[str]: エラーメッセージ（問題が無い場合は None）
+        """
+        def is_seq(value):
+            return isinstance(value, int) and not isinstance(value, bool)
+
+        if not backup_infos:
+            return 'バックアップファイルが指定されていません'
+        if cls.is_incremental(backup_infos[0]):
+            return '最初のファイルにはフルバックアップを指定してください'
+        previous = backup_infos[0].get('watermark')
+        for number, info in enumerate(backup_infos[1:], start=2):
+            if not cls.is_incremental(info):
+                return f'{number}番目のファイルが差分バックアップではありません'
+            if not is_seq(previous):
+                return f'{number - 1}番目のファイルに変更番号のウォーターマークが無いため、差分を適用できません'
+            since, watermark = info.get('since'), info.get('watermark')
+            if not is_seq(since) or not is_seq(watermark):
+                return f'{number}番目のファイルに基準またはウォーターマークの変更番号がありません'
+            if since > previous:
+                return f'{number}番目の差分バックアップの基準（変更番号 {since}）が直前のバックアップ（{previous}）より後のため、間の変更が欠落します'
+            if watermark < previous:
+                return f'{number}番目の差分バックアップが直前のバックアップより古いため、順序が正しくありません'
+            previous = watermark
+        return None
+
+    @classmethod
+    def restore_chain(cls, paths: Sequence[str], chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        フルバックアップに続けて差分バックアップを順に適用してリストア
+
+        全体を1つのトランザクションで実行し、途中で失敗した場合は何も変更しない。
+
+        Args:
+            paths: フルバックアップ、差分バックアップの順に並べたファイルパス
+            chunk_size: 1回の executemany に渡す行数
+
+        Returns:
+            Dict: リストア結果（'statistics' に base と incrementals の件数）
+        """
+        try:
+            backups = [cls.load_backup_file(path) for path in paths]
+        except (OSError, BackupFormatError, ValueError) as e:
+            current_app.logger.error(f'Restore chain read error: {str(e)}')
+            return {'success': False, 'error': f'バックアップファイルを読み込めませんでした: {str(e)}'}
+        error = cls.validate_chain([backup['backup_info'] for backup in backups])
+        if error:
+            return {'success': False, 'error': error}
+
+        def work(now):
+            base = cls._replace_all(backups[0]['data'], chunk_size, now)
+            incrementals = [cls._apply_incremental(backup['data'], chunk_size, now) for backup in backups[1:]]
+            return {'base': base, 'incrementals': incrementals}
+
+        return cls._in_transaction(work)
+
+    @staticmethod
+    def _chunks(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+        """レコードを指定件数ごとのリストに分割"""
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _parse_datetimes(values: List[Optional[str]], default: datetime) -> List[datetime]:
+        """
+        日時文字列の列をまとめて変換（同じ値は1回だけ解析し、未指定は default）
+
+        Args:
+            values: ISO 8601 形式の文字列のリスト
+            default: 値が無い場合の日時
+
+        Returns:
+            List: datetime のリスト
+        """
+        parsed = {None: default, '': default}
+        for value in set(values):
+            if value not in parsed:
+                parsed[value] = datetime.fromisoformat(value)
+        return [parsed[value] for value in values]
+
+    @classmethod
+    def _timestamp_columns(cls, chunk: List[Dict[str, Any]], now: datetime) -> Dict[str, List[datetime]]:
+        """チャンク内の作成日時・更新日時を列単位で変換"""
+        return {
+            column: cls._parse_datetimes([record.get(column) for record in chunk], now)
+            for column in ('created_at', 'updated_at')
+        }
+
+    @classmethod
+    def _fiscal_year_rows(cls, chunk: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+        """年度レコードを登録用の行に変換"""
+        timestamps = cls._timestamp_columns(chunk, now)
+        return [
+            {
+                'year': record['year'],
+                'year_name': record['year_name'],
+                'is_active': record['is_active'],
+                'created_at': timestamps['created_at'][index],
+                'updated_at': timestamps['updated_at'][index],
+            }
+            for index, record in enumerate(chunk)
+        ]
+
+    @classmethod
+    def _branch_rows(cls, chunk: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+        """支社レコードを登録用の行に変換"""
+        timestamps = cls._timestamp_columns(chunk, now)
+        return [
+            {
+                'branch_code': record['branch_code'],
+                'branch_name': record['branch_name'],
+                'is_active': record['is_active'],
+                'created_at': timestamps['created_at'][index],
+                'updated_at': timestamps['updated_at'][index],
+            }
+            for index, record in enumerate(chunk)
+        ]
+
+    @classmethod
+    def _project_rows(cls, chunk: List[Dict[str, Any]], now: datetime,
+                      branch_id_for: Callable[[Dict[str, Any]], int]) -> List[Dict[str, Any]]:
+        """プロジェクトレコードを登録用の行に変換（支社IDは branch_id_for で解決）"""
+        timestamps = cls._timestamp_columns(chunk, now)
+        return [
+            {
+                'project_code': record['project_code'],
+                'project_name': record['project_name'],
+                'branch_id': branch_id_for(record),
+                'fiscal_year': record['fiscal_year'],
+                'order_probability': record['order_probability'],
+                'revenue': record['revenue'],
+                'expenses': record['expenses'],
+                'created_at': timestamps['created_at'][index],
+                'updated_at': timestamps['updated_at'][index],
+            }
+            for index, record in enumerate(chunk)
+        ]
+
+    @staticmethod
+    def _upsert_statement(model, key_column: str):
+        """
+        自然キーをキーにした INSERT ... ON CONFLICT DO UPDATE 文を構築
+
+        Args:
+            model: モデルクラス
+            key_column: 一意制約のある自然キーの列名
+
+        Returns:
+            Insert: 実行可能なUPSERT文
+        """
+        if db.engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        table = model.__table__
+        stmt = dialect_insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c[key_column]],
+            set_={column.name: stmt.excluded[column.name] for column in table.columns if column.name not in ('id', key_column)}
+        )
+
+    @classmethod
+    def _in_transaction(cls, work: Callable[[datetime], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        リストア処理を1つのトランザクションで実行し、失敗時はロールバック
+
+        リストアはトゥームストーンを残さずに行を削除・置き換えるため、リストア前の
+        バックアップを基準にした差分では変更が欠落する。同じトランザクションで
+        バックアップ履歴に区切りを記録し、次の差分バックアップの前にフルバックアップを
+        必要とする。
+        """
+        try:
+            statistics = work(datetime.now())
+            db.session.add(BackupHistory(
+                backup_type=BackupHistory.TYPE_RESTORE,
+                watermark=ChangeCounter.current()
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f'Restore execution error: {str(e)}')
+            return {'success': False, 'error': f'リストア実行中にエラーが発生しました: {str(e)}'}
+        return {'success': True, 'statistics': statistics}
+
+    @classmethod
+    def restore(cls, data_section: Dict[str, Iterable[Dict[str, Any]]],
+                chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        バックアップデータで全データを置き換える
+
+        3テーブルを一括削除し、年度・支社・プロジェクトの順にチャンク単位の
+        一括INSERTで登録する。支社の旧ID→新IDの対応は、支社の登録後に
+        1回のSELECTで取得した支社コードと新IDから作成する。全体を1つの
+        トランザクションで実行し、途中で失敗した場合は何も変更しない。
+
+        Args:
+            data_section: バックアップの data セクション
+            chunk_size: 1回の executemany に渡す行数
+
+        Returns:
+            Dict: リストア結果（成功時は 'statistics' に登録件数）
+        """
+        return cls._in_transaction(lambda now: cls._replace_all(data_section, chunk_size, now))
+
+    @classmethod
+    def _replace_all(cls, data_section: Dict[str, Iterable[Dict[str, Any]]],
+                     chunk_size: Optional[int], now: datetime) -> Dict[str, int]:
+        """全データの置き換え（コミットは呼び出し側で行う）"""
+        chunk_size = chunk_size or cls.RESTORE_CHUNK_SIZE
+        db.session.execute(delete(Project))
+        db.session.execute(delete(Branch))
+        db.session.execute(delete(FiscalYear))
+
+        fiscal_years_created = 0
+        for chunk in cls._chunks(data_section['fiscal_years'], chunk_size):
+            db.session.execute(FiscalYear.__table__.insert(), cls._fiscal_year_rows(chunk, now))
+            fiscal_years_created += len(chunk)
+
+        branches_created = 0
+        old_branch_codes = {}
+        for chunk in cls._chunks(data_section['branches'], chunk_size):
+            db.session.execute(Branch.__table__.insert(), cls._branch_rows(chunk, now))
+            for record in chunk:
+                if record.get('id'):
+                    old_branch_codes[record['id']] = record['branch_code']
+            branches_created += len(chunk)
+
+        new_branch_ids = dict(db.session.execute(select(Branch.branch_code, Branch.id)).all())
+        branch_id_mapping = {
+            old_id: new_branch_ids[branch_code] for old_id, branch_code in old_branch_codes.items()
+        }
+        # 対応する支社が無いプロジェクトは最初の支社に割り当てる
+        fallback_branch_id = min(new_branch_ids.values()) if new_branch_ids else None
+
+        def branch_id_for(record):
+            branch_id = branch_id_mapping.get(record['branch_id'], fallback_branch_id)
+            if branch_id is None:
+                raise ValueError('リストア用の支社データが見つかりません')
+            return branch_id
+
+        projects_created = 0
+        for chunk in cls._chunks(data_section['projects'], chunk_size):
+            db.session.execute(Project.__table__.insert(), cls._project_rows(chunk, now, branch_id_for))
+            projects_created += len(chunk)
+
+        return {
+            'projects_created': projects_created,
+            'branches_created': branches_created,
+            'fiscal_years_created': fiscal_years_created,
+            'total_created': projects_created + branches_created + fiscal_years_created
+        }
+
+    @classmethod
+    def apply_incremental(cls, data_section: Dict[str, Iterable[Dict[str, Any]]],
+                          chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        差分バックアップを現在のデータに適用
+
+        Args:
+            data_section: 差分バックアップの data セクション
+            chunk_size: 1回の executemany に渡す行数
+
+        Returns:
+            Dict: 適用結果（成功時は 'statistics' に更新・削除件数）
+        """
+        return cls._in_transaction(lambda now: cls._apply_incremental(data_section, chunk_size, now))
+
+    @classmethod
+    def _apply_incremental(cls, data_section: Dict[str, Iterable[Dict[str, Any]]],
+                           chunk_size: Optional[int], now: datetime) -> Dict[str, int]:
+        """
+        差分の適用（コミットは呼び出し側で行う）
+
+        削除データを自然キーでまとめて削除した後、年度・支社・プロジェクトの順に
+        自然キーをキーにしたUPSERTをチャンク単位で実行する。プロジェクトの支社は
+        支社コードで対応付ける。
+        """
+        chunk_size = chunk_size or cls.RESTORE_CHUNK_SIZE
+        statistics = {}
+
+        for key, _, _ in cls.TABLES:
+            statistics[f'{key}_deleted'] = 0
+        for chunk in cls._chunks(data_section.get('deleted', ()), chunk_size):
+            keys = {}
+            for record in chunk:
+                keys.setdefault(record['table'], []).append(record['key'])
+            # プロジェクト → 支社 → 年度の順に削除する
+            for key, model, _ in cls.TABLES:
+                if not keys.get(key):
+                    continue
+                key_column = getattr(model, DeletedRecord.RECORD_KEYS[key])
+                values = [int(value) for value in keys[key]] if key == 'fiscal_years' else keys[key]
+                result = db.session.execute(delete(model).where(key_column.in_(values)))
+                statistics[f'{key}_deleted'] += result.rowcount
+
+        fiscal_years_upserted = 0
+        for chunk in cls._chunks(data_section['fiscal_years'], chunk_size):
+            db.session.execute(cls._upsert_statement(FiscalYear, 'year'), cls._fiscal_year_rows(chunk, now))
+            fiscal_years_upserted += len(chunk)
+
+        branches_upserted = 0
+        old_branch_codes = {}
+        for chunk in cls._chunks(data_section['branches'], chunk_size):
+            db.session.execute(cls._upsert_statement(Branch, 'branch_code'), cls._branch_rows(chunk, now))
+            for record in chunk:
+                if record.get('id'):
+                    old_branch_codes[record['id']] = record['branch_code']
+            branches_upserted += len(chunk)
+
+        branch_ids = dict(db.session.execute(select(Branch.branch_code, Branch.id)).all())
+
+        def branch_id_for(record):
+            branch_code = record.get('branch_code') or old_branch_codes.get(record['branch_id'])
+            if branch_code not in branch_ids:
+                raise ValueError(f"プロジェクト {record['project_code']} の支社（{branch_code}）が見つかりません")
+            return branch_ids[branch_code]
+
+        projects_upserted = 0
+        for chunk in cls._chunks(data_section['projects'], chunk_size):
+            db.session.execute(cls._upsert_statement(Project, 'project_code'), cls._project_rows(chunk, now, branch_id_for))
+            projects_upserted += len(chunk)
+
+        statistics.update({
+            'projects_upserted': projects_upserted,
+            'branches_upserted': branches_upserted,
+            'fiscal_years_upserted': fiscal_years_upserted,
+            'total_upserted': projects_upserted + branches_upserted + fiscal_years_upserted,
+        })
+        statistics['total_deleted'] = sum(statistics[f'{key}_deleted'] for key, _, _ in cls.TABLES)
+        return statistics
@@ -7,13 +7,18 @@
 from sqlalchemy import func, desc
 from sqlalchemy.exc import OperationalError
 from app import db
-from app.models import Project, Branch
+from app.database import read_only_method
+from app.models import FISCAL_YEAR_START_MONTH, Project, Branch, fiscal_year_bounds
 
 
 class DashboardService:
-    """ダッシュボード統計情報サービス"""
+    """ダッシュボード統計情報サービス
+
+    集計は読み取りのみのため、呼び出し元に関係なく読み取り専用エンジンで実行する。
+    """
     
     @staticmethod
+    @read_only_method
     def get_overall_stats(fiscal_year=None):
         """
         全体統計情報を取得
@@ -56,6 +61,7 @@ class DashboardService:
         }
     
     @staticmethod
+    @read_only_method
     def get_yearly_trend_data():
         """
         年度別売上推移データを取得
@@ -97,6 +103,7 @@ class DashboardService:
         }
     
     @staticmethod
+    @read_only_method
     def get_branch_stats(fiscal_year=None):
         """
         支社別統計情報を取得
@@ -158,6 +165,7 @@ class DashboardService:
         return branch_stats
     
     @staticmethod
+    @read_only_method
     def get_recent_projects(limit=5):
         """
         最近更新されたプロジェクト一覧を取得
@@ -177,6 +185,7 @@ class DashboardService:
             return []
     
     @staticmethod
+    @read_only_method
     def get_available_years():
         """
         利用可能な年度一覧を取得
@@ -193,6 +202,7 @@ class DashboardService:
         return [year[0] for year in years] if years else []
     
     @staticmethod
+    @read_only_method
     def get_top_projects_by_revenue(fiscal_year=None, limit=10):
         """
         売上上位プロジェクトを取得
@@ -214,6 +224,7 @@ class DashboardService:
         return [project.to_dict() for project in projects]
     
     @staticmethod
+    @read_only_method
     def get_order_probability_distribution(fiscal_year=None):
         """
         受注角度別分布を取得
@@ -253,54 +264,67 @@ class DashboardService:
         
         return distribution
     
+    # 期間の種類 -> (集計する列, 期間数)
+    FISCAL_PERIODS = {
+        'month': (Project.fiscal_month, 12),
+        'quarter': (Project.fiscal_quarter, 4),
+        'half': (Project.fiscal_half, 2),
+    }
+    
     @staticmethod
-    def get_monthly_revenue_trend(fiscal_year, branch_ids=None, order_probabilities=None):
+    def _current_fiscal_year():
+        """今日が属する年度"""
+        from datetime import date
+        today = date.today()
+        return today.year if today.month >= FISCAL_YEAR_START_MONTH else today.year - 1
+    
+    @staticmethod
+    def _fiscal_period_labels(fiscal_year, period):
+        """期間の表示名（年度内の順）"""
+        if period == 'month':
+            labels = []
+            for index in range(12):
+                month = (FISCAL_YEAR_START_MONTH - 1 + index) % 12 + 1
+                year = fiscal_year if month >= FISCAL_YEAR_START_MONTH else fiscal_year + 1
+                labels.append(f"{year}/{month:02d}")
+            return labels
+        if period == 'quarter':
+            return [f'第{quarter}四半期' for quarter in range(1, 5)]
+        return ['上期', '下期']
+    
+    @classmethod
+    def _fiscal_period_totals(cls, fiscal_year, period, branch_ids=None, order_probabilities=None):
         """
-        月別売上推移データを取得
+        年度内の期間・支社ごとの件数と売上・経費の合計を集計
+        
+        保存済みの年度内期間の列で GROUP BY するため、日時の解析は行わない。
+        期間の列は売上計上日から計算しているため、対象も登録上の年度（fiscal_year）ではなく
+        売上計上日が年度内にあるプロジェクトとする（期間と年度の基準を揃える）。
         
         Args:
-            fiscal_year (int): 対象年度
+            fiscal_year (int): 対象年度（None の場合は今日が属する年度）
+            period (str): 'month'・'quarter'・'half'
             branch_ids (list, optional): 対象支社IDのリスト
             order_probabilities (list, optional): 対象受注角度のリスト（0, 50, 100）
             
         Returns:
-            dict: 月別売上データ
+            dict: 全体・支社別の期間ごとの集計（期間は年度内の順）
         """
-        from datetime import datetime, date
-        from calendar import monthrange
-        
-        # 年度の開始・終了月を計算
-        if fiscal_year:
-            start_date = date(fiscal_year, 4, 1)  # 4月1日開始
-            end_date = date(fiscal_year + 1, 3, 31)  # 翌年3月31日終了
-        else:
-            # 現在の年度を推定
-            today = date.today()
-            if today.month >= 4:
-                fiscal_year = today.year
-                start_date = date(fiscal_year, 4, 1)
-                end_date = date(fiscal_year + 1, 3, 31)
-            else:
-                fiscal_year = today.year - 1
-                start_date = date(fiscal_year, 4, 1)
-                end_date = date(fiscal_year + 1, 3, 31)
+        if period not in cls.FISCAL_PERIODS:
+            raise ValueError(f'集計期間の種類が正しくありません: {period}')
+        column, period_count = cls.FISCAL_PERIODS[period]
+        if not fiscal_year:
+            fiscal_year = cls._current_fiscal_year()
+        start, end = fiscal_year_bounds(fiscal_year)
+        revenue_date = getattr(Project, Project.REVENUE_DATE_COLUMN)
         
-        # 基本クエリ
         query = db.session.query(
-            Project.id,
-            Project.project_code,
-            Project.project_name,
-            Project.revenue,
-            Project.expenses,
-            Project.order_probability,
             Project.branch_id,
-            Branch.branch_name,
-            Branch.branch_code,
-            Project.created_at
-        ).join(Branch, Project.branch_id == Branch.id)
-        
-        # 年度フィルタ
-        query = query.filter(Project.fiscal_year == fiscal_year)
+            column.label('period'),
+            func.count(Project.id).label('count'),
+            func.sum(Project.revenue).label('total_revenue'),
+            func.sum(Project.expenses).label('total_expenses')
+        ).filter(revenue_date >= start, revenue_date < end)
         
         # 支社フィルタ
         if branch_ids:
@@ -310,93 +334,87 @@ class DashboardService:
         if order_probabilities:
             query = query.filter(Project.order_probability.in_(order_probabilities))
         
-        projects = query.all()
+        rows = query.group_by(column, Project.branch_id).all()
         
-        # 月別データを初期化（4月から3月まで）
-        months = []
-        month_labels = []
+        def empty():
+            return {'revenues': [0.0] * period_count, 'expenses': [0.0] * period_count, 'counts': [0] * period_count}
         
-        current_date = start_date
-        while current_date <= end_date:
-            months.append(current_date.month)
-            month_labels.append(f"{current_date.year}/{current_date.month:02d}")
-            
-            # 次の月へ
-            if current_date.month == 12:
-                current_date = date(current_date.year + 1, 1, 1)
-            else:
-                current_date = date(current_date.year, current_date.month + 1, 1)
+        overall = empty()
+        by_branch = {}
+        for row in rows:
+            index = row.period - 1
+            revenue = float(row.total_revenue or 0)
+            expenses = float(row.total_expenses or 0)
+            for totals in (overall, by_branch.setdefault(row.branch_id, empty())):
+                totals['revenues'][index] += revenue
+                totals['expenses'][index] += expenses
+                totals['counts'][index] += row.count
         
-        # 全体データ
-        overall_data = {month: {'revenue': 0, 'expenses': 0, 'count': 0} for month in month_labels}
+        branches = Branch.query.filter(Branch.id.in_(list(by_branch))).order_by(Branch.branch_code).all() if by_branch else []
         
-        # 支社別データ
-        branch_data = {}
+        def with_profits(totals):
+            totals['profits'] = [revenue - expenses for revenue, expenses in zip(totals['revenues'], totals['expenses'])]
+            return {key: totals[key] for key in ('revenues', 'expenses', 'profits', 'counts')}
         
-        # プロジェクトデータを月別に集計
-        for project in projects:
-            # プロジェクトの作成月を取得（年度内の月に分散）
-            created_at = project.created_at
-            
-            # 年度内の月に均等分散（簡易的な実装）
-            if created_at.month >= 4:
-                fiscal_month = created_at.month
-                fiscal_year_for_month = created_at.year
-            else:
-                fiscal_month = created_at.month
-                fiscal_year_for_month = created_at.year
-            
-            project_month = f"{fiscal_year_for_month}/{fiscal_month:02d}"
-            
-            if project_month in overall_data:
-                # 全体データに追加
-                overall_data[project_month]['revenue'] += float(project.revenue or 0)
-                overall_data[project_month]['expenses'] += float(project.expenses or 0)
-                overall_data[project_month]['count'] += 1
-                
-                # 支社別データに追加
-                branch_key = f"{project.branch_code}_{project.branch_name}"
-                if branch_key not in branch_data:
-                    branch_data[branch_key] = {
-                        'branch_id': project.branch_id,
-                        'branch_code': project.branch_code,
-                        'branch_name': project.branch_name,
-                        'data': {month: {'revenue': 0, 'expenses': 0, 'count': 0} for month in month_labels}
-                    }
-                
-                branch_data[branch_key]['data'][project_month]['revenue'] += float(project.revenue or 0)
-                branch_data[branch_key]['data'][project_month]['expenses'] += float(project.expenses or 0)
-                branch_data[branch_key]['data'][project_month]['count'] += 1
-        
-        # データを整形
-        result = {
+        return {
             'fiscal_year': fiscal_year,
-            'months': month_labels,
-            'overall': {
-                'revenues': [overall_data[month]['revenue'] for month in month_labels],
-                'expenses': [overall_data[month]['expenses'] for month in month_labels],
-                'profits': [overall_data[month]['revenue'] - overall_data[month]['expenses'] for month in month_labels],
-                'counts': [overall_data[month]['count'] for month in month_labels]
-            },
-            'branches': []
+            'labels': cls._fiscal_period_labels(fiscal_year, period),
+            'overall': with_profits(overall),
+            'branches': [
+                dict({
+                    'branch_id': branch.id,
+                    'branch_code': branch.branch_code,
+                    'branch_name': branch.branch_name,
+                }, **with_profits(by_branch[branch.id]))
+                for branch in branches
+            ]
         }
+    
+    @staticmethod
+    @read_only_method
+    def get_monthly_revenue_trend(fiscal_year, branch_ids=None, order_probabilities=None):
+        """
+        月別売上推移データを取得
         
-        # 支社別データを追加
-        for branch_key, branch_info in branch_data.items():
-            branch_result = {
-                'branch_id': branch_info['branch_id'],
-                'branch_code': branch_info['branch_code'],
-                'branch_name': branch_info['branch_name'],
-                'revenues': [branch_info['data'][month]['revenue'] for month in month_labels],
-                'expenses': [branch_info['data'][month]['expenses'] for month in month_labels],
-                'profits': [branch_info['data'][month]['revenue'] - branch_info['data'][month]['expenses'] for month in month_labels],
-                'counts': [branch_info['data'][month]['count'] for month in month_labels]
-            }
-            result['branches'].append(branch_result)
+        Args:
+            fiscal_year (int): 対象年度
+            branch_ids (list, optional): 対象支社IDのリスト
+            order_probabilities (list, optional): 対象受注角度のリスト（0, 50, 100）
+            
+        Returns:
+            dict: 月別売上データ（4月から3月まで）
+        """
+        totals = DashboardService._fiscal_period_totals(fiscal_year, 'month', branch_ids, order_probabilities)
+        return {
+            'fiscal_year': totals['fiscal_year'],
+            'months': totals['labels'],
+            'overall': totals['overall'],
+            'branches': totals['branches']
+        }
+    
+    @staticmethod
+    @read_only_method
+    def get_fiscal_period_summary(fiscal_year, period, branch_ids=None, order_probabilities=None):
+        """
+        四半期・半期（または月）ごとの売上集計を取得
         
-        return result
+        Args:
+            fiscal_year (int): 対象年度
+            period (str): 'month'・'quarter'・'half'
+            branch_ids (list, optional): 対象支社IDのリスト
+            order_probabilities (list, optional): 対象受注角度のリスト（0, 50, 100）
+            
+        Returns:
+            dict: 期間ごとの売上データ
+            
+        Raises:
+            ValueError: 期間の種類が正しくない場合
+        """
+        totals = DashboardService._fiscal_period_totals(fiscal_year, period, branch_ids, order_probabilities)
+        return dict(totals, period=period)
     
     @staticmethod
+    @read_only_method
     def get_available_branches():
         """
         利用可能な支社一覧を取得
@@ -413,6 +431,7 @@ class DashboardService:
         } for branch in branches]
     
     @staticmethod
+    @read_only_method
     def get_available_order_probabilities():
         """
         利用可能な受注角度一覧を取得
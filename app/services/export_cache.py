@@ -0,0 +1,189 @@
+"""
+エクスポートファイルのディスクキャッシュ
+
+正規化した検索条件とデータのバージョンをキーに、生成済みのCSV/XLSXを
+ローカルディスクに保存し、容量上限を超えた分は最終利用日時の古い順に削除する。
+"""
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterator, Optional
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from app import db
+from app.models import Project, Branch, ChangeCounter
+
+
+class ExportCache:
+    """生成済みエクスポートファイルのLRUキャッシュ"""
+
+    # 出力形式を変更した場合はこの値を上げて既存キャッシュを無効化する
+    FORMAT_VERSION = 1
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_app(cls) -> 'ExportCache':
+        """アプリケーション設定からキャッシュを生成"""
+        return cls(
+            current_app.config['EXPORT_CACHE_FOLDER'],
+            current_app.config['EXPORT_CACHE_MAX_BYTES']
+        )
+
+    @staticmethod
+    def data_version() -> str:
+        """
+        エクスポート対象データのバージョンを取得
+
+        書き込みトランザクションごとに増える変更番号（ChangeCounter）から求めるため、
+        更新日時や件数を保ったままのリストア・差分の適用でも値が変わる。スナップショットの
+        リストアで変更番号が巻き戻った場合に以前の値と重ならないよう、プロジェクト・支社の
+        件数と最大IDも含める。
+
+        Returns:
+            str: データバージョン
+        """
+        projects = db.session.execute(select(func.count(Project.id), func.max(Project.id))).one()
+        branches = db.session.execute(select(func.count(Branch.id), func.max(Branch.id))).one()
+        return '|'.join(str(value) for value in (ChangeCounter.current(), *projects, *branches))
+
+    def key_for(self, export_format: str, filters: Dict[str, Any], data_version: Optional[str] = None) -> str:
+        """
+        キャッシュキーを生成
+
+        Args:
+            export_format: 'csv' または 'xlsx'
+            filters: 正規化済みの検索条件
+            data_version: データバージョン（省略時は現在の値）
+
+        Returns:
+            str: キャッシュキー
+        """
+        if data_version is None:
+            data_version = self.data_version()
+        payload = json.dumps({
+            'format': export_format,
+            'format_version': self.FORMAT_VERSION,
+            'filters': filters,
+            'data_version': data_version,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str, export_format: str) -> str:
+        """キャッシュファイルのパスを取得"""
+        return os.path.join(self.directory, f'{key}.{export_format}')
+
+    def get(self, key: str, export_format: str) -> Optional[str]:
+        """
+        キャッシュ済みファイルのパスを取得（利用日時を更新）
+
+        Args:
+            key: キャッシュキー
+            export_format: 'csv' または 'xlsx'
+
+        Returns:
+            str: ファイルパス（未キャッシュの場合は None）
+        """
+        path = self.path_for(key, export_format)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def exists(self, key: str, export_format: str) -> bool:
+        """キャッシュ済みか（利用日時は更新しない）"""
+        return os.path.exists(self.path_for(key, export_format))
+
+    def open_temp(self, export_format: str):
+        """
+        キャッシュ登録用の一時ファイルを作成
+
+        Returns:
+            tuple: (ファイルオブジェクト, 一時ファイルのパス)
+        """
+        fd, temp_path = tempfile.mkstemp(suffix=f'.{export_format}.tmp', dir=self.directory)
+        return os.fdopen(fd, 'w+b'), temp_path
+
+    def commit(self, temp_path: str, key: str, export_format: str) -> str:
+        """
+        一時ファイルをキャッシュとして確定し、容量上限を超えた分を削除
+
+        Returns:
+            str: 確定したファイルのパス
+        """
+        path = self.path_for(key, export_format)
+        os.replace(temp_path, path)
+        self.cleanup(keep=path)
+        return path
+
+    @staticmethod
+    def discard(temp_path: str):
+        """書き込み途中の一時ファイルを削除"""
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+    def tee(self, chunks: Iterator[bytes], key: str, export_format: str) -> Iterator[bytes]:
+        """
+        ストリーミング出力をそのまま返しつつ、最後まで送信できたらキャッシュに登録
+
+        Args:
+            chunks: 出力するバイト列のイテレータ
+            key: キャッシュキー
+            export_format: 'csv' または 'xlsx'
+
+        Yields:
+            bytes: 入力と同じバイト列
+        """
+        output, temp_path = self.open_temp(export_format)
+        completed = False
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                yield chunk
+            completed = True
+        finally:
+            output.close()
+            if completed:
+                self.commit(temp_path, key, export_format)
+            else:
+                # クライアントの切断などで途中終了した場合は登録しない
+                self.discard(temp_path)
+
+    def cleanup(self, keep: Optional[str] = None):
+        """
+        合計サイズが上限を超えている間、最終利用日時の古いファイルから削除
+
+        Args:
+            keep: 削除対象から除外するファイル（これから送信するファイル）
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
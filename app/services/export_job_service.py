@@ -0,0 +1,386 @@
+"""
+エクスポートジョブのバックグラウンド実行
+
+大量データのエクスポートをリクエストの外でワーカースレッドに生成させ、
+完成したファイルを後からダウンロードできるようにする。同時に実行する
+ジョブ数（EXPORT_JOB_WORKERS）と、受け付けるジョブ数（待機中を含めた上限）は
+DBのジョブの件数で数えるため、複数のワーカープロセスで運用しても全体の上限になる。
+"""
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from flask import current_app
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.database import read_only
+from app.models import ExportJob
+from app.services.export_service import ExportService
+
+
+class ExportJobService:
+    """エクスポートジョブの登録・実行・状態取得を担当するサービスクラス"""
+
+    FORMATS = ('csv', 'xlsx')
+    FORMAT_ALIASES = {'excel': 'xlsx'}
+    MIMETYPES = {
+        'csv': 'text/csv',
+        'xlsx': ExportService.EXCEL_MIMETYPE,
+    }
+
+    # 完了・失敗したジョブとファイルの保持期間
+    RETENTION = timedelta(hours=24)
+    # この時間進捗が無い待機中・実行中のジョブはプロセス停止などで中断したとみなす
+    STALE_AFTER = timedelta(hours=1)
+    # 実行中のジョブが上限に達している場合に、空きを確認し直すまでの秒数
+    SLOT_RETRY_WAIT = 0.5
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+    _futures: Dict[int, Future] = {}
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        """プロセス内で共有するワーカープールを取得"""
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=max(1, current_app.config['EXPORT_JOB_WORKERS']),
+                    thread_name_prefix='export-job'
+                )
+            return cls._executor
+
+    @staticmethod
+    def worker_id() -> str:
+        """このプロセスの識別子（ホスト名:PID）"""
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    @staticmethod
+    def _process_alive(pid: int) -> bool:
+        """同じホストのプロセスが動いているか（確認できない場合は動いているとみなす）"""
+        if os.name == 'nt':
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            return True
+        return True
+
+    @staticmethod
+    def _job_directory() -> str:
+        """ジョブの出力先ディレクトリを取得"""
+        directory = str(current_app.config['EXPORT_JOB_FOLDER'])
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @classmethod
+    def file_path_for(cls, job_id: int, export_format: str) -> str:
+        """ジョブの出力ファイルのパスを取得"""
+        return os.path.join(cls._job_directory(), f'export_job_{job_id}.{export_format}')
+
+    @classmethod
+    def _progress_path(cls, job_id: int) -> str:
+        """
+        実行中の進捗を記録するファイルのパスを取得
+
+        エクスポート中は読み取りカーソルがDBのロックを保持するため、
+        進捗はDBではなくファイルに書き出し、どのプロセスからも参照できるようにする。
+        """
+        return os.path.join(cls._job_directory(), f'export_job_{job_id}.progress')
+
+    @classmethod
+    def _write_progress(cls, job_id: int, processed_rows: int):
+        """進捗ファイルを更新"""
+        path = cls._progress_path(job_id)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(str(processed_rows))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def _read_progress(cls, job_id: int) -> Optional[int]:
+        """進捗ファイルから処理済み行数を取得"""
+        try:
+            with open(cls._progress_path(job_id), encoding='utf-8') as f:
+                return int(f.read() or 0)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def normalize_format(cls, export_format: Optional[str]) -> Optional[str]:
+        """出力形式を正規化（未対応の場合は None）"""
+        export_format = (export_format or '').lower()
+        export_format = cls.FORMAT_ALIASES.get(export_format, export_format)
+        return export_format if export_format in cls.FORMATS else None
+
+    @classmethod
+    def submit(cls, export_format: str, filters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        エクスポートジョブを登録してワーカープールに投入
+
+        Args:
+            export_format: 'csv' / 'xlsx'（'excel' も可）
+            filters: 検索条件
+
+        Returns:
+            Dict: 登録結果（成功時は 'job' にジョブ情報）
+        """
+        normalized_format = cls.normalize_format(export_format)
+        if normalized_format is None:
+            return {'success': False, 'error': '対応していない出力形式です。'}
+
+        cls.cleanup()
+        if ExportJob.count_active() >= current_app.config['EXPORT_JOB_MAX_PENDING']:
+            return {
+                'success': False,
+                'busy': True,
+                'error': '実行待ちのエクスポートが上限に達しています。しばらくしてから再度お試しください。'
+            }
+
+        job = ExportJob(
+            export_format=normalized_format,
+            filters=json.dumps(ExportService.normalize_filters(filters), ensure_ascii=False),
+            worker_id=cls.worker_id()
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        app = current_app._get_current_object()
+        future = cls._get_executor().submit(cls._run, app, job.id)
+        cls._futures[job.id] = future
+        future.add_done_callback(lambda _, job_id=job.id: cls._futures.pop(job_id, None))
+
+        current_app.logger.info(f'Export job {job.id} queued ({normalized_format})')
+        return {'success': True, 'job': job.to_dict()}
+
+    @classmethod
+    def _claim(cls, job_id: int) -> bool:
+        """
+        実行中のジョブ（全プロセス）が上限未満の場合に、待機中のジョブを実行中にする
+
+        件数の確認と状態の変更を1つのUPDATEで行うため、複数のプロセスから同時に
+        呼ばれても実行中のジョブは EXPORT_JOB_WORKERS 件を超えない。
+
+        Returns:
+            bool: 実行中にできたかどうか
+        """
+        running_jobs = aliased(ExportJob)
+        running = select(func.count(running_jobs.id))\
+            .where(running_jobs.status == ExportJob.STATUS_RUNNING).scalar_subquery()
+        now = datetime.utcnow()
+        result = db.session.execute(
+            update(ExportJob)
+            .where(ExportJob.id == job_id,
+                   ExportJob.status == ExportJob.STATUS_QUEUED,
+                   running < max(1, current_app.config['EXPORT_JOB_WORKERS']))
+            .values(status=ExportJob.STATUS_RUNNING, started_at=now, updated_at=now, worker_id=cls.worker_id())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    @classmethod
+    def _wait_for_slot(cls, job_id: int) -> bool:
+        """
+        実行できるまで待機する（待機中に失敗扱いになるなど、待機中でなくなった場合は False）
+        """
+        while not cls._claim(job_id):
+            status = db.session.execute(select(ExportJob.status).where(ExportJob.id == job_id)).scalar()
+            db.session.rollback()
+            if status != ExportJob.STATUS_QUEUED:
+                return False
+            time.sleep(cls.SLOT_RETRY_WAIT)
+        return True
+
+    @classmethod
+    def _run(cls, app, job_id: int):
+        """ワーカースレッドでジョブを実行"""
+        with app.app_context():
+            if not cls._wait_for_slot(job_id):
+                db.session.remove()
+                return
+            job = db.session.get(ExportJob, job_id)
+            path = cls.file_path_for(job.id, job.export_format)
+            temp_path = f'{path}.tmp'
+            try:
+                filters = json.loads(job.filters) if job.filters else {}
+                job.total_rows = ExportService.count(filters)
+                db.session.commit()
+                cls._write_progress(job.id, 0)
+
+                processed = {'rows': 0}
+
+                def progress(rows):
+                    processed['rows'] = rows
+                    cls._write_progress(job_id, rows)
+
+                # 明細の読み取りは読み取り専用エンジンで行い、インポートなどの書き込みと競合させない
+                with open(temp_path, 'wb') as output, read_only():
+                    if job.export_format == 'xlsx':
+                        ExportService.write_excel(filters, output, progress=progress)
+                    else:
+                        for chunk in ExportService.iter_csv(filters, progress=progress):
+                            output.write(chunk)
+                processed_rows = processed['rows']
+                # 読み取りトランザクションを終了してから結果を書き込む
+                db.session.rollback()
+                os.replace(temp_path, path)
+
+                job.status = ExportJob.STATUS_COMPLETED
+                job.processed_rows = processed_rows
+                job.file_path = path
+                job.file_size = os.path.getsize(path)
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+                app.logger.info(f'Export job {job.id} completed: {processed_rows} rows')
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f'Export job {job_id} failed: {str(e)}')
+                for leftover in (temp_path, path):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+                job = db.session.get(ExportJob, job_id)
+                if job is not None:
+                    job.status = ExportJob.STATUS_FAILED
+                    job.error_message = 'エクスポートファイルの生成中にエラーが発生しました。'
+                    job.finished_at = datetime.utcnow()
+                    db.session.commit()
+            finally:
+                try:
+                    os.remove(cls._progress_path(job_id))
+                except OSError:
+                    pass
+                db.session.remove()
+
+    @classmethod
+    def get_job(cls, job_id: int) -> Optional[ExportJob]:
+        """ジョブを取得"""
+        return db.session.get(ExportJob, job_id)
+
+    @classmethod
+    def job_status(cls, job: ExportJob) -> Dict[str, Any]:
+        """
+        ジョブの状態を取得（実行中は進捗ファイルの値を反映）
+
+        Args:
+            job: ジョブ
+
+        Returns:
+            Dict: ジョブ情報
+        """
+        status = job.to_dict()
+        if job.status == ExportJob.STATUS_RUNNING:
+            processed_rows = cls._read_progress(job.id)
+            if processed_rows is not None:
+                status['processed_rows'] = processed_rows
+                if job.total_rows:
+                    status['progress'] = min(int(processed_rows * 100 / job.total_rows), 99)
+        return status
+
+    @classmethod
+    def recent_jobs(cls, limit: int = 20):
+        """最近のジョブ一覧を取得"""
+        return ExportJob.query.order_by(ExportJob.id.desc()).limit(limit).all()
+
+    @classmethod
+    def wait(cls, job_id: int, timeout: Optional[float] = None) -> Optional[ExportJob]:
+        """
+        このプロセスで実行中のジョブの完了を待つ
+
+        Args:
+            job_id: ジョブID
+            timeout: 待機する秒数
+
+        Returns:
+            ExportJob: 完了後のジョブ
+        """
+        future = cls._futures.get(job_id)
+        if future is not None:
+            future.result(timeout=timeout)
+        db.session.expire_all()
+        return cls.get_job(job_id)
+
+    @classmethod
+    def _is_orphaned(cls, job: ExportJob, at_startup: bool) -> bool:
+        """
+        ジョブを受け付けたプロセスが停止していて、実行されることが無いか
+
+        同じホストのプロセスのみ判定する。このプロセスと同じPIDのジョブは、
+        起動時（まだジョブを実行していない）に限り、再利用されたPIDの停止したプロセスのものとみなす。
+        """
+        if not job.worker_id or job.id in cls._futures:
+            return False
+        host, _, pid = job.worker_id.rpartition(':')
+        if host != socket.gethostname() or not pid.isdigit():
+            return False
+        if int(pid) == os.getpid():
+            return at_startup
+        return not cls._process_alive(int(pid))
+
+    @classmethod
+    def recover_orphaned_jobs(cls, at_startup: bool = False) -> int:
+        """
+        停止したプロセスの待機中・実行中のジョブを失敗扱いにする
+
+        ワーカープロセスの起動時に呼び出し、進捗が止まったとみなすまで
+        （STALE_AFTER）待たずに、中断したジョブを利用者に知らせる。
+
+        Args:
+            at_startup: プロセスの起動時の呼び出しか
+
+        Returns:
+            int: 失敗扱いにしたジョブ数
+        """
+        now = datetime.utcnow()
+        orphaned = [
+            job for job in ExportJob.query.filter(ExportJob.status.in_(ExportJob.ACTIVE_STATUSES)).all()
+            if cls._is_orphaned(job, at_startup)
+        ]
+        for job in orphaned:
+            job.status = ExportJob.STATUS_FAILED
+            job.error_message = 'エクスポートを実行していたプロセスが停止しました。再度実行してください。'
+            job.finished_at = now
+        if orphaned:
+            db.session.commit()
+            current_app.logger.warning(f'Marked {len(orphaned)} orphaned export jobs as failed')
+        return len(orphaned)
+
+    @classmethod
+    def cleanup(cls):
+        """保持期間を過ぎたジョブと、停止したプロセスのジョブ・進捗が止まったジョブを整理"""
+        cls.recover_orphaned_jobs()
+        now = datetime.utcnow()
+        changed = False
+        for job in ExportJob.query.filter(ExportJob.status.in_(ExportJob.ACTIVE_STATUSES)).all():
+            if job.id in cls._futures:
+                continue
+            last_activity = job.updated_at or job.created_at
+            try:
+                last_activity = max(last_activity, datetime.utcfromtimestamp(os.path.getmtime(cls._progress_path(job.id))))
+            except OSError:
+                pass
+            if now - last_activity > cls.STALE_AFTER:
+                job.status = ExportJob.STATUS_FAILED
+                job.error_message = 'エクスポートが中断されました。再度実行してください。'
+                job.finished_at = now
+                changed = True
+        expired = ExportJob.query.filter(
+            ExportJob.status.notin_(ExportJob.ACTIVE_STATUSES),
+            func.coalesce(ExportJob.finished_at, ExportJob.created_at) < now - cls.RETENTION
+        ).all()
+        for job in expired:
+            if job.file_path and os.path.exists(job.file_path):
+                os.remove(job.file_path)
+            db.session.delete(job)
+            changed = True
+        if changed:
+            db.session.commit()
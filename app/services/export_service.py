@@ -0,0 +1,737 @@
+"""
+エクスポート機能のサービスクラス
+
+検索条件の解釈と、必要な列だけを結合取得するクエリによる
+ストリーミング出力を提供します。
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+from openpyxl.utils import get_column_letter
+from sqlalchemy import func, select
+
+from app import db
+from app.enums import OrderProbability
+from app.models import Project, Branch
+
+
+class ExportService:
+    """プロジェクトデータのエクスポートを担当するサービスクラス"""
+
+    # DBカーソルから一度に取り出す行数
+    STREAM_BATCH_SIZE = 1000
+
+    DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+    CSV_HEADERS = [
+        'プロジェクトコード', 'プロジェクト名', '支社名', '支社コード', '売上の年度',
+        '受注角度', '受注角度(数値)', '売上（契約金）', '経費（トータル）', '粗利', '作成日', '更新日',
+    ]
+
+    # 検索条件として受け付けるリクエストパラメータ
+    FILTER_PARAMS = (
+        'project_code', 'project_name', 'branch_id', 'fiscal_year',
+        'order_probability_min', 'order_probability_max', 'updated_since',
+    )
+
+    # プレビューの表示件数と列
+    PREVIEW_LIMIT = 10
+    PREVIEW_COLUMNS = [
+        'プロジェクトコード', 'プロジェクト名', '支社名', '支社コード', '売上の年度',
+        '受注角度', '売上（契約金）', '経費（トータル）', '粗利', '作成日', '更新日',
+    ]
+
+    # Excel出力の設定（1シートの最大行数はヘッダー行を含む）
+    EXCEL_SHEET_TITLE = 'プロジェクト一覧'
+    EXCEL_MAX_ROWS_PER_SHEET = 1048576
+    EXCEL_MAX_COLUMN_WIDTH = 30
+    EXCEL_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    # 金額列（売上・経費・粗利）の位置
+    EXCEL_AMOUNT_COLUMNS = (7, 8, 9)
+
+    @staticmethod
+    def parse_filters(args) -> Dict[str, Any]:
+        """
+        リクエストパラメータから検索条件を取得
+
+        Args:
+            args: request.args
+
+        Returns:
+            Dict: 検索条件
+        """
+        return {
+            'project_code': args.get('project_code', ''),
+            'project_name': args.get('project_name', ''),
+            'branch_id': args.get('branch_id', type=int),
+            'fiscal_year': args.get('fiscal_year', type=int),
+            'order_probability_min': args.get('order_probability_min', type=float),
+            'order_probability_max': args.get('order_probability_max', type=float),
+            'updated_since': args.get('updated_since', type=ExportService.parse_datetime),
+        }
+
+    @classmethod
+    def filter_query_params(cls, args) -> Dict[str, str]:
+        """
+        指定された検索条件のリクエストパラメータだけを取り出す（ダウンロードURL用）
+
+        Args:
+            args: request.args
+
+        Returns:
+            Dict: パラメータ名と値
+        """
+        return {key: args.get(key) for key in cls.FILTER_PARAMS if args.get(key)}
+
+    @staticmethod
+    def parse_datetime(value: str) -> datetime:
+        """
+        ISO 8601 形式の日時を解析（タイムゾーン付きの場合はUTCの naive な日時に変換）
+
+        Raises:
+            ValueError: 日時として解釈できない場合
+        """
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+
+    @staticmethod
+    def normalize_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        検索条件を正規化（クエリに影響しない空の条件を除外）
+
+        キャッシュキーなど、同じ結果になる条件を同一視したい場合に使う。
+
+        Args:
+            filters: parse_filters の結果
+
+        Returns:
+            Dict: 実際に適用される条件のみの辞書
+        """
+        normalized = {}
+        for key in ('project_code', 'project_name', 'branch_id', 'fiscal_year'):
+            if filters.get(key):
+                normalized[key] = filters[key]
+        for key in ('order_probability_min', 'order_probability_max'):
+            if filters.get(key) is not None:
+                normalized[key] = float(filters[key])
+        if filters.get('updated_since'):
+            normalized['updated_since'] = filters['updated_since'].isoformat()
+        return normalized
+
+    @staticmethod
+    def apply_filters(stmt, filters: Dict[str, Any]):
+        """
+        検索条件をクエリに適用
+
+        Args:
+            stmt: select文
+            filters: 検索条件
+
+        Returns:
+            Select: 条件を適用したselect文
+        """
+        if filters.get('project_code'):
+            stmt = stmt.where(Project.project_code.contains(filters['project_code']))
+        if filters.get('project_name'):
+            stmt = stmt.where(Project.project_name.contains(filters['project_name']))
+        if filters.get('branch_id'):
+            stmt = stmt.where(Project.branch_id == filters['branch_id'])
+        if filters.get('fiscal_year'):
+            stmt = stmt.where(Project.fiscal_year == filters['fiscal_year'])
+        if filters.get('order_probability_min') is not None:
+            stmt = stmt.where(Project.order_probability >= filters['order_probability_min'])
+        if filters.get('order_probability_max') is not None:
+            stmt = stmt.where(Project.order_probability <= filters['order_probability_max'])
+        if filters.get('updated_since'):
+            updated_since = filters['updated_since']
+            if isinstance(updated_since, str):
+                updated_since = ExportService.parse_datetime(updated_since)
+            stmt = stmt.where(Project.updated_at >= updated_since)
+        return stmt
+
+    @classmethod
+    def build_statement(cls, filters: Dict[str, Any]):
+        """
+        エクスポート対象の列だけを支社と結合して取得するselect文を構築
+
+        Args:
+            filters: 検索条件
+
+        Returns:
+            Select: 作成日の降順に並べたselect文
+        """
+        stmt = select(
+            Project.project_code,
+            Project.project_name,
+            Branch.branch_name,
+            Branch.branch_code,
+            Project.fiscal_year,
+            Project.order_probability,
+            Project.revenue,
+            Project.expenses,
+            Project.created_at,
+            Project.updated_at,
+        ).join(Branch, Project.branch_id == Branch.id)
+        return cls.apply_filters(stmt, filters).order_by(Project.created_at.desc())
+
+    @classmethod
+    def build_record_statement(cls, filters: Dict[str, Any]):
+        """
+        機械連携用（NDJSON）の列を取得するselect文を構築
+
+        差分取得で最終更新日時を次回の起点にできるよう、更新日時・IDの昇順に並べる。
+
+        Args:
+            filters: 検索条件
+
+        Returns:
+            Select: select文
+        """
+        stmt = select(
+            Project.id,
+            Project.project_code,
+            Project.project_name,
+            Project.branch_id,
+            Branch.branch_code,
+            Branch.branch_name,
+            Project.fiscal_year,
+            Project.order_probability,
+            Project.revenue,
+            Project.expenses,
+            Project.created_at,
+            Project.updated_at,
+        ).join(Branch, Project.branch_id == Branch.id)
+        return cls.apply_filters(stmt, filters).order_by(Project.updated_at.asc(), Project.id.asc())
+
+    @classmethod
+    def count(cls, filters: Dict[str, Any]) -> int:
+        """
+        エクスポート対象の件数を取得
+
+        Args:
+            filters: 検索条件
+
+        Returns:
+            int: 件数
+        """
+        stmt = select(func.count(Project.id)).select_from(Project).join(Branch, Project.branch_id == Branch.id)
+        return db.session.execute(cls.apply_filters(stmt, filters)).scalar_one()
+
+    @classmethod
+    def preview(cls, filters: Dict[str, Any], limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        総件数と先頭の行を1回のクエリで取得
+
+        ウィンドウ関数 COUNT(*) OVER() で LIMIT 適用前の件数を各行に付けるため、
+        件数取得と先頭ページ取得を別々に実行しない。
+
+        Args:
+            filters: 検索条件
+            limit: 取得する行数（省略時は PREVIEW_LIMIT）
+
+        Returns:
+            Dict: total_count と先頭の行（preview_record の形式）のリスト rows
+        """
+        stmt = cls.build_statement(filters)\
+            .add_columns(func.count().over().label('total_count'))\
+            .limit(limit or cls.PREVIEW_LIMIT)
+        rows = db.session.execute(stmt).all()
+        return {
+            'total_count': rows[0].total_count if rows else 0,
+            'rows': [cls.preview_record(row) for row in rows],
+        }
+
+    @classmethod
+    def preview_record(cls, row) -> Dict[str, Any]:
+        """
+        1行分のプレビュー表示用データを生成
+
+        Args:
+            row: build_statement の結果行
+
+        Returns:
+            Dict: プレビュー表示用の値
+        """
+        probability = int(row.order_probability)
+        revenue = float(row.revenue)
+        expenses = float(row.expenses)
+        return {
+            'project_code': row.project_code,
+            'project_name': row.project_name,
+            'branch_name': row.branch_name or '',
+            'branch_code': row.branch_code or '',
+            'fiscal_year': row.fiscal_year,
+            'order_probability_symbol': cls.probability_symbol(probability),
+            'order_probability': probability,
+            'revenue': revenue,
+            'expenses': expenses,
+            'gross_profit': revenue - expenses,
+            'created_at': cls.format_datetime(row.created_at),
+            'updated_at': cls.format_datetime(row.updated_at),
+        }
+
+    @classmethod
+    def stream_rows(cls, filters: Dict[str, Any], batch_size: Optional[int] = None, stmt=None) -> Iterator[List[Any]]:
+        """
+        エクスポート対象の行をバッチ単位で取り出す
+
+        クエリはこの関数の呼び出し時に実行されるため、SQLのエラーは
+        レスポンスの送信開始前に検出できる。
+
+        Args:
+            filters: 検索条件
+            batch_size: 1バッチの行数
+            stmt: 実行するselect文（省略時は build_statement の結果）
+
+        Returns:
+            Iterator: 行のリストを順に返すイテレータ
+        """
+        if stmt is None:
+            stmt = cls.build_statement(filters)
+        stmt = stmt.execution_options(
+            yield_per=batch_size or cls.STREAM_BATCH_SIZE,
+            stream_results=True,
+        )
+        result = db.session.execute(stmt)
+        return result.partitions()
+
+    @staticmethod
+    def probability_symbol(value) -> str:
+        """受注角度の数値から記号を取得"""
+        try:
+            return OrderProbability.from_value(int(value)).symbol
+        except (ValueError, TypeError):
+            return OrderProbability.LOW.symbol
+
+    @classmethod
+    def format_datetime(cls, value) -> str:
+        """日時を出力用の文字列に変換"""
+        return value.strftime(cls.DATETIME_FORMAT) if value else ''
+
+    @classmethod
+    def csv_row(cls, row) -> List[Any]:
+        """
+        1行分のCSV出力値を生成
+
+        Args:
+            row: build_statement の結果行
+
+        Returns:
+            List: CSV_HEADERS の順に並んだ値
+        """
+        probability = int(row.order_probability)
+        revenue = float(row.revenue)
+        expenses = float(row.expenses)
+        return [
+            row.project_code,
+            row.project_name,
+            row.branch_name or '',
+            row.branch_code or '',
+            row.fiscal_year,
+            f'{cls.probability_symbol(probability)} {probability}%',
+            probability,
+            revenue,
+            expenses,
+            revenue - expenses,
+            cls.format_datetime(row.created_at),
+            cls.format_datetime(row.updated_at),
+        ]
+
+    @classmethod
+    def iter_csv(cls, filters: Dict[str, Any], batch_size: Optional[int] = None,
+                 progress: Optional[Callable[[int], None]] = None) -> Iterator[bytes]:
+        """
+        CSVをバッチ単位のバイト列として生成（先頭に UTF-8 BOM を1回だけ付与）
+
+        Args:
+            filters: 検索条件
+            batch_size: 1バッチの行数
+            progress: バッチごとに出力済み行数を受け取るコールバック
+
+        Returns:
+            Iterator: CSVのバイト列を順に返すジェネレータ
+        """
+        partitions = cls.stream_rows(filters, batch_size)
+
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator='\n')
+            writer.writerow(cls.CSV_HEADERS)
+            yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+            total = 0
+            for partition in partitions:
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(cls.csv_row(row) for row in partition)
+                yield buffer.getvalue().encode('utf-8')
+                total += len(partition)
+                if progress:
+                    progress(total)
+
+        return generate()
+
+    @staticmethod
+    def format_iso_datetime(value) -> Optional[str]:
+        """日時をISO 8601 形式（UTC）に変換"""
+        return value.isoformat() + 'Z' if value else None
+
+    @classmethod
+    def ndjson_record(cls, row) -> Dict[str, Any]:
+        """
+        1行分のNDJSONレコードを生成（キーは英字で固定、値は型付き）
+
+        Args:
+            row: build_record_statement の結果行
+
+        Returns:
+            Dict: レコード
+        """
+        revenue = float(row.revenue)
+        expenses = float(row.expenses)
+        return {
+            'id': row.id,
+            'project_code': row.project_code,
+            'project_name': row.project_name,
+            'branch_id': row.branch_id,
+            'branch_code': row.branch_code,
+            'branch_name': row.branch_name,
+            'fiscal_year': row.fiscal_year,
+            'order_probability': int(row.order_probability),
+            'revenue': revenue,
+            'expenses': expenses,
+            'gross_profit': revenue - expenses,
+            'created_at': cls.format_iso_datetime(row.created_at),
+            'updated_at': cls.format_iso_datetime(row.updated_at),
+        }
+
+    @classmethod
+    def max_updated_at(cls, filters: Dict[str, Any]) -> Optional[datetime]:
+        """検索条件に該当するデータの最終更新日時を取得（次回の差分取得の起点）"""
+        stmt = select(func.max(Project.updated_at)).select_from(Project).join(Branch, Project.branch_id == Branch.id)
+        return db.session.execute(cls.apply_filters(stmt, filters)).scalar_one()
+
+    @classmethod
+    def iter_ndjson(cls, filters: Dict[str, Any], batch_size: Optional[int] = None,
+                    compress: bool = True) -> Iterator[bytes]:
+        """
+        NDJSON（1行1レコードのJSON）をバッチ単位のバイト列として生成
+
+        Args:
+            filters: 検索条件（updated_since で差分のみ取得できる）
+            batch_size: 1バッチの行数
+            compress: gzip 圧縮して出力するか
+
+        Returns:
+            Iterator: NDJSONのバイト列を順に返すジェネレータ
+        """
+        partitions = cls.stream_rows(filters, batch_size, stmt=cls.build_record_statement(filters))
+
+        def generate():
+            compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+            for partition in partitions:
+                data = ''.join(
+                    json.dumps(cls.ndjson_record(row), ensure_ascii=False, separators=(',', ':')) + '\n'
+                    for row in partition
+                ).encode('utf-8')
+                if compressor:
+                    data = compressor.compress(data)
+                if data:
+                    yield data
+            if compressor:
+                yield compressor.flush()
+
+        return generate()
+
+    @classmethod
+    def _excel_styles(cls) -> Dict[str, NamedStyle]:
+        """Excel出力で使う名前付きスタイルを生成"""
+        header = NamedStyle(name='export_header')
+        header.font = Font(bold=True, color='FFFFFF')
+        header.fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
+        header.alignment = Alignment(horizontal='center', vertical='center')
+        amount = NamedStyle(name='export_amount')
+        amount.number_format = '#,##0'
+        return {'header': header, 'amount': amount}
+
+    @classmethod
+    def excel_column_widths(cls, filters: Dict[str, Any]) -> List[float]:
+        """
+        列幅を集計クエリ1回で事前計算（全セルを走査せずに最大文字数を求める）
+
+        Args:
+            filters: 検索条件
+
+        Returns:
+            List: 各列の幅（ヘッダーと値の最大文字数 + 2、上限あり）
+        """
+        gross_profit = Project.revenue - Project.expenses
+        stmt = select(
+            func.max(func.length(Project.project_code)),
+            func.max(func.length(Project.project_name)),
+            func.max(func.length(Branch.branch_name)),
+            func.max(func.length(Branch.branch_code)),
+            func.max(Project.revenue),
+            func.max(Project.expenses),
+            func.max(gross_profit),
+            func.min(gross_profit),
+        ).select_from(Project).join(Branch, Project.branch_id == Branch.id)
+        stats = db.session.execute(cls.apply_filters(stmt, filters)).one()
+
+        def amount_length(*values):
+            return max((len(str(float(value))) for value in values if value is not None), default=0)
+
+        data_lengths = [
+            stats[0] or 0,
+            stats[1] or 0,
+            stats[2] or 0,
+            stats[3] or 0,
+            4,                              # 売上の年度
+            6,                              # 「〇 100%」
+            3,                              # 受注角度(数値)
+            amount_length(stats[4]),
+            amount_length(stats[5]),
+            amount_length(stats[6], stats[7]),
+            19,                             # 作成日（YYYY-MM-DD HH:MM:SS）
+            19,                             # 更新日
+        ]
+        return [
+            min(max(len(header), length) + 2, cls.EXCEL_MAX_COLUMN_WIDTH)
+            for header, length in zip(cls.CSV_HEADERS, data_lengths)
+        ]
+
+    @classmethod
+    def _new_workbook(cls) -> Workbook:
+        """名前付きスタイルを登録した write_only モードのブックを生成"""
+        workbook = Workbook(write_only=True)
+        for style in cls._excel_styles().values():
+            workbook.add_named_style(style)
+        return workbook
+
+    @staticmethod
+    def _styled_row(worksheet, values: List[Any], style: str, positions=None) -> List[Any]:
+        """指定位置（省略時は全列）の値をスタイル付きのセルに変換"""
+        row = list(values)
+        for position in (range(len(row)) if positions is None else positions):
+            cell = WriteOnlyCell(worksheet, value=row[position])
+            cell.style = style
+            row[position] = cell
+        return row
+
+    @classmethod
+    def _new_sheet(cls, workbook: Workbook, title: str, headers: List[str], widths: List[float]):
+        """列幅とヘッダー行を設定したシートを追加"""
+        worksheet = workbook.create_sheet(title)
+        for index, width in enumerate(widths, start=1):
+            worksheet.column_dimensions[get_column_letter(index)].width = width
+        worksheet.append(cls._styled_row(worksheet, headers, 'export_header'))
+        return worksheet
+
+    @classmethod
+    def _write_detail_sheets(cls, workbook: Workbook, partitions, widths: List[float],
+                             progress: Optional[Callable[[int], None]] = None,
+                             on_row: Optional[Callable[[Any], None]] = None) -> int:
+        """
+        明細行をシートに追記（1シートの上限行数を超えたら次のシートに続ける）
+
+        Args:
+            workbook: write_only モードのブック
+            partitions: stream_rows の結果
+            widths: 列幅
+            progress: バッチごとに出力済み行数を受け取るコールバック
+            on_row: 行ごとに結果行を受け取るコールバック
+
+        Returns:
+            int: 出力したデータ行数
+        """
+        rows_per_sheet = cls.EXCEL_MAX_ROWS_PER_SHEET - 1
+
+        def sheet_title(number):
+            return cls.EXCEL_SHEET_TITLE if number == 1 else f'{cls.EXCEL_SHEET_TITLE} ({number})'
+
+        sheet_number = 1
+        worksheet = cls._new_sheet(workbook, sheet_title(sheet_number), cls.CSV_HEADERS, widths)
+        sheet_rows = 0
+        total = 0
+        for partition in partitions:
+            for row in partition:
+                if sheet_rows >= rows_per_sheet:
+                    sheet_number += 1
+                    worksheet = cls._new_sheet(workbook, sheet_title(sheet_number), cls.CSV_HEADERS, widths)
+                    sheet_rows = 0
+                worksheet.append(cls._styled_row(
+                    worksheet, cls.csv_row(row), 'export_amount', cls.EXCEL_AMOUNT_COLUMNS
+                ))
+                if on_row:
+                    on_row(row)
+                sheet_rows += 1
+                total += 1
+            if progress:
+                progress(total)
+        return total
+
+    @classmethod
+    def write_excel(cls, filters: Dict[str, Any], target, batch_size: Optional[int] = None,
+                    progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        write_only モードのブックにDBカーソルから行を追記してExcelを出力
+
+        列幅は事前計算し、書式は列ごとの名前付きスタイルで指定するため、
+        行の書き込みは1パスで完了する。1シートの上限行数を超えた場合は
+        「プロジェクト一覧 (2)」以降のシートに続きを出力する。
+
+        Args:
+            filters: 検索条件
+            target: 保存先（ファイルパスまたはバイナリファイルオブジェクト）
+            batch_size: DBから一度に取り出す行数
+            progress: バッチごとに出力済み行数を受け取るコールバック
+
+        Returns:
+            int: 出力したデータ行数
+        """
+        widths = cls.excel_column_widths(filters)
+        partitions = cls.stream_rows(filters, batch_size)
+        workbook = cls._new_workbook()
+        total = cls._write_detail_sheets(workbook, partitions, widths, progress)
+        workbook.save(target)
+        return total
+
+    @classmethod
+    def write_report(cls, filters: Dict[str, Any], target, batch_size: Optional[int] = None) -> int:
+        """
+        明細と集計シートを含む分析用レポートを1回のカーソル走査で出力
+
+        明細シートに行を書き出しながら、支社別・年度別・受注角度別の集計を
+        メモリ上で積み上げ、集計シートは最後にまとめて書き出す。
+        列幅の事前計算も行わないため、実行するクエリは明細の1本のみ。
+
+        Args:
+            filters: 検索条件
+            target: 保存先（ファイルパスまたはバイナリファイルオブジェクト）
+            batch_size: DBから一度に取り出す行数
+
+        Returns:
+            int: 出力した明細行数
+        """
+        by_branch: Dict[Any, ReportTotals] = {}
+        by_year: Dict[Any, ReportTotals] = {}
+        by_probability: Dict[Any, ReportTotals] = {}
+        grand_total = ReportTotals()
+
+        def accumulate(row):
+            revenue = float(row.revenue)
+            expenses = float(row.expenses)
+            probability = int(row.order_probability)
+            branch_key = (row.branch_code or '', row.branch_name or '')
+            for totals, key in ((by_branch, branch_key), (by_year, row.fiscal_year), (by_probability, probability)):
+                if key not in totals:
+                    totals[key] = ReportTotals()
+                totals[key].add(revenue, expenses, probability)
+            grand_total.add(revenue, expenses, probability)
+
+        partitions = cls.stream_rows(filters, batch_size)
+        workbook = cls._new_workbook()
+        total = cls._write_detail_sheets(workbook, partitions, cls.report_detail_widths(), on_row=accumulate)
+
+        cls._write_summary_sheet(
+            workbook, '支社別集計', ['支社コード', '支社名'],
+            [(list(key), by_branch[key]) for key in sorted(by_branch)], grand_total
+        )
+        cls._write_summary_sheet(
+            workbook, '年度別集計', ['売上の年度'],
+            [([year], by_year[year]) for year in sorted(by_year)], grand_total
+        )
+        cls._write_summary_sheet(
+            workbook, '受注角度別パイプライン', ['受注角度', '受注角度(数値)'],
+            [([f'{cls.probability_symbol(probability)} {probability}%', probability], by_probability[probability])
+             for probability in sorted(by_probability, reverse=True)],
+            grand_total
+        )
+        workbook.save(target)
+        return total
+
+    @classmethod
+    def report_detail_widths(cls) -> List[float]:
+        """レポートの明細シートの列幅（集計クエリを使わずヘッダーと既定値から決める）"""
+        defaults = [12, cls.EXCEL_MAX_COLUMN_WIDTH, 15, 10, 4, 6, 3, 14, 14, 14, 19, 19]
+        return [
+            min(max(len(header), length) + 2, cls.EXCEL_MAX_COLUMN_WIDTH)
+            for header, length in zip(cls.CSV_HEADERS, defaults)
+        ]
+
+    @classmethod
+    def _write_summary_sheet(cls, workbook: Workbook, title: str, key_headers: List[str],
+                             groups: List[Any], grand_total: 'ReportTotals'):
+        """
+        集計シートを書き出す（最終行に合計）
+
+        Args:
+            workbook: write_only モードのブック
+            title: シート名
+            key_headers: 集計キーの列見出し
+            groups: (キーの値のリスト, ReportTotals) のリスト
+            grand_total: 全体の合計
+        """
+        headers = key_headers + ReportTotals.HEADERS
+        widths = [max(len(header) * 2, 10) for header in headers]
+        worksheet = cls._new_sheet(workbook, title, headers, widths)
+        amount_positions = [len(key_headers) + offset for offset in ReportTotals.AMOUNT_OFFSETS]
+        for keys, totals in groups:
+            worksheet.append(cls._styled_row(worksheet, keys + totals.values(), 'export_amount', amount_positions))
+        total_keys = ['合計'] + [''] * (len(key_headers) - 1)
+        worksheet.append(cls._styled_row(
+            worksheet, total_keys + grand_total.values(), 'export_amount', amount_positions
+        ))
+
+
+class ReportTotals:
+    """レポートの集計値（件数・金額と、受注角度で加重した見込み金額）"""
+
+    HEADERS = ['件数', '売上合計', '経費合計', '粗利合計', '粗利率(%)', '加重売上', '加重粗利']
+    # HEADERS のうち金額書式を適用する列の位置
+    AMOUNT_OFFSETS = (1, 2, 3, 5, 6)
+
+    __slots__ = ('count', 'revenue', 'expenses', 'weighted_revenue', 'weighted_gross_profit')
+
+    def __init__(self):
+        self.count = 0
+        self.revenue = 0.0
+        self.expenses = 0.0
+        self.weighted_revenue = 0.0
+        self.weighted_gross_profit = 0.0
+
+    def add(self, revenue: float, expenses: float, probability: int):
+        """1件分を加算"""
+        ratio = probability / 100
+        self.count += 1
+        self.revenue += revenue
+        self.expenses += expenses
+        self.weighted_revenue += revenue * ratio
+        self.weighted_gross_profit += (revenue - expenses) * ratio
+
+    @property
+    def gross_profit(self) -> float:
+        """粗利合計"""
+        return self.revenue - self.expenses
+
+    @property
+    def gross_profit_rate(self) -> float:
+        """粗利率（%、小数第1位まで）"""
+        if self.revenue > 0:
+            return round(self.gross_profit / self.revenue * 100, 1)
+        return 0.0
+
+    def values(self) -> List[Any]:
+        """HEADERS の順に並んだ値"""
+        return [
+            self.count, self.revenue, self.expenses, self.gross_profit,
+            self.gross_profit_rate, self.weighted_revenue, self.weighted_gross_profit,
+        ]
@@ -4,13 +4,72 @@ CSV/Excelインポート機能のサービスクラス
 import pandas as pd
 import os
 import io
-from typing import Dict, List, Any, Optional
+import csv
+import codecs
+import re
+import tempfile
+import hashlib
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
 from openpyxl import load_workbook
+from sqlalchemy import Column, MetaData, String, Table, insert, select
+from sqlalchemy.exc import IntegrityError
 from openpyxl.utils.exceptions import InvalidFileException
 from app import db
-from app.models import Project, Branch, ValidationError
+from app.models import Project, Branch, ImportCheckpoint, ValidationError
 from app.enums import OrderProbability
-from flask import has_app_context
+from app.services.validation_service import ValidationService
+from app.services.report_spool import ReportSpool
+from flask import current_app, has_app_context
+
+
+# インポートモード
+IMPORT_MODE_INSERT = 'insert'
+IMPORT_MODE_UPSERT = 'upsert'
+IMPORT_MODES = (IMPORT_MODE_INSERT, IMPORT_MODE_UPSERT)
+
+# 既存コード検出用の一時テーブル（接続ごとに作成・破棄する）
+_import_codes_table = Table(
+    'import_codes',
+    MetaData(),
+    Column('project_code', String(50), primary_key=True),
+    prefixes=['TEMPORARY'],
+)
+
+
+# CSV解析エンジン
+CSV_ENGINE_AUTO = 'auto'
+CSV_ENGINE_PYARROW = 'pyarrow'
+CSV_ENGINE_C = 'c'
+
+
+def _pyarrow_available() -> bool:
+    """pyarrow がインストールされているか"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _csv_decode_errors() -> Tuple[type, ...]:
+    """
+    文字コードの判定誤りで発生するCSV読み込みエラー
+
+    Cエンジンは UnicodeDecodeError だが、解析位置によっては ParserError になり、
+    pyarrow エンジンは不正なUTF-8を ArrowInvalid として報告する。
+    """
+    errors = (UnicodeDecodeError, pd.errors.ParserError)
+    try:
+        from pyarrow.lib import ArrowInvalid
+    except ImportError:
+        return errors
+    return errors + (ArrowInvalid,)
 
 
 class ImportService:
@@ -68,6 +127,49 @@ class ImportService:
         '100': 100, '50': 50, '0': 0,
         100: 100, 50: 50, 0: 0,
     }
+
+    # インポートモード
+    IMPORT_MODE_INSERT = IMPORT_MODE_INSERT
+    IMPORT_MODE_UPSERT = IMPORT_MODE_UPSERT
+    IMPORT_MODES = IMPORT_MODES
+
+    # 更新インポートの一括処理件数（SQLiteのバインド変数上限を考慮）
+    UPSERT_BATCH_SIZE = 500
+
+    # 新規インポートのコミット単位（チャンクごとにチェックポイントを記録）
+    IMPORT_CHUNK_SIZE = 1000
+    # 複数シート一括インポートのチェックポイントのファイル形式
+    MULTI_SHEET_FILE_TYPE = 'sheets'
+
+    # CSV解析エンジン（'auto' / 'pyarrow' / 'c'）と文字コード判定に使う先頭バイト数
+    CSV_ENGINE = CSV_ENGINE_AUTO
+    CSV_ENGINES = (CSV_ENGINE_AUTO, CSV_ENGINE_PYARROW, CSV_ENGINE_C)
+    ENCODING_SAMPLE_BYTES = 64 * 1024
+
+    # 整数として取り込む数値項目
+    INTEGER_FIELDS = ('fiscal_year',)
+
+    # ドライラン差分の分類と比較対象フィールド
+    DIFF_STATUSES = ('new', 'changed', 'unchanged', 'conflict')
+    DIFF_FIELDS = (
+        'project_name',
+        'branch_name',
+        'fiscal_year',
+        'order_probability',
+        'revenue',
+        'expenses',
+    )
+    DIFF_MAX_PER_PAGE = 500
+
+    # 変更検出用の行ハッシュに含めるフィールド
+    ROW_HASH_FIELDS = (
+        'project_name',
+        'branch_id',
+        'fiscal_year',
+        'order_probability',
+        'revenue',
+        'expenses',
+    )
     
     def validate_file(self, filepath: str, file_type: str, sheet_name: str = None) -> Dict[str, Any]:
         """
@@ -88,7 +190,7 @@ class ImportService:
             
             # ファイル読み込み
             if file_type == 'csv':
-                df = pd.read_csv(filepath, encoding='utf-8-sig')
+                df = self._read_csv(filepath, self._csv_dtypes())
                 excel_info = None
             elif file_type == 'excel':
                 # Excelファイルの詳細情報を取得（BytesIO経由でロック回避）
@@ -231,7 +333,182 @@ class ImportService:
         except Exception as e:
             return {'success': False, 'error': f'Excelファイル情報の取得に失敗しました: {str(e)}'}
     
-    def get_preview_data(self, filepath: str, file_type: str, column_mapping: Dict[str, str] = None, limit: int = 10, sheet_name: str = None) -> Dict[str, Any]:
+    def _load_mapped_dataframe(self, filepath: str, file_type: str, column_mapping: Dict[str, str] = None, sheet_name: str = None) -> Optional[pd.DataFrame]:
+        """
+        ファイルを読み込み、列マッピングを適用したデータフレームを返す
+        
+        Args:
+            filepath: ファイルパス
+            file_type: ファイル形式 ('csv' or 'excel')
+            column_mapping: 列マッピング辞書（システム項目名 -> ファイル列名）
+            sheet_name: Excelシート名（Excelファイルの場合）
+            
+        Returns:
+            DataFrame: システム項目名に変換済みのデータ（未対応形式の場合は None）
+        """
+        # ファイル読み込み
+        if file_type == 'csv':
+            df = self._read_csv(filepath, self._csv_dtypes(column_mapping))
+        elif file_type == 'excel':
+            # シート名が指定されていない場合は最初のシートを使用
+            if sheet_name is None:
+                excel_info = self._get_excel_info(filepath)
+                if excel_info['success'] and excel_info['sheets']:
+                    sheet_name = excel_info['sheets'][0]['name']
+            # BytesIO + ExcelFile でクローズを保証しつつロック回避
+            with open(filepath, 'rb') as f:
+                data = f.read()
+            with pd.ExcelFile(io.BytesIO(data), engine='openpyxl') as xls:
+                df = pd.read_excel(xls, sheet_name=sheet_name)
+        else:
+            return None
+        
+        # 列名を正規化
+        df.columns = df.columns.str.strip()
+        
+        # 列マッピングを適用
+        if column_mapping:
+            # マッピングされた列のみを抽出し、システム項目名にリネーム
+            mapped_df = pd.DataFrame()
+            for system_field, file_column in column_mapping.items():
+                if file_column in df.columns:
+                    mapped_df[system_field] = df[file_column]
+            df = mapped_df
+        else:
+            # 自動マッピング（日本語→英語、未知は簡易正規化）
+            auto_map = {}
+            for col in df.columns:
+                if col in self.COLUMN_MAPPING:
+                    auto_map[col] = self.COLUMN_MAPPING[col]
+                else:
+                    auto_map[col] = col.lower().replace(' ', '_')
+            df = df.rename(columns=auto_map)
+        return self._convert_numeric_fields(df)
+    
+    def _resolve_csv_engine(self) -> str:
+        """
+        CSVの解析エンジンを決定
+        
+        'auto' の場合は pyarrow がインストールされていればマルチスレッドの
+        Arrowエンジンを使い、無ければ pandas 標準のCエンジンを使う。
+        
+        Returns:
+            str: 'pyarrow' または 'c'
+        """
+        engine = self.CSV_ENGINE
+        if has_app_context():
+            engine = current_app.config.get('IMPORT_CSV_ENGINE', engine)
+        if engine not in self.CSV_ENGINES:
+            engine = CSV_ENGINE_AUTO
+        if engine == CSV_ENGINE_C:
+            return CSV_ENGINE_C
+        # 'auto' または 'pyarrow'（未インストールなら C エンジンにフォールバック）
+        return CSV_ENGINE_PYARROW if _pyarrow_available() else CSV_ENGINE_C
+    
+    def _detect_csv_encoding(self, filepath: str) -> str:
+        """
+        CSVの文字コードを先頭部分のみで判定（UTF-8 / CP932）
+        
+        ファイル全体をデコードし直さないよう、先頭のサンプルだけを
+        インクリメンタルデコーダーで検査する（末尾で途切れた文字は許容）。
+        
+        Args:
+            filepath: ファイルパス
+            
+        Returns:
+            str: pandas に渡すエンコーディング名
+        """
+        with open(filepath, 'rb') as f:
+            sample = f.read(self.ENCODING_SAMPLE_BYTES)
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            return 'utf-8-sig'
+        except UnicodeDecodeError:
+            # Shift_JIS の上位互換である CP932 として読む（Windows の Excel 出力を想定）
+            return 'cp932'
+    
+    def _csv_dtypes(self, column_mapping: Dict[str, str] = None) -> Dict[str, Any]:
+        """
+        get_system_fields() の型定義からCSV列の dtype 指定を生成
+        
+        文字列項目は型推論させずに文字列として読む（先頭ゼロのコード等を保持）。
+        数値項目は不正値を行単位のエラーとして報告するため解析時には固定せず、
+        読み込み後に _convert_numeric_fields で一括変換する。
+        
+        Args:
+            column_mapping: 列マッピング辞書（未指定時は既知の日本語列名を使用）
+            
+        Returns:
+            Dict: ファイル列名 -> dtype
+        """
+        string_fields = {
+            field for field, info in self.get_system_fields().items()
+            if info.get('dtype') == 'string'
+        }
+        if column_mapping:
+            columns = {file_column: field for field, file_column in column_mapping.items() if file_column}
+        else:
+            columns = self.COLUMN_MAPPING
+        return {column: str for column, field in columns.items() if field in string_fields}
+    
+    def _read_csv(self, filepath: str, dtype: Dict[str, Any] = None) -> pd.DataFrame:
+        """
+        文字コード判定と解析エンジン選択を行ってCSVを読み込む
+        
+        Args:
+            filepath: ファイルパス
+            dtype: 列ごとの dtype 指定
+            
+        Returns:
+            DataFrame: 読み込んだデータ
+        """
+        encoding = self._detect_csv_encoding(filepath)
+        options = {'encoding': encoding, 'dtype': dtype or None}
+        if self._resolve_csv_engine() == CSV_ENGINE_PYARROW:
+            options['engine'] = CSV_ENGINE_PYARROW
+        try:
+            return pd.read_csv(filepath, **options)
+        except _csv_decode_errors() as error:
+            # サンプル範囲外に UTF-8 として不正なバイトがあった場合のみ読み直す
+            if encoding == 'cp932':
+                raise
+            options['encoding'] = 'cp932'
+            try:
+                return pd.read_csv(filepath, **options)
+            except _csv_decode_errors():
+                # CP932 でも読めない場合は文字コード以外の問題として元のエラーを返す
+                raise error
+    
+    def _convert_numeric_fields(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        数値項目を列単位で一括変換（変換できない値は行検証のため元の値を残す）
+        
+        Args:
+            df: システム項目名に変換済みのデータ
+            
+        Returns:
+            DataFrame: 数値項目を変換したデータ
+        """
+        for field, info in self.get_system_fields().items():
+            if info.get('dtype') != 'number' or field not in df.columns:
+                continue
+            column = df[field]
+            if not pd.api.types.is_numeric_dtype(column):
+                converted = pd.to_numeric(column, errors='coerce')
+                invalid = converted.isna() & column.notna()
+                if invalid.any():
+                    df[field] = converted.astype(object).where(~invalid, column)
+                    continue
+                column = df[field] = converted
+            # 整数項目は欠損・小数が無ければ整数の列にする（行ごとの int() 変換を省く）
+            if field in self.INTEGER_FIELDS and pd.api.types.is_float_dtype(column):
+                if column.notna().all() and (column == column.round()).all():
+                    df[field] = column.astype('int64')
+        return df
+    
+    def get_preview_data(self, filepath: str, file_type: str, column_mapping: Dict[str, str] = None, limit: int = 10, sheet_name: str = None, mode: str = 'insert') -> Dict[str, Any]:
         """
         プレビュー用のデータを取得（重複チェックと検証付き）
         
@@ -241,51 +518,19 @@ class ImportService:
             column_mapping: 列マッピング辞書
             limit: 表示行数制限
             sheet_name: Excelシート名（Excelファイルの場合）
+            mode: インポートモード ('insert' or 'upsert')
             
         Returns:
             Dict: プレビューデータ（検証結果含む）
         """
         try:
-            # ファイル読み込み
-            if file_type == 'csv':
-                df = pd.read_csv(filepath, encoding='utf-8-sig')
-            elif file_type == 'excel':
-                # シート名が指定されていない場合は最初のシートを使用
-                if sheet_name is None:
-                    excel_info = self._get_excel_info(filepath)
-                    if excel_info['success'] and excel_info['sheets']:
-                        sheet_name = excel_info['sheets'][0]['name']
-                # BytesIO + ExcelFile でクローズを保証しつつロック回避
-                with open(filepath, 'rb') as f:
-                    data = f.read()
-                with pd.ExcelFile(io.BytesIO(data), engine='openpyxl') as xls:
-                    df = pd.read_excel(xls, sheet_name=sheet_name)
-            else:
+            # ファイル読み込みと列マッピング
+            df = self._load_mapped_dataframe(filepath, file_type, column_mapping, sheet_name)
+            if df is None:
                 return {'success': False, 'error': 'サポートされていないファイル形式です'}
             
-            # 列名を正規化
-            df.columns = df.columns.str.strip()
-            
-            # 列マッピングを適用
-            if column_mapping:
-                # マッピングされた列のみを抽出し、システム項目名にリネーム
-                mapped_df = pd.DataFrame()
-                for system_field, file_column in column_mapping.items():
-                    if file_column in df.columns:
-                        mapped_df[system_field] = df[file_column]
-                df = mapped_df
-            else:
-                # 自動マッピング（日本語→英語、未知は簡易正規化）
-                auto_map = {}
-                for col in df.columns:
-                    if col in self.COLUMN_MAPPING:
-                        auto_map[col] = self.COLUMN_MAPPING[col]
-                    else:
-                        auto_map[col] = col.lower().replace(' ', '_')
-                df = df.rename(columns=auto_map)
-            
-            # データ検証と重複チェックを実行
-            validation_result = self._validate_preview_data(df)
+            # データ検証と重複チェックを実行（更新モードでは既存コードはエラーにしない）
+            validation_result = self._validate_preview_data(df, check_existing=(mode != self.IMPORT_MODE_UPSERT))
             
             # プレビューデータを取得
             preview_df = df.head(limit)
@@ -308,268 +553,1363 @@ class ImportService:
             }
             
         except Exception as e:
-            return {'success': False, 'error': f'プレビューデータ取得エラー: {str(e)}'}
+            return {'success': False, 'error': f'プレビューデータ取得エラー: {str(e)}'}
+    
+    def _validate_preview_data(self, df: pd.DataFrame, check_existing: bool = True) -> Dict[str, Any]:
+        """
+        プレビューデータの検証を実行
+        
+        Args:
+            df: データフレーム
+            check_existing: 既存プロジェクトコードをエラーとして扱うか
+            
+        Returns:
+            Dict: 検証結果
+        """
+        validation_errors = []
+        row_validations = {}
+        duplicates = []
+        
+        # ファイル内のコードのうち既存のものを取得（アプリコンテキストがない場合はスキップ）
+        existing_codes = set()
+        if check_existing and has_app_context() and 'project_code' in df.columns:
+            try:
+                file_codes = df['project_code'].dropna().astype(str).str.strip().unique().tolist()
+                existing_codes = self._find_existing_codes(file_codes)
+            except Exception:
+                # 取得失敗時は重複チェックをスキップ
+                existing_codes = set()
+        
+        # ファイル内の重複チェック
+        if 'project_code' in df.columns:
+            file_codes = df['project_code'].dropna().astype(str).str.strip()
+            duplicate_codes = file_codes[file_codes.duplicated()].unique()
+            
+            for code in duplicate_codes:
+                duplicate_rows = df[df['project_code'].astype(str).str.strip() == code].index.tolist()
+                duplicates.append({
+                    'type': 'file_duplicate',
+                    'code': code,
+                    'rows': [row + 1 for row in duplicate_rows],  # 1-based indexing
+                    'message': f'プロジェクトコード「{code}」がファイル内で重複しています'
+                })
+        
+        # 行ごとの検証
+        for index, row in df.iterrows():
+            row_errors = []
+            
+            # 必須フィールドチェック
+            for field in self.REQUIRED_COLUMNS:
+                if field in df.columns:
+                    value = row[field]
+                    if pd.isna(value) or str(value).strip() == '':
+                        row_errors.append(f'{field}が空です')
+            
+            # プロジェクトコードの既存チェック
+            if 'project_code' in df.columns and not pd.isna(row['project_code']):
+                code = str(row['project_code']).strip()
+                if code in existing_codes:
+                    row_errors.append(f'プロジェクトコード「{code}」は既に存在します')
+            
+            # 数値フィールドの検証
+            numeric_fields = ['fiscal_year', 'revenue', 'expenses']
+            for field in numeric_fields:
+                if field in df.columns and not pd.isna(row[field]):
+                    try:
+                        float(row[field])
+                    except (ValueError, TypeError):
+                        row_errors.append(f'{field}は数値である必要があります')
+            
+            # 受注角度の検証
+            if 'order_probability' in df.columns and not pd.isna(row['order_probability']):
+                converted_prob = self._convert_order_probability(row['order_probability'])
+                if converted_prob is None:
+                    row_errors.append(f'受注角度の値が無効です: {row["order_probability"]}')
+            
+            # 支社名の検証
+            if 'branch_name' in df.columns and not pd.isna(row['branch_name']):
+                branch_name = str(row['branch_name']).strip()
+                if len(branch_name) > 100:
+                    row_errors.append('支社名は100文字以内である必要があります')
+            
+            if row_errors:
+                validation_errors.append({
+                    'row': index + 1,  # 1-based indexing
+                    'errors': row_errors
+                })
+                row_validations[index] = {
+                    'has_errors': True,
+                    'errors': row_errors
+                }
+            else:
+                row_validations[index] = {
+                    'has_errors': False,
+                    'errors': []
+                }
+        
+        # サマリー情報
+        total_rows = len(df)
+        error_rows = len(validation_errors)
+        valid_rows = total_rows - error_rows
+        
+        summary = {
+            'total_rows': total_rows,
+            'valid_rows': valid_rows,
+            'error_rows': error_rows,
+            'duplicate_count': len(duplicates),
+            'success_rate': (valid_rows / total_rows * 100) if total_rows > 0 else 0
+        }
+        
+        return {
+            'summary': summary,
+            'validation_errors': validation_errors,
+            'duplicates': duplicates,
+            'row_validations': row_validations
+        }
+    
+    def _find_existing_codes(self, codes: List[str]) -> set:
+        """
+        指定コードのうちDBに既に存在するプロジェクトコードを取得
+        
+        ファイルのコードを一時テーブルに投入し、projects.project_code の
+        一意インデックスと結合して重なるコードのみを返す。
+        メモリ使用量はDBの件数ではなくファイルの件数に比例する。
+        
+        Args:
+            codes: ファイル内のプロジェクトコード（重複なし）
+            
+        Returns:
+            set: 既に存在するプロジェクトコード
+        """
+        if not codes:
+            return set()
+        connection = db.session.connection()
+        _import_codes_table.drop(connection, checkfirst=True)
+        _import_codes_table.create(connection)
+        try:
+            for batch in self._chunked(codes, self.UPSERT_BATCH_SIZE):
+                connection.execute(
+                    _import_codes_table.insert(),
+                    [{'project_code': code} for code in batch]
+                )
+            rows = connection.execute(
+                select(Project.project_code).join(
+                    _import_codes_table,
+                    _import_codes_table.c.project_code == Project.project_code
+                )
+            )
+            return {row.project_code for row in rows}
+        finally:
+            _import_codes_table.drop(connection)
+    
+    def execute_import(self, filepath: str, file_type: str, column_mapping: Dict[str, str] = None, sheet_name: str = None, mode: str = 'insert') -> Dict[str, Any]:
+        """
+        インポートを実行（詳細なエラーレポート付き）
+        
+        Args:
+            filepath: ファイルパス
+            file_type: ファイル形式
+            column_mapping: 列マッピング辞書（システム項目名 -> ファイル列名）
+            sheet_name: Excelシート名（Excelファイルの場合）
+            mode: インポートモード ('insert': 新規のみ, 'upsert': 既存は更新)
+            
+        Returns:
+            Dict: インポート結果
+        """
+        if mode not in self.IMPORT_MODES:
+            return {'success': False, 'error': f'無効なインポートモードです: {mode}'}
+        checkpoint = None
+        spool = None
+        try:
+            # DBを扱うため、必要ならアプリコンテキストを確保
+            self._ensure_persistent_context()
+            # ファイル読み込みと列マッピング
+            df = self._load_mapped_dataframe(filepath, file_type, column_mapping, sheet_name)
+            if df is None:
+                return {'success': False, 'error': 'サポートされていないファイル形式です'}
+            
+            if mode == self.IMPORT_MODE_UPSERT:
+                return self._execute_upsert(df)
+            
+            # チェックポイント（同じファイル・条件の中断済みインポートがあれば再開）
+            checkpoint, resumed = self._get_or_create_checkpoint(filepath, file_type, column_mapping, sheet_name, len(df))
+            resumed_from_chunk = checkpoint.last_chunk + 1 if resumed else None
+            
+            # データ処理結果（再開時は反映済みチャンクの件数を引き継ぐ）
+            success_count = checkpoint.success_count
+            error_count = checkpoint.error_count
+            skipped_count = checkpoint.skipped_count
+            # エラー・成功行はディスクへ逐次書き出し、メモリには件数とサンプルのみ残す
+            spool = self._open_report_spool()
+            errors = spool.errors
+            successful_projects = spool.successes
+            
+            # 事前検証を実行
+            validation_result = self._validate_preview_data(df)
+            row_validations = validation_result['row_validations']
+            
+            # 支社はチャンク処理の前に解決・確定しておく（再開時も名前で再利用される）
+            branch_cache, branch_errors = self._prepare_branch_cache(df, row_validations)
+            
+            # チャンクごとに処理し、データとチェックポイントを同じトランザクションでコミット
+            for chunk_index, start in enumerate(range(0, len(df), checkpoint.chunk_size)):
+                if chunk_index <= checkpoint.last_chunk:
+                    continue
+                chunk = df.iloc[start:start + checkpoint.chunk_size]
+                # 先にチェックポイントを更新してトランザクションを開始しておく
+                # （SQLiteでは最外側のSAVEPOINTの解放がCOMMITになるため）
+                checkpoint.updated_at = datetime.utcnow()
+                db.session.flush()
+                chunk_success = 0
+                chunk_errors = 0
+                chunk_skipped = 0
+                
+                for index, row in chunk.iterrows():
+                    row_number = index + 1
+                    
+                    try:
+                        # 事前検証でエラーがある行はスキップ
+                        if index in row_validations and row_validations[index]['has_errors']:
+                            chunk_errors += 1
+                            chunk_skipped += 1
+                            for error in row_validations[index]['errors']:
+                                errors.append({
+                                    'row': row_number,
+                                    'error': error,
+                                    'type': 'validation_error',
+                                    'data': row.to_dict()
+                                })
+                            continue
+                        
+                        branch_error = branch_errors.get(str(row['branch_name']).strip())
+                        if branch_error:
+                            chunk_errors += 1
+                            errors.append({
+                                'row': row_number,
+                                'error': branch_error,
+                                'type': 'processing_error',
+                                'data': row.to_dict()
+                            })
+                            continue
+                        
+                        # データの前処理
+                        processed_data = self._process_row_data(row, row_number, branch_cache=branch_cache)
+                        
+                        if processed_data['success']:
+                            # プロジェクト作成（コミットはチャンク単位）
+                            project = self._add_project(processed_data['data'])
+                            chunk_success += 1
+                            successful_projects.append({
+                                'row': row_number,
+                                'project_code': project.project_code,
+                                'project_name': project.project_name
+                            })
+                        else:
+                            chunk_errors += 1
+                            errors.append({
+                                'row': row_number,
+                                'error': processed_data['error'],
+                                'type': 'processing_error',
+                                'data': row.to_dict()
+                            })
+                            
+                    except ValidationError as e:
+                        chunk_errors += 1
+                        errors.append({
+                            'row': row_number,
+                            'error': str(e.message),
+                            'type': 'model_validation_error',
+                            'data': row.to_dict()
+                        })
+                    except Exception as e:
+                        chunk_errors += 1
+                        errors.append({
+                            'row': row_number,
+                            'error': f'予期しないエラー: {str(e)}',
+                            'type': 'unexpected_error',
+                            'data': row.to_dict()
+                        })
+                
+                checkpoint.record_chunk(chunk_index, len(chunk), chunk_success, chunk_errors, chunk_skipped)
+                db.session.commit()
+                success_count += chunk_success
+                error_count += chunk_errors
+                skipped_count += chunk_skipped
+            
+            checkpoint.status = ImportCheckpoint.STATUS_COMPLETED
+            db.session.commit()
+            
+            # 結果サマリー
+            total_rows = len(df)
+            success_rate = (success_count / total_rows * 100) if total_rows > 0 else 0
+            
+            result = {
+                'success': True,
+                'total_rows': total_rows,
+                'success_count': success_count,
+                'error_count': error_count,
+                'skipped_count': skipped_count,
+                'success_rate': success_rate,
+                'errors': errors,
+                'successful_projects': successful_projects,
+                'validation_summary': validation_result['summary'],
+                'duplicates': validation_result['duplicates'],
+                'checkpoint_id': checkpoint.id,
+                'resumed_from_chunk': resumed_from_chunk
+            }
+            return self._finish_report_spool(result, spool)
+            
+        except Exception as e:
+            db.session.rollback()
+            if spool is not None:
+                self._discard_report_spool(spool)
+            result = {'success': False, 'error': f'インポート処理エラー: {str(e)}'}
+            if checkpoint is not None and checkpoint.id is not None:
+                # 反映済みのチャンクまではチェックポイントに記録されているため再開できる
+                result['checkpoint_id'] = checkpoint.id
+                result['resumable'] = True
+            return result
+    
+    def resume_import(self, checkpoint_id: int) -> Dict[str, Any]:
+        """
+        中断されたインポートをチェックポイントから再開
+        
+        反映済みのチャンクはスキップされるため、何度呼び出しても同じ行が
+        重複して登録されることはない。
+        
+        Args:
+            checkpoint_id: チェックポイントID
+            
+        Returns:
+            Dict: インポート結果（完了済みの場合は記録済みの件数）
+        """
+        self._ensure_persistent_context()
+        checkpoint = db.session.get(ImportCheckpoint, checkpoint_id)
+        if checkpoint is None:
+            return {'success': False, 'error': 'チェックポイントが見つかりません'}
+        if checkpoint.is_completed:
+            return {
+                'success': True,
+                'already_completed': True,
+                'checkpoint_id': checkpoint.id,
+                'total_rows': checkpoint.total_rows,
+                'success_count': checkpoint.success_count,
+                'error_count': checkpoint.error_count,
+                'skipped_count': checkpoint.skipped_count
+            }
+        if not os.path.exists(checkpoint.file_path):
+            return {'success': False, 'error': 'インポートファイルが見つかりません。同じファイルを再度アップロードすると続きから再開されます'}
+        if self._file_hash(checkpoint.file_path) != checkpoint.file_hash:
+            return {'success': False, 'error': 'ファイルが変更されているため再開できません'}
+        column_mapping = json.loads(checkpoint.column_mapping) if checkpoint.column_mapping else None
+        if checkpoint.file_type == self.MULTI_SHEET_FILE_TYPE:
+            sheet_names = json.loads(checkpoint.sheet_name) if checkpoint.sheet_name else None
+            return self.execute_multi_sheet_import(
+                checkpoint.file_path, column_mapping or None, sheet_names=sheet_names,
+                max_workers=current_app.config.get('IMPORT_MAX_WORKERS')
+            )
+        return self.execute_import(checkpoint.file_path, checkpoint.file_type, column_mapping or None, sheet_name=checkpoint.sheet_name)
+    
+    def _get_or_create_checkpoint(self, filepath: str, file_type: str, column_mapping: Optional[Dict[str, str]],
+                                  sheet_name: Optional[str], total_rows: int) -> Tuple[ImportCheckpoint, bool]:
+        """
+        ファイル内容と取込条件に対応するチェックポイントを取得（無ければ作成）
+        
+        Args:
+            filepath: ファイルパス
+            file_type: ファイル形式
+            column_mapping: 列マッピング辞書
+            sheet_name: Excelシート名
+            total_rows: データ行数
+            
+        Returns:
+            Tuple[ImportCheckpoint, bool]:
+                - 実行中のチェックポイント（既存のもの、または新しく作成したもの）
+                - 中断済みのチェックポイントを再開する場合は True、新しく作成した場合は False
+        """
+        file_hash = self._file_hash(filepath)
+        mapping_json = json.dumps(column_mapping or {}, ensure_ascii=False, sort_keys=True)
+        job_key = hashlib.sha256(
+            '\0'.join([file_hash, file_type, sheet_name or '', mapping_json]).encode('utf-8')
+        ).hexdigest()
+        
+        checkpoint = ImportCheckpoint.find_running(job_key)
+        resumed = checkpoint is not None
+        if checkpoint is None:
+            checkpoint = ImportCheckpoint(
+                job_key=job_key,
+                file_hash=file_hash,
+                file_path=filepath,
+                file_type=file_type,
+                sheet_name=sheet_name,
+                column_mapping=mapping_json,
+                chunk_size=self.IMPORT_CHUNK_SIZE,
+                total_rows=total_rows
+            )
+            db.session.add(checkpoint)
+        else:
+            # 再アップロードされた場合は保存先が変わるため更新
+            checkpoint.file_path = filepath
+        db.session.commit()
+        return checkpoint, resumed
+    
+    @staticmethod
+    def _file_hash(filepath: str) -> str:
+        """ファイル内容のSHA-256ハッシュを計算"""
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _prepare_branch_cache(self, df: pd.DataFrame, row_validations: Dict[int, Dict[str, Any]]):
+        """
+        取込対象行の支社を一括で解決し、未登録の支社を作成してコミット
+        
+        Args:
+            df: マッピング済みのデータフレーム
+            row_validations: 事前検証の行ごとの結果
+            
+        Returns:
+            tuple: (支社名 -> 支社ID, 支社名 -> エラーメッセージ)
+        """
+        branch_codes = {}
+        for index, row in df.iterrows():
+            if index in row_validations and row_validations[index]['has_errors']:
+                continue
+            if pd.isna(row.get('branch_name')) or str(row.get('branch_name')).strip() == '':
+                continue
+            branch_code = row.get('branch_code')
+            branch_code = None if pd.isna(branch_code) or str(branch_code).strip() == '' else str(branch_code).strip()
+            branch_codes.setdefault(str(row['branch_name']).strip(), branch_code)
+        
+        branch_ids, branch_errors = self._resolve_branch_ids(branch_codes)
+        db.session.commit()
+        return branch_ids, branch_errors
+    
+    def _add_project(self, data: Dict[str, Any]) -> Project:
+        """
+        検証付きでプロジェクトを追加（コミットは呼び出し側のチャンク単位で行う）
+        
+        行ごとにSAVEPOINTを使うため、一意制約違反はその行だけが取り消される。
+        
+        Args:
+            data: プロジェクトデータ
+            
+        Returns:
+            Project: 追加したプロジェクト
+        """
+        project = Project(**data)
+        validation_errors = project.validate_data()
+        if validation_errors:
+            raise ValidationError('入力データに問題があります', validation_errors)
+        project.validate_unique_project_code()
+        
+        try:
+            with db.session.begin_nested():
+                db.session.add(project)
+        except IntegrityError as e:
+            if 'UNIQUE constraint failed' in str(e):
+                raise ValidationError('このプロジェクトコードは既に使用されています', 'project_code')
+            raise ValidationError('データベースエラーが発生しました', 'database')
+        return project
+    
+    def _execute_upsert(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        更新インポートを実行（既存は更新・新規は追加・変更なしはスキップ）
+        
+        行ハッシュで既存データと比較し、変更のある行のみを
+        INSERT ... ON CONFLICT(project_code) DO UPDATE でバッチ反映する。
+        
+        Args:
+            df: 列マッピング済みのデータフレーム
+            
+        Returns:
+            Dict: インポート結果
+        """
+        inserted_count = 0
+        updated_count = 0
+        unchanged_count = 0
+        error_count = 0
+        skipped_count = 0
+        spool = self._open_report_spool()
+        errors = spool.errors
+        successful_projects = spool.successes
+        
+        validation_result = self._validate_preview_data(df, check_existing=False)
+        branch_cache = {}
+        seen_codes = set()
+        pending = []
+        
+        # 行の前処理（検証エラー・ファイル内重複はここで除外）
+        for index, row in df.iterrows():
+            row_number = index + 1
+            row_validation = validation_result['row_validations'].get(index)
+            if row_validation and row_validation['has_errors']:
+                error_count += 1
+                skipped_count += 1
+                for error in row_validation['errors']:
+                    errors.append({
+                        'row': row_number,
+                        'error': error,
+                        'type': 'validation_error',
+                        'data': row.to_dict()
+                    })
+                continue
+            
+            processed_data = self._process_row_data(row, row_number, branch_cache=branch_cache)
+            if not processed_data['success']:
+                error_count += 1
+                errors.append({
+                    'row': row_number,
+                    'error': processed_data['error'],
+                    'type': 'processing_error',
+                    'data': row.to_dict()
+                })
+                continue
+            
+            project_data = processed_data['data']
+            model_error = self._validate_bulk_project_data(project_data)
+            if model_error:
+                error_count += 1
+                errors.append({
+                    'row': row_number,
+                    'error': model_error,
+                    'type': 'model_validation_error',
+                    'data': row.to_dict()
+                })
+                continue
+            
+            code = project_data['project_code']
+            if code in seen_codes:
+                error_count += 1
+                skipped_count += 1
+                errors.append({
+                    'row': row_number,
+                    'error': f'プロジェクトコード「{code}」がファイル内で重複しているためスキップしました',
+                    'type': 'validation_error',
+                    'data': row.to_dict()
+                })
+                continue
+            seen_codes.add(code)
+            pending.append(({'row': row_number}, project_data))
+        
+        # バッチ単位で既存行と比較し、変更のある行のみを反映
+        try:
+            for report, project_data, action in self._upsert_rows(pending):
+                if action == 'unchanged':
+                    unchanged_count += 1
+                    continue
+                if action == 'inserted':
+                    inserted_count += 1
+                else:
+                    updated_count += 1
+                successful_projects.append(dict(
+                    report,
+                    project_code=project_data['project_code'],
+                    project_name=project_data['project_name'],
+                    action=action
+                ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self._discard_report_spool(spool)
+            return {'success': False, 'error': f'更新インポート処理エラー: {str(e)}'}
+        
+        total_rows = len(df)
+        success_count = inserted_count + updated_count + unchanged_count
+        success_rate = (success_count / total_rows * 100) if total_rows > 0 else 0
+        
+        return self._finish_report_spool({
+            'success': True,
+            'mode': self.IMPORT_MODE_UPSERT,
+            'total_rows': total_rows,
+            'success_count': success_count,
+            'inserted_count': inserted_count,
+            'updated_count': updated_count,
+            'unchanged_count': unchanged_count,
+            'error_count': error_count,
+            'skipped_count': skipped_count,
+            'success_rate': success_rate,
+            'errors': errors,
+            'successful_projects': successful_projects,
+            'validation_summary': validation_result['summary'],
+            'duplicates': validation_result['duplicates']
+        }, spool)
+    
+    def _upsert_rows(self, pending: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[Tuple[Dict[str, Any], Dict[str, Any], str]]:
+        """
+        行ハッシュで既存行と比較し、変更のある行のみをバッチでUPSERT（コミットは呼び出し側で行う）
+        
+        Args:
+            pending: (レポート用の行の位置, プロジェクトデータ) のリスト（プロジェクトコードの重複なし）
+            
+        Returns:
+            List: (行の位置, プロジェクトデータ, 'inserted' / 'updated' / 'unchanged') のリスト
+        """
+        results = []
+        for batch in self._chunked(pending, self.UPSERT_BATCH_SIZE):
+            existing_hashes = self._load_existing_row_hashes([data['project_code'] for _, data in batch])
+            now = datetime.utcnow()
+            changed_rows = []
+            for report, project_data in batch:
+                existing_hash = existing_hashes.get(project_data['project_code'])
+                if existing_hash is None:
+                    action = 'inserted'
+                elif existing_hash == self._row_hash(project_data):
+                    action = 'unchanged'
+                else:
+                    action = 'updated'
+                if action != 'unchanged':
+                    changed_rows.append(dict(project_data, created_at=now, updated_at=now))
+                results.append((report, project_data, action))
+            if changed_rows:
+                db.session.execute(self._build_upsert_statement(), changed_rows)
+        return results
+    
+    def _build_upsert_statement(self):
+        """
+        project_code をキーにした INSERT ... ON CONFLICT DO UPDATE 文を構築
+        
+        Returns:
+            Insert: 実行可能なUPSERT文
+        """
+        if db.engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        
+        stmt = dialect_insert(Project.__table__)
+        # created_at は既存値を保持し、それ以外の項目を更新する
+        # （UPSERT の更新側では Column.onupdate が適用されないため、変更番号も挿入側の値で更新する）
+        update_columns = list(self.ROW_HASH_FIELDS) + ['updated_at', 'change_seq']
+        return stmt.on_conflict_do_update(
+            index_elements=[Project.__table__.c.project_code],
+            set_={column: stmt.excluded[column] for column in update_columns}
+        )
+    
+    def _load_existing_row_hashes(self, codes: List[str]) -> Dict[str, str]:
+        """
+        指定プロジェクトコードの既存行ハッシュを取得
+        
+        Args:
+            codes: プロジェクトコードのリスト
+            
+        Returns:
+            Dict: プロジェクトコード -> 行ハッシュ
+        """
+        if not codes:
+            return {}
+        columns = [getattr(Project, field) for field in self.ROW_HASH_FIELDS]
+        rows = db.session.query(Project.project_code, *columns).filter(
+            Project.project_code.in_(codes)
+        ).all()
+        return {
+            row.project_code: self._row_hash(row._mapping)
+            for row in rows
+        }
+    
+    def _row_hash(self, data) -> str:
+        """
+        変更検出用の行ハッシュを計算
+        
+        金額・受注角度は小数2桁に正規化し、ファイル値とDB値（float・Decimal）の表現差を吸収する。
+        
+        Args:
+            data: ROW_HASH_FIELDS を含むマッピング
+            
+        Returns:
+            str: SHA-1 ハッシュ
+        """
+        parts = []
+        for field in self.ROW_HASH_FIELDS:
+            value = data[field]
+            if field in ('order_probability', 'revenue', 'expenses'):
+                value = f'{float(value):.2f}'
+            parts.append(str(value))
+        return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+    
+    def _validate_bulk_project_data(self, project_data: Dict[str, Any]) -> Optional[str]:
+        """
+        一括反映用のモデル検証（行ごとのDB問い合わせを行わない）
+        
+        Args:
+            project_data: 変換済みのプロジェクトデータ
+            
+        Returns:
+            str: 最初のエラーメッセージ（問題がなければ None）
+        """
+        code = project_data['project_code']
+        if len(code) > 50:
+            return 'プロジェクトコードは50文字以内で入力してください'
+        if not re.match(r'^[A-Za-z0-9\-_]+$', code):
+            return 'プロジェクトコードは英数字、ハイフン、アンダースコアのみ使用可能です'
+        if len(project_data['project_name']) > 200:
+            return 'プロジェクト名は200文字以内で入力してください'
+        validation_errors = ValidationService.validate_project_data(project_data)
+        if validation_errors:
+            return validation_errors[0].message
+        return None
+    
+    @staticmethod
+    def _chunked(items: List[Any], size: int):
+        """リストを指定件数ごとに分割して返す"""
+        for start in range(0, len(items), size):
+            yield items[start:start + size]
+    
+    def get_dry_run_diff(self, filepath: str, file_type: str, column_mapping: Dict[str, str] = None, sheet_name: str = None, page: int = 1, per_page: int = 50, status: str = None) -> Dict[str, Any]:
+        """
+        DBに書き込まずにファイル行と現在のDB状態との差分を分類（ドライラン）
+        
+        各行を new（新規）/ changed（変更あり）/ unchanged（変更なし）/
+        conflict（ファイル内重複・検証エラーで反映不可）に分類する。
+        既存行はファイル内のプロジェクトコードについて一度だけ読み込み、
+        プロジェクトコードをキーにメモリ上で突き合わせる。
+        
+        Args:
+            filepath: ファイルパス
+            file_type: ファイル形式
+            column_mapping: 列マッピング辞書
+            sheet_name: Excelシート名（Excelファイルの場合）
+            page: ページ番号（1始まり）
+            per_page: 1ページあたりの件数
+            status: 指定した分類の行のみを返す場合に指定
+            
+        Returns:
+            Dict: 分類サマリーとページ単位の差分
+        """
+        if status is not None and status not in self.DIFF_STATUSES:
+            return {'success': False, 'error': f'無効な分類です: {status}'}
+        try:
+            self._ensure_persistent_context()
+            df = self._load_mapped_dataframe(filepath, file_type, column_mapping, sheet_name)
+            if df is None:
+                return {'success': False, 'error': 'サポートされていないファイル形式です'}
+            
+            # 行の正規化（DB書き込みなし）
+            records = []
+            code_counts = {}
+            for row_number, record in enumerate(df.to_dict('records'), start=1):
+                data, error = self._normalize_record(record)
+                records.append((row_number, data, error))
+                if data is not None:
+                    code_counts[data['project_code']] = code_counts.get(data['project_code'], 0) + 1
+            
+            # 既存行を一括取得してメモリ上で突き合わせ
+            existing_rows = self._load_existing_rows(list(code_counts.keys()))
+            
+            classified = []
+            summary = {key: 0 for key in self.DIFF_STATUSES}
+            for row_number, data, error in records:
+                if error is not None:
+                    row_status = 'conflict'
+                elif code_counts[data['project_code']] > 1:
+                    row_status = 'conflict'
+                    error = f'プロジェクトコード「{data["project_code"]}」がファイル内で重複しています'
+                else:
+                    existing = existing_rows.get(data['project_code'])
+                    if existing is None:
+                        row_status = 'new'
+                    elif self._diff_fields(existing, data):
+                        row_status = 'changed'
+                    else:
+                        row_status = 'unchanged'
+                summary[row_status] += 1
+                if status is None or row_status == status:
+                    classified.append((row_number, row_status, data, error))
+            
+            # ページ分割（詳細な差分はページ内の行のみ生成）
+            per_page = max(1, min(per_page, self.DIFF_MAX_PER_PAGE))
+            total = len(classified)
+            pages = (total + per_page - 1) // per_page if total else 0
+            page = max(1, page)
+            items = []
+            for row_number, row_status, data, error in classified[(page - 1) * per_page:page * per_page]:
+                item = {
+                    'row': row_number,
+                    'status': row_status,
+                    'project_code': data['project_code'] if data else None,
+                    'data': data,
+                }
+                if error is not None:
+                    item['error'] = error
+                if row_status == 'changed':
+                    item['changes'] = self._diff_fields(existing_rows[data['project_code']], data)
+                items.append(item)
+            
+            return {
+                'success': True,
+                'total_rows': len(records),
+                'summary': summary,
+                'items': items,
+                'pagination': {
+                    'page': page,
+                    'per_page': per_page,
+                    'total': total,
+                    'pages': pages,
+                    'has_prev': page > 1,
+                    'has_next': page < pages,
+                    'prev_num': page - 1 if page > 1 else None,
+                    'next_num': page + 1 if page < pages else None
+                }
+            }
+        except Exception as e:
+            return {'success': False, 'error': f'差分プレビュー取得エラー: {str(e)}'}
+    
+    def _normalize_record(self, record: Dict[str, Any]):
+        """
+        ファイル行を比較用のプロジェクトデータに正規化（支社は名称のまま扱う）
+        
+        Args:
+            record: 列マッピング済みの行データ
+            
+        Returns:
+            tuple: (正規化データ, エラーメッセージ) のいずれかが None
+        """
+        for field in self.REQUIRED_COLUMNS:
+            value = record.get(field)
+            if value is None or pd.isna(value) or str(value).strip() == '':
+                return None, f'{field}が空です'
+        
+        order_probability = self._convert_order_probability(record['order_probability'])
+        if order_probability is None:
+            return None, f'受注角度の値が無効です: {record["order_probability"]}'
+        try:
+            fiscal_year = int(record['fiscal_year'])
+            revenue = float(record['revenue'])
+            expenses = float(record['expenses'])
+        except (ValueError, TypeError) as e:
+            return None, f'数値変換エラー: {str(e)}'
+        
+        data = {
+            'project_code': str(record['project_code']).strip(),
+            'project_name': str(record['project_name']).strip(),
+            'branch_name': str(record['branch_name']).strip(),
+            'fiscal_year': fiscal_year,
+            'order_probability': order_probability,
+            'revenue': revenue,
+            'expenses': expenses
+        }
+        if len(data['branch_name']) > 100:
+            return None, '支社名は100文字以内である必要があります'
+        error = self._validate_bulk_project_data(data)
+        if error:
+            return None, error
+        return data, None
+    
+    def _load_existing_rows(self, codes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        指定プロジェクトコードの既存行を比較用の形式で一括取得
+        
+        Args:
+            codes: プロジェクトコードのリスト
+            
+        Returns:
+            Dict: プロジェクトコード -> 既存行データ
+        """
+        existing = {}
+        for batch in self._chunked(codes, self.UPSERT_BATCH_SIZE):
+            rows = db.session.query(
+                Project.project_code,
+                Project.project_name,
+                Branch.branch_name,
+                Project.fiscal_year,
+                Project.order_probability,
+                Project.revenue,
+                Project.expenses
+            ).join(Branch, Project.branch_id == Branch.id).filter(
+                Project.project_code.in_(batch)
+            ).all()
+            for row in rows:
+                existing[row.project_code] = {
+                    'project_name': row.project_name,
+                    'branch_name': row.branch_name,
+                    'fiscal_year': row.fiscal_year,
+                    'order_probability': int(row.order_probability),
+                    'revenue': float(row.revenue),
+                    'expenses': float(row.expenses)
+                }
+        return existing
+    
+    def _diff_fields(self, existing: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        既存行とファイル行の項目単位の差分を取得
+        
+        Args:
+            existing: 既存行データ
+            data: 正規化済みのファイル行データ
+            
+        Returns:
+            Dict: 項目名 -> {'old': 既存値, 'new': ファイル値}（差分なしは空）
+        """
+        changes = {}
+        for field in self.DIFF_FIELDS:
+            old_value = existing[field]
+            new_value = data[field]
+            if field in ('revenue', 'expenses'):
+                is_same = round(old_value, 2) == round(new_value, 2)
+            else:
+                is_same = old_value == new_value
+            if not is_same:
+                changes[field] = {'old': old_value, 'new': new_value}
+        return changes
+    
+    def execute_multi_sheet_import(self, filepath: str, column_mapping: Dict[str, str] = None, sheet_names: List[str] = None, max_workers: int = None, mode: str = 'insert') -> Dict[str, Any]:
+        """
+        Excelの全シート（または指定シート）を一括でインポート
+        
+        シートの読み込みと行の検証は共有のプロセスプールでシートごとに並列実行し、
+        シート間の重複と支社を解決したうえで単一シートと同じ方式で反映する。
+        新規のみ（insert）はチャンクごとにチェックポイントを記録し、中断後は続きから再開する。
+        更新（upsert）は行ハッシュで既存行と比較し、変更のある行のみを反映する。
+        エラーはシート名と行番号で特定できるように記録する。
+        
+        Args:
+            filepath: Excelファイルのパス
+            column_mapping: 列マッピング辞書（全シート共通）
+            sheet_names: 対象シート名（省略時はデータのある全シート）
+            max_workers: 並列実行するプロセス数の上限
+            mode: インポートモード ('insert': 新規のみ, 'upsert': 既存は更新)
+            
+        Returns:
+            Dict: インポート結果（シート別の集計を含む）
+        """
+        if mode not in self.IMPORT_MODES:
+            return {'success': False, 'error': f'無効なインポートモードです: {mode}'}
+        selected_sheets = sheet_names
+        try:
+            self._ensure_persistent_context()
+            if sheet_names is None:
+                excel_info = self._get_excel_info(filepath)
+                if not excel_info['success']:
+                    return excel_info
+                sheet_names = [sheet['name'] for sheet in excel_info['sheets'] if sheet['has_data']]
+            if not sheet_names:
+                return {'success': False, 'error': 'データが含まれているシートがありません'}
+            
+            sheet_results = self._parse_sheets_in_parallel(filepath, sheet_names, column_mapping, max_workers)
+        except Exception as e:
+            return {'success': False, 'error': f'インポート処理エラー: {str(e)}'}
+        
+        sheets, entries = self._collect_sheet_rows(sheet_results)
+        try:
+            entries = self._resolve_sheet_rows(entries)
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'error': f'インポート処理エラー: {str(e)}'}
+        
+        total_rows = sum(sheet['total_rows'] for sheet in sheets)
+        if mode == self.IMPORT_MODE_UPSERT:
+            result = self._upsert_sheet_rows(entries, total_rows)
+        else:
+            result = self._insert_sheet_rows(entries, filepath, column_mapping, selected_sheets, total_rows)
+        if result['success']:
+            result['sheets'] = sheets
+        return result
+    
+    def _collect_sheet_rows(self, sheet_results: List[Dict[str, Any]]):
+        """
+        シートごとの解析結果を、シート・行の順に並べた取込対象の行にまとめる
+        
+        Args:
+            sheet_results: _parse_sheet の結果（シートの順）
+            
+        Returns:
+            tuple: (シート別の集計, (シート別の集計, 行番号, プロジェクトデータ, エラー) のリスト)
+                   プロジェクトデータとエラーはいずれかが None
+        """
+        sheets = []
+        entries = []
+        for sheet_result in sheet_results:
+            sheet_summary = {
+                'sheet': sheet_result['sheet'],
+                'total_rows': sheet_result.get('total_rows', 0),
+                'success_count': 0,
+                'error_count': 0
+            }
+            sheets.append(sheet_summary)
+            if not sheet_result['success']:
+                entries.append((sheet_summary, 0, None, {
+                    'sheet': sheet_result['sheet'],
+                    'row': 0,
+                    'error': sheet_result['error'],
+                    'type': 'sheet_error',
+                    'data': {}
+                }))
+                continue
+            rows = [(row_number, data, None) for row_number, data in sheet_result['rows']]
+            rows += [(error['row'], None, error) for error in sheet_result['errors']]
+            for row_number, data, error in sorted(rows, key=lambda row: row[0]):
+                entries.append((sheet_summary, row_number, data, error))
+        return sheets, entries
+    
+    def _resolve_sheet_rows(self, entries: List[Tuple]) -> List[Tuple]:
+        """
+        シート間のプロジェクトコード重複をエラーにし、支社を支社IDに解決
+        
+        未登録の支社はここで作成してコミットする（チャンク単位の反映・再開時に再利用される）。
+        
+        Args:
+            entries: _collect_sheet_rows の取込対象の行
+            
+        Returns:
+            List: プロジェクトデータを projects の列（branch_id を含む）に変換した取込対象の行
+        """
+        seen_codes = {}
+        branch_codes = {}
+        checked = []
+        for sheet_summary, row_number, data, error in entries:
+            if data is not None:
+                code = data['project_code']
+                if code in seen_codes:
+                    data, error = None, {
+                        'sheet': sheet_summary['sheet'],
+                        'row': row_number,
+                        'error': f'プロジェクトコード「{code}」がシート「{seen_codes[code]}」と重複しています',
+                        'type': 'validation_error',
+                        'data': data
+                    }
+                else:
+                    seen_codes[code] = sheet_summary['sheet']
+                    branch_codes.setdefault(data['branch_name'], data.get('branch_code'))
+            checked.append((sheet_summary, row_number, data, error))
+        
+        branch_ids, branch_errors = self._resolve_branch_ids(branch_codes)
+        db.session.commit()
+        
+        resolved = []
+        for sheet_summary, row_number, data, error in checked:
+            if data is not None:
+                branch_error = branch_errors.get(data['branch_name'])
+                if branch_error:
+                    data, error = None, {
+                        'sheet': sheet_summary['sheet'],
+                        'row': row_number,
+                        'error': branch_error,
+                        'type': 'processing_error',
+                        'data': data
+                    }
+                else:
+                    data = {
+                        'project_code': data['project_code'],
+                        'project_name': data['project_name'],
+                        'branch_id': branch_ids[data['branch_name']],
+                        'fiscal_year': data['fiscal_year'],
+                        'order_probability': data['order_probability'],
+                        'revenue': data['revenue'],
+                        'expenses': data['expenses']
+                    }
+            resolved.append((sheet_summary, row_number, data, error))
+        return resolved
+    
+    def _insert_sheet_rows(self, entries: List[Tuple], filepath: str, column_mapping: Optional[Dict[str, str]],
+                           sheet_names: Optional[List[str]], total_rows: int) -> Dict[str, Any]:
+        """
+        複数シートの行を新規のみで登録（チャンクごとにデータとチェックポイントを同じトランザクションでコミット）
+        
+        Args:
+            entries: _resolve_sheet_rows の取込対象の行
+            filepath: Excelファイルのパス
+            column_mapping: 列マッピング辞書
+            sheet_names: 指定された対象シート名（全シートの場合は None）
+            total_rows: 全シートのデータ行数
+            
+        Returns:
+            Dict: インポート結果
+        """
+        checkpoint = None
+        spool = None
+        try:
+            sheet_key = json.dumps(sheet_names, ensure_ascii=False) if sheet_names is not None else None
+            checkpoint, resumed = self._get_or_create_checkpoint(filepath, self.MULTI_SHEET_FILE_TYPE, column_mapping, sheet_key, total_rows)
+            resumed_from_chunk = checkpoint.last_chunk + 1 if resumed else None
+            spool = self._open_report_spool()
+            errors = spool.errors
+            successful_projects = spool.successes
+            
+            for chunk_index, chunk in enumerate(self._chunked(entries, checkpoint.chunk_size)):
+                if chunk_index <= checkpoint.last_chunk:
+                    continue
+                # 先にチェックポイントを更新してトランザクションを開始しておく
+                checkpoint.updated_at = datetime.utcnow()
+                db.session.flush()
+                existing_codes = self._find_existing_codes([data['project_code'] for _, _, data, _ in chunk if data is not None])
+                now = datetime.utcnow()
+                rows_to_insert = []
+                chunk_errors = 0
+                for sheet_summary, row_number, data, error in chunk:
+                    if data is not None and data['project_code'] in existing_codes:
+                        data, error = None, {
+                            'sheet': sheet_summary['sheet'],
+                            'row': row_number,
+                            'error': f'プロジェクトコード「{data["project_code"]}」は既に存在します',
+                            'type': 'validation_error',
+                            'data': data
+                        }
+                    if error is not None:
+                        sheet_summary['error_count'] += 1
+                        chunk_errors += 1
+                        errors.append(error)
+                        continue
+                    rows_to_insert.append(dict(data, created_at=now, updated_at=now))
+                    sheet_summary['success_count'] += 1
+                    successful_projects.append({
+                        'sheet': sheet_summary['sheet'],
+                        'row': row_number,
+                        'project_code': data['project_code'],
+                        'project_name': data['project_name']
+                    })
+                for batch in self._chunked(rows_to_insert, self.UPSERT_BATCH_SIZE):
+                    db.session.execute(insert(Project.__table__), batch)
+                checkpoint.record_chunk(chunk_index, len(chunk), len(rows_to_insert), chunk_errors, chunk_errors)
+                db.session.commit()
+            
+            checkpoint.status = ImportCheckpoint.STATUS_COMPLETED
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if spool is not None:
+                self._discard_report_spool(spool)
+            result = {'success': False, 'error': f'インポート処理エラー: {str(e)}'}
+            if checkpoint is not None and checkpoint.id is not None:
+                result['checkpoint_id'] = checkpoint.id
+                result['resumable'] = True
+            return result
+        
+        success_rate = (checkpoint.success_count / total_rows * 100) if total_rows > 0 else 0
+        return self._finish_report_spool({
+            'success': True,
+            'mode': 'all_sheets',
+            'import_mode': self.IMPORT_MODE_INSERT,
+            'total_rows': total_rows,
+            'success_count': checkpoint.success_count,
+            'error_count': checkpoint.error_count,
+            'skipped_count': checkpoint.skipped_count,
+            'success_rate': success_rate,
+            'errors': errors,
+            'successful_projects': successful_projects,
+            'duplicates': [],
+            'checkpoint_id': checkpoint.id,
+            'resumed_from_chunk': resumed_from_chunk
+        }, spool)
     
-    def _validate_preview_data(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _upsert_sheet_rows(self, entries: List[Tuple], total_rows: int) -> Dict[str, Any]:
         """
-        プレビューデータの検証を実行
+        複数シートの行を更新インポートで反映（既存は更新・新規は追加・変更なしはスキップ）
         
         Args:
-            df: データフレーム
+            entries: _resolve_sheet_rows の取込対象の行
+            total_rows: 全シートのデータ行数
             
         Returns:
-            Dict: 検証結果
+            Dict: インポート結果
         """
-        validation_errors = []
-        row_validations = {}
-        duplicates = []
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        spool = self._open_report_spool()
+        errors = spool.errors
+        successful_projects = spool.successes
+        pending = []
+        sheet_summaries = {}
+        for sheet_summary, row_number, data, error in entries:
+            if error is not None:
+                sheet_summary['error_count'] += 1
+                errors.append(error)
+                continue
+            sheet_summaries[sheet_summary['sheet']] = sheet_summary
+            pending.append(({'sheet': sheet_summary['sheet'], 'row': row_number}, data))
         
-        # 既存のプロジェクトコードを取得（アプリコンテキストがない場合はスキップ）
-        existing_codes = set()
+        try:
+            for report, project_data, action in self._upsert_rows(pending):
+                counts[action] += 1
+                sheet_summaries[report['sheet']]['success_count'] += 1
+                if action != 'unchanged':
+                    successful_projects.append(dict(
+                        report,
+                        project_code=project_data['project_code'],
+                        project_name=project_data['project_name'],
+                        action=action
+                    ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self._discard_report_spool(spool)
+            return {'success': False, 'error': f'更新インポート処理エラー: {str(e)}'}
+        
+        success_count = sum(counts.values())
+        error_count = len(entries) - len(pending)
+        success_rate = (success_count / total_rows * 100) if total_rows > 0 else 0
+        return self._finish_report_spool({
+            'success': True,
+            'mode': 'all_sheets',
+            'import_mode': self.IMPORT_MODE_UPSERT,
+            'total_rows': total_rows,
+            'success_count': success_count,
+            'inserted_count': counts['inserted'],
+            'updated_count': counts['updated'],
+            'unchanged_count': counts['unchanged'],
+            'error_count': error_count,
+            'skipped_count': error_count,
+            'success_rate': success_rate,
+            'errors': errors,
+            'successful_projects': successful_projects,
+            'duplicates': []
+        }, spool)
+    
+    def _report_directory(self) -> str:
+        """インポートレポートのスプール先ディレクトリを取得"""
         if has_app_context():
-            try:
-                existing_projects = Project.query.with_entities(Project.project_code).all()
-                for project in existing_projects:
-                    existing_codes.add(project.project_code)
-            except Exception:
-                # 取得失敗時は重複チェックをスキップ
-                existing_codes = set()
+            base = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+        else:
+            base = tempfile.gettempdir()
+        return os.path.join(str(base), 'import_reports')
+    
+    def _open_report_spool(self) -> ReportSpool:
+        """エラー・成功行を書き出すスプールを作成"""
+        return ReportSpool(self._report_directory())
+    
+    def _finish_report_spool(self, result: Dict[str, Any], spool: ReportSpool) -> Dict[str, Any]:
+        """
+        スプールを閉じ、インポート結果にはサンプルと件数のみを残す
         
-        # ファイル内の重複チェック
-        if 'project_code' in df.columns:
-            file_codes = df['project_code'].dropna().astype(str).str.strip()
-            duplicate_codes = file_codes[file_codes.duplicated()].unique()
+        Args:
+            result: インポート結果
+            spool: レポートスプール
             
-            for code in duplicate_codes:
-                duplicate_rows = df[df['project_code'].astype(str).str.strip() == code].index.tolist()
-                duplicates.append({
-                    'type': 'file_duplicate',
-                    'code': code,
-                    'rows': [row + 1 for row in duplicate_rows],  # 1-based indexing
-                    'message': f'プロジェクトコード「{code}」がファイル内で重複しています'
-                })
+        Returns:
+            Dict: レポートIDを付与したインポート結果
+        """
+        spool.duplicates.extend(result.get('duplicates') or [])
+        spool.close()
+        result['errors'] = spool.errors.sample
+        result['successful_projects'] = spool.successes.sample
+        result['errors_truncated'] = spool.errors.truncated
+        result['successes_truncated'] = spool.successes.truncated
+        result['report_id'] = spool.report_id
+        return result
+    
+    def _discard_report_spool(self, spool: ReportSpool):
+        """失敗したインポートのスプールを破棄"""
+        spool.close()
+        ReportSpool.remove(spool.directory, spool.report_id)
+    
+    def _parse_sheets_in_parallel(self, filepath: str, sheet_names: List[str], column_mapping: Dict[str, str] = None, max_workers: int = None) -> List[Dict[str, Any]]:
+        """
+        シートの読み込みと検証をプロセスプールで並列実行
         
-        # 行ごとの検証
-        for index, row in df.iterrows():
-            row_errors = []
-            
-            # 必須フィールドチェック
-            for field in self.REQUIRED_COLUMNS:
-                if field in df.columns:
-                    value = row[field]
-                    if pd.isna(value) or str(value).strip() == '':
-                        row_errors.append(f'{field}が空です')
-            
-            # プロジェクトコードの既存チェック
-            if 'project_code' in df.columns and not pd.isna(row['project_code']):
-                code = str(row['project_code']).strip()
-                if code in existing_codes:
-                    row_errors.append(f'プロジェクトコード「{code}」は既に存在します')
-            
-            # 数値フィールドの検証
-            numeric_fields = ['fiscal_year', 'revenue', 'expenses']
-            for field in numeric_fields:
-                if field in df.columns and not pd.isna(row[field]):
-                    try:
-                        float(row[field])
-                    except (ValueError, TypeError):
-                        row_errors.append(f'{field}は数値である必要があります')
-            
-            # 受注角度の検証
-            if 'order_probability' in df.columns and not pd.isna(row['order_probability']):
-                converted_prob = self._convert_order_probability(row['order_probability'])
-                if converted_prob is None:
-                    row_errors.append(f'受注角度の値が無効です: {row["order_probability"]}')
-            
-            # 支社名の検証
-            if 'branch_name' in df.columns and not pd.isna(row['branch_name']):
-                branch_name = str(row['branch_name']).strip()
-                if len(branch_name) > 100:
-                    row_errors.append('支社名は100文字以内である必要があります')
+        Args:
+            filepath: Excelファイルのパス
+            sheet_names: 対象シート名
+            column_mapping: 列マッピング辞書
+            max_workers: プロセス数の上限（1の場合は逐次実行）
             
-            if row_errors:
-                validation_errors.append({
-                    'row': index + 1,  # 1-based indexing
-                    'errors': row_errors
-                })
-                row_validations[index] = {
-                    'has_errors': True,
-                    'errors': row_errors
-                }
-            else:
-                row_validations[index] = {
-                    'has_errors': False,
-                    'errors': []
-                }
-        
-        # サマリー情報
-        total_rows = len(df)
-        error_rows = len(validation_errors)
-        valid_rows = total_rows - error_rows
-        
-        summary = {
-            'total_rows': total_rows,
-            'valid_rows': valid_rows,
-            'error_rows': error_rows,
-            'duplicate_count': len(duplicates),
-            'success_rate': (valid_rows / total_rows * 100) if total_rows > 0 else 0
-        }
+        Returns:
+            List: シートごとの解析結果（sheet_names の順）
+        """
+        workers = min(len(sheet_names), max_workers or os.cpu_count() or 1)
+        if workers <= 1:
+            return [self._parse_sheet(filepath, name, column_mapping) for name in sheet_names]
         
-        return {
-            'summary': summary,
-            'validation_errors': validation_errors,
-            'duplicates': duplicates,
-            'row_validations': row_validations
-        }
+        # プロセスの起動はリクエストごとに行わず、上限付きの共有プールを使う
+        pool_size = current_app.config.get('IMPORT_MAX_WORKERS') if has_app_context() else None
+        executor = _get_sheet_parse_executor(pool_size or workers)
+        try:
+            return list(executor.map(
+                _parse_sheet_worker,
+                [filepath] * len(sheet_names),
+                sheet_names,
+                [column_mapping] * len(sheet_names)
+            ))
+        except BrokenProcessPool:
+            # ワーカーが異常終了した場合はプールを作り直せるようにし、このリクエストは逐次実行する
+            _discard_sheet_parse_executor(executor)
+            return [self._parse_sheet(filepath, name, column_mapping) for name in sheet_names]
     
-    def execute_import(self, filepath: str, file_type: str, column_mapping: Dict[str, str] = None, sheet_name: str = None) -> Dict[str, Any]:
+    def _parse_sheet(self, filepath: str, sheet_name: str, column_mapping: Dict[str, str] = None) -> Dict[str, Any]:
         """
-        インポートを実行（詳細なエラーレポート付き）
+        1シートを読み込み、DBに依存しない検証を行う（プロセスプールから呼ばれる）
         
         Args:
-            filepath: ファイルパス
-            file_type: ファイル形式
-            column_mapping: 列マッピング辞書（システム項目名 -> ファイル列名）
-            sheet_name: Excelシート名（Excelファイルの場合）
+            filepath: Excelファイルのパス
+            sheet_name: シート名
+            column_mapping: 列マッピング辞書
             
         Returns:
-            Dict: インポート結果
+            Dict: 正規化済みの行とエラー
         """
         try:
-            # DBを扱うため、必要ならアプリコンテキストを確保
-            self._ensure_persistent_context()
-            # ファイル読み込み
-            if file_type == 'csv':
-                df = pd.read_csv(filepath, encoding='utf-8-sig')
-            elif file_type == 'excel':
-                # シート名が指定されていない場合は最初のシートを使用
-                if sheet_name is None:
-                    excel_info = self._get_excel_info(filepath)
-                    if excel_info['success'] and excel_info['sheets']:
-                        sheet_name = excel_info['sheets'][0]['name']
-                # BytesIO + ExcelFile でクローズを保証しつつロック回避
-                with open(filepath, 'rb') as f:
-                    data = f.read()
-                with pd.ExcelFile(io.BytesIO(data), engine='openpyxl') as xls:
-                    df = pd.read_excel(xls, sheet_name=sheet_name)
-            else:
-                return {'success': False, 'error': 'サポートされていないファイル形式です'}
-            
-            # 列名を正規化
-            df.columns = df.columns.str.strip()
-            
-            # 列マッピングを適用
-            if column_mapping:
-                # マッピングされた列のみを抽出し、システム項目名にリネーム
-                mapped_df = pd.DataFrame()
-                for system_field, file_column in column_mapping.items():
-                    if file_column in df.columns:
-                        mapped_df[system_field] = df[file_column]
-                df = mapped_df
-            else:
-                # 自動マッピング（日本語→英語、未知は簡易正規化）
-                auto_map = {}
-                for col in df.columns:
-                    if col in self.COLUMN_MAPPING:
-                        auto_map[col] = self.COLUMN_MAPPING[col]
-                    else:
-                        auto_map[col] = col.lower().replace(' ', '_')
-                df = df.rename(columns=auto_map)
-            
-            # データ処理結果
-            success_count = 0
-            error_count = 0
-            skipped_count = 0
+            df = self._load_mapped_dataframe(filepath, 'excel', column_mapping, sheet_name)
+            rows = []
             errors = []
-            successful_projects = []
-            
-            # 事前検証を実行
-            validation_result = self._validate_preview_data(df)
-            
-            # 行ごとに処理
-            for index, row in df.iterrows():
-                row_number = index + 1
-                
-                try:
-                    # 事前検証でエラーがある行はスキップ
-                    if index in validation_result['row_validations'] and validation_result['row_validations'][index]['has_errors']:
-                        error_count += 1
-                        skipped_count += 1
-                        for error in validation_result['row_validations'][index]['errors']:
-                            errors.append({
-                                'row': row_number,
-                                'error': error,
-                                'type': 'validation_error',
-                                'data': row.to_dict()
-                            })
-                        continue
-                    
-                    # データの前処理
-                    processed_data = self._process_row_data(row, row_number)
-                    
-                    if processed_data['success']:
-                        # プロジェクト作成
-                        project = Project.create_with_validation(**processed_data['data'])
-                        success_count += 1
-                        successful_projects.append({
-                            'row': row_number,
-                            'project_code': project.project_code,
-                            'project_name': project.project_name
-                        })
-                    else:
-                        error_count += 1
-                        errors.append({
-                            'row': row_number,
-                            'error': processed_data['error'],
-                            'type': 'processing_error',
-                            'data': row.to_dict()
-                        })
-                        
-                except ValidationError as e:
-                    error_count += 1
-                    errors.append({
-                        'row': row_number,
-                        'error': str(e.message),
-                        'type': 'model_validation_error',
-                        'data': row.to_dict()
-                    })
-                except Exception as e:
-                    error_count += 1
+            for row_number, record in enumerate(df.to_dict('records'), start=1):
+                data, error = self._normalize_record(record)
+                if error:
                     errors.append({
+                        'sheet': sheet_name,
                         'row': row_number,
-                        'error': f'予期しないエラー: {str(e)}',
-                        'type': 'unexpected_error',
-                        'data': row.to_dict()
+                        'error': error,
+                        'type': 'validation_error',
+                        'data': record
                     })
-            
-            # 結果サマリー
-            total_rows = len(df)
-            success_rate = (success_count / total_rows * 100) if total_rows > 0 else 0
-            
-            result = {
+                    continue
+                branch_code = record.get('branch_code')
+                if branch_code is not None and not pd.isna(branch_code) and str(branch_code).strip():
+                    data['branch_code'] = str(branch_code).strip()
+                rows.append((row_number, data))
+            return {
                 'success': True,
-                'total_rows': total_rows,
-                'success_count': success_count,
-                'error_count': error_count,
-                'skipped_count': skipped_count,
-                'success_rate': success_rate,
-                'errors': errors,
-                'successful_projects': successful_projects,
-                'validation_summary': validation_result['summary'],
-                'duplicates': validation_result['duplicates']
+                'sheet': sheet_name,
+                'total_rows': len(df),
+                'rows': rows,
+                'errors': errors
             }
-            return result
-            
         except Exception as e:
-            return {'success': False, 'error': f'インポート処理エラー: {str(e)}'}
+            return {'success': False, 'sheet': sheet_name, 'error': f'シート読み込みエラー: {str(e)}'}
+    
+    def _resolve_branch_ids(self, branch_codes: Dict[str, Optional[str]]):
+        """
+        支社名から支社IDを一括で解決し、未登録の支社はコミットせずに作成
+        
+        Args:
+            branch_codes: 支社名 -> 支社コード（未指定は None）
+            
+        Returns:
+            tuple: (支社名 -> 支社ID, 支社名 -> エラーメッセージ)
+        """
+        branch_ids = {}
+        branch_errors = {}
+        names = list(branch_codes.keys())
+        for batch in self._chunked(names, self.UPSERT_BATCH_SIZE):
+            for branch in Branch.query.filter(Branch.branch_name.in_(batch)).all():
+                if branch.is_active:
+                    branch_ids[branch.branch_name] = branch.id
+                else:
+                    branch_errors[branch.branch_name] = f'支社「{branch.branch_name}」は無効化されています'
+        
+        for name in names:
+            if name in branch_ids or name in branch_errors:
+                continue
+            branch_code = branch_codes[name] or self._generate_branch_code(name)
+            branch = Branch(branch_code=branch_code, branch_name=name, is_active=True)
+            validation_errors = branch.validate_data()
+            if validation_errors:
+                branch_errors[name] = f'支社作成エラー: {validation_errors[0].message}'
+                continue
+            if Branch.query.filter_by(branch_code=branch_code).first():
+                branch_errors[name] = '支社作成エラー: この支社コードは既に使用されています'
+                continue
+            db.session.add(branch)
+            db.session.flush()
+            branch_ids[name] = branch.id
+        return branch_ids, branch_errors
     
-    def _process_row_data(self, row: pd.Series, row_number: int) -> Dict[str, Any]:
+    def _process_row_data(self, row: pd.Series, row_number: int, branch_cache: Dict[str, int] = None) -> Dict[str, Any]:
         """
         行データを処理してプロジェクトデータに変換
         
         Args:
             row: 行データ
             row_number: 行番号
+            branch_cache: 支社名 -> 支社ID のキャッシュ（一括処理時に指定）
             
         Returns:
             Dict: 処理結果
@@ -587,10 +1927,18 @@ class ImportService:
             branch_name = str(row['branch_name']).strip()
             branch_code = str(row.get('branch_code', '')).strip()
             
+            # キャッシュ済みの支社はDB問い合わせを省略
+            if branch_cache is not None and branch_name in branch_cache:
+                branch_id = branch_cache[branch_name]
+            else:
+                branch_id = None
+            
             # 支社名で検索
-            branch = Branch.query.filter_by(branch_name=branch_name).first()
+            branch = None
+            if branch_id is None:
+                branch = Branch.query.filter_by(branch_name=branch_name).first()
             
-            if not branch:
+            if branch_id is None and not branch:
                 # 支社が存在しない場合は作成
                 if not branch_code:
                     # 支社コードが指定されていない場合は支社名から生成
@@ -608,6 +1956,11 @@ class ImportService:
                         'error': f'支社作成エラー: {str(e.message)}'
                     }
             
+            if branch_id is None:
+                branch_id = branch.id
+                if branch_cache is not None:
+                    branch_cache[branch_name] = branch_id
+            
             # 受注角度の変換
             order_prob_raw = row['order_probability']
             order_probability = self._convert_order_probability(order_prob_raw)
@@ -618,11 +1971,18 @@ class ImportService:
                     'error': f'受注角度の値が無効です: {order_prob_raw}'
                 }
             
-            # 数値フィールドの変換
+            # 数値フィールドは読み込み時に列単位で変換済み（_convert_numeric_fields）の値を使い、
+            # 変換されずに残った値だけをここで変換する
+            fiscal_year = row['fiscal_year']
+            revenue = row['revenue']
+            expenses = row['expenses']
             try:
-                fiscal_year = int(row['fiscal_year'])
-                revenue = float(row['revenue'])
-                expenses = float(row['expenses'])
+                if not isinstance(fiscal_year, int):
+                    fiscal_year = int(fiscal_year)
+                if not isinstance(revenue, (int, float)):
+                    revenue = float(revenue)
+                if not isinstance(expenses, (int, float)):
+                    expenses = float(expenses)
             except (ValueError, TypeError) as e:
                 return {
                     'success': False,
@@ -633,7 +1993,7 @@ class ImportService:
             project_data = {
                 'project_code': str(row['project_code']).strip(),
                 'project_name': str(row['project_name']).strip(),
-                'branch_id': branch.id,
+                'branch_id': branch_id,
                 'fiscal_year': fiscal_year,
                 'order_probability': order_probability,
                 'revenue': revenue,
@@ -722,48 +2082,56 @@ class ImportService:
             'project_code': {
                 'label': 'プロジェクトコード',
                 'required': True,
+                'dtype': 'string',
                 'description': '一意のプロジェクト識別コード',
                 'example': 'PRJ001, PROJECT-2024-001'
             },
             'project_name': {
                 'label': 'プロジェクト名',
                 'required': True,
+                'dtype': 'string',
                 'description': 'プロジェクトの名称',
                 'example': '新システム開発プロジェクト'
             },
             'branch_name': {
                 'label': '支社名',
                 'required': True,
+                'dtype': 'string',
                 'description': 'プロジェクトを管理する支社名',
                 'example': '東京支社, 大阪支社'
             },
             'branch_code': {
                 'label': '支社コード',
                 'required': False,
+                'dtype': 'string',
                 'description': '支社の識別コード（省略可）',
                 'example': 'TKY, OSK'
             },
             'fiscal_year': {
                 'label': '売上の年度',
                 'required': True,
+                'dtype': 'number',
                 'description': '売上が計上される年度',
                 'example': '2024, 2025'
             },
             'order_probability': {
                 'label': '受注角度',
                 'required': True,
+                'dtype': 'string',
                 'description': '受注の可能性（〇=100, △=50, ×=0）',
                 'example': '〇, △, ×, 100, 50, 0'
             },
             'revenue': {
                 'label': '売上（契約金）',
                 'required': True,
+                'dtype': 'number',
                 'description': '契約金額（数値）',
                 'example': '1000000, 5000000'
             },
             'expenses': {
                 'label': '経費（トータル）',
                 'required': True,
+                'dtype': 'number',
                 'description': '総経費（数値）',
                 'example': '800000, 3000000'
             }
@@ -902,25 +2270,42 @@ class ImportService:
         Returns:
             str: CSV形式のエラーレポート
         """
-        import io
-        import csv
+        return ''.join(self.iter_error_report(errors, duplicates))
+    
+    def generate_success_report(self, successful_projects: List[Dict]) -> str:
+        """
+        成功レポートをCSV形式で生成
         
-        output = io.StringIO()
-        writer = csv.writer(output)
+        Args:
+            successful_projects: 成功したプロジェクトリスト
+            
+        Returns:
+            str: CSV形式の成功レポート
+        """
+        return ''.join(self.iter_success_report(successful_projects))
+    
+    def iter_error_report(self, errors: Iterable[Dict], duplicates: Iterable[Dict] = None) -> Iterator[str]:
+        """
+        エラーレポートのCSVを1行ずつ生成
         
-        # ヘッダー行
-        writer.writerow(['行番号', 'エラータイプ', 'エラー内容', 'データ'])
+        Args:
+            errors: エラーのイテラブル（スプールからの読み出しも可）
+            duplicates: 重複のイテラブル
+            
+        Yields:
+            str: CSVの1行
+        """
+        yield self._csv_line(['行番号', 'エラータイプ', 'エラー内容', 'データ'])
         
         # 重複エラーを追加
-        if duplicates:
-            for duplicate in duplicates:
-                for row in duplicate['rows']:
-                    writer.writerow([
-                        row,
-                        '重複エラー',
-                        duplicate['message'],
-                        f"プロジェクトコード: {duplicate['code']}"
-                    ])
+        for duplicate in duplicates or []:
+            for row in duplicate['rows']:
+                yield self._csv_line([
+                    row,
+                    '重複エラー',
+                    duplicate['message'],
+                    f"プロジェクトコード: {duplicate['code']}"
+                ])
         
         # 検証エラーを追加
         for error in errors:
@@ -929,46 +2314,76 @@ class ImportService:
                 # データを文字列形式に変換
                 data_parts = []
                 for key, value in error['data'].items():
-                    if not pd.isna(value):
+                    if value is not None and not pd.isna(value):
                         data_parts.append(f"{key}: {value}")
                 data_str = ", ".join(data_parts)
             
-            writer.writerow([
-                error['row'],
+            # 複数シートのインポートではシート名を行番号に付与
+            row_label = f"{error['sheet']}!{error['row']}" if error.get('sheet') else error['row']
+            yield self._csv_line([
+                row_label,
                 error.get('type', 'エラー'),
                 error['error'],
                 data_str
             ])
-        
-        return output.getvalue()
     
-    def generate_success_report(self, successful_projects: List[Dict]) -> str:
+    def iter_success_report(self, successful_projects: Iterable[Dict]) -> Iterator[str]:
         """
-        成功レポートをCSV形式で生成
+        成功レポートのCSVを1行ずつ生成
         
         Args:
-            successful_projects: 成功したプロジェクトリスト
+            successful_projects: 成功したプロジェクトのイテラブル
             
-        Returns:
-            str: CSV形式の成功レポート
+        Yields:
+            str: CSVの1行
         """
-        import io
-        import csv
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # ヘッダー行
-        writer.writerow(['行番号', 'プロジェクトコード', 'プロジェクト名'])
-        
-        # 成功したプロジェクトを追加
+        yield self._csv_line(['行番号', 'プロジェクトコード', 'プロジェクト名'])
         for project in successful_projects:
-            writer.writerow([
+            yield self._csv_line([
                 project['row'],
                 project['project_code'],
                 project['project_name']
             ])
+    
+    def iter_spooled_error_report(self, report_id: str) -> Iterator[str]:
+        """
+        スプール済みのエラーレポートをCSVとして逐次生成
+        
+        Args:
+            report_id: インポート結果のレポートID
+            
+        Yields:
+            str: CSVの1行
+        """
+        directory = self._report_directory()
+        return self.iter_error_report(
+            ReportSpool.iter_records(directory, report_id, 'errors'),
+            ReportSpool.iter_records(directory, report_id, 'duplicates')
+        )
+    
+    def iter_spooled_success_report(self, report_id: str) -> Iterator[str]:
+        """
+        スプール済みの成功レポートをCSVとして逐次生成
         
+        Args:
+            report_id: インポート結果のレポートID
+            
+        Yields:
+            str: CSVの1行
+        """
+        return self.iter_success_report(
+            ReportSpool.iter_records(self._report_directory(), report_id, 'successes')
+        )
+    
+    def has_spooled_report(self, report_id: str) -> bool:
+        """レポートIDに対応するスプールが存在するか"""
+        return ReportSpool.exists(self._report_directory(), report_id)
+    
+    @staticmethod
+    def _csv_line(values: List[Any]) -> str:
+        """1行分のCSV文字列を生成"""
+        output = io.StringIO()
+        csv.writer(output).writerow(values)
         return output.getvalue()
     
     def get_excel_sheets(self, filepath: str) -> Dict[str, Any]:
@@ -1031,4 +2446,35 @@ class ImportService:
             }
             
         except Exception as e:
-            return {'success': False, 'error': f'シート検証エラー: {str(e)}'}
\ No newline at end of file
+            return {'success': False, 'error': f'シート検証エラー: {str(e)}'}
+
+
+# シート解析用のプロセスプール（プロセス内で共有し、初回の利用時に作成する）
+_sheet_parse_executor: Optional[ProcessPoolExecutor] = None
+_sheet_parse_executor_lock = threading.Lock()
+
+
+def _get_sheet_parse_executor(max_workers: int) -> ProcessPoolExecutor:
+    """シート解析用の共有プロセスプールを取得（プロセス数は作成時の上限で固定）"""
+    global _sheet_parse_executor
+    with _sheet_parse_executor_lock:
+        if _sheet_parse_executor is None:
+            # Windows でも同じ挙動になるよう spawn で起動（子プロセスはDBに触れない）
+            _sheet_parse_executor = ProcessPoolExecutor(
+                max_workers=max(1, max_workers), mp_context=multiprocessing.get_context('spawn')
+            )
+        return _sheet_parse_executor
+
+
+def _discard_sheet_parse_executor(executor: ProcessPoolExecutor):
+    """使えなくなった共有プロセスプールを破棄（次回の利用時に作り直す）"""
+    global _sheet_parse_executor
+    with _sheet_parse_executor_lock:
+        if _sheet_parse_executor is executor:
+            _sheet_parse_executor = None
+    executor.shutdown(wait=False)
+
+
+def _parse_sheet_worker(filepath: str, sheet_name: str, column_mapping: Dict[str, str] = None) -> Dict[str, Any]:
+    """プロセスプール用のシート解析関数（pickle可能なモジュール関数）"""
+    return ImportService()._parse_sheet(filepath, sheet_name, column_mapping)
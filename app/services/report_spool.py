@@ -0,0 +1,161 @@
+"""
+インポート結果レポートのディスクスプール
+"""
+import gzip
+import json
+import os
+import re
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+
+def _json_default(value: Any) -> Any:
+    """numpy/pandas の値をJSONに変換"""
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class SpooledRecords:
+    """
+    レコードを gzip 圧縮した NDJSON として逐次書き出すリスト風オブジェクト
+
+    メモリには件数と先頭の数件（サンプル）だけを保持する。
+    """
+
+    def __init__(self, path: str, sample_size: int):
+        self.path = path
+        self.sample_size = sample_size
+        self.sample: List[Dict[str, Any]] = []
+        self._count = 0
+        self._file = None
+
+    def append(self, record: Dict[str, Any]):
+        """レコードを1件追加"""
+        if self._file is None:
+            self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+        self._file.write(json.dumps(record, ensure_ascii=False, default=_json_default))
+        self._file.write('\n')
+        self._count += 1
+        if len(self.sample) < self.sample_size:
+            self.sample.append(record)
+
+    def extend(self, records):
+        """複数のレコードを追加"""
+        for record in records:
+            self.append(record)
+
+    def close(self):
+        """書き込みを終了"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def truncated(self) -> bool:
+        """サンプルに含まれないレコードがあるか"""
+        return self._count > len(self.sample)
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+
+class ReportSpool:
+    """インポートのエラー・成功レコードをディスクに書き出すスプール"""
+
+    KINDS = ('errors', 'successes', 'duplicates')
+    SAMPLE_SIZE = 100
+    # 古いスプールの保持期間（秒）
+    RETENTION_SECONDS = 24 * 60 * 60
+
+    _REPORT_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+    def __init__(self, directory: str, sample_size: Optional[int] = None):
+        self.directory = directory
+        self.report_id = uuid.uuid4().hex
+        os.makedirs(directory, exist_ok=True)
+        self.cleanup(directory, self.RETENTION_SECONDS)
+        size = self.SAMPLE_SIZE if sample_size is None else sample_size
+        self.errors = SpooledRecords(self.path_for(directory, self.report_id, 'errors'), size)
+        self.successes = SpooledRecords(self.path_for(directory, self.report_id, 'successes'), size)
+        self.duplicates = SpooledRecords(self.path_for(directory, self.report_id, 'duplicates'), size)
+
+    def close(self):
+        """すべてのスプールを閉じる"""
+        self.errors.close()
+        self.successes.close()
+        self.duplicates.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @classmethod
+    def path_for(cls, directory: str, report_id: str, kind: str) -> str:
+        """スプールファイルのパスを取得"""
+        return os.path.join(directory, f'{report_id}.{kind}.ndjson.gz')
+
+    @classmethod
+    def exists(cls, directory: str, report_id: str) -> bool:
+        """レポートIDが有効か（いずれかのスプールが存在するか）"""
+        if not report_id or not cls._REPORT_ID_PATTERN.match(report_id):
+            return False
+        return any(os.path.exists(cls.path_for(directory, report_id, kind)) for kind in cls.KINDS)
+
+    @classmethod
+    def iter_records(cls, directory: str, report_id: str, kind: str) -> Iterator[Dict[str, Any]]:
+        """
+        スプールからレコードを1件ずつ読み出す
+
+        Args:
+            directory: スプールディレクトリ
+            report_id: レポートID
+            kind: 'errors' / 'successes' / 'duplicates'
+
+        Yields:
+            Dict: レコード
+        """
+        if kind not in cls.KINDS or not cls._REPORT_ID_PATTERN.match(report_id or ''):
+            return
+        path = cls.path_for(directory, report_id, kind)
+        if not os.path.exists(path):
+            return
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    @classmethod
+    def remove(cls, directory: str, report_id: str):
+        """レポートのスプールファイルを削除"""
+        if not cls._REPORT_ID_PATTERN.match(report_id or ''):
+            return
+        for kind in cls.KINDS:
+            path = cls.path_for(directory, report_id, kind)
+            if os.path.exists(path):
+                os.remove(path)
+
+    @classmethod
+    def cleanup(cls, directory: str, max_age_seconds: int):
+        """保持期間を過ぎたスプールファイルを削除"""
+        threshold = time.time() - max_age_seconds
+        try:
+            for name in os.listdir(directory):
+                if not name.endswith('.ndjson.gz'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    if os.path.getmtime(path) < threshold:
+                        os.remove(path)
+                except OSError:
+                    pass
+        except OSError:
+            pass
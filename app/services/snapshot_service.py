@@ -0,0 +1,293 @@
+"""
+SQLiteオンラインバックアップAPIによるスナップショット
+
+sqlite3.Connection.backup() でページを少しずつコピーし、書き込みを
+長時間止めずに一貫したデータベースの複製を作成する。スナップショットには
+チェックサムを記録したマニフェストを付け、リストアも同じAPIで稼働中の
+データベースへ書き戻す（ファイルの置き換えは行わない）。
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+
+from app import db
+
+
+class SnapshotService:
+    """スナップショットの作成・検証・リストアを担当するサービスクラス"""
+
+    FORMAT = 'sqlite-snapshot'
+    FORMAT_VERSION = 1
+    MANIFEST_SUFFIX = '.manifest.json'
+
+    # マニフェストに件数を記録するテーブル
+    COUNT_TABLES = ('projects', 'branches', 'fiscal_years')
+
+    CHUNK_SIZE = 1024 * 1024
+
+    # リストア後の WAL チェックポイントの再試行回数と待機秒数（回数に比例して延ばす）
+    CHECKPOINT_RETRIES = 5
+    CHECKPOINT_RETRY_WAIT = 0.2
+
+    @staticmethod
+    def database_path() -> Optional[str]:
+        """接続先のSQLiteデータベースファイルのパスを取得（SQLite以外・メモリDBは None）"""
+        url = db.engine.url
+        if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+            return None
+        return os.path.abspath(url.database)
+
+    @staticmethod
+    def snapshot_directory() -> str:
+        """スナップショットの保存先ディレクトリを取得"""
+        directory = str(current_app.config['BACKUP_SNAPSHOT_FOLDER'])
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @classmethod
+    def _file_sha256(cls, path: str) -> str:
+        """ファイルの SHA-256 を計算"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(cls.CHUNK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @classmethod
+    def _manifest_path(cls, name: str) -> str:
+        return os.path.join(cls.snapshot_directory(), f'{name}{cls.MANIFEST_SUFFIX}')
+
+    @classmethod
+    def _resolve(cls, name: str) -> Optional[Dict[str, Any]]:
+        """スナップショット名からマニフェストを読み込む（不正な名前・存在しない場合は None）"""
+        if not name or os.path.basename(name) != name:
+            return None
+        try:
+            with open(cls._manifest_path(name), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def create_snapshot(cls, compress: bool = False, pages: Optional[int] = None,
+                        sleep: Optional[float] = None) -> Dict[str, Any]:
+        """
+        データベースのスナップショットを作成
+
+        Args:
+            compress: gzip 圧縮するか
+            pages: 1ステップでコピーするページ数（ステップ間は書き込みをブロックしない）
+            sleep: ステップ間の待機秒数
+
+        Returns:
+            Dict: 作成結果（成功時は 'manifest' にマニフェスト）
+        """
+        source_path = cls.database_path()
+        if source_path is None or not os.path.exists(source_path):
+            return {'success': False, 'error': 'SQLiteのデータベースファイルが見つからないため、スナップショットを作成できません。'}
+
+        directory = cls.snapshot_directory()
+        name = f"snapshot_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        database_file = f'{name}.db'
+        fd, temp_path = tempfile.mkstemp(suffix='.db.tmp', dir=directory)
+        os.close(fd)
+        try:
+            source = sqlite3.connect(source_path)
+            target = sqlite3.connect(temp_path)
+            try:
+                source.backup(
+                    target,
+                    pages=pages or current_app.config['BACKUP_SNAPSHOT_PAGES_PER_STEP'],
+                    sleep=current_app.config['BACKUP_SNAPSHOT_STEP_SLEEP'] if sleep is None else sleep
+                )
+                check = target.execute('PRAGMA quick_check').fetchone()[0]
+                if check != 'ok':
+                    raise RuntimeError(f'integrity check failed: {check}')
+                page_count = target.execute('PRAGMA page_count').fetchone()[0]
+                existing = {row[0] for row in target.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                counts = {
+                    table: target.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                    for table in cls.COUNT_TABLES if table in existing
+                }
+            finally:
+                target.close()
+                source.close()
+
+            database_sha256 = cls._file_sha256(temp_path)
+            database_size = os.path.getsize(temp_path)
+            if compress:
+                database_file += '.gz'
+                with open(temp_path, 'rb') as src, gzip.open(os.path.join(directory, database_file), 'wb') as dst:
+                    shutil.copyfileobj(src, dst, cls.CHUNK_SIZE)
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, os.path.join(directory, database_file))
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            current_app.logger.error(f'Snapshot creation error: {str(e)}')
+            return {'success': False, 'error': 'スナップショットの作成中にエラーが発生しました。'}
+
+        file_path = os.path.join(directory, database_file)
+        manifest = {
+            'format': cls.FORMAT,
+            'version': cls.FORMAT_VERSION,
+            'name': name,
+            'file': database_file,
+            'compressed': compress,
+            'size': os.path.getsize(file_path),
+            'sha256': cls._file_sha256(file_path),
+            'database_size': database_size,
+            'database_sha256': database_sha256,
+            'page_count': page_count,
+            'tables': counts,
+            'created_at': datetime.now().isoformat()
+        }
+        with open(cls._manifest_path(name), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        current_app.logger.info(f'Snapshot created: {database_file} ({manifest["size"]} bytes)')
+        return {'success': True, 'manifest': manifest}
+
+    @classmethod
+    def list_snapshots(cls) -> List[Dict[str, Any]]:
+        """スナップショットのマニフェスト一覧を新しい順に取得"""
+        manifests = []
+        for filename in os.listdir(cls.snapshot_directory()):
+            if filename.endswith(cls.MANIFEST_SUFFIX):
+                manifest = cls._resolve(filename[:-len(cls.MANIFEST_SUFFIX)])
+                if manifest:
+                    manifests.append(manifest)
+        return sorted(manifests, key=lambda manifest: manifest['name'], reverse=True)
+
+    @classmethod
+    def snapshot_file_path(cls, name: str) -> Optional[str]:
+        """スナップショットのファイルパスを取得"""
+        manifest = cls._resolve(name)
+        if manifest is None:
+            return None
+        return os.path.join(cls.snapshot_directory(), manifest['file'])
+
+    @classmethod
+    def verify_snapshot(cls, name: str) -> Dict[str, Any]:
+        """
+        スナップショットファイルのチェックサムをマニフェストと照合
+
+        Returns:
+            Dict: 検証結果
+        """
+        manifest = cls._resolve(name)
+        if manifest is None:
+            return {'success': False, 'error': '指定されたスナップショットが見つかりません。'}
+        path = os.path.join(cls.snapshot_directory(), manifest['file'])
+        if not os.path.exists(path):
+            return {'success': False, 'error': 'スナップショットのファイルが見つかりません。'}
+        if cls._file_sha256(path) != manifest['sha256']:
+            return {'success': False, 'error': 'スナップショットのチェックサムが一致しません。ファイルが破損している可能性があります。'}
+        return {'success': True, 'manifest': manifest}
+
+    @classmethod
+    def _checkpoint(cls, connection: sqlite3.Connection) -> bool:
+        """
+        WAL をデータベースファイルに書き戻して切り詰める
+
+        読み取り中の接続があると PRAGMA wal_checkpoint の busy 列が 1 になり、
+        途中までしか書き戻されないため、待機して再試行する。
+
+        Returns:
+            bool: 書き戻しが完了した場合は True（WALモードでない場合も True）
+        """
+        for attempt in range(cls.CHECKPOINT_RETRIES):
+            busy = connection.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()[0]
+            if not busy:
+                return True
+            time.sleep(cls.CHECKPOINT_RETRY_WAIT * (attempt + 1))
+        return False
+
+    @classmethod
+    def restore_snapshot(cls, name: str) -> Dict[str, Any]:
+        """
+        スナップショットからデータベースをリストア
+
+        展開・検証したスナップショットを sqlite3.Connection.backup() で稼働中の
+        データベースへ1ステップで書き戻す。コピーはデータベースの書き込みロックの下で
+        1トランザクションとして行われるため、他の接続（別プロセスを含む）は閉じる
+        必要がなく、コピー中の書き込みは待たされ、完了後はリストアした内容を参照する。
+        WAL・共有メモリのファイルは削除せず、書き戻し後にチェックポイントで切り詰める。
+        リストア前のデータベースは同じAPIで pre_restore_*.db としてスナップショットの
+        保存先に残す。
+
+        Returns:
+            Dict: リストア結果
+        """
+        verified = cls.verify_snapshot(name)
+        if not verified['success']:
+            return verified
+        manifest = verified['manifest']
+        database_path = cls.database_path()
+        if database_path is None or not os.path.exists(database_path):
+            return {'success': False, 'error': 'SQLiteのデータベースファイルが見つからないため、リストアできません。'}
+
+        directory = cls.snapshot_directory()
+        source_path = os.path.join(directory, manifest['file'])
+        fd, temp_path = tempfile.mkstemp(suffix='.restore.tmp', dir=directory)
+        os.close(fd)
+        pre_restore_path = None
+        try:
+            opener = gzip.open if manifest['compressed'] else open
+            with opener(source_path, 'rb') as src, open(temp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, cls.CHUNK_SIZE)
+            if cls._file_sha256(temp_path) != manifest['database_sha256']:
+                raise RuntimeError('database checksum mismatch')
+
+            pre_restore_path = os.path.join(
+                directory, f"pre_restore_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.db"
+            )
+            db.session.remove()
+            live = sqlite3.connect(database_path, timeout=30)
+            try:
+                pre_restore = sqlite3.connect(pre_restore_path)
+                try:
+                    live.backup(pre_restore)
+                finally:
+                    pre_restore.close()
+
+                started = datetime.now()
+                snapshot = sqlite3.connect(temp_path)
+                try:
+                    snapshot.backup(live)
+                finally:
+                    snapshot.close()
+                swap_ms = (datetime.now() - started).total_seconds() * 1000
+
+                checkpointed = cls._checkpoint(live)
+            finally:
+                live.close()
+        except Exception as e:
+            if pre_restore_path and os.path.exists(pre_restore_path):
+                os.remove(pre_restore_path)
+            current_app.logger.error(f'Snapshot restore error: {str(e)}')
+            return {'success': False, 'error': 'スナップショットのリストア中にエラーが発生しました。'}
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        if not checkpointed:
+            # リストアはコミット済み。WAL は読み取り中の接続が終わった後の自動チェックポイントで書き戻される
+            current_app.logger.warning('Snapshot restore: WAL checkpoint is busy; the WAL file was not truncated')
+        current_app.logger.info(f'Snapshot restored: {manifest["file"]} ({swap_ms:.1f} ms)')
+        return {
+            'success': True,
+            'manifest': manifest,
+            'pre_restore_file': os.path.basename(pre_restore_path),
+            'swap_ms': round(swap_ms, 1),
+            'checkpointed': checkpointed
+        }
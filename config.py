@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 class Config:
@@ -11,11 +12,52 @@ class Config:
     # Windows でも安定して解決できるように、URI は POSIX 形式にする
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + DATABASE_PATH.as_posix()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLiteの接続ごとに適用する PRAGMA（None の項目は SQLite の既定値のまま）
+    # WAL にすると読み取り中でも書き込みができ、複数ワーカーでのロック待ちが減る
+    SQLITE_PRAGMAS = {
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 32 * 1024)),  # 負の値は KiB 単位
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)),
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON',
+    }
+    # GETリクエストと集計の読み取りを読み取り専用の接続（mode=ro・query_only）に振り分ける
+    DATABASE_READ_ROUTING = os.environ.get('DATABASE_READ_ROUTING', 'true').lower() in ('1', 'true', 'yes')
+    # 起動時に未適用のマイグレーション（migrations/migrate.py）を適用する（無効にすると未適用の場合は起動しない）
+    DATABASE_AUTO_MIGRATE = os.environ.get('DATABASE_AUTO_MIGRATE', 'true').lower() in ('1', 'true', 'yes')
+    # 起動時のデータベース初期化に失敗した場合に、1回だけ再試行するまでの待機秒数
+    DATABASE_INIT_RETRY_WAIT = float(os.environ.get('DATABASE_INIT_RETRY_WAIT', 2.0))
     
     # File upload configuration
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = BASE_DIR / 'uploads'
     
+    # Import configuration
+    # 複数シート一括インポートで並列に解析するプロセス数の上限
+    IMPORT_MAX_WORKERS = int(os.environ.get('IMPORT_MAX_WORKERS', os.cpu_count() or 1))
+    # CSVの解析エンジン（auto: pyarrow があれば使用、c: pandas 標準エンジン）
+    IMPORT_CSV_ENGINE = os.environ.get('IMPORT_CSV_ENGINE', 'auto')
+    
+    # Export configuration
+    # 生成済みエクスポートファイルのキャッシュ先と容量上限（超過分は古い順に削除）
+    EXPORT_CACHE_FOLDER = BASE_DIR / 'data' / 'export_cache'
+    EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    # 非同期エクスポートジョブの出力先、同時実行数、受け付ける待機中ジョブ数の上限
+    # （同時実行数・待機中の上限はDBのジョブで数えるため、全ワーカープロセスの合計）
+    EXPORT_JOB_FOLDER = BASE_DIR / 'data' / 'export_jobs'
+    EXPORT_JOB_WORKERS = int(os.environ.get('EXPORT_JOB_WORKERS', 2))
+    EXPORT_JOB_MAX_PENDING = int(os.environ.get('EXPORT_JOB_MAX_PENDING', 10))
+    
+    # Backup configuration
+    # SQLiteスナップショットの保存先と、オンラインバックアップの1ステップのページ数・ステップ間の待機秒数
+    BACKUP_SNAPSHOT_FOLDER = BASE_DIR / 'backups' / 'snapshots'
+    BACKUP_SNAPSHOT_PAGES_PER_STEP = int(os.environ.get('BACKUP_SNAPSHOT_PAGES_PER_STEP', 1024))
+    BACKUP_SNAPSHOT_STEP_SLEEP = float(os.environ.get('BACKUP_SNAPSHOT_STEP_SLEEP', 0.01))
+    # 差分バックアップ用の削除記録（トゥームストーン）の保持日数（フルバックアップ作成時に整理）
+    BACKUP_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('BACKUP_TOMBSTONE_RETENTION_DAYS', 90))
+    
     # Pagination
     PROJECTS_PER_PAGE = 20
     
@@ -44,6 +86,14 @@ class ProductionConfig(Config):
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FILE = os.environ.get('LOG_FILE', '/app/logs/app.log')
     
+    # 複数ワーカーでの書き込み待ちを長めに許容し、キャッシュ・mmap を大きく取る
+    SQLITE_PRAGMAS = {
+        **Config.SQLITE_PRAGMAS,
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000)),
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024)),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    }
+    
     def __init__(self):
         super().__init__()
         self.SECRET_KEY = os.environ.get('SECRET_KEY')
@@ -62,6 +112,16 @@ class TestingConfig(Config):
     TEST_DATABASE_PATH = Config.BASE_DIR / 'data' / 'test_sample.db'
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + TEST_DATABASE_PATH.as_posix()
     WTF_CSRF_ENABLED = False
+    # テストで生成されるアップロード・インポートレポート・エクスポートのキャッシュなどは
+    # リポジトリ外に出力する（pytest ではセッションごとの一時ディレクトリに置き換える: tests/conftest.py）
+    TEST_FILES_DIR = Path(tempfile.gettempdir()) / 'project_system_test'
+    UPLOAD_FOLDER = TEST_FILES_DIR / 'uploads'
+    EXPORT_CACHE_FOLDER = TEST_FILES_DIR / 'export_cache'
+    EXPORT_JOB_FOLDER = TEST_FILES_DIR / 'export_jobs'
+    BACKUP_SNAPSHOT_FOLDER = TEST_FILES_DIR / 'snapshots'
+    DATABASE_INIT_RETRY_WAIT = 0
+    # テストDBは使い捨てのため fsync を省略する
+    SQLITE_PRAGMAS = {**Config.SQLITE_PRAGMAS, 'synchronous': 'OFF'}
 
 # Configuration mapping
 config = {
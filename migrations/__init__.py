@@ -0,0 +1 @@
+# データベースマイグレーション（migrate.py はスクリプトとしても実行できる）
@@ -2,20 +2,375 @@
 """
 データベースマイグレーション機能
 """
+import argparse
+import json
 import sqlite3
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Windows（ロックせずに実行する）
+    fcntl = None
+
+# 売上・経費（円単位の小数）を銭単位の整数に変換する
+# 金額列が INTEGER で作成済みのデータベース（新しいスキーマ）は変換しない
+MONEY_TO_MINOR_UNITS_SQL = """
+    UPDATE projects
+    SET revenue = CAST(ROUND(revenue * 100) AS INTEGER),
+        expenses = CAST(ROUND(expenses * 100) AS INTEGER)
+    WHERE (SELECT type FROM pragma_table_info('projects') WHERE name = 'revenue') != 'INTEGER'
+"""
+
+# 年度内の期間の列（4月始まり。作成日時を売上計上日として計算する）
+FISCAL_PERIOD_COLUMNS = {
+    'fiscal_month': "(CAST(strftime('%m', created_at) AS INTEGER) + 8) % 12 + 1",
+    'fiscal_quarter': '(fiscal_month - 1) / 3 + 1',
+    'fiscal_half': '(fiscal_month - 1) / 6 + 1',
+}
+
+
+def add_fiscal_period_columns(cursor):
+    """年度内の期間の列とインデックスを追加し、既存の行の値を埋める（追加済みの列はそのまま）"""
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info('projects')")}
+    for column, expression in FISCAL_PERIOD_COLUMNS.items():
+        if column in existing:
+            continue
+        cursor.execute(f'ALTER TABLE projects ADD COLUMN {column} INTEGER NOT NULL DEFAULT 1')
+        cursor.execute(f'UPDATE projects SET {column} = {expression}')
+    for column in FISCAL_PERIOD_COLUMNS:
+        suffix = column.replace('fiscal_', '')
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS idx_projects_fiscal_year_{suffix} ON projects(fiscal_year, {column})'
+        )
+
+# 差分バックアップの変更番号（change_seq）の列を持つテーブル
+# （deleted_records はアプリの起動時に作成されるため、存在する場合のみ追加する）
+CHANGE_SEQ_TABLES = ('projects', 'branches', 'fiscal_years', 'deleted_records')
+
+
+def add_change_seq_columns(cursor):
+    """
+    変更番号の列を追加し、ウォーターマークが日時のバックアップ履歴を削除する
+
+    既存の行は変更番号 0 になる（次のフルバックアップに含まれる）。日時のウォーターマークは
+    差分の基準にできないため、backup_history は削除し、アプリの起動時に作り直す。
+    変更番号のインデックスもアプリの起動時に作成する。
+    """
+    tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in CHANGE_SEQ_TABLES:
+        if table not in tables:
+            continue
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info('{table}')")}
+        if 'change_seq' not in existing:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('DROP INDEX IF EXISTS idx_deleted_records_table_deleted_at')
+    watermark_type = cursor.execute(
+        "SELECT type FROM pragma_table_info('backup_history') WHERE name = 'watermark'"
+    ).fetchone()
+    if watermark_type and watermark_type[0].upper() != 'INTEGER':
+        cursor.execute('DROP TABLE backup_history')
+
+def add_export_job_worker_column(cursor):
+    """エクスポートジョブを実行するプロセスの列を追加（テーブルはアプリの起動時に作成されるため、存在する場合のみ）"""
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info('export_jobs')")}
+    if existing and 'worker_id' not in existing:
+        cursor.execute('ALTER TABLE export_jobs ADD COLUMN worker_id VARCHAR(100)')
+
+# プロジェクトテーブルの 008 の時点の構造（テーブル名は {table}。以降の列は ALTER TABLE で追加する）
+PROJECTS_COLUMNS = (
+    'id', 'project_code', 'project_name', 'branch_id', 'fiscal_year', 'order_probability',
+    'revenue', 'expenses', 'created_at', 'updated_at', 'fiscal_month', 'fiscal_quarter', 'fiscal_half',
+)
+PROJECTS_TABLE_SQL = """
+    CREATE TABLE {table} (
+        id INTEGER NOT NULL,
+        project_code VARCHAR(50) NOT NULL,
+        project_name VARCHAR(200) NOT NULL,
+        branch_id INTEGER NOT NULL,
+        fiscal_year INTEGER NOT NULL,
+        order_probability NUMERIC(5, 2) NOT NULL,
+        revenue INTEGER NOT NULL,
+        expenses INTEGER NOT NULL,
+        created_at DATETIME NOT NULL,
+        updated_at DATETIME NOT NULL,
+        fiscal_month INTEGER NOT NULL,
+        fiscal_quarter INTEGER NOT NULL,
+        fiscal_half INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        CONSTRAINT check_order_probability_values CHECK (order_probability IN (0, 50, 100)),
+        CONSTRAINT check_revenue_positive CHECK (revenue >= 0),
+        CONSTRAINT check_expenses_positive CHECK (expenses >= 0),
+        CONSTRAINT check_fiscal_year_range CHECK (fiscal_year >= 1900 AND fiscal_year <= 2100),
+        FOREIGN KEY(branch_id) REFERENCES branches (id)
+    )
+"""
+PROJECTS_INDEXES = (
+    {'name': 'ix_projects_project_code', 'columns': ['project_code'], 'unique': True},
+    {'name': 'ix_projects_branch_id', 'columns': ['branch_id'], 'unique': False},
+    {'name': 'ix_projects_fiscal_year', 'columns': ['fiscal_year'], 'unique': False},
+    {'name': 'ix_projects_created_at', 'columns': ['created_at'], 'unique': False},
+    {'name': 'ix_projects_updated_at', 'columns': ['updated_at'], 'unique': False},
+    {'name': 'idx_projects_fiscal_year_month', 'columns': ['fiscal_year', 'fiscal_month'], 'unique': False},
+    {'name': 'idx_projects_fiscal_year_quarter', 'columns': ['fiscal_year', 'fiscal_quarter'], 'unique': False},
+    {'name': 'idx_projects_fiscal_year_half', 'columns': ['fiscal_year', 'fiscal_half'], 'unique': False},
+)
+
+class TableRebuild:
+    """
+    テーブルを新しい構造に作り直すマイグレーション（アプリを止めずに実行する）
+
+    SQLiteの ALTER TABLE で変更できない構造の変更（列の型・制約など）は、
+    新しいテーブルへのコピーと入れ替えで行う。一括でコピーすると、その間
+    書き込みがロックされ、中断した場合も最初からやり直しになるため、
+
+    1. 新しい構造のテーブルと仮の名前のインデックスを作成し、元のテーブルへの
+       変更を新しいテーブルに反映するトリガーを設定する
+    2. 行を id 順に batch_size 件ずつコピーし、バッチごとにコミットして
+       進捗（チェックポイント）を記録する
+    3. 短いトランザクションでテーブルの名前を入れ替える
+    4. 元のテーブルを削除し、インデックスを元の名前で作り直す
+
+    の順に実行する。途中で中断した場合は、記録した段階と位置から再開する。
+    対象のテーブルは INTEGER PRIMARY KEY の id 列を持つこと。
+    """
+
+    PROGRESS_TABLE = 'schema_migration_progress'
+    BATCH_SIZE = 5000
+
+    PHASE_COPYING = 'copying'
+    PHASE_SWAPPED = 'swapped'
+
+    def __init__(self, table, create_sql, columns, indexes=(), batch_size=None):
+        """
+        Args:
+            table: 作り直すテーブル名
+            create_sql: 新しい構造の CREATE TABLE 文（テーブル名は {table}）
+            columns: 新しいテーブルの列 -> 元のテーブルから値を求めるSQL式（None は同名の列）
+            indexes: 元のテーブルのインデックスに加えて作成するインデックス（name, columns, unique）
+            batch_size: 1トランザクションでコピーする行数
+        """
+        self.table = table
+        self.create_sql = create_sql
+        self.columns = {column: expression or column for column, expression in columns.items()}
+        self.extra_indexes = [dict(index) for index in indexes]
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.new_table = f'{table}__rebuild'
+        self.retired_table = f'{table}__retired'
+
+    def run(self, conn, version, log=print):
+        """
+        チェックポイントから再開してテーブルを作り直す（完了したら進捗の記録を削除）
+
+        Args:
+            conn: sqlite3 の接続（トランザクションを開始していないこと）
+            version: マイグレーションのバージョン（進捗の記録のキー）
+            log: 進捗の出力先
+        """
+        conn.commit()
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {self.PROGRESS_TABLE} (
+                version VARCHAR(50) PRIMARY KEY,
+                table_name VARCHAR(100) NOT NULL,
+                phase VARCHAR(20) NOT NULL,
+                last_id INTEGER NOT NULL DEFAULT 0,
+                copied INTEGER NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                indexes TEXT NOT NULL,
+                updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.commit()
+        # 入れ替え時に他のテーブルの外部キー参照が書き換わらないようにする
+        foreign_keys = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+        conn.execute('PRAGMA foreign_keys = OFF')
+        conn.execute('PRAGMA legacy_alter_table = ON')
+        try:
+            progress = self._progress(conn, version)
+            if progress is None:
+                self._start(conn, version, log)
+                progress = self._progress(conn, version)
+            if progress['phase'] == self.PHASE_COPYING:
+                self._copy(conn, version, progress, log)
+                self._swap(conn, version, log)
+            self._finish(conn, version, json.loads(progress['indexes']), log)
+        finally:
+            conn.execute('PRAGMA legacy_alter_table = OFF')
+            conn.execute(f'PRAGMA foreign_keys = {"ON" if foreign_keys else "OFF"}')
+
+    def _progress(self, conn, version):
+        row = conn.execute(
+            f'SELECT phase, last_id, copied, total, indexes FROM {self.PROGRESS_TABLE} WHERE version = ?',
+            (version,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('phase', 'last_id', 'copied', 'total', 'indexes'), row))
+
+    def _indexes(self, conn):
+        """
+        新しいテーブルに作成するインデックス
+
+        元のテーブルの CREATE INDEX で作成されたもの（新しいテーブルに無い列のものは除く）と、
+        追加で指定されたもの（同じ名前・同じ列の並びのものは指定を優先）。
+        """
+        indexes = list(self.extra_indexes)
+        names = {index['name'] for index in indexes}
+        column_lists = {tuple(index['columns']) for index in indexes}
+        for _, name, unique, origin, partial in conn.execute(f"PRAGMA index_list('{self.table}')").fetchall():
+            if origin != 'c' or name in names:
+                continue
+            columns = [row[2] for row in conn.execute(f"PRAGMA index_info('{name}')").fetchall()]
+            if partial or None in columns:
+                raise ValueError(f'式・条件付きのインデックスの作り直しには対応していません: {name}')
+            if tuple(columns) in column_lists:
+                continue
+            if all(column in self.columns for column in columns):
+                column_lists.add(tuple(columns))
+                indexes.append({'name': name, 'unique': bool(unique), 'columns': columns})
+        return indexes
+
+    @staticmethod
+    def _create_index_sql(name, table, index):
+        unique = 'UNIQUE ' if index['unique'] else ''
+        return f'CREATE {unique}INDEX IF NOT EXISTS {name} ON {table} ({", ".join(index["columns"])})'
+
+    def _trigger_sql(self):
+        columns = ', '.join(self.columns)
+        expressions = ', '.join(self.columns.values())
+        copy_row = f'INSERT OR REPLACE INTO {self.new_table} ({columns}) SELECT {expressions} FROM {self.table} WHERE id = NEW.id;'
+        return [
+            f'''CREATE TRIGGER {self.new_table}_insert AFTER INSERT ON {self.table} BEGIN
+                {copy_row}
+            END''',
+            f'''CREATE TRIGGER {self.new_table}_update AFTER UPDATE ON {self.table} BEGIN
+                DELETE FROM {self.new_table} WHERE id = OLD.id;
+                {copy_row}
+            END''',
+            f'''CREATE TRIGGER {self.new_table}_delete AFTER DELETE ON {self.table} BEGIN
+                DELETE FROM {self.new_table} WHERE id = OLD.id;
+            END''',
+        ]
+
+    def _start(self, conn, version, log):
+        """新しいテーブル・仮のインデックス・トリガーを作成し、進捗の記録を開始（1トランザクション）"""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            indexes = self._indexes(conn)
+            total = conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+            conn.execute(f'DROP TABLE IF EXISTS {self.new_table}')
+            conn.execute(self.create_sql.format(table=self.new_table))
+            for index in indexes:
+                conn.execute(self._create_index_sql(f'{index["name"]}__rebuild', self.new_table, index))
+            for sql in self._trigger_sql():
+                conn.execute(sql)
+            conn.execute(
+                f'INSERT INTO {self.PROGRESS_TABLE} (version, table_name, phase, total, indexes) VALUES (?, ?, ?, ?, ?)',
+                (version, self.table, self.PHASE_COPYING, total, json.dumps(indexes))
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        log(f"  {self.table}: {total:,}件を{self.batch_size:,}件ずつ {self.new_table} にコピーします")
+
+    def _copy(self, conn, version, progress, log):
+        """id 順に batch_size 件ずつコピー（バッチごとにコミットして位置を記録）"""
+        columns = ', '.join(self.columns)
+        expressions = ', '.join(self.columns.values())
+        last_id, copied, total = progress['last_id'], progress['copied'], progress['total']
+        if copied:
+            log(f"  {self.table}: id {last_id} の次から再開します（{copied:,}/{total:,}件コピー済み）")
+        started = time.perf_counter()
+        while True:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                upper, count = conn.execute(
+                    f'SELECT MAX(id), COUNT(*) FROM (SELECT id FROM {self.table} WHERE id > ? ORDER BY id LIMIT ?)',
+                    (last_id, self.batch_size)
+                ).fetchone()
+                if not count:
+                    conn.rollback()
+                    break
+                conn.execute(
+                    f'INSERT OR REPLACE INTO {self.new_table} ({columns}) '
+                    f'SELECT {expressions} FROM {self.table} WHERE id > ? AND id <= ?',
+                    (last_id, upper)
+                )
+                conn.execute(
+                    f'UPDATE {self.PROGRESS_TABLE} SET last_id = ?, copied = copied + ?, updated_at = CURRENT_TIMESTAMP '
+                    'WHERE version = ?',
+                    (upper, count, version)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            last_id = upper
+            copied += count
+            elapsed = time.perf_counter() - started
+            log(f"  {self.table}: {copied:,}/{total:,}件 ({copied / total * 100 if total else 100:.1f}%, {elapsed:.1f}秒)")
+
+    def _swap(self, conn, version, log):
+        """トリガーを削除してテーブル名を入れ替える（ロックを取るのはこの短いトランザクションのみ）"""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            source_max, target_max = (
+                conn.execute(f'SELECT MAX(id) FROM {table}').fetchone()[0]
+                for table in (self.table, self.new_table)
+            )
+            if source_max != target_max:
+                raise RuntimeError(f'{self.table} のコピーが完了していません（最大ID {source_max} / {target_max}）')
+            for suffix in ('insert', 'update', 'delete'):
+                conn.execute(f'DROP TRIGGER IF EXISTS {self.new_table}_{suffix}')
+            conn.execute(f'ALTER TABLE {self.table} RENAME TO {self.retired_table}')
+            conn.execute(f'ALTER TABLE {self.new_table} RENAME TO {self.table}')
+            conn.execute(
+                f'UPDATE {self.PROGRESS_TABLE} SET phase = ?, updated_at = CURRENT_TIMESTAMP WHERE version = ?',
+                (self.PHASE_SWAPPED, version)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        log(f"  {self.table}: 新しいテーブルに入れ替えました")
+
+    def _finish(self, conn, version, indexes, log):
+        """元のテーブルを削除し、インデックスを元の名前で作り直す（それぞれ別のトランザクション）"""
+        conn.execute(f'DROP TABLE IF EXISTS {self.retired_table}')
+        conn.commit()
+        for index in indexes:
+            # 元の名前のインデックスを作成してから仮の名前のものを削除する（一意制約が途切れないように）
+            conn.execute(self._create_index_sql(index['name'], self.table, index))
+            conn.commit()
+            conn.execute(f'DROP INDEX IF EXISTS {index["name"]}__rebuild')
+            conn.commit()
+        log(f"  {self.table}: インデックス{len(indexes)}件を作成しました")
+
+
 class DatabaseMigrator:
     """データベースマイグレーション管理クラス"""
     
-    def __init__(self, db_path='data/projects.db'):
+    def __init__(self, db_path='data/projects.db', batch_size=None):
         self.db_path = Path(db_path)
         self.migrations_table = 'schema_migrations'
+        self.batch_size = batch_size
+        self._connection = None
     
     def connect(self):
-        """データベース接続"""
-        return sqlite3.connect(self.db_path)
+        """データベース接続（チェックごとに接続し直さず、同じ接続を使い回す）"""
+        if self._connection is None:
+            # アプリの書き込みと重なった場合はロックの解放を待つ
+            self._connection = sqlite3.connect(self.db_path, timeout=30)
+        return self._connection
+    
+    def close(self):
+        """データベース接続を閉じる"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
     
     def init_migrations_table(self):
         """マイグレーション管理テーブルを初期化"""
@@ -48,9 +403,12 @@ class DatabaseMigrator:
             with self.connect() as conn:
                 cursor = conn.cursor()
                 
-                # マイグレーションSQLを実行
+                # マイグレーションSQLを実行（関数の場合はカーソルを渡して呼び出す）
                 for sql in sql_commands:
-                    cursor.execute(sql)
+                    if callable(sql):
+                        sql(cursor)
+                    else:
+                        cursor.execute(sql)
                 
                 # マイグレーション記録を追加
                 cursor.execute(f'''
@@ -66,6 +424,66 @@ class DatabaseMigrator:
             print(f"✗ マイグレーション {version} の適用に失敗しました: {e}")
             return False
     
+    def apply_rebuild(self, version, description, rebuild):
+        """
+        テーブルを作り直すマイグレーションを適用（中断した場合は次回の実行で再開）
+        
+        Args:
+            version: マイグレーションのバージョン
+            description: 説明
+            rebuild: TableRebuild
+        """
+        if self.is_migration_applied(version):
+            print(f"マイグレーション {version} は既に適用済みです")
+            return False
+        
+        conn = self.connect()
+        if self.batch_size:
+            rebuild.batch_size = self.batch_size
+        try:
+            rebuild.run(conn, version)
+            with conn:
+                conn.execute(f'''
+                    INSERT INTO {self.migrations_table} (version, description)
+                    VALUES (?, ?)
+                ''', (version, description))
+                conn.execute(f'DELETE FROM {TableRebuild.PROGRESS_TABLE} WHERE version = ?', (version,))
+            print(f"✓ マイグレーション {version} を適用しました: {description}")
+            return True
+        except Exception as e:
+            print(f"✗ マイグレーション {version} の適用に失敗しました（再実行すると続きから再開します）: {e}")
+            return False
+    
+    def pending_versions(self, migrations):
+        """
+        未適用のマイグレーションのバージョンを取得（管理テーブルが無い場合はすべて）
+
+        Args:
+            migrations: build_migrations() の定義
+        """
+        conn = self.connect()
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.migrations_table,)
+        ).fetchone()
+        applied = set()
+        if exists:
+            applied = {row[0] for row in conn.execute(f'SELECT version FROM {self.migrations_table}')}
+        return [migration['version'] for migration in migrations if migration['version'] not in applied]
+    
+    def stamp(self, migrations):
+        """
+        マイグレーションを実行せずに適用済みとして記録（現在のモデルの構造で作成したデータベース用）
+
+        Args:
+            migrations: build_migrations() の定義
+        """
+        self.init_migrations_table()
+        with self.connect() as conn:
+            conn.executemany(
+                f'INSERT OR IGNORE INTO {self.migrations_table} (version, description) VALUES (?, ?)',
+                [(migration['version'], migration['description']) for migration in migrations]
+            )
+    
     def get_applied_migrations(self):
         """適用済みマイグレーション一覧を取得"""
         with self.connect() as conn:
@@ -77,15 +495,9 @@ class DatabaseMigrator:
             ''')
             return cursor.fetchall()
 
-def run_migrations():
-    """マイグレーションを実行"""
-    print("データベースマイグレーションを開始...")
-    
-    migrator = DatabaseMigrator()
-    migrator.init_migrations_table()
-    
-    # マイグレーション定義
-    migrations = [
+def build_migrations():
+    """マイグレーション定義（適用順）"""
+    return [
         {
             'version': '001_initial_schema',
             'description': 'プロジェクトテーブルの初期作成',
@@ -137,18 +549,97 @@ def run_migrations():
                 'CREATE INDEX IF NOT EXISTS idx_branches_branch_code ON branches(branch_code)',
                 'CREATE INDEX IF NOT EXISTS idx_branches_is_active ON branches(is_active)'
             ]
+        },
+        {
+            'version': '005_add_projects_updated_at_index',
+            'description': '差分バックアップ用の更新日時インデックス追加',
+            'sql': [
+                'CREATE INDEX IF NOT EXISTS ix_projects_updated_at ON projects(updated_at)'
+            ]
+        },
+        {
+            'version': '006_store_money_as_minor_units',
+            'description': '売上・経費を銭単位の整数に変換',
+            'sql': [
+                MONEY_TO_MINOR_UNITS_SQL
+            ]
+        },
+        {
+            'version': '007_add_fiscal_period_columns',
+            'description': '年度内の月・四半期・半期の列とインデックス追加',
+            'sql': [
+                add_fiscal_period_columns
+            ]
+        },
+        {
+            'version': '008_rebuild_projects_table',
+            'description': 'プロジェクトテーブルを現在のモデルの構造（金額列の型・外部キー）に作り直し',
+            'rebuild': TableRebuild(
+                'projects', PROJECTS_TABLE_SQL, {column: None for column in PROJECTS_COLUMNS}, PROJECTS_INDEXES
+            )
+        },
+        {
+            'version': '009_add_change_seq_columns',
+            'description': '差分バックアップの変更番号の列を追加（ウォーターマークを日時から変更番号に変更）',
+            'sql': [
+                add_change_seq_columns
+            ]
+        },
+        {
+            'version': '010_add_export_job_worker_column',
+            'description': 'エクスポートジョブを実行するプロセスの列を追加',
+            'sql': [
+                add_export_job_worker_column
+            ]
         }
     ]
+
+
+@contextmanager
+def migration_lock(db_path):
+    """
+    マイグレーションの確認・適用をプロセス間で排他する（<DBファイル>.migrate.lock のファイルロック）
+
+    複数のワーカープロセスが同時に起動しても、1つのプロセスだけが適用し、
+    他のプロセスは適用が終わるまで待ってから確認する。同じプロセス内で入れ子にしないこと。
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f'{db_path}.migrate.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def run_migrations(db_path='data/projects.db', batch_size=None):
+    """
+    未適用のマイグレーションを実行（他のプロセスと並行して実行する場合は migration_lock の中で呼ぶ）
+
+    Returns:
+        list: 適用できずに残った（未適用の）マイグレーションのバージョン
+    """
+    print("データベースマイグレーションを開始...")
+    
+    migrator = DatabaseMigrator(db_path, batch_size=batch_size)
+    migrator.init_migrations_table()
+    migrations = build_migrations()
     
     # マイグレーションを順次適用
     applied_count = 0
     for migration in migrations:
-        if migrator.apply_migration(
-            migration['version'],
-            migration['description'],
-            migration['sql']
-        ):
+        if 'rebuild' in migration:
+            applied = migrator.apply_rebuild(migration['version'], migration['description'], migration['rebuild'])
+        else:
+            applied = migrator.apply_migration(migration['version'], migration['description'], migration['sql'])
+        if applied:
             applied_count += 1
+        elif not migrator.is_migration_applied(migration['version']):
+            # 失敗したマイグレーションより後のものは前提が崩れるため適用しない
+            print(f"マイグレーション {migration['version']} が失敗したため、以降のマイグレーションを中止します")
+            break
     
     # 適用済みマイグレーション一覧を表示
     print(f"\n適用済みマイグレーション一覧:")
@@ -157,6 +648,15 @@ def run_migrations():
         print(f"  - {version}: {description} (適用日時: {applied_at})")
     
     print(f"\nマイグレーション完了: {applied_count}件の新しいマイグレーションを適用しました")
+    pending = migrator.pending_versions(migrations)
+    migrator.close()
+    return pending
 
 if __name__ == '__main__':
-    run_migrations()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='データベースマイグレーション')
+    parser.add_argument('--db', default='data/projects.db', help='SQLiteのデータベースファイル')
+    parser.add_argument('--batch-size', type=int, help=f'テーブルの作り直しで1トランザクションにコピーする行数（既定 {TableRebuild.BATCH_SIZE}）')
+    args = parser.parse_args()
+    with migration_lock(args.db):
+        pending = run_migrations(args.db, args.batch_size)
+    raise SystemExit(1 if pending else 0)
\ No newline at end of file
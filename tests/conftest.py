@@ -14,6 +14,18 @@ import tempfile
 import os
 from app import create_app, db
 from app.models import Branch, Project
+from config import TestingConfig
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_test_files(tmp_path_factory):
+    """テストで生成されるファイルの出力先をセッションごとの一時ディレクトリにする"""
+    base = tmp_path_factory.mktemp('app_files')
+    TestingConfig.UPLOAD_FOLDER = base / 'uploads'
+    TestingConfig.EXPORT_CACHE_FOLDER = base / 'export_cache'
+    TestingConfig.EXPORT_JOB_FOLDER = base / 'export_jobs'
+    TestingConfig.BACKUP_SNAPSHOT_FOLDER = base / 'snapshots'
+    yield base
 
 
 @pytest.fixture(scope='function')
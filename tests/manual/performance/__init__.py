@@ -0,0 +1 @@
+# Manual performance benchmarks
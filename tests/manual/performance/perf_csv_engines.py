@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+CSV解析エンジンのベンチマーク
+
+10,000 / 100,000 / 1,000,000 行のCSVを生成し、エンジン（c / pyarrow）と
+文字コード（UTF-8 / CP932）ごとに列マッピング済みデータフレームの作成時間を計測する。
+
+    python -m tests.manual.performance.perf_csv_engines
+    python -m tests.manual.performance.perf_csv_engines --rows 10000 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app.services import import_service as import_service_module
+from app.services.import_service import ImportService
+
+
+HEADER = 'プロジェクトコード,プロジェクト名,支社名,売上の年度,受注角度,売上,経費\n'
+COLUMN_MAPPING = {
+    'project_code': 'プロジェクトコード',
+    'project_name': 'プロジェクト名',
+    'branch_name': '支社名',
+    'fiscal_year': '売上の年度',
+    'order_probability': '受注角度',
+    'revenue': '売上',
+    'expenses': '経費'
+}
+BRANCHES = ['東京支社', '大阪支社', '名古屋支社', '福岡支社']
+PROBABILITIES = ['〇', '△', '×']
+
+
+def write_csv(path, rows, encoding):
+    """ベンチマーク用のCSVを作成"""
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        f.write(HEADER)
+        for i in range(rows):
+            f.write(
+                f'PRJ{i:07d},案件{i},{BRANCHES[i % 4]},{2020 + i % 6},'
+                f'{PROBABILITIES[i % 3]},{(i % 1000) * 1000},{(i % 700) * 1000}\n'
+            )
+
+
+def measure(service, path, repeat):
+    """最速の読み込み時間（秒）を返す"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        df = service._load_mapped_dataframe(path, 'csv', COLUMN_MAPPING)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CSV解析エンジンのベンチマーク')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    engines = ['c']
+    if import_service_module._pyarrow_available():
+        engines.append('pyarrow')
+    else:
+        print('pyarrow が未インストールのため c エンジンのみ計測します')
+
+    service = ImportService()
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f'{"行数":>10} {"文字コード":>10} {"エンジン":>8} {"秒":>8} {"行/秒":>12}')
+        for rows in args.rows:
+            for encoding in ('utf-8-sig', 'cp932'):
+                path = os.path.join(workdir, f'bench_{rows}_{encoding}.csv')
+                write_csv(path, rows, encoding)
+                for engine in engines:
+                    service.CSV_ENGINE = engine
+                    seconds, count = measure(service, path, args.repeat)
+                    assert count == rows
+                    print(f'{rows:>10,} {encoding:>10} {engine:>8} {seconds:>8.3f} {rows / seconds:>12,.0f}')
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
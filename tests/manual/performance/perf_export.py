@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+エクスポートのベンチマーク
+
+テスト用DB（data/test_sample.db）に指定件数のプロジェクトを投入し、
+CSV（ストリーミング）とExcel（write_only）の出力時間とピークメモリを計測する。
+(--memory 指定時のみメモリを計測)
+件数を増やしたときに時間が線形、メモリがほぼ一定であることを確認する。
+
+    python -m tests.manual.performance.perf_export
+    python -m tests.manual.performance.perf_export --rows 10000 100000
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import insert
+from werkzeug.datastructures import MultiDict
+
+from app import create_app, db
+from app.models import Project, Branch
+from app.services.export_service import ExportService
+
+
+def populate(rows):
+    """ベンチマーク用のデータを投入"""
+    db.drop_all()
+    db.create_all()
+    branches = [Branch(branch_code=f'B{i:02d}', branch_name=f'支社{i}', is_active=True) for i in range(10)]
+    db.session.add_all(branches)
+    db.session.flush()
+    now = datetime.utcnow()
+    batch = []
+    for i in range(rows):
+        batch.append({
+            'project_code': f'PRJ{i:08d}',
+            'project_name': f'ベンチマーク案件{i}',
+            'branch_id': branches[i % 10].id,
+            'fiscal_year': 2020 + i % 6,
+            'order_probability': (0, 50, 100)[i % 3],
+            'revenue': (i % 1000) * 1000,
+            'expenses': (i % 700) * 1000,
+            'created_at': now,
+            'updated_at': now,
+        })
+        if len(batch) == 5000:
+            db.session.execute(insert(Project.__table__), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Project.__table__), batch)
+    db.session.commit()
+
+
+def measure(label, rows, func, trace_memory):
+    """処理時間（と指定時はピークメモリ）を表示"""
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    peak = ''
+    if trace_memory:
+        # tracemalloc は処理を大きく遅くするため、時間計測とは別に実行する
+        tracemalloc.start()
+        func()
+        peak = f'{tracemalloc.get_traced_memory()[1] / 1024 / 1024:>8.1f}MB'
+        tracemalloc.stop()
+    print(f'{rows:>10,} {label:>6} {elapsed:>8.2f}s {peak:>10}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='エクスポートのベンチマーク')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 500_000])
+    parser.add_argument('--memory', action='store_true', help='ピークメモリも計測する')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    with app.app_context():
+        print(f'{"行数":>10} {"形式":>6} {"時間":>9} {"ピーク":>10}')
+        for rows in args.rows:
+            populate(rows)
+            filters = ExportService.parse_filters(MultiDict())
+
+            def export_csv():
+                for _ in ExportService.iter_csv(filters):
+                    pass
+
+            def export_excel():
+                with tempfile.TemporaryFile() as output:
+                    ExportService.write_excel(filters, output)
+
+            measure('csv', rows, export_csv, args.memory)
+            measure('xlsx', rows, export_excel, args.memory)
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+月別・四半期別集計のベンチマーク
+
+作成日時を読み込んで Python で「YYYY/MM」に振り分ける従来の月別集計と、
+保存済みの年度内期間の列（fiscal_month・fiscal_quarter）で GROUP BY する
+集計の所要時間を比較する。
+
+    python -m tests.manual.performance.perf_fiscal_periods
+    python -m tests.manual.performance.perf_fiscal_periods --rows 500000 --repeat 5
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import create_app, db
+from app.models import Project, Branch, fiscal_year_bounds
+from app.services.dashboard_service import DashboardService
+from config import TestingConfig
+
+FISCAL_YEAR = 2024
+
+
+def populate(rows):
+    """6年度分のプロジェクトを投入"""
+    branches = [Branch(branch_code=f'B{i:02d}', branch_name=f'支社{i}', is_active=True) for i in range(10)]
+    db.session.add_all(branches)
+    db.session.flush()
+    start = datetime(2020, 4, 1)
+    for offset in range(0, rows, 5000):
+        batch = []
+        for i in range(offset, min(offset + 5000, rows)):
+            created_at = start + timedelta(hours=i * 6 % (6 * 365 * 24))
+            batch.append({
+                'project_code': f'PRJ{i:09d}',
+                'project_name': f'ベンチマーク案件{i}',
+                'branch_id': branches[i % len(branches)].id,
+                'fiscal_year': created_at.year if created_at.month >= 4 else created_at.year - 1,
+                'order_probability': (0, 50, 100)[i % 3],
+                'revenue': (i % 1000) * 1000,
+                'expenses': (i % 700) * 1000,
+                'created_at': created_at,
+                'updated_at': created_at,
+            })
+        db.session.execute(insert(Project.__table__), batch)
+    db.session.commit()
+
+
+def python_monthly_trend():
+    """従来の集計（作成日時を読み込み、Python で月に振り分ける）"""
+    start, end = fiscal_year_bounds(FISCAL_YEAR)
+    rows = db.session.query(
+        Project.revenue, Project.expenses, Project.branch_id, Project.created_at
+    ).filter(Project.created_at >= start, Project.created_at < end).all()
+    totals = {}
+    for row in rows:
+        label = f'{row.created_at.year}/{row.created_at.month:02d}'
+        bucket = totals.setdefault((row.branch_id, label), [0.0, 0.0, 0])
+        bucket[0] += float(row.revenue)
+        bucket[1] += float(row.expenses)
+        bucket[2] += 1
+    return totals
+
+
+def timed(repeat, func_):
+    """最速の所要時間（ミリ秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func_()
+        db.session.rollback()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='月別・四半期別集計のベンチマーク')
+    parser.add_argument('--rows', type=int, default=200_000, help='データ件数')
+    parser.add_argument('--repeat', type=int, default=3, help='各計測の繰り返し回数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        TestingConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(directory, "bench.db")}'
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            populate(args.rows)
+
+            print(f'rows={args.rows:,} repeat={args.repeat} fiscal_year={FISCAL_YEAR}')
+            print(f'{"集計":>22} {"所要ms":>8}')
+            for label, func_ in (
+                ('月別（作成日時をPythonで）', python_monthly_trend),
+                ('月別（fiscal_month）', lambda: DashboardService.get_monthly_revenue_trend(FISCAL_YEAR)),
+                ('四半期（fiscal_quarter）', lambda: DashboardService.get_fiscal_period_summary(FISCAL_YEAR, 'quarter')),
+                ('半期（fiscal_half）', lambda: DashboardService.get_fiscal_period_summary(FISCAL_YEAR, 'half')),
+            ):
+                print(f'{label:>22} {timed(args.repeat, func_):>8.1f}')
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+金額列の型による読み込みコストのベンチマーク
+
+同じデータを Numeric(15, 2)（Decimal に変換）と Money（銭単位の整数）の
+テーブルに入れ、一覧・エクスポート相当の全件読み込みと、支社別の
+合計・粗利順の並べ替えの所要時間を比較する。
+
+    python -m tests.manual.performance.perf_money_hydration
+    python -m tests.manual.performance.perf_money_hydration --rows 500000 --repeat 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import Column, Integer, MetaData, Numeric, Table, create_engine, func, insert, select
+
+from app.models import Money
+
+
+def build_tables(metadata):
+    """比較用のテーブル（金額列の型だけが異なる）"""
+    tables = {}
+    for label, money_type in (('Numeric', Numeric(15, 2)), ('Money', Money())):
+        tables[label] = Table(
+            f'projects_{label.lower()}', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('branch_id', Integer, nullable=False),
+            Column('revenue', money_type, nullable=False),
+            Column('expenses', money_type, nullable=False),
+        )
+    return tables
+
+
+def timed(repeat, func_):
+    """最速の所要時間（ミリ秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func_()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='金額列の型による読み込みコストのベンチマーク')
+    parser.add_argument('--rows', type=int, default=200_000, help='データ件数')
+    parser.add_argument('--repeat', type=int, default=3, help='各計測の繰り返し回数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f'sqlite:///{os.path.join(directory, "bench.db")}')
+        metadata = MetaData()
+        tables = build_tables(metadata)
+        metadata.create_all(engine)
+        rows = [
+            {'id': i + 1, 'branch_id': i % 10, 'revenue': (i % 1000) * 1000 + 0.5, 'expenses': (i % 700) * 1000 + 0.25}
+            for i in range(args.rows)
+        ]
+        with engine.begin() as connection:
+            for table in tables.values():
+                connection.execute(insert(table), rows)
+
+        print(f'rows={args.rows:,} repeat={args.repeat}')
+        print(f'{"型":>8} {"全件読込ms":>10} {"合計ms":>8} {"粗利順ms":>8}')
+        with engine.connect() as connection:
+            for label, table in tables.items():
+                profit = table.c.revenue - table.c.expenses
+                load = timed(args.repeat, lambda: [
+                    (float(row.revenue), float(row.expenses))
+                    for row in connection.execute(select(table.c.id, table.c.revenue, table.c.expenses))
+                ])
+                totals = timed(args.repeat, lambda: connection.execute(
+                    select(table.c.branch_id, func.sum(table.c.revenue), func.sum(profit)).group_by(table.c.branch_id)
+                ).all())
+                ordered = timed(args.repeat, lambda: connection.execute(
+                    select(table.c.id, profit).order_by(profit.desc()).limit(100)
+                ).all())
+                print(f'{label:>8} {load:>10.1f} {totals:>8.1f} {ordered:>8.1f}')
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+読み取り専用エンジンへの振り分けのベンチマーク
+
+インポート相当の書き込み（1,000件ごとの一括INSERTとコミット）を行うプロセスと、
+ダッシュボードの集計を繰り返すプロセスを同時に動かし、DATABASE_READ_ROUTING の
+有効・無効でインポートの処理件数・コミット時間とダッシュボードの応答時間を比較する。
+
+    python -m tests.manual.performance.perf_read_routing
+    python -m tests.manual.performance.perf_read_routing --readers 4 --seconds 10 --rows 200000
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, db
+from app.models import Project, Branch
+from app.services.dashboard_service import DashboardService
+from config import TestingConfig
+
+IMPORT_CHUNK = 1000
+
+
+def make_app(path, routing):
+    """ベンチマーク用のDBを使うアプリを作成"""
+    TestingConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    TestingConfig.DATABASE_READ_ROUTING = routing
+    # fsync ありで計測する
+    TestingConfig.SQLITE_PRAGMAS = {**TestingConfig.SQLITE_PRAGMAS, 'synchronous': 'NORMAL'}
+    return create_app('testing')
+
+
+def project_rows(start, count, branch_ids):
+    now = datetime.utcnow()
+    return [
+        {
+            'project_code': f'PRJ{i:09d}',
+            'project_name': f'ベンチマーク案件{i}',
+            'branch_id': branch_ids[i % len(branch_ids)],
+            'fiscal_year': 2020 + i % 6,
+            'order_probability': (0, 50, 100)[i % 3],
+            'revenue': (i % 1000) * 1000,
+            'expenses': (i % 700) * 1000,
+            'created_at': now,
+            'updated_at': now,
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def populate(path, rows):
+    """初期データを投入"""
+    app = make_app(path, False)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        branches = [Branch(branch_code=f'B{i:02d}', branch_name=f'支社{i}', is_active=True) for i in range(10)]
+        db.session.add_all(branches)
+        db.session.flush()
+        branch_ids = [branch.id for branch in branches]
+        for start in range(0, rows, 5000):
+            db.session.execute(insert(Project.__table__), project_rows(start, min(5000, rows - start), branch_ids))
+        db.session.commit()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def importer(args):
+    """インポート相当の書き込みを繰り返す"""
+    path, routing, seconds, start = args
+    app = make_app(path, routing)
+    latencies = []
+    errors = 0
+    with app.app_context():
+        branch_ids = [branch_id for (branch_id,) in db.session.query(Branch.id).all()]
+        db.session.rollback()
+        deadline = time.perf_counter() + seconds
+        offset = start
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                db.session.execute(insert(Project.__table__), project_rows(offset, IMPORT_CHUNK, branch_ids))
+                db.session.commit()
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+                continue
+            offset += IMPORT_CHUNK
+            latencies.append(time.perf_counter() - started)
+    return 'import', latencies, errors
+
+
+def dashboard(args):
+    """ダッシュボードの集計を繰り返す"""
+    path, routing, seconds, _ = args
+    app = make_app(path, routing)
+    latencies = []
+    errors = 0
+    with app.test_request_context('/'):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                DashboardService.get_overall_stats()
+                DashboardService.get_branch_stats()
+                DashboardService.get_yearly_trend_data()
+                db.session.rollback()
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+    return 'dashboard', latencies, errors
+
+
+def run(label, routing, rows, readers, seconds):
+    """1つの設定でベンチマークを実行して結果を表示"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.db')
+        populate(path, rows)
+        tasks = [(importer, (path, routing, seconds, rows))]
+        tasks += [(dashboard, (path, routing, seconds, None)) for _ in range(readers)]
+        with multiprocessing.Pool(len(tasks)) as pool:
+            pending = [pool.apply_async(func, (args,)) for func, args in tasks]
+            results = [item.get() for item in pending]
+
+    imports = [latency for role, latencies, _ in results if role == 'import' for latency in latencies]
+    reads = [latency for role, latencies, _ in results if role == 'dashboard' for latency in latencies]
+    import_errors = sum(errors for role, _, errors in results if role == 'import')
+    read_errors = sum(errors for role, _, errors in results if role == 'dashboard')
+
+    def percentile(values, ratio):
+        if not values:
+            return float('nan')
+        return sorted(values)[min(int(len(values) * ratio), len(values) - 1)] * 1000
+
+    print(
+        f'{label:>8} {len(imports) * IMPORT_CHUNK / seconds:>12,.0f} {percentile(imports, 0.95):>11.1f} {import_errors:>6} '
+        f'{len(reads) / seconds:>8.1f} {statistics.median(reads) * 1000 if reads else float("nan"):>10.1f} '
+        f'{percentile(reads, 0.95):>10.1f} {read_errors:>6}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='読み取り専用エンジンへの振り分けのベンチマーク')
+    parser.add_argument('--rows', type=int, default=100_000, help='初期データの件数')
+    parser.add_argument('--readers', type=int, default=4, help='ダッシュボードのプロセス数')
+    parser.add_argument('--seconds', type=float, default=5.0, help='各設定の計測秒数')
+    args = parser.parse_args()
+
+    print(f'rows={args.rows:,} readers={args.readers} seconds={args.seconds}')
+    print(f'{"振り分け":>8} {"取込件数/s":>12} {"コミットp95ms":>11} {"取込失敗":>6} '
+          f'{"集計/s":>8} {"集計p50ms":>10} {"集計p95ms":>10} {"集計失敗":>6}')
+    for label, routing in (('無効', False), ('有効', True)):
+        run(label, routing, args.rows, args.readers, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+SQLiteの PRAGMA 設定のベンチマーク
+
+gunicorn の複数ワーカーを想定し、書き込みプロセスと読み取りプロセスを同時に
+動かして、SQLiteの既定値（rollback journal・synchronous=FULL）と config の
+SQLITE_PRAGMAS を比較する。書き込みは1件の更新を1トランザクションで
+コミットし、読み取りは支社別の集計クエリを実行する。
+
+    python -m tests.manual.performance.perf_sqlite_pragmas
+    python -m tests.manual.performance.perf_sqlite_pragmas --writers 4 --readers 4 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.database import configure_sqlite
+from config import config
+
+ROWS = 20_000
+
+SCHEMA = '''
+CREATE TABLE branches (id INTEGER PRIMARY KEY, branch_code VARCHAR(20) UNIQUE NOT NULL);
+CREATE TABLE projects (
+    id INTEGER PRIMARY KEY,
+    project_code VARCHAR(50) UNIQUE NOT NULL,
+    branch_id INTEGER NOT NULL REFERENCES branches(id),
+    fiscal_year INTEGER NOT NULL,
+    revenue NUMERIC(15, 2) NOT NULL,
+    expenses NUMERIC(15, 2) NOT NULL,
+    updated_at DATETIME NOT NULL
+);
+CREATE INDEX ix_projects_branch_id ON projects(branch_id);
+'''
+
+READ_QUERY = text(
+    'SELECT branch_id, COUNT(*), SUM(revenue), SUM(revenue - expenses) '
+    'FROM projects WHERE fiscal_year = :year GROUP BY branch_id'
+)
+WRITE_QUERY = text(
+    "UPDATE projects SET revenue = revenue + 1, updated_at = datetime('now') WHERE id = :id"
+)
+
+
+def prepare(path):
+    """ベンチマーク用のデータベースを作成（既定の rollback journal で作成する）"""
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as connection:
+        for statement in SCHEMA.strip().split(';'):
+            if statement.strip():
+                connection.execute(text(statement))
+        connection.execute(text('INSERT INTO branches (id, branch_code) VALUES (:id, :code)'),
+                           [{'id': i, 'code': f'B{i:02d}'} for i in range(1, 11)])
+        connection.execute(text(
+            'INSERT INTO projects (project_code, branch_id, fiscal_year, revenue, expenses, updated_at) '
+            "VALUES (:code, :branch, :year, :revenue, :expenses, datetime('now'))"
+        ), [
+            {'code': f'PRJ{i:08d}', 'branch': i % 10 + 1, 'year': 2020 + i % 6,
+             'revenue': i % 1000 * 1000, 'expenses': i % 700 * 1000}
+            for i in range(ROWS)
+        ])
+    engine.dispose()
+
+
+def worker(args):
+    """指定秒数だけ書き込み・読み取りを繰り返し、件数と所要時間を返す"""
+    path, pragmas, role, seconds, seed = args
+    # pysqlite の timeout（既定5秒）は busy_timeout と同じ働きをするため、比較のため無効にする
+    engine = create_engine(f'sqlite:///{path}', connect_args={'timeout': 0})
+    configure_sqlite(engine, pragmas)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    counter = seed
+    with engine.connect() as connection:
+        while time.perf_counter() < deadline:
+            counter += 7919
+            started = time.perf_counter()
+            try:
+                if role == 'write':
+                    with connection.begin():
+                        connection.execute(WRITE_QUERY, {'id': counter % ROWS + 1})
+                else:
+                    connection.execute(READ_QUERY, {'year': 2020 + counter % 6}).all()
+                    connection.rollback()
+            except OperationalError:
+                # database is locked
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+    engine.dispose()
+    return role, latencies, errors
+
+
+def run(label, pragmas, writers, readers, seconds):
+    """1つの設定でベンチマークを実行して結果を表示"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.db')
+        prepare(path)
+        tasks = [(path, pragmas, 'write', seconds, i) for i in range(writers)]
+        tasks += [(path, pragmas, 'read', seconds, i) for i in range(readers)]
+        with multiprocessing.Pool(len(tasks)) as pool:
+            results = pool.map(worker, tasks)
+
+    writes = [latency for role, latencies, _ in results if role == 'write' for latency in latencies]
+    reads = [latency for role, latencies, _ in results if role == 'read' for latency in latencies]
+    write_errors = sum(errors for role, _, errors in results if role == 'write')
+    read_errors = sum(errors for role, _, errors in results if role == 'read')
+
+    def percentile(values, ratio):
+        if not values:
+            return float('nan')
+        return sorted(values)[min(int(len(values) * ratio), len(values) - 1)] * 1000
+
+    print(
+        f'{label:>10} {len(writes) / seconds:>10.1f} {write_errors:>8} '
+        f'{percentile(writes, 0.95):>9.2f} {statistics.median(reads) * 1000 if reads else float("nan"):>9.2f} '
+        f'{percentile(reads, 0.95):>9.2f} {read_errors:>8}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLiteの PRAGMA 設定のベンチマーク')
+    parser.add_argument('--writers', type=int, default=4, help='書き込みプロセス数')
+    parser.add_argument('--readers', type=int, default=4, help='読み取りプロセス数')
+    parser.add_argument('--seconds', type=float, default=5.0, help='各設定の計測秒数')
+    args = parser.parse_args()
+
+    profiles = [
+        ('sqlite既定', {}),
+        ('development', config['development'].SQLITE_PRAGMAS),
+        ('production', config['production'].SQLITE_PRAGMAS),
+    ]
+    print(f'writers={args.writers} readers={args.readers} seconds={args.seconds} rows={ROWS:,}')
+    print(f'{"設定":>10} {"commit/s":>10} {"書込失敗":>8} {"書込p95ms":>9} {"読取p50ms":>9} {"読取p95ms":>9} {"読取失敗":>8}')
+    for label, pragmas in profiles:
+        run(label, pragmas, args.writers, args.readers, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+バックアップJSONの逐次読み込みとアップロード・リストアのテスト
+"""
+import gzip
+import io
+import json
+import os
+import pytest
+from app import create_app, db
+from app.models import Project, Branch, FiscalYear
+from app.services.backup_reader import BackupFormatError, BackupReader
+
+
+def _backup(projects=30):
+    """バックアップ作成時と同じ順序（projects, branches, fiscal_years）のデータ"""
+    return {
+        'backup_info': {'created_at': '2024-04-01T00:00:00', 'version': '1.0', 'description': 'テスト'},
+        'data': {
+            'projects': [
+                {'id': i, 'project_code': f'PRJ{i:03d}', 'project_name': f'案件{i}「テスト」',
+                 'branch_id': 1, 'fiscal_year': 2024, 'order_probability': 50.0,
+                 'revenue': 1234567.5 + i, 'expenses': 1000 * i,
+                 'created_at': '2024-03-01T09:00:00', 'updated_at': None}
+                for i in range(1, projects + 1)
+            ],
+            'branches': [
+                {'id': 1, 'branch_code': 'TKY', 'branch_name': '東京本社', 'is_active': True,
+                 'created_at': '2024-01-01T00:00:00', 'updated_at': None},
+            ],
+            'fiscal_years': [
+                {'id': 1, 'year': 2024, 'year_name': '2024年度', 'is_active': True,
+                 'created_at': '2024-01-01T00:00:00', 'updated_at': None},
+            ],
+        },
+        'statistics': {'total_projects': projects},
+    }
+
+
+class TestBackupReader:
+    """BackupReader のテスト"""
+
+    @pytest.mark.parametrize('read_size', [1, 7, 64, 4096])
+    def test_records_split_across_reads(self, read_size):
+        """読み込み単位の境界で途切れたレコード・数値も正しく読み込める"""
+        backup = _backup()
+        reader = BackupReader(io.StringIO(json.dumps(backup, ensure_ascii=False)), read_size=read_size)
+        assert list(reader.iter_records('projects')) == backup['data']['projects']
+
+    def test_indented_format(self):
+        """indent 付きの旧形式も読み込める"""
+        backup = _backup(3)
+        reader = BackupReader(io.StringIO(json.dumps(backup, ensure_ascii=False, indent=2)), read_size=5)
+        assert list(reader.iter_records('branches')) == backup['data']['branches']
+
+    def test_events(self):
+        """セクション・テーブル・レコードの順にイベントを返す"""
+        text = '{"backup_info": {"version": "1.0"}, "data": {"projects": [1, 2], "extra": 3}, "n": 10}'
+        events = list(BackupReader(io.StringIO(text), read_size=3).iter_events())
+        assert events == [
+            ('section', 'backup_info', {'version': '1.0'}),
+            ('table', 'projects', None),
+            ('record', 'projects', 1),
+            ('record', 'projects', 2),
+            ('table_value', 'extra', 3),
+            ('section', 'n', 10),
+        ]
+
+    def test_empty_containers(self):
+        """空のオブジェクト・配列"""
+        events = list(BackupReader(io.StringIO('{"data": {"projects": []}}')).iter_events())
+        assert events == [('table', 'projects', None)]
+        assert list(BackupReader(io.StringIO('{}')).iter_events()) == []
+
+    @pytest.mark.parametrize('text', ['', '{"data": {"projects": [1, }}', '{"a": 1} x', '{"a" 1}', '{"a": 1'])
+    def test_invalid_json(self, text):
+        """JSONとして正しくない場合は JSONDecodeError"""
+        with pytest.raises(json.JSONDecodeError):
+            list(BackupReader(io.StringIO(text), read_size=4).iter_events())
+
+    def test_not_object(self):
+        """トップレベルがオブジェクトでない場合は BackupFormatError"""
+        with pytest.raises(BackupFormatError):
+            list(BackupReader(io.StringIO('[1, 2]')).iter_events())
+
+
+class TestStreamingUploadRestore:
+    """逐次読み込みによるアップロード・リストアのテスト"""
+
+    @pytest.fixture
+    def app(self, tmp_path):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        return app.test_client()
+
+    def _upload(self, client, content, filename):
+        return client.post('/backup/upload', data={'backup_file': (io.BytesIO(content), filename)},
+                           content_type='multipart/form-data')
+
+    def test_upload_stores_original_bytes(self, app, client, tmp_path):
+        """アップロードしたバイト列をそのまま保存し、件数をプレビューに返す"""
+        content = json.dumps(_backup(), ensure_ascii=False).encode('utf-8')
+        response = self._upload(client, content, 'backup.json')
+        assert response.status_code == 200
+        payload = response.get_json()
+        assert payload['preview']['backup_data'] == {'projects': 30, 'branches': 1, 'fiscal_years': 1, 'total': 32, 'deleted': 0}
+        assert payload['preview']['backup_info']['description'] == 'テスト'
+        stored = tmp_path / f"{payload['session_key']}.json"
+        assert stored.read_bytes() == content
+
+    def test_gzip_upload_and_restore(self, app, client, tmp_path):
+        """gzip のまま保存し、リストア時に展開しながら登録する"""
+        content = gzip.compress(json.dumps(_backup(), ensure_ascii=False).encode('utf-8'))
+        response = self._upload(client, content, 'backup.json.gz')
+        session_key = response.get_json()['session_key']
+        stored = tmp_path / f'{session_key}.json.gz'
+        assert stored.read_bytes() == content
+
+        response = client.post('/backup/restore', json={'session_key': session_key, 'confirm': True})
+        assert response.status_code == 200
+        assert response.get_json()['statistics']['projects_created'] == 30
+        assert Project.query.count() == 30
+        assert Branch.query.count() == 1
+        assert FiscalYear.query.count() == 1
+        assert not stored.exists()
+
+    def test_every_record_is_validated(self, app, client, tmp_path):
+        """先頭以外のレコードに必須項目がない場合もエラーにし、保存したファイルを削除する"""
+        backup = _backup(5)
+        del backup['data']['projects'][3]['revenue']
+        response = self._upload(client, json.dumps(backup).encode('utf-8'), 'backup.json')
+        assert response.status_code == 400
+        assert 'プロジェクトデータに revenue フィールドが見つかりません' in response.get_json()['error']
+        assert os.listdir(tmp_path) == []
+
+    def test_table_not_list(self, app, client):
+        """テーブルが配列でない場合"""
+        backup = _backup(1)
+        backup['data']['branches'] = {}
+        response = self._upload(client, json.dumps(backup).encode('utf-8'), 'backup.json')
+        assert response.status_code == 400
+        assert 'branches データの形式が正しくありません' in response.get_json()['error']
+
+    def test_broken_gzip(self, app, client, tmp_path):
+        """gzip として壊れている場合"""
+        response = self._upload(client, b'not gzip', 'backup.json.gz')
+        assert response.status_code == 400
+        assert '有効なJSONファイル' in response.get_json()['error']
+        assert os.listdir(tmp_path) == []
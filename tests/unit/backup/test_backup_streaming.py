@@ -0,0 +1,126 @@
+"""
+バックアップのストリーミング生成のテスト
+"""
+import pytest
+import gzip
+import io
+import json
+from datetime import datetime
+from app import create_app, db
+from app.models import Project, Branch, FiscalYear
+from app.services.backup_service import BackupService
+
+
+class TestBackupStreaming:
+    """/backup/create のストリーミング出力のテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def sample_data(self, app):
+        """年度2件・支社2件・プロジェクト7件"""
+        db.session.add_all([
+            FiscalYear(year=2024, year_name='2024年度', is_active=True),
+            FiscalYear(year=2025, year_name='2025年度', is_active=False),
+        ])
+        tokyo = Branch(branch_code='TKY', branch_name='東京本社', is_active=True)
+        osaka = Branch(branch_code='OSK', branch_name='大阪支社', is_active=False)
+        db.session.add_all([tokyo, osaka])
+        db.session.flush()
+        for i in range(7):
+            db.session.add(Project(
+                project_code=f'PRJ{i:03d}',
+                project_name=f'案件{i}',
+                branch_id=tokyo.id if i % 2 == 0 else osaka.id,
+                fiscal_year=2024,
+                order_probability=50,
+                revenue=1000000 + i,
+                expenses=800000,
+                created_at=datetime(2024, 4, 1, 9, 0, 0),
+                updated_at=datetime(2024, 4, 2, 9, 0, 0)
+            ))
+        db.session.commit()
+
+    def test_streams_same_format(self, client, sample_data, monkeypatch):
+        """従来と同じ構成のJSONをバッチ単位でストリーミングする"""
+        monkeypatch.setattr(BackupService, 'STREAM_BATCH_SIZE', 3)
+        response = client.get('/backup/create')
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == 'application/json'
+        assert response.headers['Content-Disposition'].endswith('.json')
+
+        backup = json.loads(response.get_data())
+        assert list(backup) == ['backup_info', 'data', 'statistics']
+        assert backup['backup_info']['version'] == '1.0'
+        assert backup['statistics'] == {'projects_count': 7, 'branches_count': 2, 'fiscal_years_count': 2}
+        assert [project['project_code'] for project in backup['data']['projects']] == [f'PRJ{i:03d}' for i in range(7)]
+        assert backup['data']['projects'][1] == {
+            'id': 2,
+            'project_code': 'PRJ001',
+            'project_name': '案件1',
+            'branch_id': 2,
+            'fiscal_year': 2024,
+            'order_probability': 50.0,
+            'revenue': 1000001.0,
+            'expenses': 800000.0,
+            'created_at': '2024-04-01T09:00:00',
+            'updated_at': '2024-04-02T09:00:00',
+        }
+        assert backup['data']['branches'][1]['is_active'] is False
+        assert backup['data']['fiscal_years'][1] == {
+            'id': 2, 'year': 2025, 'year_name': '2025年度', 'is_active': False,
+            'created_at': backup['data']['fiscal_years'][1]['created_at'],
+            'updated_at': backup['data']['fiscal_years'][1]['updated_at'],
+        }
+
+    def test_without_pretty_print(self, client, sample_data):
+        """インデントせず1行1レコードで出力する"""
+        body = client.get('/backup/create').get_data().decode('utf-8')
+        assert '\n  ' not in body
+        assert sum(1 for line in body.splitlines() if line.startswith('{"id"')) == 11
+
+    def test_gzip_backup_can_be_uploaded(self, client, sample_data):
+        """gzip 圧縮したバックアップを生成し、そのままアップロードできる"""
+        response = client.get('/backup/create?compress=gzip')
+
+        assert response.mimetype == 'application/gzip'
+        assert response.headers['Content-Disposition'].endswith('.json.gz')
+        body = response.get_data()
+        backup = json.loads(gzip.decompress(body))
+        assert backup['statistics']['projects_count'] == 7
+
+        upload = client.post('/backup/upload', data={
+            'backup_file': (io.BytesIO(body), 'backup.json.gz')
+        }, content_type='multipart/form-data')
+        assert upload.status_code == 200
+        assert upload.get_json()['preview']['backup_data']['projects'] == 7
+
+    def test_broken_gzip_upload(self, client):
+        """壊れた gzip ファイルはJSON形式エラーとして扱う"""
+        response = client.post('/backup/upload', data={
+            'backup_file': (io.BytesIO(b'not gzip'), 'backup.json.gz')
+        }, content_type='multipart/form-data')
+        assert response.status_code == 400
+        assert 'ファイル形式が正しくありません' in response.get_json()['error']
+
+    def test_empty_tables(self, client, app):
+        """データが無くても有効なJSONになる"""
+        backup = json.loads(client.get('/backup/create').get_data())
+        assert backup['data'] == {'projects': [], 'branches': [], 'fiscal_years': []}
+        assert backup['statistics'] == {'projects_count': 0, 'branches_count': 0, 'fiscal_years_count': 0}
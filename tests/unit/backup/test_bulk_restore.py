@@ -0,0 +1,127 @@
+"""
+一括INSERTによるリストアのテスト
+"""
+import pytest
+from datetime import datetime
+from sqlalchemy import event
+from app import create_app, db
+from app.models import Project, Branch, FiscalYear
+from app.services.backup_service import BackupService
+
+
+def _backup_data(projects=20):
+    """旧IDが新IDと一致しない支社を含むバックアップデータ"""
+    return {
+        'fiscal_years': [
+            {'id': 7, 'year': 2024, 'year_name': '2024年度', 'is_active': True,
+             'created_at': '2024-01-01T00:00:00', 'updated_at': None},
+        ],
+        'branches': [
+            {'id': 11, 'branch_code': 'TKY', 'branch_name': '東京本社', 'is_active': True,
+             'created_at': '2024-01-01T00:00:00', 'updated_at': '2024-02-01T00:00:00'},
+            {'id': 12, 'branch_code': 'OSK', 'branch_name': '大阪支社', 'is_active': False,
+             'created_at': '2024-01-01T00:00:00', 'updated_at': '2024-02-01T00:00:00'},
+        ],
+        'projects': [
+            {'id': 100 + i, 'project_code': f'PRJ{i:03d}', 'project_name': f'案件{i}',
+             'branch_id': 12 if i % 2 else 11, 'fiscal_year': 2024, 'order_probability': 50.0,
+             'revenue': 1000000.0 + i, 'expenses': 800000.0,
+             'created_at': '2024-03-01T09:00:00', 'updated_at': f'2024-03-02T09:00:{i % 60:02d}.123456'}
+            for i in range(projects)
+        ],
+    }
+
+
+class TestBulkRestore:
+    """BackupService.restore のテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def existing_data(self, app):
+        """リストアで置き換えられる既存データ"""
+        branch = Branch(branch_code='OLD', branch_name='旧支社', is_active=True)
+        db.session.add(branch)
+        db.session.add(FiscalYear(year=2020, year_name='2020年度', is_active=True))
+        db.session.flush()
+        db.session.add(Project(project_code='OLD001', project_name='旧案件', branch_id=branch.id,
+                               fiscal_year=2020, order_probability=0, revenue=1, expenses=0))
+        db.session.commit()
+
+    def test_restore_replaces_data(self, app, existing_data):
+        """既存データを置き換え、支社IDを新しいIDに対応付ける"""
+        result = BackupService.restore(_backup_data(), chunk_size=7)
+
+        assert result['success'] is True
+        assert result['statistics'] == {
+            'projects_created': 20, 'branches_created': 2, 'fiscal_years_created': 1, 'total_created': 23
+        }
+        assert Project.query.filter_by(project_code='OLD001').first() is None
+        assert {branch.branch_code for branch in Branch.query.all()} == {'TKY', 'OSK'}
+
+        project = Project.query.filter_by(project_code='PRJ001').first()
+        assert project.branch.branch_code == 'OSK'
+        assert project.updated_at == datetime(2024, 3, 2, 9, 0, 1, 123456)
+        assert Project.query.filter_by(project_code='PRJ002').first().branch.branch_code == 'TKY'
+        assert Branch.query.filter_by(branch_code='OSK').first().is_active is False
+        fiscal_year = FiscalYear.query.first()
+        assert fiscal_year.created_at == datetime(2024, 1, 1)
+        assert fiscal_year.updated_at is not None
+
+    def test_chunked_inserts(self, app, existing_data):
+        """プロジェクトはチャンク単位の executemany で登録し、支社IDの対応付けは1回のSELECT"""
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, executemany))
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            BackupService.restore(_backup_data(), chunk_size=7)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        project_inserts = [item for item in statements if item[0].startswith('INSERT INTO projects')]
+        assert len(project_inserts) == 3
+        assert all(executemany for _, executemany in project_inserts)
+        # 変更番号の採番・履歴の記録（change_counter）を除くと、支社の対応付けの1回のみ
+        selects = [item for item in statements if item[0].startswith('SELECT') and 'change_counter' not in item[0]]
+        assert len(selects) == 1
+
+    def test_unknown_branch_uses_first_branch(self, app):
+        """対応する支社が無いプロジェクトは最初の支社に割り当てる"""
+        data = _backup_data(projects=1)
+        data['projects'][0]['branch_id'] = 999
+
+        assert BackupService.restore(data)['success'] is True
+        assert Project.query.first().branch.branch_code == 'TKY'
+
+    def test_restore_is_atomic(self, app, existing_data):
+        """途中で失敗した場合は既存データが残る"""
+        data = _backup_data()
+        data['projects'][15]['project_code'] = 'PRJ000'
+
+        result = BackupService.restore(data, chunk_size=7)
+
+        assert result['success'] is False
+        assert 'リストア実行中にエラーが発生しました' in result['error']
+        assert [project.project_code for project in Project.query.all()] == ['OLD001']
+        assert [branch.branch_code for branch in Branch.query.all()] == ['OLD']
+
+    def test_projects_without_branches(self, app, existing_data):
+        """支社データが無い場合はエラー"""
+        data = _backup_data(projects=1)
+        data['branches'] = []
+
+        result = BackupService.restore(data)
+        assert result['success'] is False
+        assert Project.query.count() == 1
@@ -0,0 +1,298 @@
+"""
+差分バックアップ（ウォーターマークとトゥームストーン）のテスト
+"""
+import io
+import json
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app import create_app, db
+from app.models import Project, Branch, FiscalYear, DeletedRecord, BackupHistory
+from app.services.backup_service import BackupService
+
+
+def _write_backup(path, since=None):
+    """バックアップをファイルに書き出し、内容を返す"""
+    content = b''.join(BackupService.iter_backup(since=since))
+    path.write_bytes(content)
+    return json.loads(content)
+
+
+def _snapshot():
+    """比較用に現在のデータを自然キーで取得"""
+    return {
+        'projects': {
+            project.project_code: (project.project_name, project.branch.branch_code, float(project.revenue))
+            for project in Project.query.all()
+        },
+        'branches': {branch.branch_code: branch.branch_name for branch in Branch.query.all()},
+        'fiscal_years': {fiscal_year.year: fiscal_year.year_name for fiscal_year in FiscalYear.query.all()},
+    }
+
+
+class TestIncrementalBackup:
+    """差分バックアップの作成と適用のテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        return app.test_client()
+
+    @pytest.fixture
+    def sample_data(self, app):
+        """1時間前に更新された既存データ"""
+        tokyo = Branch(branch_code='TKY', branch_name='東京本社', is_active=True)
+        osaka = Branch(branch_code='OSK', branch_name='大阪支社', is_active=True)
+        db.session.add_all([tokyo, osaka, FiscalYear(year=2024, year_name='2024年度', is_active=True)])
+        db.session.flush()
+        for i in range(10):
+            db.session.add(Project(project_code=f'PRJ{i:03d}', project_name=f'案件{i}',
+                                   branch_id=tokyo.id if i % 2 else osaka.id, fiscal_year=2024,
+                                   order_probability=50, revenue=1000 + i, expenses=500))
+        db.session.commit()
+        past = datetime.utcnow() - timedelta(hours=1)
+        for model in (Project, Branch, FiscalYear):
+            db.session.execute(update(model).values(updated_at=past))
+        db.session.commit()
+
+    def _change_data(self):
+        """フルバックアップ後の変更（更新・追加・削除）"""
+        project = Project.query.filter_by(project_code='PRJ001').first()
+        project.revenue = 9999
+        osaka = Branch.query.filter_by(branch_code='OSK').first()
+        db.session.add(Project(project_code='PRJ100', project_name='新規案件', branch_id=osaka.id,
+                               fiscal_year=2025, order_probability=100, revenue=5000, expenses=100))
+        db.session.add(FiscalYear(year=2025, year_name='2025年度', is_active=True))
+        db.session.commit()
+        Project.query.filter_by(project_code='PRJ002').first().delete_with_validation()
+
+    def test_delete_records_tombstone(self, app, sample_data):
+        """ORMでの削除は自然キーのトゥームストーンとして記録される"""
+        Project.query.filter_by(project_code='PRJ003').first().delete_with_validation()
+
+        tombstone = DeletedRecord.query.one()
+        assert (tombstone.table_name, tombstone.record_key) == ('projects', 'PRJ003')
+        assert tombstone.deleted_at is not None
+
+    def test_incremental_contains_only_changes(self, app, sample_data, tmp_path):
+        """差分バックアップには変更された行と削除のみが含まれ、ウォーターマークが記録される"""
+        full = _write_backup(tmp_path / 'full.json')
+        assert full['backup_info']['backup_type'] == 'full'
+        assert list(full['data']) == ['projects', 'branches', 'fiscal_years']
+        self._change_data()
+
+        since = BackupHistory.latest_watermark()
+        incremental = _write_backup(tmp_path / 'incremental.json', since=since)
+
+        assert incremental['backup_info']['backup_type'] == 'incremental'
+        assert incremental['backup_info']['since'] == full['backup_info']['watermark']
+        assert sorted(record['project_code'] for record in incremental['data']['projects']) == ['PRJ001', 'PRJ100']
+        assert {record['branch_code'] for record in incremental['data']['projects']} == {'TKY', 'OSK'}
+        assert incremental['data']['branches'] == []
+        assert [record['year'] for record in incremental['data']['fiscal_years']] == [2025]
+        assert [(record['table'], record['key']) for record in incremental['data']['deleted']] == [('projects', 'PRJ002')]
+        assert incremental['statistics']['deleted_count'] == 1
+
+        history = BackupHistory.query.order_by(BackupHistory.id).all()
+        assert [item.backup_type for item in history] == ['full', 'incremental']
+        assert history[1].record_count == 3
+        assert history[1].deleted_count == 1
+
+    def test_key_change_records_tombstone(self, app, sample_data):
+        """ORMで自然キーを変更すると、変更前のキーがトゥームストーンとして記録される"""
+        Project.query.filter_by(project_code='PRJ003').first().project_code = 'PRJ903'
+        db.session.commit()
+        # 変更前の値を読み込まずに代入した場合も記録する
+        branch = Branch.query.filter_by(branch_code='OSK').first()
+        db.session.expire(branch, ['branch_code'])
+        branch.branch_code = 'KIX'
+        db.session.commit()
+
+        assert [(record.table_name, record.record_key) for record in DeletedRecord.query.order_by(DeletedRecord.id)] == [
+            ('projects', 'PRJ003'), ('branches', 'OSK')
+        ]
+
+    def test_watermark_includes_long_transactions(self, app, sample_data, tmp_path):
+        """バックアップの開始前に始まり後でコミットされた変更は、更新日時が古くても次の差分に含まれる"""
+        writer = db.engine.connect()
+        transaction = writer.begin()
+        writer.execute(update(Project).where(Project.project_code == 'PRJ005')
+                       .values(project_name='長いトランザクション', updated_at=datetime.utcnow() - timedelta(hours=2)))
+        chunks = BackupService.iter_backup_json()
+        full = next(chunks)
+        transaction.commit()
+        writer.close()
+        full = json.loads(full + ''.join(chunks))
+        # コミットが読み取りより後のため、ウォーターマークより大きい変更番号になる
+        assert Project.query.filter_by(project_code='PRJ005').one().change_seq > full['backup_info']['watermark']
+
+        incremental = _write_backup(tmp_path / 'incremental.json', since=BackupHistory.latest_watermark())
+        assert [record['project_name'] for record in incremental['data']['projects']] == ['長いトランザクション']
+
+        # 変更が無ければ次の差分は空で、ウォーターマークも進まない
+        empty = _write_backup(tmp_path / 'empty.json', since=BackupHistory.latest_watermark())
+        assert empty['data']['projects'] == []
+        assert empty['backup_info']['watermark'] == incremental['backup_info']['watermark']
+
+    def test_recreated_record_is_not_deleted(self, app, sample_data, tmp_path):
+        """削除後に同じコードで作り直されたレコードのトゥームストーンは出力しない"""
+        _write_backup(tmp_path / 'full.json')
+        project = Project.query.filter_by(project_code='PRJ004').first()
+        branch_id = project.branch_id
+        project.delete_with_validation()
+        db.session.add(Project(project_code='PRJ004', project_name='再登録', branch_id=branch_id,
+                               fiscal_year=2024, order_probability=0, revenue=1, expenses=0))
+        db.session.commit()
+
+        incremental = _write_backup(tmp_path / 'incremental.json', since=BackupHistory.latest_watermark())
+        assert incremental['data']['deleted'] == []
+        assert [record['project_code'] for record in incremental['data']['projects']] == ['PRJ004']
+
+    def test_restore_chain(self, app, sample_data, tmp_path):
+        """フルバックアップ＋差分の適用で、元のデータベースと同じ状態になる"""
+        _write_backup(tmp_path / 'full.json')
+        self._change_data()
+        _write_backup(tmp_path / 'incremental1.json', since=BackupHistory.latest_watermark())
+        Branch.query.filter_by(branch_code='TKY').first().branch_name = '東京本店'
+        db.session.commit()
+        _write_backup(tmp_path / 'incremental2.json', since=BackupHistory.latest_watermark())
+        expected = _snapshot()
+
+        # 別のデータに置き換えてから復元する
+        BackupService.restore({'fiscal_years': [], 'branches': [
+            {'id': 1, 'branch_code': 'XXX', 'branch_name': '別支社', 'is_active': True}
+        ], 'projects': []})
+
+        result = BackupService.restore_chain([
+            str(tmp_path / 'full.json'), str(tmp_path / 'incremental1.json'), str(tmp_path / 'incremental2.json')
+        ], chunk_size=3)
+
+        assert result['success'] is True
+        assert result['statistics']['base']['projects_created'] == 10
+        assert result['statistics']['incrementals'][0]['projects_upserted'] == 2
+        assert result['statistics']['incrementals'][0]['projects_deleted'] == 1
+        assert result['statistics']['incrementals'][1]['branches_upserted'] == 1
+        assert _snapshot() == expected
+
+    def test_restore_chain_with_renamed_key(self, app, sample_data, tmp_path):
+        """フルバックアップ後にコードを変更した場合、差分の適用後に変更前のコードの行は残らない"""
+        tokyo = Branch.query.filter_by(branch_code='TKY').first()
+        db.session.add(Project(project_code='OLD001', project_name='改番前', branch_id=tokyo.id, fiscal_year=2024,
+                               order_probability=100, revenue=100, expenses=10))
+        db.session.commit()
+        _write_backup(tmp_path / 'full.json')
+        Project.query.filter_by(project_code='OLD001').first().project_code = 'NEW001'
+        db.session.commit()
+        incremental = _write_backup(tmp_path / 'incremental.json', since=BackupHistory.latest_watermark())
+        assert incremental['data']['deleted'] == [
+            {'table': 'projects', 'key': 'OLD001', 'deleted_at': incremental['data']['deleted'][0]['deleted_at']}
+        ]
+
+        result = BackupService.restore_chain([str(tmp_path / 'full.json'), str(tmp_path / 'incremental.json')])
+
+        assert result['success'] is True
+        codes = {project.project_code for project in Project.query.all()}
+        assert 'OLD001' not in codes
+        assert 'NEW001' in codes
+        assert len(codes) == 11
+
+    def test_restore_requires_new_full_backup(self, app, client, sample_data, tmp_path):
+        """リストア後は履歴に区切りを記録し、新しいフルバックアップまで差分を作成しない"""
+        full = _write_backup(tmp_path / 'full.json')
+        result = BackupService.restore_chain([str(tmp_path / 'full.json')])
+        assert result['success'] is True
+
+        history = BackupHistory.query.order_by(BackupHistory.id).all()
+        assert [item.backup_type for item in history] == ['full', 'restore']
+        assert history[1].watermark > full['backup_info']['watermark']
+        assert BackupHistory.latest_watermark() is None
+        assert client.get('/backup/create?type=incremental').status_code == 400
+
+        _write_backup(tmp_path / 'full2.json')
+        assert BackupHistory.latest_watermark() == history[1].watermark
+
+    def test_restore_chain_rejects_gap(self, app, sample_data, tmp_path):
+        """ウォーターマークが連続しない差分は適用しない"""
+        _write_backup(tmp_path / 'full.json')
+        watermark = BackupHistory.latest_watermark()
+        _write_backup(tmp_path / 'incremental.json', since=watermark + 1)
+
+        result = BackupService.restore_chain([str(tmp_path / 'full.json'), str(tmp_path / 'incremental.json')])
+        assert result['success'] is False
+        assert '欠落' in result['error']
+        assert Project.query.count() == 10
+
+        # ウォーターマークが日時の旧形式のファイルは差分の基準にできない
+        full = json.loads((tmp_path / 'full.json').read_text(encoding='utf-8'))
+        full['backup_info']['watermark'] = '2024-04-01T00:00:00'
+        (tmp_path / 'legacy.json').write_text(json.dumps(full, ensure_ascii=False), encoding='utf-8')
+        _write_backup(tmp_path / 'incremental.json', since=watermark)
+        result = BackupService.restore_chain([str(tmp_path / 'legacy.json'), str(tmp_path / 'incremental.json')])
+        assert result['success'] is False
+        assert '変更番号' in result['error']
+
+        result = BackupService.restore_chain([str(tmp_path / 'incremental.json')])
+        assert result['success'] is False
+        assert 'フルバックアップ' in result['error']
+
+    def test_restore_chain_is_atomic(self, app, sample_data, tmp_path):
+        """差分の適用に失敗した場合はフルバックアップの適用も取り消す"""
+        _write_backup(tmp_path / 'full.json')
+        self._change_data()
+        incremental = _write_backup(tmp_path / 'incremental.json', since=BackupHistory.latest_watermark())
+        incremental['data']['projects'][0]['branch_code'] = 'NONE'
+        (tmp_path / 'incremental.json').write_text(json.dumps(incremental, ensure_ascii=False), encoding='utf-8')
+        Project.query.filter_by(project_code='PRJ005').first().delete_with_validation()
+
+        result = BackupService.restore_chain([str(tmp_path / 'full.json'), str(tmp_path / 'incremental.json')])
+
+        assert result['success'] is False
+        assert '支社' in result['error']
+        assert Project.query.filter_by(project_code='PRJ005').first() is None
+
+    def test_incremental_route(self, app, client, sample_data):
+        """基準となるバックアップが無い場合はエラー、ある場合は差分を出力"""
+        response = client.get('/backup/create?type=incremental')
+        assert response.status_code == 400
+
+        client.get('/backup/create').get_data()
+        self._change_data()
+        response = client.get('/backup/create?type=incremental')
+        assert response.status_code == 200
+        assert 'project_system_incremental_' in response.headers['Content-Disposition']
+        backup = json.loads(response.get_data())
+        assert backup['statistics']['projects_count'] == 2
+
+        response = client.get('/backup/create?type=incremental&since=invalid')
+        assert response.status_code == 400
+
+        history = client.get('/backup/history').get_json()['history']
+        assert [item['backup_type'] for item in history] == ['incremental', 'full']
+
+    def test_incremental_upload_preview(self, app, client, sample_data, tmp_path):
+        """差分バックアップのアップロードは置き換えではなく適用としてプレビューする"""
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        _write_backup(tmp_path / 'full.json')
+        self._change_data()
+        content = b''.join(BackupService.iter_backup(since=BackupHistory.latest_watermark()))
+
+        response = client.post('/backup/upload', data={'backup_file': (io.BytesIO(content), 'inc.json')},
+                               content_type='multipart/form-data')
+        preview = response.get_json()['preview']
+        assert preview['backup_info']['backup_type'] == 'incremental'
+        assert preview['backup_data']['deleted'] == 1
+        assert preview['warning']['data_will_be_replaced'] is False
+
+        response = client.post('/backup/restore', json={'session_key': response.get_json()['session_key'], 'confirm': True})
+        assert response.status_code == 200
+        assert response.get_json()['statistics']['total_upserted'] == 3
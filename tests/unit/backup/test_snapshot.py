@@ -0,0 +1,177 @@
+"""
+SQLiteスナップショットのテスト
+"""
+import pytest
+import gzip
+import os
+import sqlite3
+from app import create_app, db
+from app.models import Project, Branch, FiscalYear
+from app.services.snapshot_service import SnapshotService
+
+
+class TestSnapshot:
+    """スナップショットの作成・検証・リストアのテスト"""
+
+    @pytest.fixture
+    def app(self, tmp_path):
+        """スナップショットの保存先を一時ディレクトリにしたテスト用アプリケーション"""
+        app = create_app('testing')
+        app.config['BACKUP_SNAPSHOT_FOLDER'] = str(tmp_path / 'snapshots')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def sample_data(self, app):
+        """年度1件・支社1件・プロジェクト30件"""
+        db.session.add(FiscalYear(year=2024, year_name='2024年度', is_active=True))
+        branch = Branch(branch_code='TKY', branch_name='東京本社', is_active=True)
+        db.session.add(branch)
+        db.session.flush()
+        for i in range(30):
+            db.session.add(Project(
+                project_code=f'PRJ{i:03d}', project_name=f'案件{i}', branch_id=branch.id,
+                fiscal_year=2024, order_probability=100, revenue=1000000, expenses=800000
+            ))
+        db.session.commit()
+
+    @pytest.mark.parametrize('compress', [False, True])
+    def test_create_snapshot(self, app, sample_data, compress):
+        """一貫した複製とチェックサム付きのマニフェストを作成する"""
+        result = SnapshotService.create_snapshot(compress=compress, pages=1, sleep=0)
+
+        assert result['success'] is True
+        manifest = result['manifest']
+        assert manifest['compressed'] is compress
+        assert manifest['tables'] == {'projects': 30, 'branches': 1, 'fiscal_years': 1}
+        assert manifest['file'].endswith('.db.gz' if compress else '.db')
+        path = SnapshotService.snapshot_file_path(manifest['name'])
+        assert SnapshotService.verify_snapshot(manifest['name'])['success'] is True
+
+        if compress:
+            copy_path = os.path.join(app.config['BACKUP_SNAPSHOT_FOLDER'], 'copy.db')
+            with gzip.open(path, 'rb') as src, open(copy_path, 'wb') as dst:
+                dst.write(src.read())
+            path = copy_path
+        connection = sqlite3.connect(path)
+        try:
+            assert connection.execute('SELECT COUNT(*) FROM projects').fetchone()[0] == 30
+        finally:
+            connection.close()
+
+    def test_verify_detects_corruption(self, app, sample_data):
+        """ファイルが変更されているとチェックサム不一致になる"""
+        name = SnapshotService.create_snapshot()['manifest']['name']
+        with open(SnapshotService.snapshot_file_path(name), 'ab') as f:
+            f.write(b'broken')
+
+        result = SnapshotService.verify_snapshot(name)
+        assert result['success'] is False
+        assert 'チェックサム' in result['error']
+        assert SnapshotService.restore_snapshot(name)['success'] is False
+
+    def test_restore_swaps_database(self, app, client, sample_data):
+        """リストアでスナップショットの内容がデータベースに書き戻される"""
+        response = client.post('/backup/snapshot', json={'compress': True})
+        assert response.status_code == 200
+        name = response.get_json()['snapshot']['name']
+
+        Project.query.filter(Project.project_code >= 'PRJ010').delete()
+        db.session.commit()
+        assert Project.query.count() == 10
+
+        assert client.post(f'/backup/snapshot/{name}/restore', json={}).status_code == 400
+        response = client.post(f'/backup/snapshot/{name}/restore', json={'confirm': True})
+        data = response.get_json()
+        assert data['success'] is True
+        assert data['pre_restore_file'].startswith('pre_restore_')
+        assert os.path.exists(os.path.join(app.config['BACKUP_SNAPSHOT_FOLDER'], data['pre_restore_file']))
+
+        db.session.remove()
+        assert Project.query.count() == 30
+
+    def test_restore_with_open_connections(self, app, sample_data):
+        """他の接続を開いたままリストアでき、その接続からもリストア後の内容が見える"""
+        name = SnapshotService.create_snapshot()['manifest']['name']
+        database_path = SnapshotService.database_path()
+        inode = os.stat(database_path).st_ino
+        other = sqlite3.connect(database_path)
+        try:
+            other.execute("DELETE FROM projects WHERE project_code >= 'PRJ010'")
+            other.commit()
+            assert other.execute('SELECT COUNT(*) FROM projects').fetchone() == (10,)
+
+            result = SnapshotService.restore_snapshot(name)
+
+            assert result['success'] is True
+            assert result['checkpointed'] is True
+            assert other.execute('SELECT COUNT(*) FROM projects').fetchone() == (30,)
+        finally:
+            other.close()
+        # ファイルは置き換えず、稼働中のデータベースへ書き戻している
+        assert os.stat(database_path).st_ino == inode
+        pre_restore = sqlite3.connect(os.path.join(app.config['BACKUP_SNAPSHOT_FOLDER'], result['pre_restore_file']))
+        assert pre_restore.execute('SELECT COUNT(*) FROM projects').fetchone() == (10,)
+        pre_restore.close()
+        assert not [f for f in os.listdir(app.config['BACKUP_SNAPSHOT_FOLDER']) if f.endswith('.restore.tmp')]
+
+    def test_checkpoint_retries_while_busy(self, app, monkeypatch):
+        """チェックポイントが busy の間は待って再試行し、解消しなければ False を返す"""
+        monkeypatch.setattr(SnapshotService, 'CHECKPOINT_RETRY_WAIT', 0)
+
+        class Connection:
+            def __init__(self, results):
+                self.results = list(results)
+                self.calls = 0
+
+            def execute(self, statement):
+                assert statement == 'PRAGMA wal_checkpoint(TRUNCATE)'
+                self.calls += 1
+                return self
+
+            def fetchone(self):
+                return self.results.pop(0)
+
+        connection = Connection([(1, 10, 3), (1, 10, 7), (0, 0, 0)])
+        assert SnapshotService._checkpoint(connection) is True
+        assert connection.calls == 3
+
+        connection = Connection([(1, 10, 3)] * SnapshotService.CHECKPOINT_RETRIES)
+        assert SnapshotService._checkpoint(connection) is False
+        assert connection.calls == SnapshotService.CHECKPOINT_RETRIES
+
+    def test_list_and_download(self, client, sample_data):
+        """一覧とダウンロード"""
+        name = client.post('/backup/snapshot').get_json()['snapshot']['name']
+
+        snapshots = client.get('/backup/snapshot').get_json()['snapshots']
+        assert [snapshot['name'] for snapshot in snapshots] == [name]
+
+        response = client.get(f'/backup/snapshot/{name}/download')
+        assert response.status_code == 200
+        assert response.get_data().startswith(b'SQLite format 3')
+        assert client.get('/backup/snapshot/unknown/download').status_code == 404
+        assert client.get('/backup/snapshot/..%2Fconfig/download').status_code == 404
+
+    def test_cli(self, app, sample_data):
+        """CLIコマンドから作成・検証できる"""
+        runner = app.test_cli_runner()
+
+        result = runner.invoke(args=['snapshot', 'create', '--compress'])
+        assert result.exit_code == 0
+        name = result.output.split(':')[0]
+
+        assert runner.invoke(args=['snapshot', 'verify', name]).exit_code == 0
+        assert name in runner.invoke(args=['snapshot', 'list']).output
+        failed = runner.invoke(args=['snapshot', 'verify', 'unknown'])
+        assert failed.exit_code != 0
+        assert '見つかりません' in failed.output
@@ -0,0 +1,181 @@
+"""
+年度内期間（月・四半期・半期）の保存列と集計のテスト
+"""
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event, insert
+from app import create_app, db
+from app.models import Branch, Project, fiscal_period
+from app.services.dashboard_service import DashboardService
+
+
+class TestFiscalPeriods:
+    """fiscal_month / fiscal_quarter / fiscal_half のテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def branches(self, app):
+        """2支社のプロジェクト（2024年度の4月・7月・翌年3月、2023年度の1件）"""
+        tokyo = Branch(branch_code='TKY', branch_name='東京支社', is_active=True)
+        osaka = Branch(branch_code='OSK', branch_name='大阪支社', is_active=True)
+        db.session.add_all([tokyo, osaka])
+        db.session.flush()
+        rows = [
+            ('P1', tokyo, 2024, 100, datetime(2024, 4, 10), 1000, 600),
+            ('P2', tokyo, 2024, 50, datetime(2024, 7, 1), 2000, 1500),
+            ('P3', osaka, 2024, 100, datetime(2025, 3, 31, 23, 59), 500, 100),
+            ('P4', osaka, 2023, 100, datetime(2024, 2, 1), 9999, 0),
+        ]
+        for code, branch, year, probability, created_at, revenue, expenses in rows:
+            db.session.add(Project(
+                project_code=code, project_name=code, branch_id=branch.id, fiscal_year=year,
+                order_probability=probability, revenue=revenue, expenses=expenses,
+                created_at=created_at, updated_at=created_at
+            ))
+        db.session.commit()
+        return tokyo, osaka
+
+    @pytest.mark.parametrize('month, expected', [
+        (4, (1, 1, 1)), (6, (3, 1, 1)), (7, (4, 2, 1)), (9, (6, 2, 1)),
+        (10, (7, 3, 2)), (12, (9, 3, 2)), (1, (10, 4, 2)), (3, (12, 4, 2)),
+    ])
+    def test_fiscal_period(self, month, expected):
+        """4月始まりの年度内の月・四半期・半期"""
+        assert fiscal_period(datetime(2024, month, 15)) == expected
+
+    def test_computed_on_insert(self, app, branches):
+        """ORM・Core の一括INSERTのどちらでも売上計上日から計算される"""
+        project = Project.query.filter_by(project_code='P3').one()
+        assert (project.fiscal_month, project.fiscal_quarter, project.fiscal_half) == (12, 4, 2)
+
+        db.session.execute(insert(Project.__table__), [{
+            'project_code': 'BULK', 'project_name': 'BULK', 'branch_id': branches[0].id, 'fiscal_year': 2024,
+            'order_probability': 0, 'revenue': 1, 'expenses': 0,
+            'created_at': datetime(2024, 11, 5), 'updated_at': datetime(2024, 11, 5),
+        }])
+        db.session.commit()
+        bulk = Project.query.filter_by(project_code='BULK').one()
+        assert (bulk.fiscal_month, bulk.fiscal_quarter, bulk.fiscal_half) == (8, 3, 2)
+
+    def test_recomputed_when_date_changes(self, app, branches):
+        """ORM で売上計上日を変更すると再計算される"""
+        project = Project.query.filter_by(project_code='P1').one()
+        project.project_name = '名称のみ変更'
+        db.session.commit()
+        assert project.fiscal_month == 1
+
+        project.created_at = datetime(2024, 10, 1)
+        db.session.commit()
+        assert (project.fiscal_month, project.fiscal_quarter, project.fiscal_half) == (7, 3, 2)
+
+    def test_monthly_trend(self, app, branches):
+        """月別推移は年度内の月の列で集計する"""
+        trend = DashboardService.get_monthly_revenue_trend(2024)
+
+        assert trend['fiscal_year'] == 2024
+        assert trend['months'][0] == '2024/04'
+        assert trend['months'][-1] == '2025/03'
+        assert trend['overall']['revenues'][0] == 1000
+        assert trend['overall']['revenues'][3] == 2000
+        assert trend['overall']['revenues'][11] == 500
+        assert trend['overall']['profits'][11] == 400
+        assert sum(trend['overall']['counts']) == 3
+        assert [branch['branch_code'] for branch in trend['branches']] == ['OSK', 'TKY']
+
+    def test_monthly_trend_filters(self, app, branches):
+        """支社・受注角度で絞り込める"""
+        tokyo, _ = branches
+        trend = DashboardService.get_monthly_revenue_trend(2024, branch_ids=[tokyo.id], order_probabilities=[100])
+
+        assert sum(trend['overall']['counts']) == 1
+        assert [branch['branch_code'] for branch in trend['branches']] == ['TKY']
+
+    def test_grouped_without_datetime_columns(self, app, branches):
+        """集計クエリは保存済みの期間の列で GROUP BY し、作成日時を読み込まない"""
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', record)
+        try:
+            DashboardService.get_fiscal_period_summary(2024, 'quarter')
+        finally:
+            for engine in db.engines.values():
+                event.remove(engine, 'before_cursor_execute', record)
+
+        aggregate = next(statement for statement in statements if 'GROUP BY' in statement)
+        selected, _, grouped = aggregate.partition(' GROUP BY ')
+        assert 'projects.fiscal_quarter' in grouped
+        assert 'created_at' not in grouped
+        assert 'created_at' not in selected.split('FROM')[0]
+
+    def test_filtered_by_revenue_date_fiscal_year(self, app, branches):
+        """登録上の年度ではなく、期間の列と同じ売上計上日の年度で集計する"""
+        tokyo, _ = branches
+        db.session.add(Project(
+            project_code='P5', project_name='P5', branch_id=tokyo.id, fiscal_year=2025,
+            order_probability=100, revenue=700, expenses=0,
+            created_at=datetime(2026, 5, 10), updated_at=datetime(2026, 5, 10)
+        ))
+        db.session.commit()
+
+        assert sum(DashboardService.get_monthly_revenue_trend(2025)['overall']['counts']) == 0
+        trend = DashboardService.get_monthly_revenue_trend(2026)
+        assert trend['months'][1] == '2026/05'
+        assert trend['overall']['revenues'][1] == 700
+        assert sum(trend['overall']['counts']) == 1
+
+    def test_quarter_and_half_api(self, client, branches):
+        """四半期・半期の集計API"""
+        quarter = client.get('/api/fiscal-period-summary?year=2024&period=quarter').get_json()
+        assert quarter['labels'] == ['第1四半期', '第2四半期', '第3四半期', '第4四半期']
+        assert quarter['overall']['revenues'] == [1000, 2000, 0, 500]
+
+        half = client.get('/api/fiscal-period-summary?year=2024&period=half').get_json()
+        assert half['labels'] == ['上期', '下期']
+        assert half['overall']['counts'] == [2, 1]
+
+        response = client.get('/api/fiscal-period-summary?year=2024&period=week')
+        assert response.status_code == 400
+
+    def test_migration_backfills_existing_rows(self, tmp_path):
+        """既存のテーブルに列を追加し、作成日時から値を埋める"""
+        sys.path.insert(0, str(Path(__file__).resolve().parents[3] / 'migrations'))
+        try:
+            from migrate import add_fiscal_period_columns
+        finally:
+            sys.path.pop(0)
+
+        connection = sqlite3.connect(tmp_path / 'legacy.db')
+        connection.execute('CREATE TABLE projects (id INTEGER PRIMARY KEY, fiscal_year INTEGER, created_at DATETIME)')
+        connection.execute("INSERT INTO projects VALUES (1, 2024, '2025-01-15 10:00:00.000000')")
+        add_fiscal_period_columns(connection.cursor())
+        # 2回目は何もしない
+        add_fiscal_period_columns(connection.cursor())
+
+        assert connection.execute(
+            'SELECT fiscal_month, fiscal_quarter, fiscal_half FROM projects'
+        ).fetchone() == (10, 4, 2)
+        indexes = {row[1] for row in connection.execute("PRAGMA index_list('projects')")}
+        assert 'idx_projects_fiscal_year_quarter' in indexes
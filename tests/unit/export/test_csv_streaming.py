@@ -0,0 +1,100 @@
+"""
+CSVストリーミングエクスポートのテスト
+"""
+import pytest
+import csv
+import io
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import Project, Branch
+from app.services.export_service import ExportService
+
+
+class TestCsvStreamingExport:
+    """/export/csv のストリーミング出力のテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def projects(self, app):
+        """作成日時をずらした25件のプロジェクト"""
+        tokyo = Branch(branch_code='TKY', branch_name='東京支社', is_active=True)
+        osaka = Branch(branch_code='OSK', branch_name='大阪支社', is_active=True)
+        db.session.add_all([tokyo, osaka])
+        db.session.flush()
+        base = datetime(2024, 4, 1, 9, 0, 0)
+        for i in range(25):
+            db.session.add(Project(
+                project_code=f'PRJ{i:03d}',
+                project_name=f'案件{i}, "引用"' if i == 0 else f'案件{i}',
+                branch_id=tokyo.id if i % 2 == 0 else osaka.id,
+                fiscal_year=2024 if i < 20 else 2025,
+                order_probability=[100, 50, 0][i % 3],
+                revenue=1000000 + i,
+                expenses=800000,
+                created_at=base + timedelta(minutes=i),
+                updated_at=base + timedelta(minutes=i)
+            ))
+        db.session.commit()
+        return tokyo, osaka
+
+    def _read(self, response):
+        body = response.get_data()
+        return body, list(csv.reader(io.StringIO(body.decode('utf-8-sig'))))
+
+    def test_streams_all_rows(self, client, projects, monkeypatch):
+        """全件がバッチ単位でストリーミングされ、BOMは先頭に1回だけ付く"""
+        monkeypatch.setattr(ExportService, 'STREAM_BATCH_SIZE', 7)
+        response = client.get('/export/csv')
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == 'text/csv'
+        assert 'attachment; filename=projects_export_' in response.headers['Content-Disposition']
+
+        body, rows = self._read(response)
+        assert body.startswith(b'\xef\xbb\xbf')
+        assert body.count(b'\xef\xbb\xbf') == 1
+        assert rows[0] == ExportService.CSV_HEADERS
+        assert len(rows) == 26
+        # 作成日の降順
+        assert rows[1][0] == 'PRJ024'
+        assert rows[-1][0] == 'PRJ000'
+
+    def test_row_format(self, client, projects):
+        """各列の書式が従来のエクスポートと同じ"""
+        _, rows = self._read(client.get('/export/csv?project_code=PRJ000'))
+
+        assert rows[1] == [
+            'PRJ000', '案件0, "引用"', '東京支社', 'TKY', '2024', '〇 100%', '100',
+            '1000000.0', '800000.0', '200000.0', '2024-04-01 09:00:00', '2024-04-01 09:00:00'
+        ]
+
+    def test_filters(self, client, projects):
+        """検索条件が適用される"""
+        tokyo, osaka = projects
+        _, rows = self._read(client.get(f'/export/csv?branch_id={osaka.id}&fiscal_year=2024'))
+        assert len(rows) == 11
+        assert {row[2] for row in rows[1:]} == {'大阪支社'}
+
+        _, rows = self._read(client.get('/export/csv?order_probability_min=50&order_probability_max=50'))
+        assert {row[6] for row in rows[1:]} == {'50'}
+
+    def test_empty_result(self, client, app):
+        """該当データが無い場合はヘッダーのみ"""
+        body, rows = self._read(client.get('/export/csv'))
+        assert rows == [ExportService.CSV_HEADERS]
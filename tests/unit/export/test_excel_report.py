@@ -0,0 +1,134 @@
+"""
+分析用Excelレポートのテスト
+"""
+import pytest
+import io
+from datetime import datetime, timedelta
+from openpyxl import load_workbook
+from sqlalchemy import event
+from app import create_app, db
+from app.models import Project, Branch
+from app.services.export_service import ExportService
+
+
+class TestExcelReport:
+    """/export/report.xlsx のテスト"""
+
+    @pytest.fixture
+    def app(self, tmp_path):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        app.config['EXPORT_CACHE_FOLDER'] = str(tmp_path / 'export_cache')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def projects(self, app):
+        """2支社・2年度・3段階の受注角度にまたがる6件のプロジェクト"""
+        tokyo = Branch(branch_code='TKY', branch_name='東京支社', is_active=True)
+        osaka = Branch(branch_code='OSK', branch_name='大阪支社', is_active=True)
+        db.session.add_all([tokyo, osaka])
+        db.session.flush()
+        base = datetime(2024, 4, 1, 9, 0, 0)
+        rows = [
+            (tokyo, 2024, 100, 1000000, 600000),
+            (tokyo, 2024, 50, 2000000, 1500000),
+            (tokyo, 2025, 0, 500000, 400000),
+            (osaka, 2024, 100, 3000000, 2000000),
+            (osaka, 2025, 50, 1000000, 800000),
+            (osaka, 2025, 50, 400000, 300000),
+        ]
+        for i, (branch, year, probability, revenue, expenses) in enumerate(rows):
+            db.session.add(Project(
+                project_code=f'PRJ{i:03d}',
+                project_name=f'案件{i}',
+                branch_id=branch.id,
+                fiscal_year=year,
+                order_probability=probability,
+                revenue=revenue,
+                expenses=expenses,
+                created_at=base + timedelta(minutes=i),
+                updated_at=base + timedelta(minutes=i)
+            ))
+        db.session.commit()
+
+    def _rows(self, worksheet):
+        return [list(row) for row in worksheet.iter_rows(values_only=True)]
+
+    def test_report_sheets(self, client, projects):
+        """明細・支社別・年度別・受注角度別のシートが出力される"""
+        response = client.get('/export/report.xlsx')
+
+        assert response.status_code == 200
+        assert response.mimetype == ExportService.EXCEL_MIMETYPE
+        assert 'projects_report_' in response.headers['Content-Disposition']
+        workbook = load_workbook(io.BytesIO(response.get_data()))
+        assert workbook.sheetnames == ['プロジェクト一覧', '支社別集計', '年度別集計', '受注角度別パイプライン']
+
+        detail = self._rows(workbook['プロジェクト一覧'])
+        assert detail[0] == ExportService.CSV_HEADERS
+        assert len(detail) == 7
+
+        branch = self._rows(workbook['支社別集計'])
+        assert branch[0] == ['支社コード', '支社名', '件数', '売上合計', '経費合計', '粗利合計', '粗利率(%)', '加重売上', '加重粗利']
+        assert branch[1] == ['OSK', '大阪支社', 3, 4400000, 3100000, 1300000, 29.5, 3700000, 1150000]
+        assert branch[2] == ['TKY', '東京支社', 3, 3500000, 2500000, 1000000, 28.6, 2000000, 650000]
+        assert branch[3] == ['合計', None, 6, 7900000, 5600000, 2300000, 29.1, 5700000, 1800000]
+
+        year = self._rows(workbook['年度別集計'])
+        assert [row[:3] for row in year[1:]] == [[2024, 3, 6000000], [2025, 3, 1900000], ['合計', 6, 7900000]]
+
+        pipeline = self._rows(workbook['受注角度別パイプライン'])
+        assert [row[:4] for row in pipeline[1:]] == [
+            ['〇 100%', 100, 2, 4000000],
+            ['△ 50%', 50, 3, 3400000],
+            ['× 0%', 0, 1, 500000],
+            ['合計', None, 6, 7900000],
+        ]
+        assert pipeline[2][7] == 1700000
+        assert workbook['支社別集計']['D2'].number_format == '#,##0'
+
+    def test_single_query(self, app, projects):
+        """明細のクエリ1本だけで出力する"""
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        # 読み取り専用エンジンに振り分けられたクエリも含めて記録する
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', record)
+        try:
+            total = ExportService.write_report(ExportService.normalize_filters({}), io.BytesIO(), batch_size=2)
+        finally:
+            for engine in db.engines.values():
+                event.remove(engine, 'before_cursor_execute', record)
+
+        assert total == 6
+        assert len(statements) == 1
+
+    def test_filters_and_rollover(self, app, projects, monkeypatch):
+        """検索条件が集計にも適用され、明細は上限行数で次のシートに続く"""
+        monkeypatch.setattr(ExportService, 'EXCEL_MAX_ROWS_PER_SHEET', 3)
+        output = io.BytesIO()
+
+        total = ExportService.write_report({'fiscal_year': 2025}, output)
+
+        workbook = load_workbook(output)
+        assert total == 3
+        assert workbook.sheetnames[:2] == ['プロジェクト一覧', 'プロジェクト一覧 (2)']
+        assert self._rows(workbook['年度別集計'])[1][:2] == [2025, 3]
+
+    def test_empty_report(self, client, app):
+        """データが無くてもヘッダーと合計行を出力する"""
+        workbook = load_workbook(io.BytesIO(client.get('/export/report.xlsx').get_data()))
+        assert self._rows(workbook['支社別集計'])[1][:3] == ['合計', None, 0]
@@ -0,0 +1,102 @@
+"""
+write_only モードのExcelエクスポートのテスト
+"""
+import pytest
+import io
+from datetime import datetime, timedelta
+from openpyxl import load_workbook
+from werkzeug.datastructures import MultiDict
+from app import create_app, db
+from app.models import Project, Branch
+from app.services.export_service import ExportService
+
+
+class TestExcelStreamingExport:
+    """/export/excel のテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def projects(self, app):
+        """作成日時をずらした5件のプロジェクト"""
+        branch = Branch(branch_code='TKY', branch_name='東京支社', is_active=True)
+        db.session.add(branch)
+        db.session.flush()
+        base = datetime(2024, 4, 1, 9, 0, 0)
+        for i in range(5):
+            db.session.add(Project(
+                project_code=f'PRJ{i:03d}',
+                project_name='とても長いプロジェクト名' * 5 if i == 0 else f'案件{i}',
+                branch_id=branch.id,
+                fiscal_year=2024,
+                order_probability=100,
+                revenue=1234567,
+                expenses=1000000,
+                created_at=base + timedelta(minutes=i),
+                updated_at=base + timedelta(minutes=i)
+            ))
+        db.session.commit()
+
+    def _load(self, response):
+        return load_workbook(io.BytesIO(response.get_data()))
+
+    def test_export_excel(self, client, projects):
+        """ヘッダー・データ・書式が出力される"""
+        response = client.get('/export/excel')
+
+        assert response.status_code == 200
+        assert response.mimetype == ExportService.EXCEL_MIMETYPE
+        worksheet = self._load(response)['プロジェクト一覧']
+        rows = list(worksheet.iter_rows(values_only=True))
+        assert list(rows[0]) == ExportService.CSV_HEADERS
+        assert len(rows) == 6
+        assert rows[1][0] == 'PRJ004'
+        assert rows[1][7] == 1234567
+        assert rows[1][9] == 234567
+
+        assert worksheet['A1'].font.bold is True
+        assert worksheet['A1'].fill.start_color.rgb.endswith('366092')
+        assert worksheet['H2'].number_format == '#,##0'
+        assert worksheet['J2'].number_format == '#,##0'
+
+    def test_column_widths_are_precomputed(self, client, projects):
+        """列幅はデータの最大文字数から事前計算され、上限で切り詰められる"""
+        worksheet = self._load(client.get('/export/excel'))['プロジェクト一覧']
+
+        assert worksheet.column_dimensions['A'].width == len('プロジェクトコード') + 2
+        assert worksheet.column_dimensions['B'].width == ExportService.EXCEL_MAX_COLUMN_WIDTH
+        assert worksheet.column_dimensions['H'].width == len('1234567.0') + 2
+
+    def test_rolls_over_to_extra_sheets(self, app, projects, monkeypatch):
+        """1シートの上限行数を超えると次のシートに続きを出力する"""
+        monkeypatch.setattr(ExportService, 'EXCEL_MAX_ROWS_PER_SHEET', 3)
+        output = io.BytesIO()
+
+        total = ExportService.write_excel(ExportService.parse_filters(MultiDict()), output, batch_size=2)
+
+        workbook = load_workbook(output)
+        assert total == 5
+        assert workbook.sheetnames == ['プロジェクト一覧', 'プロジェクト一覧 (2)', 'プロジェクト一覧 (3)']
+        counts = [workbook[name].max_row for name in workbook.sheetnames]
+        assert counts == [3, 3, 2]
+        assert [row[0] for row in workbook['プロジェクト一覧 (3)'].iter_rows(min_row=2, values_only=True)] == ['PRJ000']
+
+    def test_filters(self, client, projects):
+        """検索条件が適用される"""
+        worksheet = self._load(client.get('/export/excel?project_code=PRJ001'))['プロジェクト一覧']
+        assert worksheet.max_row == 2
+
@@ -0,0 +1,188 @@
+"""
+エクスポートキャッシュのテスト
+"""
+import pytest
+import os
+import time
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import Project, Branch
+from app.services.backup_service import BackupService
+from app.services.export_cache import ExportCache
+
+
+class TestExportCache:
+    """生成済みエクスポートのキャッシュのテスト"""
+
+    @pytest.fixture
+    def app(self, tmp_path):
+        """キャッシュ保存先を一時ディレクトリにしたテスト用アプリケーション"""
+        app = create_app('testing')
+        app.config['EXPORT_CACHE_FOLDER'] = str(tmp_path / 'export_cache')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def projects(self, app):
+        """3件のプロジェクト"""
+        branch = Branch(branch_code='TKY', branch_name='東京支社', is_active=True)
+        db.session.add(branch)
+        db.session.flush()
+        base = datetime(2024, 4, 1, 9, 0, 0)
+        for i in range(3):
+            db.session.add(Project(
+                project_code=f'PRJ{i:03d}',
+                project_name=f'案件{i}',
+                branch_id=branch.id,
+                fiscal_year=2024,
+                order_probability=100,
+                revenue=1000000,
+                expenses=800000,
+                created_at=base + timedelta(minutes=i),
+                updated_at=base + timedelta(minutes=i)
+            ))
+        db.session.commit()
+        return branch
+
+    def _cached_files(self, app):
+        return sorted(os.listdir(app.config['EXPORT_CACHE_FOLDER']))
+
+    @pytest.mark.parametrize('url, extension', [('/export/csv', '.csv'), ('/export/excel', '.xlsx')])
+    def test_second_request_served_from_cache(self, app, client, projects, url, extension):
+        """2回目は生成済みファイルを send_file で返す"""
+        first = client.get(url)
+        body = first.get_data()
+        assert first.headers['ETag']
+        assert [os.path.splitext(name)[1] for name in self._cached_files(app)] == [extension]
+
+        second = client.get(url)
+        assert second.status_code == 200
+        assert second.content_length == len(body)
+        assert second.get_data() == body
+        assert second.headers['ETag'] == first.headers['ETag']
+        assert 'attachment' in second.headers['Content-Disposition']
+
+    def test_conditional_request(self, app, client, projects):
+        """ETag が一致すれば 304 を返す"""
+        first = client.get('/export/csv')
+        first.get_data()
+        etag = first.headers['ETag']
+
+        response = client.get('/export/csv', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        # 未キャッシュでも内容が同じなら生成せずに 304 を返す
+        for name in self._cached_files(app):
+            os.remove(os.path.join(app.config['EXPORT_CACHE_FOLDER'], name))
+        assert client.get('/export/csv', headers={'If-None-Match': etag}).status_code == 304
+        excel = client.get('/export/excel')
+        assert client.get('/export/excel', headers={'If-None-Match': excel.headers['ETag']}).status_code == 304
+
+    def test_normalized_filters_share_entry(self, app, client, projects):
+        """空の条件は無視され、同じ条件として同一のキャッシュを使う"""
+        first = client.get('/export/csv?project_code=&fiscal_year=')
+        first.get_data()
+        second = client.get('/export/csv')
+
+        assert first.headers['ETag'] == second.headers['ETag']
+        assert len(self._cached_files(app)) == 1
+        other = client.get('/export/csv?fiscal_year=2024')
+        assert other.headers['ETag'] != first.headers['ETag']
+        other.get_data()
+
+    def test_invalidated_by_data_change(self, app, client, projects):
+        """データの更新・追加でキャッシュキーが変わる"""
+        first = client.get('/export/csv')
+        first.get_data()
+        etag = first.headers['ETag']
+
+        project = Project.query.filter_by(project_code='PRJ000').first()
+        project.project_name = '変更後'
+        db.session.commit()
+        response = client.get('/export/csv', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert '変更後' in response.get_data().decode('utf-8-sig')
+
+        branch = db.session.get(Branch, project.branch_id)
+        branch.branch_name = '東京本社'
+        db.session.commit()
+        assert '東京本社' in client.get('/export/csv').get_data().decode('utf-8-sig')
+
+    def test_invalidated_by_restore_with_same_timestamps(self, app, client, projects):
+        """件数・ID・更新日時が同じデータへのリストアでもキャッシュキーが変わる"""
+        first = client.get('/export/csv')
+        first.get_data()
+        etag = first.headers['ETag']
+
+        backup = {
+            'fiscal_years': [],
+            'branches': [{
+                'id': projects.id, 'branch_code': 'TKY', 'branch_name': '東京支社', 'is_active': True,
+                'created_at': projects.created_at.isoformat(), 'updated_at': projects.updated_at.isoformat(),
+            }],
+            'projects': [
+                {
+                    'project_code': project.project_code, 'project_name': f'旧{project.project_name}',
+                    'branch_id': projects.id, 'fiscal_year': 2024, 'order_probability': 100,
+                    'revenue': 1000000, 'expenses': 800000,
+                    'created_at': project.created_at.isoformat(), 'updated_at': project.updated_at.isoformat(),
+                }
+                for project in Project.query.order_by(Project.id)
+            ],
+        }
+        assert BackupService.restore(backup)['success'] is True
+
+        response = client.get('/export/csv', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert '旧案件0' in response.get_data().decode('utf-8-sig')
+
+    def test_download_link_reports_cached(self, client, projects):
+        """download-link は生成済みかどうかを返す"""
+        assert client.get('/export/csv/download-link').get_json()['cached'] is False
+        client.get('/export/csv').get_data()
+        assert client.get('/export/csv/download-link').get_json()['cached'] is True
+
+        assert client.get('/export/excel/download-link').get_json()['cached'] is False
+        client.get('/export/excel')
+        assert client.get('/export/excel/download-link').get_json()['cached'] is True
+
+    def test_interrupted_stream_is_not_cached(self, app, projects):
+        """途中で打ち切られた出力は登録しない"""
+        cache = ExportCache.from_app()
+        stream = cache.tee(iter([b'a', b'b']), 'key', 'csv')
+        assert next(stream) == b'a'
+        stream.close()
+
+        assert not cache.exists('key', 'csv')
+        assert self._cached_files(app) == []
+
+    def test_lru_cleanup(self, tmp_path):
+        """上限を超えると最終利用日時の古いものから削除する"""
+        cache = ExportCache(tmp_path, max_bytes=25)
+        now = time.time()
+        for index, key in enumerate(['old', 'used', 'new']):
+            output, temp_path = cache.open_temp('csv')
+            with output:
+                output.write(b'x' * 10)
+            cache.commit(temp_path, key, 'csv')
+            os.utime(cache.path_for(key, 'csv'), (now - 100 + index, now - 100 + index))
+        # 3件目の登録時点で上限超過のため最古の 'old' が削除される
+        assert not cache.exists('old', 'csv')
+
+        assert cache.get('used', 'csv')
+        output, temp_path = cache.open_temp('csv')
+        with output:
+            output.write(b'x' * 10)
+        cache.commit(temp_path, 'latest', 'csv')
+
+        assert cache.exists('used', 'csv')
+        assert not cache.exists('new', 'csv')
+        assert cache.exists('latest', 'csv')
@@ -0,0 +1,236 @@
+"""
+非同期エクスポートジョブのテスト
+"""
+import pytest
+import csv
+import io
+import os
+import socket
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from openpyxl import load_workbook
+from app import create_app, db
+from app.models import Project, Branch, ExportJob
+from app.services.export_job_service import ExportJobService
+from app.services.export_service import ExportService
+
+
+class TestExportJobs:
+    """/export/jobs のテスト"""
+
+    @pytest.fixture
+    def app(self, tmp_path):
+        """ジョブの出力先を一時ディレクトリにしたテスト用アプリケーション"""
+        app = create_app('testing')
+        app.config['EXPORT_JOB_FOLDER'] = str(tmp_path / 'export_jobs')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def projects(self, app):
+        """2支社にまたがる12件のプロジェクト"""
+        tokyo = Branch(branch_code='TKY', branch_name='東京支社', is_active=True)
+        osaka = Branch(branch_code='OSK', branch_name='大阪支社', is_active=True)
+        db.session.add_all([tokyo, osaka])
+        db.session.flush()
+        base = datetime(2024, 4, 1, 9, 0, 0)
+        for i in range(12):
+            db.session.add(Project(
+                project_code=f'PRJ{i:03d}',
+                project_name=f'案件{i}',
+                branch_id=tokyo.id if i % 2 == 0 else osaka.id,
+                fiscal_year=2024,
+                order_probability=100,
+                revenue=1000000,
+                expenses=800000,
+                created_at=base + timedelta(minutes=i),
+                updated_at=base + timedelta(minutes=i)
+            ))
+        db.session.commit()
+        return tokyo, osaka
+
+    def _submit(self, client, **payload):
+        response = client.post('/export/jobs', json=payload)
+        assert response.status_code == 202
+        return response.get_json()['job']
+
+    def test_excel_job(self, app, client, projects, monkeypatch):
+        """Excelをバックグラウンドで生成し、完了後にダウンロードできる"""
+        monkeypatch.setattr(ExportService, 'STREAM_BATCH_SIZE', 5)
+        job = self._submit(client, format='excel')
+        assert job['status'] == ExportJob.STATUS_QUEUED
+        assert job['download_url'] is None
+
+        ExportJobService.wait(job['id'], timeout=30)
+        status = client.get(job['status_url']).get_json()['job']
+        assert status['status'] == ExportJob.STATUS_COMPLETED
+        assert status['total_rows'] == 12
+        assert status['processed_rows'] == 12
+        assert status['progress'] == 100
+
+        response = client.get(status['download_url'])
+        assert response.status_code == 200
+        assert response.mimetype == ExportService.EXCEL_MIMETYPE
+        assert '.xlsx' in response.headers['Content-Disposition']
+        worksheet = load_workbook(io.BytesIO(response.get_data()))['プロジェクト一覧']
+        assert worksheet.max_row == 13
+        # 進捗ファイルは完了後に削除される
+        assert os.listdir(app.config['EXPORT_JOB_FOLDER']) == ['export_job_1.xlsx']
+
+    def test_csv_job_with_filters(self, client, projects):
+        """検索条件付きのCSVジョブ"""
+        tokyo, _ = projects
+        job = self._submit(client, format='csv', branch_id=tokyo.id, project_code='')
+
+        ExportJobService.wait(job['id'], timeout=30)
+        status = client.get(job['status_url']).get_json()['job']
+        assert status['filters'] == {'branch_id': tokyo.id}
+
+        body = client.get(status['download_url']).get_data().decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(body)))
+        assert len(rows) == 7
+        assert {row[2] for row in rows[1:]} == {'東京支社'}
+
+    def test_form_submission(self, client, projects):
+        """フォーム送信でも受け付ける"""
+        response = client.post('/export/jobs', data={'format': 'csv', 'fiscal_year': '2024'})
+        assert response.status_code == 202
+        job = response.get_json()['job']
+        ExportJobService.wait(job['id'], timeout=30)
+        assert client.get(job['status_url']).get_json()['job']['total_rows'] == 12
+
+    def test_invalid_format(self, client, projects):
+        """未対応の形式は受け付けない"""
+        response = client.post('/export/jobs', json={'format': 'pdf'})
+        assert response.status_code == 400
+        assert response.get_json()['success'] is False
+        assert ExportJob.query.count() == 0
+
+    def test_rejects_when_queue_is_full(self, app, client, projects):
+        """待機中・実行中のジョブが上限に達していれば 503"""
+        app.config['EXPORT_JOB_MAX_PENDING'] = 1
+        db.session.add(ExportJob(export_format='csv', status=ExportJob.STATUS_RUNNING))
+        db.session.commit()
+
+        response = client.post('/export/jobs', json={'format': 'csv'})
+        assert response.status_code == 503
+        assert ExportJob.query.count() == 1
+
+    def test_running_limit_across_processes(self, app, client, projects, monkeypatch):
+        """他のプロセスの実行中のジョブも同時実行数に数え、空くまで待機する"""
+        monkeypatch.setattr(ExportJobService, 'SLOT_RETRY_WAIT', 0.05)
+        app.config['EXPORT_JOB_WORKERS'] = 1
+        other = ExportJob(export_format='csv', status=ExportJob.STATUS_RUNNING,
+                          worker_id=f'{socket.gethostname()}:{os.getppid()}')
+        db.session.add(other)
+        db.session.commit()
+
+        job = self._submit(client, format='csv')
+        with pytest.raises(TimeoutError):
+            ExportJobService.wait(job['id'], timeout=0.5)
+        assert client.get(job['status_url']).get_json()['job']['status'] == ExportJob.STATUS_QUEUED
+
+        other.status = ExportJob.STATUS_COMPLETED
+        db.session.commit()
+        status = ExportJobService.wait(job['id'], timeout=30)
+        assert status.status == ExportJob.STATUS_COMPLETED
+        assert status.worker_id == ExportJobService.worker_id()
+
+    def test_orphaned_jobs_failed_at_startup(self, app, projects):
+        """停止したプロセスのジョブは、ワーカーの起動時に失敗扱いにする"""
+        host = socket.gethostname()
+        finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+        finished.wait()
+        dead = ExportJob(export_format='csv', status=ExportJob.STATUS_RUNNING, worker_id=f'{host}:{finished.pid}')
+        # PIDが再利用された場合（このプロセスと同じPIDの待機中ジョブ）
+        reused = ExportJob(export_format='csv', status=ExportJob.STATUS_QUEUED, worker_id=ExportJobService.worker_id())
+        alive = ExportJob(export_format='csv', status=ExportJob.STATUS_RUNNING, worker_id=f'{host}:{os.getppid()}')
+        remote = ExportJob(export_format='csv', status=ExportJob.STATUS_RUNNING, worker_id=f'other-host:{finished.pid}')
+        db.session.add_all([dead, reused, alive, remote])
+        db.session.commit()
+
+        # リクエスト中の整理では、このプロセスのジョブは対象外
+        ExportJobService.cleanup()
+        db.session.expire_all()
+        assert db.session.get(ExportJob, reused.id).status == ExportJob.STATUS_QUEUED
+        assert db.session.get(ExportJob, dead.id).status == ExportJob.STATUS_FAILED
+
+        create_app('testing')
+        db.session.expire_all()
+        assert db.session.get(ExportJob, reused.id).status == ExportJob.STATUS_FAILED
+        assert db.session.get(ExportJob, dead.id).error_message
+        assert db.session.get(ExportJob, alive.id).status == ExportJob.STATUS_RUNNING
+        assert db.session.get(ExportJob, remote.id).status == ExportJob.STATUS_RUNNING
+
+    def test_download_before_completion(self, client, projects):
+        """完了前のダウンロードは 409、存在しないジョブは 404"""
+        job = ExportJob(export_format='xlsx', status=ExportJob.STATUS_RUNNING, total_rows=12)
+        db.session.add(job)
+        db.session.commit()
+
+        response = client.get(f'/export/jobs/{job.id}/download')
+        assert response.status_code == 409
+        assert client.get('/export/jobs/999').status_code == 404
+
+    def test_running_progress(self, client, projects):
+        """実行中は進捗ファイルの値を返す"""
+        job = ExportJob(export_format='xlsx', status=ExportJob.STATUS_RUNNING, total_rows=12)
+        db.session.add(job)
+        db.session.commit()
+        ExportJobService._write_progress(job.id, 6)
+
+        status = client.get(f'/export/jobs/{job.id}').get_json()['job']
+        assert status['processed_rows'] == 6
+        assert status['progress'] == 50
+
+    def test_failed_job(self, app, client, projects, monkeypatch):
+        """生成に失敗したジョブは failed になりファイルは残らない"""
+        def broken(*args, **kwargs):
+            raise RuntimeError('broken')
+
+        monkeypatch.setattr(ExportService, 'write_excel', broken)
+        job = self._submit(client, format='xlsx')
+
+        ExportJobService.wait(job['id'], timeout=30)
+        status = client.get(job['status_url']).get_json()['job']
+        assert status['status'] == ExportJob.STATUS_FAILED
+        assert status['error_message']
+        assert os.listdir(app.config['EXPORT_JOB_FOLDER']) == []
+
+    def test_cleanup(self, app, projects):
+        """進捗の止まったジョブは失敗扱い、保持期間を過ぎたジョブは削除"""
+        old = datetime.utcnow() - timedelta(days=2)
+        stale = ExportJob(export_format='csv', status=ExportJob.STATUS_RUNNING, created_at=old, updated_at=old)
+        expired = ExportJob(export_format='csv', status=ExportJob.STATUS_COMPLETED, created_at=old, updated_at=old,
+                            finished_at=old, file_path=ExportJobService.file_path_for(99, 'csv'))
+        db.session.add_all([stale, expired])
+        db.session.commit()
+        with open(expired.file_path, 'w') as f:
+            f.write('x')
+        expired_path = expired.file_path
+
+        ExportJobService.cleanup()
+
+        # 中断扱いにしたジョブは保持期間の間は一覧に残る
+        assert db.session.get(ExportJob, stale.id).status == ExportJob.STATUS_FAILED
+        assert ExportJob.query.count() == 1
+        assert not os.path.exists(expired_path)
+
+    def test_list_jobs(self, client, projects):
+        """最近のジョブ一覧"""
+        job = self._submit(client, format='csv')
+        ExportJobService.wait(job['id'], timeout=30)
+
+        jobs = client.get('/export/jobs').get_json()['jobs']
+        assert [item['id'] for item in jobs] == [job['id']]
+        assert jobs[0]['download_url']
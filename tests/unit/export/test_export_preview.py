@@ -0,0 +1,141 @@
+"""
+エクスポートのプレビュー・ダウンロードリンクのテスト
+"""
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.models import Project, Branch
+
+
+class TestExportPreview:
+    """/export/preview と download-link のテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def projects(self, app):
+        """作成日時をずらした15件のプロジェクト"""
+        branch = Branch(branch_code='TKY', branch_name='東京支社', is_active=True)
+        db.session.add(branch)
+        db.session.flush()
+        base = datetime(2024, 4, 1, 9, 0, 0)
+        for i in range(15):
+            db.session.add(Project(
+                project_code=f'PRJ{i:03d}',
+                project_name=f'案件{i}',
+                branch_id=branch.id,
+                fiscal_year=2024 if i < 12 else 2025,
+                order_probability=50,
+                revenue=1000000,
+                expenses=600000,
+                created_at=base + timedelta(minutes=i),
+                updated_at=base + timedelta(minutes=i)
+            ))
+        db.session.commit()
+        return branch
+
+    @pytest.fixture
+    def statements(self, app):
+        """実行されたSQLを記録"""
+        executed = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            executed.append(statement)
+
+        # 読み取り専用エンジンに振り分けられたクエリも含めて記録する
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', record)
+        yield executed
+        for engine in db.engines.values():
+            event.remove(engine, 'before_cursor_execute', record)
+
+    @staticmethod
+    def _project_selects(statements):
+        """projects への検索（キャッシュキー用のデータのバージョン取得を除く）"""
+        return [
+            statement for statement in statements
+            if 'FROM projects' in statement and 'max(projects.id)' not in statement
+        ]
+
+    def test_preview_single_query(self, client, projects, statements):
+        """総件数と先頭10件を1回のクエリで取得する"""
+        data = client.get('/export/preview').get_json()
+
+        assert data['success'] is True
+        assert data['total_count'] == 15
+        assert data['preview_count'] == 10
+        assert data['preview_data'][0] == {
+            'project_code': 'PRJ014',
+            'project_name': '案件14',
+            'branch_name': '東京支社',
+            'branch_code': 'TKY',
+            'fiscal_year': 2025,
+            'order_probability_symbol': '△',
+            'order_probability': 50,
+            'revenue': 1000000.0,
+            'expenses': 600000.0,
+            'gross_profit': 400000.0,
+            'created_at': '2024-04-01 09:14:00',
+            'updated_at': '2024-04-01 09:14:00',
+        }
+        selects = self._project_selects(statements)
+        assert len(selects) == 1
+        assert 'OVER ()' in selects[0]
+
+    def test_preview_filters(self, client, projects):
+        """検索条件が件数とプレビューの両方に適用される"""
+        data = client.get('/export/preview?fiscal_year=2025').get_json()
+        assert data['total_count'] == 3
+        assert [row['project_code'] for row in data['preview_data']] == ['PRJ014', 'PRJ013', 'PRJ012']
+
+        data = client.get('/export/preview?project_code=NONE').get_json()
+        assert data['total_count'] == 0
+        assert data['preview_data'] == []
+
+    @pytest.mark.parametrize('url, endpoint', [
+        ('/export/csv/download-link', '/export/csv'),
+        ('/export/excel/download-link', '/export/excel'),
+    ])
+    def test_download_link(self, client, projects, url, endpoint):
+        """件数と、指定された条件だけを含むダウンロードURLを返す"""
+        data = client.get(f'{url}?fiscal_year=2024&project_name=&order_probability_min=50').get_json()
+
+        assert data['success'] is True
+        assert data['record_count'] == 12
+        assert data['download_url'] == f'{endpoint}?fiscal_year=2024&order_probability_min=50'
+        assert '12件' in data['message']
+
+    def test_preview_includes_download_links(self, client, projects, statements):
+        """プレビューの件数でダウンロードリンクを返し、件数を取り直さない"""
+        data = client.get('/export/preview?fiscal_year=2025').get_json()
+
+        links = data['download_links']
+        assert links['csv']['download_url'] == '/export/csv?fiscal_year=2025'
+        assert links['excel']['download_url'] == '/export/excel?fiscal_year=2025'
+        assert links['csv']['record_count'] == links['excel']['record_count'] == 3
+        assert len(self._project_selects(statements)) == 1
+        assert len([statement for statement in statements if 'max(projects.id)' in statement]) == 1
+
+    def test_download_link_ignores_client_count(self, client, projects, statements):
+        """クライアントが渡した件数（record_count）は使わず、サーバー側で集計した件数を返す"""
+        data = client.get('/export/csv/download-link?fiscal_year=2024&record_count=99999').get_json()
+
+        assert data['record_count'] == 12
+        assert '12件' in data['message']
+        assert data['download_url'] == '/export/csv?fiscal_year=2024'
+        assert len(self._project_selects(statements)) == 1
@@ -0,0 +1,111 @@
+"""
+NDJSONエクスポートのテスト
+"""
+import pytest
+import gzip
+import json
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import Project, Branch
+from app.services.export_service import ExportService
+
+
+class TestNdjsonExport:
+    """/export/ndjson のテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def projects(self, app):
+        """更新日時をずらした5件のプロジェクト"""
+        branch = Branch(branch_code='TKY', branch_name='東京支社', is_active=True)
+        db.session.add(branch)
+        db.session.flush()
+        base = datetime(2024, 4, 1, 9, 0, 0)
+        for i in range(5):
+            db.session.add(Project(
+                project_code=f'PRJ{i:03d}',
+                project_name=f'案件{i}',
+                branch_id=branch.id,
+                fiscal_year=2024,
+                order_probability=[100, 50, 0][i % 3],
+                revenue=1000000,
+                expenses=750000,
+                created_at=base,
+                updated_at=base + timedelta(hours=4 - i)
+            ))
+        db.session.commit()
+        return branch
+
+    def _records(self, response):
+        body = response.get_data()
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return [json.loads(line) for line in body.decode('utf-8').splitlines()]
+
+    def test_gzip_stream(self, client, projects, monkeypatch):
+        """gzip 対応クライアントには圧縮したNDJSONをストリーミングする"""
+        monkeypatch.setattr(ExportService, 'STREAM_BATCH_SIZE', 2)
+        response = client.get('/export/ndjson', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == 'application/x-ndjson'
+        assert response.headers['Content-Encoding'] == 'gzip'
+        records = self._records(response)
+        # 更新日時の昇順
+        assert [record['project_code'] for record in records] == ['PRJ004', 'PRJ003', 'PRJ002', 'PRJ001', 'PRJ000']
+        assert response.headers['X-Max-Updated-At'] == '2024-04-01T13:00:00Z'
+
+    def test_record_fields(self, client, projects):
+        """英字キーと型付きの値で出力される"""
+        response = client.get('/export/ndjson?project_code=PRJ001')
+        assert 'Content-Encoding' not in response.headers
+
+        assert self._records(response) == [{
+            'id': 2,
+            'project_code': 'PRJ001',
+            'project_name': '案件1',
+            'branch_id': projects.id,
+            'branch_code': 'TKY',
+            'branch_name': '東京支社',
+            'fiscal_year': 2024,
+            'order_probability': 50,
+            'revenue': 1000000.0,
+            'expenses': 750000.0,
+            'gross_profit': 250000.0,
+            'created_at': '2024-04-01T09:00:00Z',
+            'updated_at': '2024-04-01T12:00:00Z',
+        }]
+
+    @pytest.mark.parametrize('updated_since', ['2024-04-01T11:00:00Z', '2024-04-01T20:00:00+09:00', '2024-04-01T11:00:00'])
+    def test_updated_since(self, client, projects, updated_since):
+        """updated_since 以降に更新されたデータのみ（タイムゾーンはUTCに換算）"""
+        response = client.get('/export/ndjson', query_string={'updated_since': updated_since})
+        assert [record['project_code'] for record in self._records(response)] == ['PRJ002', 'PRJ001', 'PRJ000']
+
+    def test_invalid_updated_since(self, client, projects):
+        """日時として解釈できない updated_since は 400"""
+        response = client.get('/export/ndjson?updated_since=yesterday')
+        assert response.status_code == 400
+        assert response.get_json()['success'] is False
+
+    def test_empty_result(self, client, projects):
+        """該当データが無い場合は空の本文"""
+        response = client.get('/export/ndjson?updated_since=2030-01-01', headers={'Accept-Encoding': 'gzip'})
+        assert self._records(response) == []
+        assert 'X-Max-Updated-At' not in response.headers
@@ -0,0 +1,174 @@
+"""
+チェックポイント付きインポート（中断・再開）のテスト
+"""
+import pytest
+import os
+import tempfile
+from app import create_app, db
+from app.models import Project, Branch, ImportCheckpoint
+from app.services.import_service import ImportService
+
+
+COLUMN_MAPPING = {
+    'project_code': 'プロジェクトコード',
+    'project_name': 'プロジェクト名',
+    'branch_name': '支社名',
+    'fiscal_year': '売上の年度',
+    'order_probability': '受注角度',
+    'revenue': '売上',
+    'expenses': '経費'
+}
+
+
+class WorkerKilled(BaseException):
+    """プロセス強制終了の代わりに送出する例外"""
+
+
+class TestCheckpointResume:
+    """チェックポイントと再開のテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def import_service(self):
+        """チャンクを小さくしたImportServiceインスタンス"""
+        service = ImportService()
+        service.IMPORT_CHUNK_SIZE = 2
+        return service
+
+    @pytest.fixture
+    def csv_file(self):
+        """5行（うち1行は不正）のCSV"""
+        csv_content = """プロジェクトコード,プロジェクト名,支社名,売上の年度,受注角度,売上,経費
+PRJ001,案件1,東京支社,2024,〇,100,50
+PRJ002,案件2,東京支社,2024,△,200,50
+PRJ003,案件3,大阪支社,2024,×,300,50
+PRJ004,不正な行,大阪支社,2024,無効,400,50
+PRJ005,案件5,大阪支社,2024,〇,500,50"""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False, encoding='utf-8-sig') as f:
+            f.write(csv_content)
+        yield f.name
+        if os.path.exists(f.name):
+            os.unlink(f.name)
+
+    def _interrupt_after_rows(self, import_service, monkeypatch, rows):
+        """指定行数を処理した後に強制終了させる"""
+        original = ImportService._process_row_data
+        calls = {'count': 0}
+
+        def interrupted(self, row, row_number, branch_cache=None):
+            calls['count'] += 1
+            if calls['count'] > rows:
+                raise WorkerKilled()
+            return original(self, row, row_number, branch_cache=branch_cache)
+
+        monkeypatch.setattr(ImportService, '_process_row_data', interrupted)
+
+    def test_checkpoint_is_completed(self, app, import_service, csv_file):
+        """最後まで処理するとチェックポイントが完了になる"""
+        result = import_service.execute_import(csv_file, 'csv', COLUMN_MAPPING)
+
+        assert result['success'] is True
+        assert result['success_count'] == 4
+        assert result['error_count'] == 1
+        assert result['resumed_from_chunk'] is None
+        checkpoint = db.session.get(ImportCheckpoint, result['checkpoint_id'])
+        assert checkpoint.is_completed
+        assert checkpoint.last_chunk == 2
+        assert checkpoint.processed_rows == 5
+
+    def test_interrupted_import_keeps_committed_chunks(self, app, import_service, csv_file, monkeypatch):
+        """中断時は記録済みチャンクまでのデータだけが残る"""
+        self._interrupt_after_rows(import_service, monkeypatch, 2)
+        with pytest.raises(WorkerKilled):
+            import_service.execute_import(csv_file, 'csv', COLUMN_MAPPING)
+        db.session.rollback()
+
+        assert Project.query.count() == 2
+        checkpoint = ImportCheckpoint.get_incomplete()[0]
+        assert checkpoint.last_chunk == 0
+        assert checkpoint.success_count == 2
+
+    def test_resume_skips_applied_chunks(self, app, import_service, csv_file, monkeypatch):
+        """再開時は反映済みチャンクをスキップし、重複登録しない"""
+        self._interrupt_after_rows(import_service, monkeypatch, 2)
+        with pytest.raises(WorkerKilled):
+            import_service.execute_import(csv_file, 'csv', COLUMN_MAPPING)
+        db.session.rollback()
+        monkeypatch.undo()
+        checkpoint_id = ImportCheckpoint.get_incomplete()[0].id
+
+        result = import_service.resume_import(checkpoint_id)
+
+        assert result['success'] is True
+        assert result['resumed_from_chunk'] == 1
+        assert result['success_count'] == 4
+        assert result['error_count'] == 1
+        assert [p['project_code'] for p in result['successful_projects']] == ['PRJ003', 'PRJ005']
+        assert Project.query.count() == 4
+        assert Branch.query.count() == 2
+
+        # 完了後の再開は何もしない
+        again = import_service.resume_import(checkpoint_id)
+        assert again['already_completed'] is True
+        assert Project.query.count() == 4
+
+    def test_reupload_of_same_file_resumes(self, app, import_service, csv_file, monkeypatch):
+        """同じ内容のファイルを再度取り込むと続きから再開される"""
+        self._interrupt_after_rows(import_service, monkeypatch, 1)
+        with pytest.raises(WorkerKilled):
+            import_service.execute_import(csv_file, 'csv', COLUMN_MAPPING)
+        db.session.rollback()
+        monkeypatch.undo()
+
+        result = import_service.execute_import(csv_file, 'csv', COLUMN_MAPPING)
+
+        assert result['resumed_from_chunk'] == 0
+        assert result['success_count'] == 4
+        assert ImportCheckpoint.query.count() == 1
+
+    def test_resume_rejects_modified_file(self, app, import_service, csv_file, monkeypatch):
+        """ファイル内容が変わっている場合は再開しない"""
+        self._interrupt_after_rows(import_service, monkeypatch, 1)
+        with pytest.raises(WorkerKilled):
+            import_service.execute_import(csv_file, 'csv', COLUMN_MAPPING)
+        db.session.rollback()
+        monkeypatch.undo()
+        with open(csv_file, 'a', encoding='utf-8') as f:
+            f.write('\nPRJ006,追加,東京支社,2024,〇,1,1')
+
+        result = import_service.resume_import(ImportCheckpoint.get_incomplete()[0].id)
+
+        assert result['success'] is False
+        assert Project.query.count() == 0
+
+    def test_index_lists_pending_imports(self, client, import_service, csv_file, monkeypatch):
+        """インポート画面に中断済みインポートが表示され、再開できる"""
+        self._interrupt_after_rows(import_service, monkeypatch, 2)
+        with pytest.raises(WorkerKilled):
+            import_service.execute_import(csv_file, 'csv', COLUMN_MAPPING)
+        db.session.rollback()
+        monkeypatch.undo()
+        checkpoint_id = ImportCheckpoint.get_incomplete()[0].id
+
+        response = client.get('/import/')
+        assert '中断されたインポート' in response.get_data(as_text=True)
+
+        response = client.post(f'/import/resume/{checkpoint_id}')
+        assert response.status_code == 200
+        assert Project.query.count() == 4
+        assert not os.path.exists(csv_file)
@@ -0,0 +1,175 @@
+"""
+CSV解析エンジン・文字コード判定のテスト
+"""
+import pytest
+import os
+import sys
+import tempfile
+import types
+import pandas as pd
+from app import create_app
+from app.services import import_service as import_service_module
+from app.services.import_service import ImportService
+
+
+COLUMN_MAPPING = {
+    'project_code': 'プロジェクトコード',
+    'project_name': 'プロジェクト名',
+    'branch_name': '支社名',
+    'fiscal_year': '売上の年度',
+    'order_probability': '受注角度',
+    'revenue': '売上',
+    'expenses': '経費'
+}
+
+CSV_CONTENT = """プロジェクトコード,プロジェクト名,支社名,売上の年度,受注角度,売上,経費
+001,東京案件,東京支社,2024,〇,1000000,800000
+002,大阪案件,大阪支社,2024,100,abc,300000"""
+
+
+def _write(content, encoding):
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False, encoding=encoding, newline='') as f:
+        f.write(content)
+    return f.name
+
+
+class TestCsvParseEngine:
+    """CSV読み込みのテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            yield app
+
+    @pytest.fixture
+    def import_service(self):
+        """ImportServiceインスタンス"""
+        return ImportService()
+
+    @pytest.mark.parametrize('encoding, expected', [
+        ('utf-8-sig', 'utf-8-sig'),
+        ('utf-8', 'utf-8-sig'),
+        ('cp932', 'cp932'),
+        ('shift_jis', 'cp932'),
+    ])
+    def test_detects_encoding(self, import_service, encoding, expected):
+        """BOM付き/なしUTF-8とShift_JIS/CP932を判定できる"""
+        path = _write(CSV_CONTENT, encoding)
+        try:
+            assert import_service._detect_csv_encoding(path) == expected
+            df = import_service._load_mapped_dataframe(path, 'csv', COLUMN_MAPPING)
+            assert list(df['project_name']) == ['東京案件', '大阪案件']
+        finally:
+            os.unlink(path)
+
+    def test_falls_back_when_sample_is_ascii(self, import_service):
+        """サンプル範囲がASCIIのみでも、後続がCP932なら読み直す"""
+        content = CSV_CONTENT.replace('プロジェクトコード', 'code' + ' ' * 200)
+        path = _write(content, 'cp932')
+        import_service.ENCODING_SAMPLE_BYTES = 64
+        try:
+            df = import_service._read_csv(path)
+            assert df.iloc[0, 1] == '東京案件'
+        finally:
+            os.unlink(path)
+
+    @pytest.mark.parametrize('error', ['parser', 'arrow'])
+    def test_falls_back_on_engine_errors(self, import_service, monkeypatch, error):
+        """解析エラー（ParserError・pyarrow の ArrowInvalid）でもCP932で読み直す"""
+        class ArrowInvalid(ValueError):
+            pass
+
+        pyarrow = types.ModuleType('pyarrow')
+        pyarrow.lib = types.ModuleType('pyarrow.lib')
+        pyarrow.lib.ArrowInvalid = ArrowInvalid
+        monkeypatch.setitem(sys.modules, 'pyarrow', pyarrow)
+        monkeypatch.setitem(sys.modules, 'pyarrow.lib', pyarrow.lib)
+        monkeypatch.setattr(import_service, '_resolve_csv_engine', lambda: 'c')
+        read_csv = pd.read_csv
+        encodings = []
+
+        def fake_read_csv(filepath, **options):
+            encodings.append(options['encoding'])
+            if options['encoding'] != 'cp932':
+                raise pd.errors.ParserError('invalid') if error == 'parser' else ArrowInvalid('CSV parse error')
+            return read_csv(filepath, **options)
+
+        monkeypatch.setattr(import_service_module.pd, 'read_csv', fake_read_csv)
+        content = CSV_CONTENT.replace('プロジェクトコード', 'code' + ' ' * 200)
+        path = _write(content, 'cp932')
+        import_service.ENCODING_SAMPLE_BYTES = 64
+        try:
+            df = import_service._read_csv(path)
+        finally:
+            os.unlink(path)
+
+        assert encodings == ['utf-8-sig', 'cp932']
+        assert df.iloc[0, 1] == '東京案件'
+
+    def test_malformed_csv_keeps_original_error(self, import_service, monkeypatch):
+        """CP932でも読めない場合は最初のエラーを返す"""
+        def fake_read_csv(filepath, **options):
+            raise pd.errors.ParserError(options['encoding'])
+
+        monkeypatch.setattr(import_service_module.pd, 'read_csv', fake_read_csv)
+        path = _write(CSV_CONTENT, 'utf-8')
+        try:
+            with pytest.raises(pd.errors.ParserError, match='utf-8-sig'):
+                import_service._read_csv(path)
+        finally:
+            os.unlink(path)
+
+    def test_string_fields_keep_leading_zeros(self, import_service):
+        """文字列項目は型推論されず先頭ゼロが保持される"""
+        path = _write(CSV_CONTENT, 'utf-8-sig')
+        try:
+            df = import_service._load_mapped_dataframe(path, 'csv', COLUMN_MAPPING)
+        finally:
+            os.unlink(path)
+
+        assert list(df['project_code']) == ['001', '002']
+        assert list(df['order_probability']) == ['〇', '100']
+
+    def test_numeric_fields_converted_once(self, import_service):
+        """数値項目は一括変換され、不正値は行検証用に元の値が残る"""
+        path = _write(CSV_CONTENT, 'utf-8-sig')
+        try:
+            df = import_service._load_mapped_dataframe(path, 'csv', COLUMN_MAPPING)
+        finally:
+            os.unlink(path)
+
+        assert pd.api.types.is_numeric_dtype(df['fiscal_year'])
+        assert pd.api.types.is_numeric_dtype(df['expenses'])
+        assert df['revenue'].tolist() == [1000000, 'abc']
+
+    def test_row_data_uses_converted_values(self, app, import_service):
+        """行の処理では一括変換済みの数値をそのまま使う（整数項目は整数の列になる）"""
+        content = CSV_CONTENT.replace(',2024,', ',2024.0,').replace(',abc,', ',2500.5,')
+        path = _write(content, 'utf-8-sig')
+        try:
+            df = import_service._load_mapped_dataframe(path, 'csv', COLUMN_MAPPING)
+        finally:
+            os.unlink(path)
+
+        assert df['fiscal_year'].dtype == 'int64'
+        row = next(df.iterrows())[1]
+        data = import_service._process_row_data(row, 1, branch_cache={'東京支社': 1})['data']
+        assert data['fiscal_year'] == 2024 and type(data['fiscal_year']) is int
+        assert data['revenue'] is row['revenue']
+        assert data['expenses'] is row['expenses']
+
+    def test_engine_falls_back_without_pyarrow(self, import_service, monkeypatch):
+        """pyarrow が無い環境ではCエンジンを使う"""
+        monkeypatch.setattr(import_service_module, '_pyarrow_available', lambda: False)
+        assert import_service._resolve_csv_engine() == 'c'
+
+        monkeypatch.setattr(import_service_module, '_pyarrow_available', lambda: True)
+        assert import_service._resolve_csv_engine() == 'pyarrow'
+
+    def test_engine_from_config(self, app, import_service, monkeypatch):
+        """設定でCエンジンを強制できる"""
+        monkeypatch.setattr(import_service_module, '_pyarrow_available', lambda: True)
+        app.config['IMPORT_CSV_ENGINE'] = 'c'
+        assert import_service._resolve_csv_engine() == 'c'
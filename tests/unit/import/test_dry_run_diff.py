@@ -0,0 +1,137 @@
+"""
+インポートのドライラン差分機能のテスト
+"""
+import pytest
+import json
+import os
+import tempfile
+from app import create_app, db
+from app.models import Project, Branch
+from app.services.import_service import ImportService
+
+
+COLUMN_MAPPING = {
+    'project_code': 'プロジェクトコード',
+    'project_name': 'プロジェクト名',
+    'branch_name': '支社名',
+    'fiscal_year': '売上の年度',
+    'order_probability': '受注角度',
+    'revenue': '売上',
+    'expenses': '経費'
+}
+
+
+class TestDryRunDiff:
+    """ドライラン差分のテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def import_service(self):
+        """ImportServiceインスタンス"""
+        return ImportService()
+
+    @pytest.fixture
+    def existing_projects(self, app):
+        """既存のプロジェクトデータ"""
+        tokyo = Branch.create_with_validation(branch_code='TKY', branch_name='東京支社', is_active=True)
+        Branch.create_with_validation(branch_code='OSK', branch_name='大阪支社', is_active=True)
+        Project.create_with_validation(
+            project_code='PRJ001', project_name='既存プロジェクト1', branch_id=tokyo.id,
+            fiscal_year=2024, order_probability=100, revenue=1000000, expenses=800000
+        )
+        Project.create_with_validation(
+            project_code='PRJ002', project_name='既存プロジェクト2', branch_id=tokyo.id,
+            fiscal_year=2024, order_probability=50, revenue=2000000, expenses=1500000
+        )
+
+    @pytest.fixture
+    def diff_csv_file(self):
+        """各分類の行を含むCSV"""
+        csv_content = """プロジェクトコード,プロジェクト名,支社名,売上の年度,受注角度,売上,経費
+PRJ001,既存プロジェクト1,東京支社,2024,〇,1000000,800000
+PRJ002,既存プロジェクト2,大阪支社,2024,〇,2000000,1500000
+PRJ003,新規プロジェクト,東京支社,2025,△,300000,100000
+PRJ004,重複A,東京支社,2025,△,1,1
+PRJ004,重複B,東京支社,2025,△,2,2
+PRJ005,不正な行,東京支社,2025,無効,abc,1"""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False, encoding='utf-8-sig') as f:
+            f.write(csv_content)
+        yield f.name
+        os.unlink(f.name)
+
+    def test_classifies_rows(self, app, import_service, existing_projects, diff_csv_file):
+        """各行が new/changed/unchanged/conflict に分類される"""
+        result = import_service.get_dry_run_diff(diff_csv_file, 'csv', COLUMN_MAPPING)
+
+        assert result['success'] is True
+        assert result['total_rows'] == 6
+        assert result['summary'] == {'new': 1, 'changed': 1, 'unchanged': 1, 'conflict': 3}
+        statuses = {item['row']: item['status'] for item in result['items']}
+        assert statuses == {1: 'unchanged', 2: 'changed', 3: 'new', 4: 'conflict', 5: 'conflict', 6: 'conflict'}
+
+    def test_changed_row_has_field_diffs(self, app, import_service, existing_projects, diff_csv_file):
+        """変更あり行には項目単位の差分が含まれる"""
+        result = import_service.get_dry_run_diff(diff_csv_file, 'csv', COLUMN_MAPPING, status='changed')
+
+        assert len(result['items']) == 1
+        changes = result['items'][0]['changes']
+        assert changes == {
+            'branch_name': {'old': '東京支社', 'new': '大阪支社'},
+            'order_probability': {'old': 50, 'new': 100},
+        }
+
+    def test_does_not_write(self, app, import_service, existing_projects, diff_csv_file):
+        """ドライランはDBを変更しない"""
+        import_service.get_dry_run_diff(diff_csv_file, 'csv', COLUMN_MAPPING)
+        assert Project.query.count() == 2
+        assert Project.query.filter_by(project_code='PRJ003').first() is None
+
+    def test_pagination(self, app, import_service, existing_projects, diff_csv_file):
+        """結果がページ単位で返される"""
+        result = import_service.get_dry_run_diff(diff_csv_file, 'csv', COLUMN_MAPPING, page=2, per_page=4)
+
+        assert [item['row'] for item in result['items']] == [5, 6]
+        assert result['pagination']['pages'] == 2
+        assert result['pagination']['has_prev'] is True
+        assert result['pagination']['has_next'] is False
+        # サマリーはページに関係なく全行の集計
+        assert sum(result['summary'].values()) == 6
+
+    def test_invalid_status(self, app, import_service, diff_csv_file):
+        """未知の分類指定はエラーになる"""
+        result = import_service.get_dry_run_diff(diff_csv_file, 'csv', COLUMN_MAPPING, status='deleted')
+        assert result['success'] is False
+
+    def test_dry_run_route(self, client, existing_projects, diff_csv_file):
+        """ドライランAPIがセッションのファイルを使って差分を返す"""
+        with client.session_transaction() as session:
+            session['import_file'] = diff_csv_file
+            session['import_type'] = 'csv'
+            session['import_column_mapping'] = COLUMN_MAPPING
+
+        response = client.get('/import/dry_run?status=new')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['summary']['new'] == 1
+        assert [item['project_code'] for item in data['items']] == ['PRJ003']
+
+    def test_dry_run_route_without_session(self, client):
+        """セッション情報がない場合は400"""
+        response = client.get('/import/dry_run')
+        assert response.status_code == 400
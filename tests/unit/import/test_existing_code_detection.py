@@ -0,0 +1,70 @@
+"""
+一時テーブルを用いた既存プロジェクトコード検出のテスト
+"""
+import pytest
+import pandas as pd
+from sqlalchemy import text
+from app import create_app, db
+from app.models import Project, Branch
+from app.services.import_service import ImportService
+
+
+class TestExistingCodeDetection:
+    """既存コード検出のテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def import_service(self):
+        """ImportServiceインスタンス"""
+        return ImportService()
+
+    @pytest.fixture
+    def existing_projects(self, app):
+        """既存のプロジェクトデータ"""
+        branch = Branch.create_with_validation(branch_code='TKY', branch_name='東京支社', is_active=True)
+        for i in range(1, 4):
+            Project.create_with_validation(
+                project_code=f'EXIST{i:03d}', project_name=f'既存{i}', branch_id=branch.id,
+                fiscal_year=2024, order_probability=100, revenue=1000, expenses=500
+            )
+
+    def test_returns_only_intersecting_codes(self, app, import_service, existing_projects):
+        """ファイルとDBの両方に存在するコードのみ返す"""
+        codes = ['EXIST001', 'EXIST003', 'NEW001']
+        assert import_service._find_existing_codes(codes) == {'EXIST001', 'EXIST003'}
+
+    def test_handles_more_codes_than_one_batch(self, app, import_service, existing_projects):
+        """バッチ件数を超えるコードでも検出できる"""
+        codes = [f'NEW{i:05d}' for i in range(ImportService.UPSERT_BATCH_SIZE * 2 + 10)] + ['EXIST002']
+        assert import_service._find_existing_codes(codes) == {'EXIST002'}
+
+    def test_empty_codes(self, app, import_service):
+        """コードが無い場合は空集合"""
+        assert import_service._find_existing_codes([]) == set()
+
+    def test_temporary_table_is_dropped(self, app, import_service, existing_projects):
+        """検出後に一時テーブルが残らない"""
+        import_service._find_existing_codes(['EXIST001'])
+        tables = db.session.execute(
+            text("SELECT name FROM sqlite_temp_master WHERE type = 'table'")
+        ).fetchall()
+        assert 'import_codes' not in [row[0] for row in tables]
+
+    def test_validation_flags_existing_codes(self, app, import_service, existing_projects):
+        """検証結果で既存コードの行がエラーになる"""
+        df = pd.DataFrame({'project_code': ['EXIST001', 'NEW001', None]})
+        result = import_service._validate_preview_data(df)
+
+        assert result['row_validations'][0]['has_errors'] is True
+        assert 'プロジェクトコード「EXIST001」は既に存在します' in result['row_validations'][0]['errors']
+        assert result['row_validations'][1]['has_errors'] is False
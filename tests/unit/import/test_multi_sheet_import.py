@@ -0,0 +1,220 @@
+"""
+Excel複数シート一括インポート機能のテスト
+"""
+import pytest
+import os
+import tempfile
+from openpyxl import Workbook
+from app import create_app, db
+from app.models import Project, Branch, ImportCheckpoint
+from app.services import import_service as import_service_module
+from app.services.import_service import ImportService
+
+
+class WorkerKilled(BaseException):
+    """プロセス強制終了の代わりに送出する例外"""
+
+
+HEADERS = ['プロジェクトコード', 'プロジェクト名', '支社名', '売上の年度', '受注角度', '売上', '経費']
+
+
+class TestMultiSheetImport:
+    """複数シート一括インポートのテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def import_service(self):
+        """ImportServiceインスタンス"""
+        return ImportService()
+
+    @pytest.fixture
+    def workbook_file(self):
+        """支社ごとのシートを持つExcelファイル"""
+        workbook = Workbook()
+        tokyo = workbook.active
+        tokyo.title = '東京'
+        tokyo.append(HEADERS)
+        tokyo.append(['TKY-001', '東京案件1', '東京支社', 2024, '〇', 1000000, 800000])
+        tokyo.append(['TKY-002', '東京案件2', '東京支社', 2024, '△', 500000, 300000])
+
+        osaka = workbook.create_sheet('大阪')
+        osaka.append(HEADERS)
+        osaka.append(['OSK-001', '大阪案件1', '大阪支社', 2024, '×', 200000, 100000])
+        osaka.append(['TKY-001', 'シート間重複', '大阪支社', 2024, '〇', 1, 1])
+        osaka.append(['OSK-002', '不正な行', '大阪支社', 2024, '無効', 1, 1])
+
+        empty = workbook.create_sheet('空')
+        empty.append(HEADERS)
+
+        with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as f:
+            workbook.save(f.name)
+        yield f.name
+        if os.path.exists(f.name):
+            os.unlink(f.name)
+
+    @pytest.mark.parametrize('max_workers', [1, 2])
+    def test_imports_all_sheets(self, app, import_service, workbook_file, max_workers):
+        """データのある全シートが1回でインポートされる（逐次・並列とも同じ結果）"""
+        result = import_service.execute_multi_sheet_import(workbook_file, max_workers=max_workers)
+
+        assert result['success'] is True
+        assert result['success_count'] == 3
+        assert result['error_count'] == 2
+        assert [sheet['sheet'] for sheet in result['sheets']] == ['東京', '大阪']
+        assert result['sheets'][0]['success_count'] == 2
+        assert result['sheets'][1]['success_count'] == 1
+        assert result['sheets'][1]['error_count'] == 2
+
+        assert Project.query.count() == 3
+        assert Branch.query.count() == 2
+        osaka_project = Project.query.filter_by(project_code='OSK-001').first()
+        assert osaka_project.branch.branch_name == '大阪支社'
+
+    def test_errors_are_attributed_to_sheet_and_row(self, app, import_service, workbook_file):
+        """エラーにシート名と行番号が記録される"""
+        result = import_service.execute_multi_sheet_import(workbook_file, max_workers=1)
+
+        locations = {(error['sheet'], error['row']) for error in result['errors']}
+        assert locations == {('大阪', 2), ('大阪', 3)}
+        duplicate_error = [e for e in result['errors'] if e['row'] == 2][0]
+        assert '東京' in duplicate_error['error']
+
+        report = import_service.generate_error_report(result['errors'])
+        assert '大阪!2' in report
+
+    def test_existing_codes_are_rejected(self, app, import_service, workbook_file):
+        """既存コードの行はエラーになり、その他の行は登録される"""
+        branch = Branch.create_with_validation(branch_code='TKY', branch_name='東京支社', is_active=True)
+        Project.create_with_validation(
+            project_code='TKY-002', project_name='既存', branch_id=branch.id,
+            fiscal_year=2024, order_probability=100, revenue=1, expenses=1
+        )
+
+        result = import_service.execute_multi_sheet_import(workbook_file, max_workers=1)
+
+        assert result['success_count'] == 2
+        assert ('東京', 2) in {(error['sheet'], error['row']) for error in result['errors']}
+        assert Project.query.count() == 3
+
+    def test_upsert_updates_existing_projects(self, app, import_service, workbook_file):
+        """更新モードでは既存コードの行を更新し、変更の無い行はスキップする"""
+        branch = Branch.create_with_validation(branch_code='TKY', branch_name='東京支社', is_active=True)
+        Project.create_with_validation(
+            project_code='TKY-002', project_name='既存', branch_id=branch.id,
+            fiscal_year=2024, order_probability=100, revenue=1, expenses=1
+        )
+        Project.create_with_validation(
+            project_code='TKY-001', project_name='東京案件1', branch_id=branch.id,
+            fiscal_year=2024, order_probability=100, revenue=1000000, expenses=800000
+        )
+
+        result = import_service.execute_multi_sheet_import(workbook_file, max_workers=1, mode='upsert')
+
+        assert result['success'] is True
+        assert result['import_mode'] == 'upsert'
+        assert (result['inserted_count'], result['updated_count'], result['unchanged_count']) == (1, 1, 1)
+        assert result['error_count'] == 2
+        assert [sheet['success_count'] for sheet in result['sheets']] == [2, 1]
+        assert {(p['sheet'], p['project_code'], p['action']) for p in result['successful_projects']} == {
+            ('東京', 'TKY-002', 'updated'), ('大阪', 'OSK-001', 'inserted')
+        }
+        assert Project.query.count() == 3
+        updated = Project.query.filter_by(project_code='TKY-002').one()
+        assert (updated.project_name, updated.order_probability, updated.revenue) == ('東京案件2', 50, 500000)
+
+    def test_invalid_mode(self, app, import_service, workbook_file):
+        """不正なインポートモードはエラーになる"""
+        result = import_service.execute_multi_sheet_import(workbook_file, max_workers=1, mode='replace')
+        assert result['success'] is False
+
+    def test_resume_from_checkpoint(self, app, import_service, workbook_file, monkeypatch):
+        """中断しても反映済みのチャンクは残り、再実行で続きから登録する"""
+        import_service.IMPORT_CHUNK_SIZE = 2
+        original = ImportService._find_existing_codes
+        calls = {'count': 0}
+
+        def interrupted(self, codes):
+            calls['count'] += 1
+            if calls['count'] == 2:
+                raise WorkerKilled()
+            return original(self, codes)
+
+        monkeypatch.setattr(ImportService, '_find_existing_codes', interrupted)
+        with pytest.raises(WorkerKilled):
+            import_service.execute_multi_sheet_import(workbook_file, max_workers=1)
+        db.session.rollback()
+        assert Project.query.count() == 2
+        checkpoint = ImportCheckpoint.get_incomplete()[0]
+        assert (checkpoint.file_type, checkpoint.last_chunk) == (ImportService.MULTI_SHEET_FILE_TYPE, 0)
+
+        result = import_service.resume_import(checkpoint.id)
+
+        assert result['success'] is True
+        assert result['resumed_from_chunk'] == 1
+        assert (result['success_count'], result['error_count']) == (3, 2)
+        assert Project.query.count() == 3
+        assert db.session.get(ImportCheckpoint, checkpoint.id).is_completed
+
+    def test_parallel_parse_reuses_executor(self, app, import_service, workbook_file):
+        """並列解析のプロセスプールはリクエストごとに作らず共有する"""
+        import_service.execute_multi_sheet_import(workbook_file, sheet_names=['東京', '大阪'], max_workers=2)
+        executor = import_service_module._sheet_parse_executor
+        assert executor is not None
+
+        db.session.query(Project).delete()
+        db.session.commit()
+        result = import_service.execute_multi_sheet_import(workbook_file, sheet_names=['東京', '大阪'], max_workers=2)
+
+        assert result['success_count'] == 3
+        assert import_service_module._sheet_parse_executor is executor
+
+    def test_selected_sheets_only(self, app, import_service, workbook_file):
+        """対象シートを指定できる"""
+        result = import_service.execute_multi_sheet_import(workbook_file, sheet_names=['東京'], max_workers=1)
+
+        assert result['success_count'] == 2
+        assert Project.query.count() == 2
+
+    def test_set_sheet_all_sheets(self, client, workbook_file):
+        """全シート指定でマッピング画面へ進み、実行時に全シートを取り込む"""
+        with client.session_transaction() as session:
+            session['import_file'] = workbook_file
+            session['import_type'] = 'excel'
+
+        response = client.post('/import/set_sheet', data={'all_sheets': '1'})
+        assert response.status_code == 302
+        with client.session_transaction() as session:
+            assert session['import_all_sheets'] is True
+            assert session['selected_sheet'] == '東京'
+            session['import_column_mapping'] = {
+                'project_code': 'プロジェクトコード',
+                'project_name': 'プロジェクト名',
+                'branch_name': '支社名',
+                'fiscal_year': '売上の年度',
+                'order_probability': '受注角度',
+                'revenue': '売上',
+                'expenses': '経費'
+            }
+
+        client.application.config['IMPORT_MAX_WORKERS'] = 1
+        response = client.post('/import/execute')
+
+        assert response.status_code == 200
+        assert 'シート別の結果' in response.get_data(as_text=True)
+        with client.application.app_context():
+            assert Project.query.count() == 3
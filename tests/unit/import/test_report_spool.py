@@ -0,0 +1,127 @@
+"""
+インポート結果レポートのディスクスプールのテスト
+"""
+import pytest
+import csv
+import io
+import os
+import tempfile
+import numpy as np
+from app import create_app, db
+from app.services.import_service import ImportService
+from app.services.report_spool import ReportSpool
+
+
+COLUMN_MAPPING = {
+    'project_code': 'プロジェクトコード',
+    'project_name': 'プロジェクト名',
+    'branch_name': '支社名',
+    'fiscal_year': '売上の年度',
+    'order_probability': '受注角度',
+    'revenue': '売上',
+    'expenses': '経費'
+}
+
+
+class TestReportSpool:
+    """ReportSpool 単体のテスト"""
+
+    def test_records_are_spooled_with_bounded_sample(self, tmp_path):
+        """全件はディスクに書かれ、メモリには先頭のサンプルだけが残る"""
+        with ReportSpool(str(tmp_path), sample_size=3) as spool:
+            for i in range(10):
+                spool.errors.append({'row': i + 1, 'error': 'エラー', 'data': {'revenue': np.int64(i)}})
+
+        assert len(spool.errors) == 10
+        assert [record['row'] for record in spool.errors.sample] == [1, 2, 3]
+        assert spool.errors.truncated is True
+
+        records = list(ReportSpool.iter_records(str(tmp_path), spool.report_id, 'errors'))
+        assert len(records) == 10
+        assert records[9]['data']['revenue'] == 9
+        assert os.path.exists(ReportSpool.path_for(str(tmp_path), spool.report_id, 'errors'))
+
+    def test_invalid_report_id_is_rejected(self, tmp_path):
+        """不正なレポートIDではファイルを参照しない"""
+        assert ReportSpool.exists(str(tmp_path), '../../etc/passwd') is False
+        assert list(ReportSpool.iter_records(str(tmp_path), '../secret', 'errors')) == []
+
+    def test_cleanup_removes_old_spools(self, tmp_path):
+        """保持期間を過ぎたスプールは削除される"""
+        with ReportSpool(str(tmp_path)) as spool:
+            spool.successes.append({'row': 1, 'project_code': 'A', 'project_name': 'B'})
+        path = ReportSpool.path_for(str(tmp_path), spool.report_id, 'successes')
+        os.utime(path, (0, 0))
+
+        ReportSpool.cleanup(str(tmp_path), 60)
+
+        assert not os.path.exists(path)
+
+
+class TestSpooledImportReports:
+    """インポート結果のスプールとストリーミングダウンロードのテスト"""
+
+    @pytest.fixture
+    def app(self, tmp_path):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def csv_file(self):
+        """正常行3件・不正行150件のCSV"""
+        lines = ['プロジェクトコード,プロジェクト名,支社名,売上の年度,受注角度,売上,経費']
+        for i in range(3):
+            lines.append(f'OK{i:03d},正常{i},東京支社,2024,〇,100,50')
+        for i in range(150):
+            lines.append(f'NG{i:03d},不正{i},東京支社,2024,無効,100,50')
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False, encoding='utf-8-sig') as f:
+            f.write('\n'.join(lines))
+        yield f.name
+        if os.path.exists(f.name):
+            os.unlink(f.name)
+
+    def test_result_keeps_only_sample(self, app, csv_file):
+        """インポート結果にはエラーのサンプルと件数だけが残る"""
+        result = ImportService().execute_import(csv_file, 'csv', COLUMN_MAPPING)
+
+        assert result['error_count'] == 150
+        assert len(result['errors']) == ReportSpool.SAMPLE_SIZE
+        assert result['errors_truncated'] is True
+        assert result['successes_truncated'] is False
+        assert result['report_id']
+
+    def test_error_report_is_streamed_from_spool(self, client, csv_file):
+        """エラーレポートはスプールから全件ストリーミングされる"""
+        with client.session_transaction() as session:
+            session['import_file'] = csv_file
+            session['import_type'] = 'csv'
+            session['import_column_mapping'] = COLUMN_MAPPING
+        client.post('/import/execute')
+        with client.session_transaction() as session:
+            assert 'import_errors' not in session
+            assert session['import_report_id']
+
+        response = client.get('/import/download_error_report')
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.headers['Content-Type'] == 'text/csv; charset=utf-8'
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        assert rows[0] == ['行番号', 'エラータイプ', 'エラー内容', 'データ']
+        assert len(rows) == 151
+
+        response = client.get('/import/download_success_report')
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        assert [row[1] for row in rows[1:]] == ['OK000', 'OK001', 'OK002']
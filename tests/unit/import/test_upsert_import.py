@@ -0,0 +1,184 @@
+"""
+更新インポート（UPSERT）機能のテスト
+"""
+import json
+import pytest
+import os
+import tempfile
+from app import create_app, db
+from app.models import Project, Branch, BackupHistory
+from app.services.backup_service import BackupService
+from app.services.import_service import ImportService
+
+
+COLUMN_MAPPING = {
+    'project_code': 'プロジェクトコード',
+    'project_name': 'プロジェクト名',
+    'branch_name': '支社名',
+    'fiscal_year': '売上の年度',
+    'order_probability': '受注角度',
+    'revenue': '売上',
+    'expenses': '経費'
+}
+
+
+class TestUpsertImport:
+    """更新インポートのテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def client(self, app):
+        """テストクライアント"""
+        return app.test_client()
+
+    @pytest.fixture
+    def import_service(self):
+        """ImportServiceインスタンス"""
+        return ImportService()
+
+    @pytest.fixture
+    def existing_projects(self, app):
+        """既存のプロジェクトデータ"""
+        branch = Branch.create_with_validation(branch_code='TKY', branch_name='東京支社', is_active=True)
+        Project.create_with_validation(
+            project_code='PRJ001', project_name='既存プロジェクト1', branch_id=branch.id,
+            fiscal_year=2024, order_probability=100, revenue=1000000, expenses=800000
+        )
+        Project.create_with_validation(
+            project_code='PRJ002', project_name='既存プロジェクト2', branch_id=branch.id,
+            fiscal_year=2024, order_probability=50, revenue=2000000, expenses=1500000
+        )
+        return branch
+
+    @pytest.fixture
+    def upsert_csv_file(self):
+        """既存1件変更・既存1件変更なし・新規1件のCSV"""
+        csv_content = """プロジェクトコード,プロジェクト名,支社名,売上の年度,受注角度,売上,経費
+PRJ001,既存プロジェクト1,東京支社,2024,〇,1000000,800000
+PRJ002,名称変更プロジェクト,東京支社,2024,〇,2500000,1500000
+PRJ003,新規プロジェクト,東京支社,2025,△,300000,100000"""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False, encoding='utf-8-sig') as f:
+            f.write(csv_content)
+        yield f.name
+        os.unlink(f.name)
+
+    def test_upsert_counts(self, app, import_service, existing_projects, upsert_csv_file):
+        """新規・更新・変更なしの件数が集計される"""
+        result = import_service.execute_import(upsert_csv_file, 'csv', COLUMN_MAPPING, mode='upsert')
+
+        assert result['success'] is True
+        assert result['mode'] == 'upsert'
+        assert result['inserted_count'] == 1
+        assert result['updated_count'] == 1
+        assert result['unchanged_count'] == 1
+        assert result['error_count'] == 0
+        assert {p['project_code']: p['action'] for p in result['successful_projects']} == {
+            'PRJ002': 'updated',
+            'PRJ003': 'inserted',
+        }
+
+    def test_upsert_updates_existing_rows(self, app, import_service, existing_projects, upsert_csv_file):
+        """既存行は更新され、作成日時は保持される"""
+        original = Project.query.filter_by(project_code='PRJ002').first()
+        original_id = original.id
+        original_created_at = original.created_at
+
+        import_service.execute_import(upsert_csv_file, 'csv', COLUMN_MAPPING, mode='upsert')
+        db.session.expire_all()
+
+        assert Project.query.count() == 3
+        updated = Project.query.filter_by(project_code='PRJ002').first()
+        assert updated.id == original_id
+        assert updated.project_name == '名称変更プロジェクト'
+        assert int(updated.order_probability) == 100
+        assert float(updated.revenue) == 2500000
+        assert updated.created_at == original_created_at
+
+        inserted = Project.query.filter_by(project_code='PRJ003').first()
+        assert inserted.branch_id == existing_projects.id
+        assert inserted.fiscal_year == 2025
+
+    def test_upsert_included_in_incremental_backup(self, app, import_service, existing_projects, upsert_csv_file):
+        """更新インポートで変更された行は、直前のバックアップからの差分バックアップに含まれる"""
+        b''.join(BackupService.iter_backup())
+        watermark = BackupHistory.latest_watermark()
+
+        import_service.execute_import(upsert_csv_file, 'csv', COLUMN_MAPPING, mode='upsert')
+        db.session.expire_all()
+
+        assert Project.query.filter_by(project_code='PRJ002').one().change_seq > watermark
+        incremental = json.loads(b''.join(BackupService.iter_backup(since=watermark)))
+        assert {record['project_code']: record['project_name'] for record in incremental['data']['projects']} == {
+            'PRJ002': '名称変更プロジェクト',
+            'PRJ003': '新規プロジェクト',
+        }
+
+    def test_upsert_is_idempotent(self, app, import_service, existing_projects, upsert_csv_file):
+        """同じファイルを再インポートすると全件変更なしになる"""
+        import_service.execute_import(upsert_csv_file, 'csv', COLUMN_MAPPING, mode='upsert')
+        result = import_service.execute_import(upsert_csv_file, 'csv', COLUMN_MAPPING, mode='upsert')
+
+        assert result['inserted_count'] == 0
+        assert result['updated_count'] == 0
+        assert result['unchanged_count'] == 3
+
+    def test_upsert_skips_file_duplicates(self, app, import_service, existing_projects):
+        """ファイル内で重複するコードは最初の行のみ反映される"""
+        csv_content = """プロジェクトコード,プロジェクト名,支社名,売上の年度,受注角度,売上,経費
+PRJ010,最初の行,東京支社,2024,〇,100,50
+PRJ010,二番目の行,東京支社,2024,〇,200,50"""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False, encoding='utf-8-sig') as f:
+            f.write(csv_content)
+        try:
+            result = import_service.execute_import(f.name, 'csv', COLUMN_MAPPING, mode='upsert')
+        finally:
+            os.unlink(f.name)
+
+        assert result['inserted_count'] == 1
+        assert result['error_count'] == 1
+        assert Project.query.filter_by(project_code='PRJ010').first().project_name == '最初の行'
+
+    def test_insert_mode_still_rejects_existing(self, app, import_service, existing_projects, upsert_csv_file):
+        """通常モードでは既存コードはエラーのまま"""
+        result = import_service.execute_import(upsert_csv_file, 'csv', COLUMN_MAPPING)
+
+        assert result['success'] is True
+        assert result['success_count'] == 1
+        assert result['error_count'] == 2
+
+    def test_invalid_mode(self, app, import_service, upsert_csv_file):
+        """未知のモードはエラーになる"""
+        result = import_service.execute_import(upsert_csv_file, 'csv', COLUMN_MAPPING, mode='replace')
+        assert result['success'] is False
+
+    def test_preview_upsert_mode_does_not_flag_existing(self, app, import_service, existing_projects, upsert_csv_file):
+        """更新モードのプレビューでは既存コードをエラーにしない"""
+        result = import_service.get_preview_data(upsert_csv_file, 'csv', COLUMN_MAPPING, mode='upsert')
+        assert result['validation_summary']['error_rows'] == 0
+
+    def test_execute_route_with_upsert_mode(self, client, existing_projects, upsert_csv_file):
+        """実行ルートがフォームのモード指定を受け付ける"""
+        with client.session_transaction() as session:
+            session['import_file'] = upsert_csv_file
+            session['import_type'] = 'csv'
+            session['import_column_mapping'] = COLUMN_MAPPING
+
+        # ルートは処理後にファイルを削除するため、フィクスチャ側の削除用に複製を残す
+        with open(upsert_csv_file, encoding='utf-8-sig') as src:
+            content = src.read()
+        response = client.post('/import/execute', data={'import_mode': 'upsert'})
+        with open(upsert_csv_file, 'w', encoding='utf-8-sig') as dst:
+            dst.write(content)
+
+        assert response.status_code == 200
+        assert '新規: 1件' in response.get_data(as_text=True)
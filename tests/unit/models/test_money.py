@@ -0,0 +1,95 @@
+"""
+金額型（銭単位の整数で保存）のテスト
+"""
+import sqlite3
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select, text
+from app import create_app, db
+from app.models import Branch, Money, Project
+
+
+class TestMoney:
+    """Money 型と Project.revenue / expenses のテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def projects(self, app):
+        """金額に端数を含むプロジェクト"""
+        branch = Branch(branch_code='TKY', branch_name='東京支社', is_active=True)
+        db.session.add(branch)
+        db.session.flush()
+        for code, revenue, expenses in (('P1', Decimal('1000.50'), 0.29), ('P2', 300, '120.01'), ('P3', 2000.5, 2500)):
+            db.session.add(Project(
+                project_code=code, project_name=code, branch_id=branch.id, fiscal_year=2024,
+                order_probability=100, revenue=revenue, expenses=expenses
+            ))
+        db.session.commit()
+
+    @pytest.mark.parametrize('value, stored', [
+        (1000, 100000), (Decimal('1000.50'), 100050), (0.29, 29), ('120.01', 12001), (Decimal('0.005'), 1), (None, None),
+    ])
+    def test_bind_to_minor_units(self, value, stored):
+        """円単位の値を銭単位の整数に変換する（端数は四捨五入）"""
+        assert Money().process_bind_param(value, None) == stored
+
+    def test_stored_as_integer(self, app, projects):
+        """DBには整数で保存され、読み込むと円単位の float になる"""
+        rows = db.session.execute(text(
+            "SELECT revenue, typeof(revenue), expenses FROM projects WHERE project_code = 'P1'"
+        )).one()
+        assert tuple(rows) == (100050, 'integer', 29)
+
+        project = Project.query.filter_by(project_code='P1').one()
+        assert project.revenue == 1000.5
+        assert project.expenses == 0.29
+        assert project.to_dict()['gross_profit'] == pytest.approx(1000.21)
+
+    def test_sql_aggregates_and_sorting(self, app, projects):
+        """合計・差額・並べ替え・比較はSQL側の整数で計算し、結果は円単位になる"""
+        total, profit = db.session.execute(select(
+            func.sum(Project.revenue), func.sum(Project.revenue - Project.expenses)
+        )).one()
+        assert total == 3301.0
+        assert profit == pytest.approx(680.7)
+
+        codes = db.session.scalars(
+            select(Project.project_code).order_by((Project.revenue - Project.expenses).desc())
+        ).all()
+        assert codes == ['P1', 'P2', 'P3']
+        assert db.session.scalars(
+            select(Project.project_code).where(Project.revenue > 1000.49).order_by(Project.project_code)
+        ).all() == ['P1', 'P3']
+
+    def test_migration_converts_existing_values(self, tmp_path):
+        """既存の小数の金額を銭単位の整数に変換し、新しいスキーマは変換しない"""
+        sys.path.insert(0, str(Path(__file__).resolve().parents[3] / 'migrations'))
+        try:
+            from migrate import MONEY_TO_MINOR_UNITS_SQL as statement
+        finally:
+            sys.path.pop(0)
+
+        legacy = sqlite3.connect(tmp_path / 'legacy.db')
+        legacy.execute('CREATE TABLE projects (id INTEGER PRIMARY KEY, revenue DECIMAL(15,2), expenses DECIMAL(15,2))')
+        legacy.execute('INSERT INTO projects VALUES (1, 1000.5, 0.29)')
+        legacy.execute(statement)
+        assert legacy.execute('SELECT revenue, typeof(revenue), expenses FROM projects').fetchone() == (100050, 'integer', 29)
+
+        current = sqlite3.connect(tmp_path / 'current.db')
+        current.execute('CREATE TABLE projects (id INTEGER PRIMARY KEY, revenue INTEGER, expenses INTEGER)')
+        current.execute('INSERT INTO projects VALUES (1, 100050, 29)')
+        current.execute(statement)
+        assert current.execute('SELECT revenue, expenses FROM projects').fetchone() == (100050, 29)
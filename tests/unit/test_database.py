@@ -0,0 +1,360 @@
+"""
+SQLiteの接続設定（PRAGMA）、データベース初期化、読み取り・書き込みの振り分けのテスト
+"""
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import OperationalError
+from app import create_app, db
+from app import database as database_module
+from app.database import (
+    INITIALIZED_KEY, READ_BIND_KEY, DatabaseNotReadyError, build_pragma_statements, configure_sqlite,
+    ensure_database_ready, initialize_database, read_only, read_only_database_uri
+)
+from app.models import Branch, Project
+from app.services.dashboard_service import DashboardService
+from config import TestingConfig
+from migrations.migrate import migration_lock, run_migrations
+
+
+class TestSqlitePragmas:
+    """configure_sqlite のテスト"""
+
+    def test_build_statements_in_order(self):
+        """busy_timeout を先頭に、設定された項目だけを適用順に並べる"""
+        statements = build_pragma_statements({
+            'foreign_keys': True, 'journal_mode': 'wal', 'busy_timeout': 3000, 'mmap_size': None
+        })
+        assert statements == [
+            'PRAGMA busy_timeout = 3000',
+            'PRAGMA journal_mode = WAL',
+            'PRAGMA foreign_keys = ON',
+        ]
+
+    @pytest.mark.parametrize('pragmas', [{'page_size': 4096}, {'journal_mode': 'WAL; DROP TABLE projects'}])
+    def test_invalid_pragmas(self, pragmas):
+        """未対応の PRAGMA や値は起動時にエラーにする"""
+        with pytest.raises(ValueError):
+            build_pragma_statements(pragmas)
+
+    def test_applied_on_connect(self, tmp_path):
+        """新しい接続ごとに PRAGMA が適用される"""
+        engine = create_engine(f'sqlite:///{tmp_path / "pragma.db"}')
+        configure_sqlite(engine, {
+            'busy_timeout': 1234, 'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -2048,
+            'mmap_size': 1048576, 'temp_store': 'MEMORY', 'foreign_keys': 'ON'
+        })
+        with engine.connect() as connection:
+            values = {
+                name: connection.execute(text(f'PRAGMA {name}')).scalar()
+                for name in ('busy_timeout', 'journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'foreign_keys')
+            }
+        engine.dispose()
+        # synchronous: NORMAL=1, temp_store: MEMORY=2
+        assert values == {
+            'busy_timeout': 1234, 'journal_mode': 'wal', 'synchronous': 1, 'cache_size': -2048,
+            'mmap_size': 1048576, 'temp_store': 2, 'foreign_keys': 1
+        }
+
+    def test_app_engine_uses_config_profile(self):
+        """アプリのエンジンには設定クラスごとの SQLITE_PRAGMAS が適用される"""
+        app = create_app('testing')
+        with app.app_context():
+            with db.engine.connect() as connection:
+                assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+                assert connection.execute(text('PRAGMA synchronous')).scalar() == 0
+                assert connection.execute(text('PRAGMA foreign_keys')).scalar() == 1
+                assert connection.execute(text('PRAGMA busy_timeout')).scalar() == app.config['SQLITE_PRAGMAS']['busy_timeout']
+            db.session.remove()
+
+
+class TestDatabaseInitialization:
+    """起動時のデータベース初期化のテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def statements(self, app):
+        """実行されたSQL文を記録"""
+        executed = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            executed.append(statement)
+
+        # 読み取り専用エンジンに振り分けられたクエリも含めて記録する
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', record)
+        yield executed
+        for engine in db.engines.values():
+            event.remove(engine, 'before_cursor_execute', record)
+
+    @pytest.mark.parametrize('path', ['/health', '/static/test.css', '/projects/', '/export/jobs'])
+    def test_no_catalog_query_per_request(self, app, statements, path):
+        """通常のリクエストではスキーマのカタログを参照しない"""
+        client = app.test_client()
+        client.get(path).get_data()
+        client.get(path).get_data()
+
+        assert not [statement for statement in statements
+                    if 'sqlite_master' in statement or 'PRAGMA' in statement.upper()]
+
+    def test_static_request_has_no_queries(self, app, statements):
+        """静的ファイルの配信ではSQLを実行しない"""
+        app.test_client().get('/static/test.css').get_data()
+        assert statements == []
+
+    def test_creates_missing_index(self, app):
+        """既存テーブルに不足しているインデックスを作成する"""
+        db.session.execute(text('DROP INDEX ix_projects_updated_at'))
+        db.session.commit()
+        app.extensions[INITIALIZED_KEY] = False
+
+        assert initialize_database(app) is True
+        assert 'ix_projects_updated_at' in {index['name'] for index in inspect(db.engine).get_indexes('projects')}
+
+    def test_retries_once_at_startup(self, app, monkeypatch):
+        """起動時の初期化に失敗した場合は1回だけ再試行し、それでも失敗すれば起動しない"""
+        calls = []
+
+        def initialize(app_, results):
+            calls.append(app_)
+            return results.pop(0)
+
+        results = [False, True]
+        monkeypatch.setattr(database_module, 'initialize_database', lambda app_: initialize(app_, results))
+        ensure_database_ready(app)
+        assert len(calls) == 2
+
+        calls.clear()
+        results = [False, False, True]
+        monkeypatch.setattr(database_module, 'initialize_database', lambda app_: initialize(app_, results))
+        with pytest.raises(DatabaseNotReadyError):
+            ensure_database_ready(app)
+        assert len(calls) == 2
+
+    def test_no_initialization_per_request(self, app, statements):
+        """リクエストの処理では初期化を再試行しない"""
+        app.extensions[INITIALIZED_KEY] = False
+        app.test_client().get('/health').get_data()
+
+        assert app.extensions[INITIALIZED_KEY] is False
+        assert not [statement for statement in statements if 'CREATE' in statement.upper()]
+
+
+class TestSchemaMigration:
+    """起動時のマイグレーションの適用・確認のテスト"""
+
+    @pytest.fixture
+    def legacy_database(self, tmp_path, monkeypatch):
+        """金額を小数（NUMERIC）で持つ、マイグレーション前のデータベース"""
+        path = tmp_path / 'legacy.db'
+        connection = sqlite3.connect(path)
+        connection.executescript('''
+            CREATE TABLE branches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                branch_code VARCHAR(20) UNIQUE NOT NULL,
+                branch_name VARCHAR(100) UNIQUE NOT NULL,
+                is_active BOOLEAN NOT NULL DEFAULT 1,
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE projects (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                project_code VARCHAR(50) UNIQUE NOT NULL,
+                project_name VARCHAR(200) NOT NULL,
+                branch_id INTEGER NOT NULL REFERENCES branches (id),
+                fiscal_year INTEGER NOT NULL,
+                order_probability DECIMAL(5,2) NOT NULL,
+                revenue DECIMAL(15,2) NOT NULL,
+                expenses DECIMAL(15,2) NOT NULL,
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+            INSERT INTO branches (id, branch_code, branch_name) VALUES (1, 'TKY', '東京支社');
+            INSERT INTO projects (project_code, project_name, branch_id, fiscal_year, order_probability, revenue, expenses, created_at, updated_at)
+            VALUES ('LEGACY1', '旧データ', 1, 2024, 100, 1000.5, 0.29, '2024-07-01 00:00:00.000000', '2024-07-01 00:00:00.000000');
+        ''')
+        connection.commit()
+        connection.close()
+        monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{path.as_posix()}')
+        return path
+
+    def _column_type(self, path, column):
+        connection = sqlite3.connect(path)
+        try:
+            return connection.execute(f"SELECT type FROM pragma_table_info('projects') WHERE name = '{column}'").fetchone()[0]
+        finally:
+            connection.close()
+
+    def _applied(self, path):
+        connection = sqlite3.connect(path)
+        try:
+            return {row[0] for row in connection.execute('SELECT version FROM schema_migrations')}
+        finally:
+            connection.close()
+
+    def _dispose(self, app):
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+    def test_migrates_legacy_numeric_database(self, legacy_database, capsys):
+        """旧スキーマのデータベースは起動時にマイグレーションを適用してから使う"""
+        app = create_app('testing')
+        try:
+            with app.app_context():
+                project = Project.query.filter_by(project_code='LEGACY1').one()
+                assert (project.revenue, project.expenses) == (1000.5, 0.29)
+                assert (project.fiscal_month, project.fiscal_quarter) == (4, 2)
+        finally:
+            self._dispose(app)
+
+        assert self._column_type(legacy_database, 'revenue') == 'INTEGER'
+        assert '006_store_money_as_minor_units' in self._applied(legacy_database)
+
+    def test_concurrent_startup_waits_for_migration(self, legacy_database, capsys):
+        """他のプロセスがマイグレーションのロックを持っている間は確認・適用を待つ"""
+        started = []
+
+        def start_worker():
+            started.append(create_app('testing'))
+
+        with migration_lock(str(legacy_database)):
+            worker = threading.Thread(target=start_worker)
+            worker.start()
+            worker.join(0.5)
+            assert worker.is_alive()
+            # ロックを持つプロセス（先に起動したワーカー）が適用する
+            assert run_migrations(str(legacy_database)) == []
+        worker.join(10)
+
+        assert len(started) == 1
+        self._dispose(started[0])
+        assert self._column_type(legacy_database, 'revenue') == 'INTEGER'
+
+    def test_refuses_to_start_without_migration(self, legacy_database, monkeypatch):
+        """自動適用が無効な場合、未適用のマイグレーションがあれば起動しない"""
+        monkeypatch.setattr(TestingConfig, 'DATABASE_AUTO_MIGRATE', False)
+
+        with pytest.raises(DatabaseNotReadyError, match='006_store_money_as_minor_units.*銭単位'):
+            create_app('testing')
+
+        assert self._column_type(legacy_database, 'revenue') == 'DECIMAL(15,2)'
+
+    def test_new_database_is_stamped(self, tmp_path, monkeypatch):
+        """新しいデータベースはモデルから作成し、マイグレーションは適用済みとして記録する"""
+        path = tmp_path / 'new.db'
+        monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{path.as_posix()}')
+        monkeypatch.setattr(TestingConfig, 'DATABASE_AUTO_MIGRATE', False)
+
+        self._dispose(create_app('testing'))
+        # 2回目の起動でも未適用のマイグレーションは無い
+        self._dispose(create_app('testing'))
+
+        assert '008_rebuild_projects_table' in self._applied(path)
+        assert self._column_type(path, 'revenue') == 'INTEGER'
+
+
+class TestReadWriteRouting:
+    """読み取り専用エンジンへの振り分けのテスト"""
+
+    @pytest.fixture
+    def app(self):
+        """テスト用アプリケーション"""
+        app = create_app('testing')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            branch = Branch(branch_code='TKY', branch_name='東京支社', is_active=True)
+            db.session.add(branch)
+            db.session.flush()
+            db.session.add(Project(project_code='PRJ001', project_name='案件1', branch_id=branch.id,
+                                   fiscal_year=2024, order_probability=50, revenue=1000, expenses=500))
+            db.session.commit()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def engines(self, app):
+        """エンジンごとに実行されたSQL文を記録"""
+        executed = {'write': [], 'read': []}
+        listeners = []
+        for name, engine in (('write', db.engine), ('read', db.engines[READ_BIND_KEY])):
+            def record(conn, cursor, statement, parameters, context, executemany, name=name):
+                executed[name].append(statement)
+            event.listen(engine, 'before_cursor_execute', record)
+            listeners.append((engine, record))
+        yield executed
+        for engine, record in listeners:
+            event.remove(engine, 'before_cursor_execute', record)
+
+    def test_read_only_uri(self, tmp_path):
+        """SQLiteのファイルDBのみ読み取り専用URIを作成する"""
+        assert read_only_database_uri(f'sqlite:///{tmp_path}/a.db') == f'sqlite:///file:{tmp_path}/a.db?mode=ro&uri=true'
+        assert read_only_database_uri('sqlite:///relative.db', str(tmp_path)) == f'sqlite:///file:{tmp_path}/relative.db?mode=ro&uri=true'
+        assert read_only_database_uri('sqlite://') is None
+        assert read_only_database_uri('postgresql://user@localhost/db') is None
+
+    def test_read_engine_is_read_only(self, app):
+        """読み取り専用エンジンでは書き込みができない"""
+        with db.engines[READ_BIND_KEY].connect() as connection:
+            assert connection.execute(text('PRAGMA query_only')).scalar() == 1
+            with pytest.raises(OperationalError):
+                connection.execute(text("UPDATE branches SET branch_name = 'x'"))
+
+    def test_get_request_reads_from_read_engine(self, app, engines):
+        """GETリクエストの読み取りは読み取り専用エンジンで実行する"""
+        response = app.test_client().get('/projects/')
+        assert response.status_code == 200
+        assert any('FROM branches' in statement for statement in engines['read'])
+        assert engines['write'] == []
+
+    def test_writes_stick_to_write_engine(self, app, engines):
+        """書き込み後はトランザクションが終わるまで通常のエンジンで読み取る"""
+        with read_only():
+            assert Project.query.count() == 1
+            assert engines['write'] == []
+            db.session.add(Project(project_code='PRJ002', project_name='案件2', branch_id=Branch.query.first().id,
+                                   fiscal_year=2024, order_probability=0, revenue=1, expenses=0))
+            # 未コミットの追加も見える（flush 後の読み取りは通常のエンジン）
+            assert Project.query.count() == 2
+            assert any(statement.startswith('INSERT INTO projects') for statement in engines['write'])
+            db.session.commit()
+
+            engines['write'].clear()
+            assert Project.query.count() == 2
+            assert engines['write'] == []
+
+    def test_post_request_uses_write_engine(self, app, engines):
+        """GET以外のリクエストでは読み取りも通常のエンジンで実行する"""
+        with app.test_request_context('/', method='POST'):
+            assert Project.query.count() == 1
+        assert any('FROM projects' in statement for statement in engines['write'])
+
+    def test_dashboard_service_always_reads_from_read_engine(self, app, engines):
+        """DashboardService はリクエストのメソッドに関係なく読み取り専用エンジンを使う"""
+        with app.test_request_context('/', method='POST'):
+            stats = DashboardService.get_overall_stats()
+        assert stats['total_projects'] == 1
+        assert engines['read']
+        assert not [statement for statement in engines['write'] if 'FROM projects' in statement]
+
+    def test_routing_disabled(self, monkeypatch):
+        """DATABASE_READ_ROUTING を無効にすると読み取り専用エンジンを作成しない"""
+        monkeypatch.setattr(TestingConfig, 'DATABASE_READ_ROUTING', False)
+        disabled = create_app('testing')
+        with disabled.app_context():
+            assert READ_BIND_KEY not in db.engines
@@ -0,0 +1,206 @@
+"""
+マイグレーション（DatabaseMigrator・テーブルの作り直し）のテスト
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'migrations'))
+try:
+    from migrate import (PROJECTS_INDEXES, DatabaseMigrator, TableRebuild, add_change_seq_columns,
+                         add_export_job_worker_column, run_migrations)
+finally:
+    sys.path.pop(0)
+
+
+CREATE_SQL = '''
+    CREATE TABLE {table} (
+        id INTEGER NOT NULL,
+        code VARCHAR(20) NOT NULL,
+        amount INTEGER NOT NULL,
+        PRIMARY KEY (id)
+    )
+'''
+
+
+class Interrupted(Exception):
+    """テスト用の中断"""
+
+
+class TestTableRebuild:
+    """TableRebuild のテスト"""
+
+    @pytest.fixture
+    def database(self, tmp_path):
+        """金額を小数で持つ旧構造のテーブル（20件）"""
+        path = tmp_path / 'rebuild.db'
+        connection = sqlite3.connect(path)
+        connection.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, code VARCHAR(20) NOT NULL, amount DECIMAL(15,2) NOT NULL)')
+        connection.execute('CREATE UNIQUE INDEX ix_items_code ON items (code)')
+        connection.executemany('INSERT INTO items VALUES (?, ?, ?)', [(i, f'C{i:02d}', i + 0.5) for i in range(1, 21)])
+        connection.commit()
+        yield path, connection
+        connection.close()
+
+    def _rebuild(self, batch_size=6):
+        return TableRebuild('items', CREATE_SQL, {
+            'id': None, 'code': None, 'amount': 'CAST(ROUND(amount * 100) AS INTEGER)'
+        }, batch_size=batch_size)
+
+    def _names(self, connection):
+        return {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'")}
+
+    def test_rebuild_in_batches(self, database):
+        """バッチごとにコピーし、インデックスを元の名前で作り直す"""
+        path, connection = database
+        lines = []
+
+        self._rebuild().run(connection, '001_items', log=lines.append)
+
+        assert connection.execute("SELECT type FROM pragma_table_info('items') WHERE name = 'amount'").fetchone() == ('INTEGER',)
+        assert connection.execute('SELECT id, code, amount FROM items WHERE id = 3').fetchone() == (3, 'C03', 350)
+        assert connection.execute('SELECT COUNT(*) FROM items').fetchone() == (20,)
+        assert self._names(connection) == {'items', 'ix_items_code', TableRebuild.PROGRESS_TABLE}
+        assert sum('件 (' in line for line in lines) == 4
+        with pytest.raises(sqlite3.IntegrityError):
+            connection.execute("INSERT INTO items VALUES (99, 'C01', 0)")
+
+    def test_resume_with_concurrent_writes(self, database):
+        """中断後はチェックポイントから再開し、中断中の書き込みもトリガーで反映される"""
+        path, connection = database
+        calls = []
+
+        def interrupt(line):
+            calls.append(line)
+            if len(calls) == 3:
+                raise Interrupted()
+
+        with pytest.raises(Interrupted):
+            self._rebuild().run(connection, '001_items', log=interrupt)
+        assert connection.execute(
+            f"SELECT phase, last_id, copied FROM {TableRebuild.PROGRESS_TABLE} WHERE version = '001_items'"
+        ).fetchone() == (TableRebuild.PHASE_COPYING, 12, 12)
+
+        # 別の接続（アプリ）からの書き込み（コピー済み・未コピーの両方）
+        app = sqlite3.connect(path)
+        app.execute('UPDATE items SET amount = 1.25 WHERE id = 2')
+        app.execute('DELETE FROM items WHERE id IN (5, 15)')
+        app.execute("UPDATE items SET amount = 7 WHERE id = 18")
+        app.execute("INSERT INTO items VALUES (30, 'C30', 30.01)")
+        app.commit()
+        app.close()
+
+        lines = []
+        self._rebuild().run(connection, '001_items', log=lines.append)
+
+        assert 'id 12 の次から再開します' in lines[0]
+        rows = dict(connection.execute('SELECT id, amount FROM items').fetchall())
+        assert len(rows) == 19
+        assert (rows[2], rows[18], rows[30]) == (125, 700, 3001)
+        assert 5 not in rows and 15 not in rows
+        assert not any(name.endswith('__rebuild') or name.startswith('items__') for name in self._names(connection))
+
+    def test_resume_after_swap(self, database, monkeypatch):
+        """入れ替え後に中断しても、再実行で後片付けとインデックスの作成を行う"""
+        path, connection = database
+        finish = TableRebuild._finish
+
+        def fail(self, *args, **kwargs):
+            raise Interrupted()
+
+        monkeypatch.setattr(TableRebuild, '_finish', fail)
+        with pytest.raises(Interrupted):
+            self._rebuild().run(connection, '001_items', log=lambda line: None)
+        assert 'items__retired' in self._names(connection)
+
+        monkeypatch.setattr(TableRebuild, '_finish', finish)
+        self._rebuild().run(connection, '001_items', log=lambda line: None)
+
+        assert self._names(connection) == {'items', 'ix_items_code', TableRebuild.PROGRESS_TABLE}
+        assert connection.execute('SELECT SUM(amount) FROM items').fetchone() == (22000,)
+
+    def test_skips_duplicate_legacy_indexes(self, database):
+        """指定したインデックスと同じ列の並びの旧インデックスは作り直さない"""
+        path, connection = database
+        connection.execute('CREATE INDEX idx_code ON items (code)')
+        connection.execute('CREATE INDEX idx_amount ON items (amount)')
+        rebuild = TableRebuild('items', CREATE_SQL, {
+            'id': None, 'code': None, 'amount': 'CAST(ROUND(amount * 100) AS INTEGER)'
+        }, indexes=[{'name': 'ix_items_code_v2', 'columns': ['code'], 'unique': True}])
+
+        rebuild.run(connection, '001_items', log=lambda line: None)
+
+        assert self._names(connection) == {'items', 'ix_items_code_v2', 'idx_amount', TableRebuild.PROGRESS_TABLE}
+
+
+class TestDatabaseMigrator:
+    """DatabaseMigrator のテスト"""
+
+    def test_reuses_connection(self, tmp_path):
+        """適用済みのチェックごとに接続し直さない"""
+        migrator = DatabaseMigrator(tmp_path / 'migrator.db')
+        migrator.init_migrations_table()
+        connection = migrator.connect()
+
+        assert not migrator.is_migration_applied('001')
+        assert migrator.apply_migration('001', 'テスト', ['CREATE TABLE items (id INTEGER PRIMARY KEY)'])
+        assert migrator.is_migration_applied('001')
+        assert migrator.connect() is connection
+        migrator.close()
+
+    def test_apply_rebuild(self, tmp_path):
+        """作り直しの完了でマイグレーションを記録し、進捗の記録を削除する"""
+        migrator = DatabaseMigrator(tmp_path / 'migrator.db', batch_size=2)
+        migrator.init_migrations_table()
+        migrator.apply_migration('001', 'テスト', [
+            'CREATE TABLE items (id INTEGER PRIMARY KEY, code VARCHAR(20) NOT NULL, amount REAL NOT NULL)',
+            "INSERT INTO items VALUES (1, 'A', 1.5), (2, 'B', 2), (3, 'C', 0.01)",
+        ])
+        rebuild = TableRebuild('items', CREATE_SQL, {'id': None, 'code': None, 'amount': 'CAST(ROUND(amount * 100) AS INTEGER)'})
+
+        assert migrator.apply_rebuild('002', '作り直し', rebuild)
+        assert not migrator.apply_rebuild('002', '作り直し', rebuild)
+
+        connection = migrator.connect()
+        assert connection.execute('SELECT amount FROM items ORDER BY id').fetchall() == [(150,), (200,), (1,)]
+        assert connection.execute(f'SELECT COUNT(*) FROM {TableRebuild.PROGRESS_TABLE}').fetchone() == (0,)
+        migrator.close()
+
+    def test_run_migrations_indexes(self, tmp_path, capsys):
+        """旧スキーマから全マイグレーションを適用すると、projects のインデックスはモデルと同じになる"""
+        path = tmp_path / 'projects.db'
+        run_migrations(str(path))
+
+        connection = sqlite3.connect(path)
+        names = {row[1] for row in connection.execute("PRAGMA index_list('projects')") if row[3] == 'c'}
+        connection.close()
+        assert names == {index['name'] for index in PROJECTS_INDEXES}
+
+    def test_add_change_seq_columns(self, tmp_path):
+        """変更番号の列を追加し、ウォーターマークが日時のバックアップ履歴を削除する"""
+        connection = sqlite3.connect(tmp_path / 'backup.db')
+        connection.execute('CREATE TABLE projects (id INTEGER PRIMARY KEY, project_code VARCHAR(50))')
+        connection.execute("INSERT INTO projects VALUES (1, 'P1')")
+        connection.execute('CREATE TABLE backup_history (id INTEGER PRIMARY KEY, watermark DATETIME NOT NULL)')
+        add_change_seq_columns(connection.cursor())
+        # 2回目は何もしない
+        add_change_seq_columns(connection.cursor())
+
+        assert connection.execute('SELECT change_seq FROM projects').fetchone() == (0,)
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert tables == {'projects'}
+        connection.close()
+
+    def test_add_export_job_worker_column(self, tmp_path):
+        """エクスポートジョブにプロセスの列を追加する（テーブルが無ければ何もしない）"""
+        connection = sqlite3.connect(tmp_path / 'jobs.db')
+        add_export_job_worker_column(connection.cursor())
+        connection.execute("CREATE TABLE export_jobs (id INTEGER PRIMARY KEY, status VARCHAR(20))")
+        connection.execute("INSERT INTO export_jobs VALUES (1, 'running')")
+        add_export_job_worker_column(connection.cursor())
+        add_export_job_worker_column(connection.cursor())
+
+        assert connection.execute('SELECT status, worker_id FROM export_jobs').fetchone() == ('running', None)
+        connection.close()